@@ -0,0 +1,163 @@
+# 이벤트 루프 지연 모니터 및 느린 콜백 탐지기
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+from fastapi import APIRouter, Request
+from prometheus_client import Counter, Histogram
+
+from .profiler import _check_admin
+
+logger = logging.getLogger("loop_monitor")
+
+LOOP_LAG = Histogram(
+    'event_loop_lag_seconds',
+    'Event loop scheduling lag in seconds',
+    ['service'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+SLOW_CALLBACKS = Counter(
+    'event_loop_slow_callbacks_total',
+    'Number of callbacks that blocked the event loop longer than the threshold',
+    ['service']
+)
+
+SLOW_CALLBACK_DURATION = Histogram(
+    'event_loop_slow_callback_duration_seconds',
+    'Duration of callbacks that blocked the event loop',
+    ['service'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+
+class LoopMonitor:
+    """이벤트 루프 스케줄링 지연을 계속 측정하고, 임계값보다 오래 루프를 막은 콜백의 스택을 기록
+
+    루프 안의 tick 태스크가 interval마다 heartbeat를 갱신하고, 별도 감시 스레드가
+    heartbeat가 임계값 이상 늦어지면 그 순간 루프 스레드의 스택을 캡처한다.
+    스택은 루프를 막고 있는 바로 그 코드를 가리킨다.
+    """
+
+    def __init__(self, service: str, interval: float = 0.05, slow_threshold: float = 0.1,
+                 max_events: int = 100):
+        self.service = service
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.events: deque = deque(maxlen=max_events)
+        self.max_lag = 0.0
+        self._heartbeat = time.perf_counter()
+        self._pending_stack: Optional[List[str]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"⏱️ 이벤트 루프 모니터 시작: {self.service} (임계값 {self.slow_threshold * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _tick(self):
+        while True:
+            self._heartbeat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - self._heartbeat - self.interval)
+            LOOP_LAG.labels(service=self.service).observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.slow_threshold:
+                self._record_slow_callback(lag)
+
+    def _watch(self):
+        # 임계값의 절반 주기로 heartbeat 확인 → 막힌 동안 한 번만 스택 캡처
+        captured_for = None
+        while not self._stop.wait(self.slow_threshold / 2):
+            heartbeat = self._heartbeat
+            overdue = time.perf_counter() - heartbeat - self.interval
+            if overdue >= self.slow_threshold and captured_for != heartbeat:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._pending_stack = traceback.format_stack(frame, limit=30)
+                    captured_for = heartbeat
+
+    def _record_slow_callback(self, duration: float):
+        stack = self._pending_stack or []
+        self._pending_stack = None
+        SLOW_CALLBACKS.labels(service=self.service).inc()
+        SLOW_CALLBACK_DURATION.labels(service=self.service).observe(duration)
+        location = stack[-1].strip().splitlines()[0] if stack else "unknown"
+        self.events.append({
+            "timestamp": datetime.now().isoformat(),
+            "duration_ms": round(duration * 1000, 1),
+            "location": location,
+            "stack": [line.rstrip() for line in stack],
+        })
+        logger.warning(f"🐢 이벤트 루프 {duration * 1000:.0f}ms 차단: {location}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "service": self.service,
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "slow_callbacks": list(reversed(self.events)),
+        }
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+async def start_loop_monitor(service_name: str) -> LoopMonitor:
+    """lifespan 시작 시 호출 - 환경변수로 주기/임계값 조정 가능"""
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopMonitor(
+            service_name,
+            interval=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50")) / 1000,
+            slow_threshold=float(os.getenv("LOOP_SLOW_CALLBACK_MS", "100")) / 1000,
+        )
+        await _monitor.start()
+    return _monitor
+
+
+async def stop_loop_monitor():
+    """lifespan 종료 시 호출"""
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
+
+
+loop_monitor_router = APIRouter(prefix="/admin/loop", tags=["Admin Loop Monitor"])
+
+
+@loop_monitor_router.get("/slow-callbacks", summary="최근 느린 콜백과 스택")
+async def slow_callbacks(request: Request):
+    """관리자 전용 - 최근 루프를 막은 콜백 목록 (스택 포함)"""
+    _check_admin(request)
+    if _monitor is None:
+        return {"status": "stopped", "slow_callbacks": []}
+    return _monitor.snapshot()
@@ -0,0 +1,299 @@
+# 샘플링 프로파일러 - 관리자 전용 on-demand 프로파일링 및 요청 단위 프로파일링
+import os
+import sys
+import time
+import uuid
+import hmac
+import random
+import asyncio
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional, Dict, Any
+
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import PlainTextResponse
+
+logger = logging.getLogger("profiler")
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+PROFILE_REQUEST_HEADER = "X-Profile-Request"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# 안전 상한 (운영 트래픽에서 사용해도 되도록)
+MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+MIN_INTERVAL_MS = float(os.getenv("PROFILER_MIN_INTERVAL_MS", "5"))
+MAX_SESSIONS = int(os.getenv("PROFILER_MAX_SESSIONS", "1"))
+MAX_OVERHEAD = float(os.getenv("PROFILER_MAX_OVERHEAD", "0.05"))
+MAX_STACK_DEPTH = 64
+MAX_STORED_REQUEST_PROFILES = 32
+
+# CPU 모드에서 유휴 상태로 간주하는 최상단 프레임 (이벤트 루프 대기, 스레드풀 대기)
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """sys._current_frames()를 주기적으로 읽어 collapsed stack으로 집계하는 샘플러
+
+    mode="wall"은 모든 스레드의 모든 샘플을, mode="cpu"는 유휴 대기 프레임이
+    최상단인 샘플을 제외한다. target_task가 주어지면 이벤트 루프 스레드에서
+    해당 태스크가 실행 중일 때의 샘플만 기록한다 (요청 단위 프로파일링).
+    """
+
+    def __init__(self, interval_ms: float = 10.0, mode: str = "cpu",
+                 target_task: Optional[asyncio.Task] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.interval = max(interval_ms, MIN_INTERVAL_MS) / 1000
+        self.mode = mode
+        self.target_task = target_task
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident() if loop is not None else None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampler_seconds = 0.0
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    @property
+    def overhead(self) -> float:
+        elapsed = (self.stopped_at or time.perf_counter()) - self.started_at
+        return self.sampler_seconds / elapsed if elapsed > 0 else 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.stopped_at = time.perf_counter()
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        frames = sys._current_frames()
+        if self.target_task is not None:
+            # 대상 태스크가 이벤트 루프에서 실행 중일 때만 루프 스레드 샘플 기록
+            # (current_task(loop)는 다른 스레드에서 조회해도 되는 공개 API)
+            if asyncio.current_task(self.loop) is not self.target_task:
+                return
+            frames = {self.loop_thread_id: frames.get(self.loop_thread_id)}
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in frames.items():
+            if frame is None or thread_id == own_id:
+                continue
+            if self.mode == "cpu" and _is_idle(frame):
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _run(self):
+        # 간격을 흔들어 샘플 시점이 이벤트 루프의 GIL 반납 지점(select 대기)에 맞물리지 않게 함 - 고정 간격이면
+        # 바쁜 태스크 실행 중이 아니라 태스크 사이에서만 GIL을 얻어 대상 태스크 샘플이 거의 남지 않음
+        while not self._stop.wait(self.interval * random.uniform(0.5, 1.5)):
+            # 샘플러 스레드 CPU 시간 - 벽시계로 재면 GIL 대기까지 비용으로 잡혀 간격이 불필요하게 늘어남
+            t0 = time.thread_time()
+            self._sample()
+            cost = time.thread_time() - t0
+            self.sampler_seconds += cost
+            # 샘플링 비용이 상한을 넘으면 샘플 간격을 늘려 오버헤드 제한
+            if cost > self.interval * MAX_OVERHEAD:
+                self.interval = min(self.interval * 2, 1.0)
+
+    def collapsed(self) -> str:
+        """flamegraph.pl / speedscope 호환 collapsed stack 텍스트"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "samples": self.samples,
+            "interval_ms": round(self.interval * 1000, 3),
+            "overhead": round(self.overhead, 4),
+        }
+
+
+class _SessionLimiter:
+    """동시에 실행되는 프로파일링 세션 수 상한 (대기하지 않고 즉시 거절)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+
+_sessions = _SessionLimiter(MAX_SESSIONS)
+_request_profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def _check_admin(request: Request):
+    """PROFILER_ADMIN_TOKEN이 설정되어 있고 헤더 토큰이 일치할 때만 허용"""
+    expected = os.getenv("PROFILER_ADMIN_TOKEN")
+    provided = request.headers.get(ADMIN_TOKEN_HEADER, "")
+    if not expected or not hmac.compare_digest(provided, expected):
+        raise HTTPException(status_code=403, detail="관리자 전용 엔드포인트입니다")
+
+
+def _is_admin(request: Request) -> bool:
+    try:
+        _check_admin(request)
+        return True
+    except HTTPException:
+        return False
+
+
+def _collapsed_response(profiler: SamplingProfiler, service: str, extra: Optional[Dict[str, str]] = None):
+    stats = profiler.stats()
+    headers = {
+        "Content-Disposition": f'attachment; filename="{service}-{int(time.time())}.collapsed"',
+        "X-Profile-Samples": str(stats["samples"]),
+        "X-Profile-Interval-Ms": str(stats["interval_ms"]),
+        "X-Profile-Overhead": str(stats["overhead"]),
+    }
+    headers.update(extra or {})
+    return PlainTextResponse(profiler.collapsed(), headers=headers)
+
+
+class ProfileRequestMiddleware:
+    """X-Profile-Request 헤더가 붙은 관리자 요청 하나만 프로파일링하는 ASGI 미들웨어
+
+    엔드포인트와 같은 태스크에서 실행되어야 하므로 다른 미들웨어보다 먼저
+    (= 가장 안쪽에) 등록해야 한다. 결과는 X-Profile-Id 헤더로 알려주고
+    /admin/profile/requests/{id}에서 내려받는다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request = Request(scope)
+        if not request.headers.get(PROFILE_REQUEST_HEADER) or not _is_admin(request):
+            return await self.app(scope, receive, send)
+        if not _sessions.try_acquire():
+            logger.warning("⚠️ 프로파일링 세션 상한 도달 - 요청 프로파일링 생략")
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex
+        mode = request.headers.get(PROFILE_REQUEST_HEADER).lower()
+        profiler = SamplingProfiler(
+            interval_ms=MIN_INTERVAL_MS,
+            mode="wall" if mode == "wall" else "cpu",
+            target_task=asyncio.current_task(),
+            loop=asyncio.get_running_loop(),
+        )
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())
+                ]
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            _sessions.release()
+            _request_profiles[profile_id] = {
+                "path": request.url.path,
+                "collapsed": profiler.collapsed(),
+                "stats": profiler.stats(),
+            }
+            while len(_request_profiles) > MAX_STORED_REQUEST_PROFILES:
+                _request_profiles.popitem(last=False)
+
+
+def create_profiler_router(service_name: str) -> APIRouter:
+    router = APIRouter(prefix="/admin/profile", tags=["Admin Profiler"])
+
+    @router.post("", summary="N초 동안 샘플링 프로파일링 (collapsed stack 반환)")
+    async def profile(
+        request: Request,
+        seconds: float = Query(10.0, gt=0),
+        mode: str = Query("cpu", pattern="^(cpu|wall)$"),
+        interval_ms: float = Query(10.0, gt=0),
+    ):
+        """관리자 전용 - 이벤트 루프를 막지 않고 N초간 샘플링한 결과를 반환"""
+        _check_admin(request)
+        if not _sessions.try_acquire():
+            raise HTTPException(status_code=429, detail="이미 실행 중인 프로파일링 세션이 있습니다")
+        seconds = min(seconds, MAX_SECONDS)
+        profiler = SamplingProfiler(interval_ms=interval_ms, mode=mode)
+        logger.info(f"🔬 프로파일링 시작: {service_name} {seconds}s mode={mode}")
+        try:
+            profiler.start()
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(profiler.stop)
+            _sessions.release()
+        logger.info(f"🔬 프로파일링 종료: {profiler.stats()}")
+        return _collapsed_response(profiler, service_name)
+
+    @router.get("/requests", summary="저장된 요청 프로파일 목록")
+    async def list_request_profiles(request: Request):
+        _check_admin(request)
+        return [
+            {"profile_id": pid, "path": p["path"], **p["stats"]}
+            for pid, p in reversed(_request_profiles.items())
+        ]
+
+    @router.get("/requests/{profile_id}", summary="요청 프로파일 내려받기")
+    async def get_request_profile(request: Request, profile_id: str):
+        _check_admin(request)
+        stored = _request_profiles.get(profile_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="프로파일을 찾을 수 없습니다")
+        return PlainTextResponse(
+            stored["collapsed"],
+            headers={"Content-Disposition": f'attachment; filename="{service_name}-{profile_id}.collapsed"'},
+        )
+
+    return router
+
+
+def install_profiler(app, service_name: str):
+    """FastAPI 앱에 관리자 프로파일러 라우터와 요청 단위 프로파일링 미들웨어 등록
+
+    요청 단위 프로파일링이 엔드포인트 태스크를 정확히 잡으려면 다른
+    미들웨어보다 먼저 호출해야 한다.
+    """
+    app.add_middleware(ProfileRequestMiddleware)
+    app.include_router(create_profiler_router(service_name))
+    return app
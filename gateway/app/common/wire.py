@@ -0,0 +1,100 @@
+# 서비스 간 내부 호출용 압축 바이너리 인코딩 - 객체는 msgpack, 숫자 열은 리틀엔디언 원시 배열
+#
+# 서비스 간 직접 호출만 Accept 헤더로 협상한다. 게이트웨이는 클라이언트 Accept에서 이 형식을 빼고 업스트림 JSON을
+# 그대로 중계한다 (packed → JSON 변환은 서비스의 JSON 인코딩과 비용이 비슷해 게이트웨이로 옮겨도 이득이 없음,
+# cbam-service/bench_wire_format.py 참고).
+#   Accept: application/vnd.cbam.packed+msgpack  → 이 형식, 없으면 기존 JSON
+# 숫자/불리언 1차원 배열은 msgpack 확장 타입(ARRAY_EXT) 하나로 담는다:
+#   데이터 = dtype 문자열 3바이트("<f8", "<i8", "|b1" …) + 리틀엔디언 원시 바이트
+#   양쪽 디코더가 모두 읽을 수 있는 dtype(ARRAY_DTYPES)만 - float16 등 나머지는 일반 리스트로 보낸다
+# 디코더는 numpy가 있으면 복사 없는 ndarray(np.frombuffer), 없으면 표준 array 모듈로 리스트를 만든다.
+import sys
+import json
+import math
+from array import array
+from typing import Any, Optional
+
+import msgpack
+
+PACKED_MEDIA_TYPE = "application/vnd.cbam.packed+msgpack"
+ARRAY_EXT = 1
+
+# 확장 타입으로 보내는 (dtype 종류, 크기) - 모두 3바이트 dtype 문자열, array 모듈로도 읽을 수 있는 것
+ARRAY_DTYPES = {("b", 1), ("i", 1), ("i", 2), ("i", 4), ("i", 8), ("u", 1), ("u", 2), ("u", 4), ("u", 8),
+                ("f", 4), ("f", 8)}
+
+# (dtype 종류, 크기) → array 모듈 typecode (플랫폼별 크기가 맞는 것만)
+_TYPECODES = {}
+for _code in "bBhHiIlLqQfd":
+    _kind = "f" if _code in "fd" else ("u" if _code.isupper() else "i")
+    _TYPECODES.setdefault((_kind, array(_code).itemsize), _code)
+
+
+def accepts_packed(accept: Optional[str]) -> bool:
+    """Accept 헤더에 내부 바이너리 형식이 있으면 True (q=0은 거절로 취급)"""
+    for part in (accept or "").split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        if media == PACKED_MEDIA_TYPE:
+            return not any(p.replace(" ", "") in ("q=0", "q=0.0") for p in params)
+    return False
+
+
+def _default(obj: Any):
+    # numpy는 인코딩하는 서비스에만 있으므로 속성으로 판별
+    dtype = getattr(obj, "dtype", None)
+    if dtype is None:
+        raise TypeError(f"직렬화할 수 없는 타입: {type(obj).__name__}")
+    if getattr(obj, "ndim", 0) == 1 and (dtype.kind, dtype.itemsize) in ARRAY_DTYPES:
+        little = obj.astype(dtype.newbyteorder("<"), copy=False)
+        return msgpack.ExtType(ARRAY_EXT, little.dtype.str.encode("ascii") + little.tobytes())
+    # 문자열/객체 배열, 다차원 배열, float16 등 확장 타입에 없는 dtype, numpy 스칼라
+    return obj.tolist()
+
+
+def packb(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def _array_descr(payload: bytes) -> str:
+    descr = payload[:3].decode("ascii", errors="replace")
+    if descr[:1] not in "<|" or (descr[1:2], int(descr[2:]) if descr[2:].isdigit() else 0) not in ARRAY_DTYPES:
+        raise ValueError(f"지원하지 않는 배열 dtype: {descr!r}")
+    return descr
+
+
+def _array_to_list(descr: str, data: bytes) -> list:
+    kind, size = descr[1], int(descr[2:])
+    values = array(_TYPECODES["u" if kind == "b" else kind, size])
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    if kind == "b":
+        return [bool(v) for v in values]
+    values = values.tolist()
+    # JSON 응답과 같은 규칙 (NaN → null)
+    if kind == "f" and any(map(math.isnan, values)):
+        values = [None if v != v else v for v in values]
+    return values
+
+
+def unpackb(data: bytes, numpy_arrays: bool = True) -> Any:
+    """numpy_arrays=False면 배열을 JSON과 같은 모양의 리스트로 (JSON 변환용)"""
+
+    def ext_hook(code: int, payload: bytes):
+        if code != ARRAY_EXT:
+            return msgpack.ExtType(code, payload)
+        descr = _array_descr(payload)
+        if numpy_arrays:
+            import numpy as np
+
+            return np.frombuffer(payload, dtype=np.dtype(descr), offset=3)
+        return _array_to_list(descr, payload[3:])
+
+    return msgpack.unpackb(data, ext_hook=ext_hook, raw=False, strict_map_key=False)
+
+
+def packed_to_json(data: bytes) -> bytes:
+    """내부 바이너리 본문 → JSON 본문 (FastAPI JSONResponse와 같은 형식, 벤치마크 비교/디버깅용)"""
+    return json.dumps(
+        unpackb(data, numpy_arrays=False), ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
@@ -0,0 +1,276 @@
+# 업스트림 능동 헬스 프로버 - 모든 인스턴스를 주기적으로 동시에 확인(지터), 이상 인스턴스 방출, 라우팅 대상 선택
+#
+# 인스턴스 상태
+#   healthy        마지막 프로브 결과 (None = 아직 확인 전, 라우팅에는 포함)
+#   ejected_until  이상치 방출 종료 시각 - 연속 실패(능동 프로브 + 프록시 연결 실패) 또는 지연 이상치일 때,
+#                  방출될 때마다 기간이 두 배 (깜빡이는 인스턴스가 금방 돌아오지 않도록)
+# 라우팅은 healthy이고 방출되지 않은 인스턴스를 라운드 로빈으로 고르며, 하나도 없으면 전체에서 고른다(fail-open).
+# /health 응답은 프로브 라운드가 끝날 때 미리 직렬화해 둔 스냅샷을 그대로 반환 (업스트림을 요청 중에 호출하지 않음).
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import statistics
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.router.auth_router import record_ejection, record_probe, update_service_health
+
+logger = logging.getLogger("gateway_api")
+
+PROBE_INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "5"))
+# 간격에 ±비율만큼 무작위 지터 (게이트웨이 여러 대가 같은 순간에 프로브하지 않도록)
+PROBE_JITTER = float(os.getenv("HEALTH_PROBE_JITTER", "0.2"))
+PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "2"))
+PROBE_PATH = os.getenv("HEALTH_PROBE_PATH", "/health")
+EJECT_AFTER_FAILURES = int(os.getenv("HEALTH_EJECT_AFTER_FAILURES", "3"))
+BASE_EJECTION_SECONDS = float(os.getenv("HEALTH_BASE_EJECTION_SECONDS", "30"))
+MAX_EJECTION_SECONDS = 300.0
+# 이만큼 연속 정상이면 방출 횟수(다음 방출 기간의 배수)를 하나 줄임
+EJECTION_DECAY_SUCCESSES = 12
+# 지연 이상치: 같은 서비스 인스턴스 중앙값의 N배 이상이면서 최소 기준 초과 (인스턴스 3개 이상일 때만)
+LATENCY_OUTLIER_FACTOR = float(os.getenv("HEALTH_LATENCY_OUTLIER_FACTOR", "5"))
+LATENCY_OUTLIER_MIN_MS = float(os.getenv("HEALTH_LATENCY_OUTLIER_MIN_MS", "500"))
+# 지연 이상치로 동시에 방출할 수 있는 인스턴스 비율 상한
+MAX_EJECTION_PERCENT = 50
+EWMA_ALPHA = 0.3
+
+
+class _ProbeLogFilter(logging.Filter):
+    """httpx 요청 로그에서 프로브 요청만 제외 (몇 초마다 인스턴스 수만큼 쌓이므로)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.msg != 'HTTP Request: %s %s "%s %d %s"':
+            return True
+        return urlsplit(str(record.args[1])).path != PROBE_PATH
+
+
+class Instance:
+    def __init__(self, service: str, url: str):
+        self.service = service
+        self.url = url
+        self.healthy: Optional[bool] = None
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.latency_ms: Optional[float] = None
+        self.last_probe_at: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    def ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def routable(self, now: float) -> bool:
+        return self.healthy is not False and not self.ejected(now)
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ejected_until": datetime.fromtimestamp(
+                time.time() + self.ejected_until - now).isoformat() if self.ejected(now) else None,
+            "consecutive_failures": self.consecutive_failures,
+            "latency_ms": round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            "last_probe_at": self.last_probe_at,
+            "last_error": self.last_error,
+        }
+
+
+class UpstreamRegistry:
+    """서비스별 인스턴스 목록과 상태 - 이벤트 루프 안에서만 변경 (잠금 불필요)"""
+
+    def __init__(self, services: Dict[str, List[str]]):
+        self.services = {name: [Instance(name, url.rstrip("/")) for url in urls] for name, urls in services.items()}
+        self._cursor = {name: 0 for name in services}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+        self.snapshot: dict = {}
+        self.snapshot_body = b""
+        self.all_up = True
+        self._rebuild_snapshot()
+
+    # ---- 라우팅 ----
+
+    def pick(self, service: str) -> str:
+        instances = self.services[service]
+        if len(instances) == 1:
+            return instances[0].url
+        now = time.monotonic()
+        candidates = [i for i in instances if i.routable(now)] or instances
+        self._cursor[service] = (self._cursor[service] + 1) % len(candidates)
+        return candidates[self._cursor[service]].url
+
+    def report_failure(self, service: str, url: str, error: str):
+        """프록시 연결 실패/타임아웃 (수동 감지) - 다음 프로브를 기다리지 않고 연속 실패에 합산"""
+        instance = next((i for i in self.services.get(service, []) if i.url == url.rstrip("/")), None)
+        if instance is not None:
+            self._failed(instance, error, time.monotonic())
+            self._rebuild_snapshot()
+
+    # ---- 상태 전이 ----
+
+    def _eject(self, instance: Instance, reason: str, now: float):
+        duration = min(BASE_EJECTION_SECONDS * 2 ** instance.ejections, MAX_EJECTION_SECONDS)
+        instance.ejected_until = now + duration
+        instance.ejections += 1
+        record_ejection(instance.service, reason)
+        logger.warning(f"🚫 업스트림 방출 {instance.service} {instance.url}: {reason}, {duration:.0f}초")
+
+    def _failed(self, instance: Instance, error: str, now: float):
+        instance.consecutive_failures += 1
+        instance.consecutive_successes = 0
+        instance.last_error = error
+        if instance.consecutive_failures >= EJECT_AFTER_FAILURES:
+            instance.healthy = False
+            if not instance.ejected(now):
+                self._eject(instance, "consecutive_failures", now)
+
+    def _succeeded(self, instance: Instance, latency_ms: float):
+        if instance.healthy is False:
+            logger.info(f"✅ 업스트림 복구 {instance.service} {instance.url}")
+        instance.healthy = True
+        instance.consecutive_failures = 0
+        instance.consecutive_successes += 1
+        instance.last_error = None
+        instance.latency_ms = latency_ms if instance.latency_ms is None else (
+            EWMA_ALPHA * latency_ms + (1 - EWMA_ALPHA) * instance.latency_ms)
+        # 방출이 끝난 뒤 정상 프로브가 충분히 이어지면 다음 방출 기간을 한 단계씩 줄임
+        if instance.ejections and instance.consecutive_successes >= EJECTION_DECAY_SUCCESSES:
+            instance.ejections -= 1
+            instance.consecutive_successes = 0
+
+    def _detect_latency_outliers(self, now: float):
+        for service, instances in self.services.items():
+            measured = [i for i in instances if i.healthy and i.latency_ms is not None]
+            if len(measured) < 3:
+                continue
+            median = statistics.median(i.latency_ms for i in measured)
+            budget = len(instances) * MAX_EJECTION_PERCENT // 100 - sum(i.ejected(now) for i in instances)
+            for instance in sorted(measured, key=lambda i: i.latency_ms, reverse=True):
+                if budget <= 0:
+                    break
+                if (not instance.ejected(now) and instance.latency_ms > LATENCY_OUTLIER_MIN_MS
+                        and instance.latency_ms > LATENCY_OUTLIER_FACTOR * median):
+                    self._eject(instance, "latency_outlier", now)
+                    budget -= 1
+
+    # ---- 프로브 ----
+
+    async def _probe(self, instance: Instance):
+        started = time.perf_counter()
+        try:
+            response = await self._client.get(f"{instance.url}{PROBE_PATH}")
+            ok = response.status_code < 400
+            error = None if ok else f"HTTP {response.status_code}"
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        elapsed = time.perf_counter() - started
+        instance.last_probe_at = datetime.now().isoformat()
+        record_probe(instance.service, instance.url, ok, elapsed)
+        if ok:
+            self._succeeded(instance, elapsed * 1000)
+        else:
+            self._failed(instance, error, time.monotonic())
+
+    async def probe_all(self):
+        """모든 서비스의 모든 인스턴스를 동시에 프로브 (라운드 시간 = 가장 느린 인스턴스, 타임아웃으로 상한)"""
+        await asyncio.gather(*(self._probe(i) for instances in self.services.values() for i in instances))
+        self._detect_latency_outliers(time.monotonic())
+        self.rounds += 1
+        self._rebuild_snapshot()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 헬스 프로브 라운드 실패: {str(e)}")
+            await asyncio.sleep(PROBE_INTERVAL_SECONDS * (1 + random.uniform(-PROBE_JITTER, PROBE_JITTER)))
+
+    async def start(self):
+        logging.getLogger("httpx").addFilter(_PROBE_LOG_FILTER)
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(PROBE_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_keepalive_connections=sum(len(i) for i in self.services.values())),
+        )
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"🩺 업스트림 헬스 프로버 시작: {PROBE_INTERVAL_SECONDS}s ±{PROBE_JITTER:.0%}, "
+            + ", ".join(f"{name} {len(instances)}개" for name, instances in self.services.items())
+        )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---- 캐시된 상태 ----
+
+    def _rebuild_snapshot(self):
+        now = time.monotonic()
+        services = {}
+        for name, instances in self.services.items():
+            up = sum(1 for i in instances if i.healthy and not i.ejected(now))
+            checked = any(i.healthy is not None for i in instances)
+            services[name] = {
+                "status": "up" if up else ("down" if checked else "unknown"),
+                "healthy_instances": up,
+                "instances": [i.to_dict(now) for i in instances],
+            }
+            if checked:
+                update_service_health(name, bool(up))
+        self.all_up = all(s["status"] != "down" for s in services.values())
+        self.snapshot = {
+            "status": "healthy" if self.all_up else "degraded",
+            "checked_at": datetime.now().isoformat(),
+            "probe_rounds": self.rounds,
+            "probe_interval_seconds": PROBE_INTERVAL_SECONDS,
+            "services": services,
+        }
+        self.snapshot_body = json.dumps(self.snapshot, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+_PROBE_LOG_FILTER = _ProbeLogFilter()
+_registry: Optional[UpstreamRegistry] = None
+
+
+def init_upstreams(services: Dict[str, List[str]]) -> UpstreamRegistry:
+    global _registry
+    if _registry is None:
+        _registry = UpstreamRegistry(services)
+    return _registry
+
+
+def get_registry() -> UpstreamRegistry:
+    if _registry is None:
+        raise RuntimeError("업스트림 레지스트리가 초기화되지 않았습니다")
+    return _registry
+
+
+def pick_upstream(service: str) -> str:
+    return get_registry().pick(service)
+
+
+def report_upstream_failure(service: str, url: str, error: str):
+    get_registry().report_failure(service, url, error)
+
+
+async def start_health_prober():
+    await get_registry().start()
+
+
+async def stop_health_prober():
+    if _registry is not None:
+        await _registry.stop()
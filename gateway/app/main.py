@@ -4,14 +4,28 @@ import sys
 import logging
 import json
 import asyncio
+import time
 from datetime import datetime
 from contextlib import asynccontextmanager
-from typing import Optional, AsyncGenerator, Dict, Any
+from typing import Optional, AsyncGenerator, Dict, Any, List
 
 import httpx
 from fastapi import FastAPI, Request, HTTPException, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.common.loop_monitor import start_loop_monitor, stop_loop_monitor, loop_monitor_router
+from app.domain.discovery.health_prober import (
+    init_upstreams, get_registry, pick_upstream, report_upstream_failure, start_health_prober, stop_health_prober,
+)
+from app.common.profiler import install_profiler
+from app.router import metrics_router
+from app.router.auth_router import record_request_metric, record_stream_first_byte
+from app.common.wire import PACKED_MEDIA_TYPE
+from app.common.tracing import (
+    install_tracing, start_span, inject_trace_headers, current_trace_id, shutdown_tracing,
+)
 
 # Railway 환경 확인
 IS_RAILWAY = os.getenv("RAILWAY_ENVIRONMENT") == "true" or (os.getenv("PORT") is not None and os.getenv("PORT") != "")
@@ -65,6 +79,55 @@ def get_auth_service_url() -> str:
 # Auth Service URL 설정 (동적 구성)
 AUTH_SERVICE_URL = get_auth_service_url()
 
+# Report Service URL 동적 구성 함수
+def get_report_service_url() -> str:
+    """Report Service URL을 동적으로 구성"""
+    if os.getenv("REPORT_SERVICE_URL"):
+        return os.getenv("REPORT_SERVICE_URL")
+    return "http://localhost:8003"
+
+REPORT_SERVICE_URL = get_report_service_url()
+
+# Chatbot Service URL 동적 구성 함수
+def get_chatbot_service_url() -> str:
+    """Chatbot Service URL을 동적으로 구성"""
+    if os.getenv("CHATBOT_SERVICE_URL"):
+        return os.getenv("CHATBOT_SERVICE_URL")
+    return "http://localhost:8004"
+
+CHATBOT_SERVICE_URL = get_chatbot_service_url()
+
+# CBAM Service URL 동적 구성 함수
+def get_cbam_service_url() -> str:
+    """CBAM Service URL을 동적으로 구성"""
+    if os.getenv("CBAM_SERVICE_URL"):
+        return os.getenv("CBAM_SERVICE_URL")
+    return "http://localhost:8002"
+
+CBAM_SERVICE_URL = get_cbam_service_url()
+
+def service_instances(env_name: str, default_url: str) -> List[str]:
+    """{NAME}_SERVICE_URLS(쉼표 구분)가 있으면 인스턴스 여러 개, 없으면 단일 URL"""
+    urls = [u.strip().rstrip("/") for u in os.getenv(env_name, "").split(",") if u.strip()]
+    return urls or [default_url.rstrip("/")]
+
+# 헬스 프로버가 확인하고 라우팅이 고르는 업스트림 인스턴스 목록
+UPSTREAMS = {
+    "auth-service": service_instances("AUTH_SERVICE_URLS", AUTH_SERVICE_URL),
+    "cbam-service": service_instances("CBAM_SERVICE_URLS", CBAM_SERVICE_URL),
+    "report-service": service_instances("REPORT_SERVICE_URLS", REPORT_SERVICE_URL),
+    "chatbot-service": service_instances("CHATBOT_SERVICE_URLS", CHATBOT_SERVICE_URL),
+}
+
+# 인스턴스 장애로 보고 수동 감지에 합산하는 오류 (읽기 타임아웃은 느린 요청일 수 있으므로 제외)
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+# 프록시가 그대로 넘기지 않는 hop-by-hop 헤더 (RFC 9110 7.6.1) + 연결별로 다시 정해지는 헤더
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+    "transfer-encoding", "upgrade", "host", "expect",
+}
+
 # 허용된 도메인 목록
 ALLOWED_DOMAINS = [
     "jhyang.info",
@@ -102,25 +165,39 @@ async def close_http_client():
 async def call_auth_service(endpoint: str, method: str = "GET", data: dict = None) -> dict:
     """Auth Service 호출 함수 (동기 응답)"""
     client = await get_http_client()
-    url = f"{AUTH_SERVICE_URL}{endpoint}"
+    base_url = pick_upstream("auth-service")
+    url = f"{base_url}{endpoint}"
     
     try:
-        if method.upper() == "GET":
-            response = await client.get(url)
-        elif method.upper() == "POST":
-            response = await client.post(url, json=data)
-        else:
-            raise HTTPException(status_code=400, detail=f"지원하지 않는 HTTP 메서드: {method}")
-        
-        response.raise_for_status()
-        return response.json()
-    except httpx.TimeoutException:
+        # 업스트림 호출 스팬 + traceparent 전파
+        with start_span(
+            f"auth-service {method.upper()} {endpoint}",
+            kind="client",
+            **{"http.method": method.upper(), "http.url": url, "peer.service": "auth-service"},
+        ) as span:
+            headers = inject_trace_headers()
+            if method.upper() == "GET":
+                response = await client.get(url, headers=headers)
+            elif method.upper() == "POST":
+                response = await client.post(url, json=data, headers=headers)
+            else:
+                raise HTTPException(status_code=400, detail=f"지원하지 않는 HTTP 메서드: {method}")
+            span.set_attribute("http.status_code", response.status_code)
+            
+            response.raise_for_status()
+            with start_span("deserialize auth-service response", **{"payload.bytes": len(response.content)}):
+                return response.json()
+    except httpx.TimeoutException as e:
+        if isinstance(e, CONNECT_ERRORS):
+            report_upstream_failure("auth-service", base_url, str(e))
         logger.error(f"⏰ Auth Service 타임아웃: {url}")
         raise HTTPException(status_code=504, detail="Auth Service 응답 시간 초과")
     except httpx.HTTPStatusError as e:
         logger.error(f"❌ Auth Service 오류: {e.response.status_code} - {e.response.text}")
         raise HTTPException(status_code=e.response.status_code, detail=f"Auth Service 오류: {e.response.text}")
     except Exception as e:
+        if isinstance(e, CONNECT_ERRORS):
+            report_upstream_failure("auth-service", base_url, str(e))
         logger.error(f"❌ Auth Service 연결 실패: {str(e)}")
         raise HTTPException(status_code=503, detail="Auth Service 연결 실패")
 
@@ -154,6 +231,7 @@ async def call_auth_service_with_fallback(endpoint: str, method: str = "GET", da
             fallback_log = {
                 "event": "auth_service_fallback",
                 "timestamp": datetime.now().isoformat(),
+                "trace_id": current_trace_id(),
                 "endpoint": endpoint,
                 "method": method,
                 "error_status": e.status_code,
@@ -174,6 +252,7 @@ async def call_auth_service_with_fallback(endpoint: str, method: str = "GET", da
         error_log = {
             "event": "auth_service_unexpected_error",
             "timestamp": datetime.now().isoformat(),
+            "trace_id": current_trace_id(),
             "endpoint": endpoint,
             "method": method,
             "error": str(e),
@@ -191,9 +270,18 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Gateway API 서비스 시작")
     # HTTP 클라이언트 초기화
     await get_http_client()
+    # 업스트림 헬스 프로버 시작 (라우팅 대상 선택과 /health/upstreams 스냅샷 갱신)
+    init_upstreams(UPSTREAMS)
+    await start_health_prober()
+    # 이벤트 루프 지연/느린 콜백 모니터 시작
+    await start_loop_monitor("gateway")
     yield
+    await stop_loop_monitor()
+    await stop_health_prober()
     # HTTP 클라이언트 정리
     await close_http_client()
+    # 남은 트레이스 스팬 내보내기
+    shutdown_tracing()
     logger.info("🛑 Gateway API 서비스 종료")
 
 app = FastAPI(
@@ -204,6 +292,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 관리자 전용 프로파일러 (요청 단위 프로파일링 미들웨어가 가장 안쪽에 오도록 먼저 등록)
+install_profiler(app, "gateway")
+
 # CORS 미들웨어 설정
 app.add_middleware(
     CORSMiddleware,
@@ -221,6 +312,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 분산 트레이싱 미들웨어 (traceparent 수신/응답 헤더, 요청 단위 서버 스팬)
+install_tracing(app, "gateway")
+
 # 메인 라우터 생성
 gateway_router = APIRouter(prefix="/api/v1", tags=["Gateway API"])
 
@@ -233,9 +327,20 @@ async def health_check():
         "service": "gateway",
         "timestamp": datetime.now().isoformat(),
         "environment": "railway",
-        "message": "Gateway API is running"
+        "message": "Gateway API is running",
+        # 프로버가 마지막으로 확인한 업스트림 요약 (업스트림을 직접 호출하지 않음)
+        "upstreams": get_registry().snapshot["status"],
     }
 
+# 업스트림 집계 헬스 - 프로브 라운드마다 미리 직렬화한 스냅샷을 그대로 반환 (업스트림 수와 무관하게 상수 시간)
+@gateway_router.get("/health/upstreams", summary="업스트림 집계 헬스 (캐시된 프로브 상태)")
+async def upstream_health():
+    """정상 인스턴스가 하나도 없는 서비스가 있으면 503"""
+    registry = get_registry()
+    return Response(
+        content=registry.snapshot_body, status_code=200 if registry.all_up else 503, media_type="application/json",
+    )
+
 # 회원가입 요청을 Auth Service로 전달 (프록시 역할)
 @gateway_router.post("/signup", summary="회원가입 - Auth Service로 전달")
 async def signup_proxy(request: Request):
@@ -247,6 +352,7 @@ async def signup_proxy(request: Request):
         gateway_log = {
             "event": "signup_proxy_request",
             "timestamp": datetime.now().isoformat(),
+            "trace_id": current_trace_id(),
             "request_data": body,
             "source": "gateway_api",
             "target_service": "auth_service",
@@ -262,6 +368,7 @@ async def signup_proxy(request: Request):
         response_log = {
             "event": "signup_proxy_response",
             "timestamp": datetime.now().isoformat(),
+            "trace_id": current_trace_id(),
             "response_data": response_data,
             "source": "gateway_api",
             "target_service": "auth_service",
@@ -281,6 +388,7 @@ async def signup_proxy(request: Request):
         error_log = {
             "event": "signup_proxy_error",
             "timestamp": datetime.now().isoformat(),
+            "trace_id": current_trace_id(),
             "error": str(e),
             "source": "gateway_api",
             "target_service": "auth_service",
@@ -291,6 +399,105 @@ async def signup_proxy(request: Request):
         
         raise HTTPException(status_code=500, detail=f"회원가입 실패: {str(e)}")
 
+async def relay_body(upstream: httpx.Response, service: str, started: float) -> AsyncGenerator[bytes, None]:
+    """업스트림 본문 청크를 받는 즉시 그대로 전달 (SSE 이벤트 경계도 바이트 그대로 유지)"""
+    first = True
+    async for chunk in upstream.aiter_raw():
+        if first:
+            record_stream_first_byte(service, time.perf_counter() - started)
+            first = False
+        yield chunk
+
+def edge_accept(accept: Optional[str]) -> str:
+    """클라이언트 Accept에서 내부 바이너리 형식을 뺌 - 공개 API 응답은 업스트림 JSON을 그대로 중계"""
+    return ", ".join(
+        part.strip() for part in (accept or "").split(",")
+        if part.strip() and part.split(";")[0].strip() != PACKED_MEDIA_TYPE
+    )
+
+async def proxy_stream(request: Request, service: str, base_url: str, upstream_path: str) -> StreamingResponse:
+    """헤더와 바이트를 가공 없이 중계 - Range 이어받기, If-None-Match(304), 206/416, SSE가 게이트웨이를 지나도 유지
+
+    응답은 aiter_raw()로 압축 해제 없이 넘기므로 Content-Length/Content-Encoding/ETag가 업스트림과 같다.
+    클라이언트가 끊으면 응답 태스크가 취소되고 BackgroundTask가 업스트림 연결을 닫아 업스트림도 끊김을 감지한다.
+    """
+    client = await get_http_client()
+    url = f"{base_url}{upstream_path}"
+    if request.url.query:
+        url = f"{url}?{request.url.query}"
+    headers = [(k, v) for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS | {"accept"}]
+    accept = edge_accept(request.headers.get("accept"))
+    if accept:
+        headers.append(("accept", accept))
+    started = time.perf_counter()
+    with start_span(
+        f"{service} {request.method} {upstream_path}",
+        kind="client",
+        **{"http.method": request.method, "http.url": url, "peer.service": service},
+    ) as span:
+        headers.extend(inject_trace_headers().items())
+        upstream_request = client.build_request(
+            request.method, url, headers=headers,
+            content=request.stream() if request.method in ("POST", "PUT") else None,
+            # 대용량 다운로드/SSE/토큰 스트림은 본문 사이 간격이 길 수 있으므로 읽기 타임아웃 없음
+            timeout=httpx.Timeout(float(os.getenv("HTTP_TIMEOUT", "30")), read=None),
+        )
+        try:
+            upstream = await client.send(upstream_request, stream=True)
+        except httpx.TimeoutException as e:
+            if isinstance(e, CONNECT_ERRORS):
+                report_upstream_failure(service, base_url, str(e))
+            record_request_metric(request.method, service, 504, time.perf_counter() - started)
+            raise HTTPException(status_code=504, detail=f"{service} 응답 시간 초과")
+        except httpx.HTTPError as e:
+            if isinstance(e, CONNECT_ERRORS):
+                report_upstream_failure(service, base_url, str(e))
+            logger.error(f"❌ {service} 연결 실패: {str(e)}")
+            record_request_metric(request.method, service, 503, time.perf_counter() - started)
+            raise HTTPException(status_code=503, detail=f"{service} 연결 실패")
+        span.set_attribute("http.status_code", upstream.status_code)
+    record_request_metric(request.method, service, upstream.status_code, time.perf_counter() - started)
+
+    response = StreamingResponse(
+        relay_body(upstream, service, started), status_code=upstream.status_code,
+        background=BackgroundTask(upstream.aclose),
+    )
+    # 중복 가능한 헤더(Set-Cookie 등)까지 순서대로 유지, 트레이스 헤더는 게이트웨이 미들웨어가 붙임
+    response.raw_headers = [
+        (k.lower().encode("latin-1"), v.encode("latin-1"))
+        for k, v in upstream.headers.multi_items()
+        if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in ("traceparent", "x-request-id")
+    ]
+    return response
+
+# Report Service 프록시 - 요청/응답 본문을 스트리밍으로 그대로 전달
+@gateway_router.api_route(
+    "/report/{path:path}",
+    methods=["GET", "HEAD", "POST", "PUT", "DELETE"],
+    summary="Report Service 프록시 (Range/ETag/조건부 요청, SSE, 청크 응답 무변경 전달)",
+)
+async def report_proxy(path: str, request: Request):
+    return await proxy_stream(request, "report-service", pick_upstream("report-service"), f"/api/v1/report/{path}")
+
+# Chatbot Service 프록시 - 토큰 스트림(SSE)을 버퍼링 없이 전달, 브라우저가 끊으면 업스트림 생성도 취소
+@gateway_router.api_route(
+    "/chatbot/{path:path}",
+    methods=["GET", "POST", "PUT", "DELETE"],
+    summary="Chatbot Service 프록시 (토큰 스트리밍 SSE 무버퍼 전달)",
+)
+async def chatbot_proxy(path: str, request: Request):
+    return await proxy_stream(request, "chatbot-service", pick_upstream("chatbot-service"), f"/api/v1/chatbot/{path}")
+
+# CBAM Service 프록시 - 서비스의 JSON 응답을 그대로 전달 (packed → JSON 변환은 서비스 JSON 인코딩만큼 들어
+# 비용이 게이트웨이로 옮겨갈 뿐이므로, 내부 바이너리 형식은 서비스 간 직접 호출에만 씀)
+@gateway_router.api_route(
+    "/cbam/{path:path}",
+    methods=["GET", "POST", "PUT", "DELETE"],
+    summary="CBAM Service 프록시 (업스트림 JSON 무변경 전달)",
+)
+async def cbam_proxy(path: str, request: Request):
+    return await proxy_stream(request, "cbam-service", pick_upstream("cbam-service"), f"/api/v1/cbam/{path}")
+
 # 첫 화면 (회원가입 버튼이 있는 페이지)
 @app.get("/", summary="첫 화면 - 회원가입 버튼")
 async def main_page():
@@ -338,6 +545,8 @@ async def main_page():
 
 # 라우터를 앱에 포함
 app.include_router(gateway_router)
+app.include_router(metrics_router, prefix="/metrics", tags=["Metrics"])
+app.include_router(loop_monitor_router)
 
 # Docker에서 uvicorn으로 실행되므로 직접 실행 코드 제거
 # if __name__ == "__main__":
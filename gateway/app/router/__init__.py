@@ -1,5 +1,3 @@
-from .proxy_router import proxy_router
-from .health_router import health_router
-from .metrics_router import metrics_router
+from .auth_router import metrics_router
 
-__all__ = ["proxy_router", "health_router", "metrics_router"] 
\ No newline at end of file
+__all__ = ["metrics_router"]
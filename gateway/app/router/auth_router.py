@@ -23,12 +23,38 @@ ACTIVE_CONNECTIONS = Gauge(
     'Number of active connections'
 )
 
+STREAM_FIRST_BYTE = Histogram(
+    'gateway_stream_first_byte_seconds',
+    'Time from proxied request start to the first upstream body chunk relayed',
+    ['service'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
 SERVICE_HEALTH = Gauge(
     'gateway_service_health',
     'Service health status (1=healthy, 0=unhealthy)',
     ['service']
 )
 
+UPSTREAM_INSTANCE_UP = Gauge(
+    'gateway_upstream_instance_up',
+    'Last active health probe result per upstream instance (1=passed, 0=failed)',
+    ['service', 'instance']
+)
+
+PROBE_DURATION = Histogram(
+    'gateway_health_probe_seconds',
+    'Active health probe duration per upstream service',
+    ['service', 'result'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2)
+)
+
+UPSTREAM_EJECTIONS = Counter(
+    'gateway_upstream_ejections_total',
+    'Upstream instances removed from routing by outlier detection',
+    ['service', 'reason']
+)
+
 
 @metrics_router.get("/")
 async def metrics():
@@ -45,6 +71,22 @@ def record_request_metric(method: str, service: str, status_code: int, duration:
     REQUEST_DURATION.labels(method=method, service=service).observe(duration)
 
 
+def record_stream_first_byte(service: str, duration: float):
+    """스트리밍 프록시 첫 바이트 지연 기록 (SSE면 첫 이벤트가 브라우저로 나간 시점)"""
+    STREAM_FIRST_BYTE.labels(service=service).observe(duration)
+
+
 def update_service_health(service: str, is_healthy: bool):
     """서비스 헬스 메트릭 업데이트"""
-    SERVICE_HEALTH.labels(service=service).set(1 if is_healthy else 0) 
\ No newline at end of file
+    SERVICE_HEALTH.labels(service=service).set(1 if is_healthy else 0)
+
+
+def record_probe(service: str, instance: str, ok: bool, duration: float):
+    """능동 헬스 프로브 결과 기록"""
+    UPSTREAM_INSTANCE_UP.labels(service=service, instance=instance).set(1 if ok else 0)
+    PROBE_DURATION.labels(service=service, result="pass" if ok else "fail").observe(duration)
+
+
+def record_ejection(service: str, reason: str):
+    """이상치 감지로 인스턴스를 라우팅에서 제외한 횟수 기록"""
+    UPSTREAM_EJECTIONS.labels(service=service, reason=reason).inc()
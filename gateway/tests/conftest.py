@@ -0,0 +1,6 @@
+# 테스트 공통 설정 - 서비스 루트(app 패키지)를 import 경로에 추가, 트레이스 파일 내보내기 끔
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TRACE_EXPORTER", "none")
@@ -0,0 +1,93 @@
+# 업스트림 헬스 프로버 - 연속 실패 인스턴스 방출/복구, 지연 이상치 방출 상한, 전부 방출되면 fail-open
+import asyncio
+import time
+
+import httpx
+
+from app.domain.discovery import health_prober
+from app.domain.discovery.health_prober import UpstreamRegistry
+
+A, B, C, D, E = (f"http://cbam-{n}:8000" for n in "abcde")
+
+
+def registry(urls, handler):
+    reg = UpstreamRegistry({"cbam": urls})
+    reg._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return reg
+
+
+def probe_rounds(reg, rounds):
+    async def run():
+        for _ in range(rounds):
+            await reg.probe_all()
+        await reg._client.aclose()
+
+    asyncio.run(run())
+
+
+def test_failing_instance_is_ejected_then_recovers():
+    down = {B}
+
+    def handler(request):
+        return httpx.Response(503 if f"{request.url.scheme}://{request.url.netloc.decode()}" in down else 200)
+
+    reg = registry([A, B], handler)
+    probe_rounds(reg, health_prober.EJECT_AFTER_FAILURES - 1)
+    # 실패 횟수가 기준 미만이면 아직 라우팅 대상
+    assert {reg.pick("cbam") for _ in range(4)} == {A, B}
+
+    reg._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    probe_rounds(reg, 1)
+    b = reg.services["cbam"][1]
+    assert b.healthy is False and b.ejected(time.monotonic()) and b.last_error == "HTTP 503"
+    assert {reg.pick("cbam") for _ in range(4)} == {A}
+    assert reg.snapshot["services"]["cbam"]["healthy_instances"] == 1
+    assert reg.snapshot["status"] == "healthy"
+
+    # 방출 기간이 끝나고 프로브가 성공하면 다시 라우팅
+    down.clear()
+    b.ejected_until = 0.0
+    reg._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    probe_rounds(reg, 1)
+    assert b.healthy is True and b.consecutive_failures == 0
+    assert {reg.pick("cbam") for _ in range(4)} == {A, B}
+
+
+def test_ejection_doubles_for_flapping_instance():
+    reg = UpstreamRegistry({"cbam": [A, B]})
+    a = reg.services["cbam"][0]
+    for _ in range(health_prober.EJECT_AFTER_FAILURES):
+        reg.report_failure("cbam", A + "/", "ConnectError")
+    first = a.ejected_until - time.monotonic()
+    a.ejected_until = 0.0
+    reg.report_failure("cbam", A, "ConnectError")
+    second = a.ejected_until - time.monotonic()
+    assert a.ejections == 2
+    assert abs(first - health_prober.BASE_EJECTION_SECONDS) < 1
+    assert abs(second - 2 * health_prober.BASE_EJECTION_SECONDS) < 1
+
+
+def test_all_instances_down_fails_open():
+    reg = registry([A, B], lambda request: httpx.Response(500))
+    probe_rounds(reg, health_prober.EJECT_AFTER_FAILURES)
+    assert all(not i.routable(time.monotonic()) for i in reg.services["cbam"])
+    # 라우팅할 대상이 없으면 요청을 버리지 않고 전체 인스턴스에서 고름
+    assert {reg.pick("cbam") for _ in range(4)} == {A, B}
+    assert reg.snapshot["status"] == "degraded"
+    assert reg.snapshot["services"]["cbam"]["status"] == "down"
+
+
+def test_latency_outliers_are_ejected_within_cap(monkeypatch):
+    monkeypatch.setattr(health_prober, "LATENCY_OUTLIER_MIN_MS", 100.0)
+    reg = UpstreamRegistry({"cbam": [A, B, C, D, E]})
+    for instance, latency in zip(reg.services["cbam"], [10.0, 12.0, 11.0, 900.0, 800.0]):
+        instance.healthy = True
+        instance.latency_ms = latency
+    reg._detect_latency_outliers(time.monotonic())
+    ejected = [i.url for i in reg.services["cbam"] if i.ejected(time.monotonic())]
+    assert ejected == [D, E]
+
+    # 이미 50%(2개)가 방출된 상태면 새 이상치도 남겨 둠
+    reg.services["cbam"][1].latency_ms = 5000.0
+    reg._detect_latency_outliers(time.monotonic())
+    assert not reg.services["cbam"][1].ejected(time.monotonic())
@@ -0,0 +1,38 @@
+# 이벤트 루프 모니터 - 루프를 막은 코드의 위치와 스택을 기록, 정상 대기는 기록하지 않음
+import time
+import asyncio
+
+from app.common.loop_monitor import LoopMonitor
+
+
+def _block_loop(seconds: float):
+    time.sleep(seconds)
+
+
+def test_blocking_callback_is_reported_with_its_stack():
+    async def scenario():
+        monitor = LoopMonitor("gateway-test", interval=0.01, slow_threshold=0.05)
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        _block_loop(0.2)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    snapshot = monitor.snapshot()
+    assert snapshot["max_lag_ms"] >= 150
+    [event] = snapshot["slow_callbacks"]
+    assert event["duration_ms"] >= 150
+    assert any("_block_loop" in line for line in event["stack"])
+
+
+def test_idle_loop_records_nothing():
+    async def scenario():
+        monitor = LoopMonitor("gateway-test", interval=0.01, slow_threshold=0.1)
+        await monitor.start()
+        await asyncio.sleep(0.2)
+        await monitor.stop()
+        return monitor
+
+    assert asyncio.run(scenario()).snapshot()["slow_callbacks"] == []
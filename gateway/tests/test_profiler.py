@@ -0,0 +1,66 @@
+# 샘플링 프로파일러 - 요청 단위 프로파일은 대상 태스크 샘플만, 관리자 토큰 없으면 거절
+import time
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.common.profiler import ADMIN_TOKEN_HEADER, PROFILE_ID_HEADER, PROFILE_REQUEST_HEADER
+from app.common.profiler import SamplingProfiler, install_profiler
+
+
+def _spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def _busy_target():
+    for _ in range(20):
+        _spin(0.01)
+        await asyncio.sleep(0)
+
+
+async def _busy_other():
+    for _ in range(20):
+        _spin(0.01)
+        await asyncio.sleep(0)
+
+
+def test_target_task_samples_only_that_task():
+    async def scenario():
+        target = asyncio.create_task(_busy_target())
+        profiler = SamplingProfiler(interval_ms=5, mode="wall", target_task=target, loop=asyncio.get_running_loop())
+        profiler.start()
+        await asyncio.gather(target, _busy_other())
+        profiler.stop()
+        return profiler
+
+    profiler = asyncio.run(scenario())
+    collapsed = profiler.collapsed()
+    assert profiler.samples > 0
+    assert "_busy_target" in collapsed
+    assert "_busy_other" not in collapsed
+
+
+def test_request_profiling_requires_admin_token(monkeypatch):
+    monkeypatch.setenv("PROFILER_ADMIN_TOKEN", "secret")
+    app = FastAPI()
+    install_profiler(app, "gateway-test")
+
+    @app.get("/work")
+    async def work():
+        await _busy_target()
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.post("/admin/profile", params={"seconds": 0.1}).status_code == 403
+    # 토큰이 틀리면 프로파일링 없이 그대로 처리
+    response = client.get("/work", headers={PROFILE_REQUEST_HEADER: "wall", ADMIN_TOKEN_HEADER: "wrong"})
+    assert response.status_code == 200 and PROFILE_ID_HEADER.lower() not in response.headers
+
+    response = client.get("/work", headers={PROFILE_REQUEST_HEADER: "wall", ADMIN_TOKEN_HEADER: "secret"})
+    profile_id = response.headers[PROFILE_ID_HEADER]
+    stored = client.get(f"/admin/profile/requests/{profile_id}", headers={ADMIN_TOKEN_HEADER: "secret"})
+    assert stored.status_code == 200
+    assert "_busy_target" in stored.text
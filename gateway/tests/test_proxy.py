@@ -0,0 +1,34 @@
+# CBAM 프록시 - 공개 API는 업스트림 JSON을 그대로 중계, 내부 바이너리 형식은 게이트웨이에서 요청하지 않음
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import main
+from app.common.wire import PACKED_MEDIA_TYPE
+
+BODY = b'{"status":"success","lines":{"certificates":[1.5,null]}}'
+
+
+def test_cbam_responses_are_relayed_as_upstream_json(monkeypatch):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("accept"))
+        return httpx.Response(200, stream=httpx.ByteStream(BODY), headers={"content-type": "application/json"})
+
+    monkeypatch.setattr(main, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(main, "pick_upstream", lambda service: "http://cbam")
+    app = FastAPI()
+    app.include_router(main.gateway_router)
+    client = TestClient(app)
+
+    response = client.post("/api/v1/cbam/calculate/batch", content=b"{}",
+                           headers={"accept": f"{PACKED_MEDIA_TYPE}, application/json;q=0.9"})
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["content-type"] == "application/json"
+    # 클라이언트가 내부 형식을 요청해도 업스트림에는 JSON만
+    assert seen == ["application/json;q=0.9"]
+
+    assert client.get("/api/v1/cbam/factors", headers={"accept": PACKED_MEDIA_TYPE}).content == BODY
+    assert PACKED_MEDIA_TYPE not in seen[-1]
@@ -0,0 +1,68 @@
+# W3C traceparent 전파 - 수신한 trace-id 유지, 요청 스팬의 자식으로 업스트림 헤더 생성
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.common import tracing
+from app.common.tracing import inject_trace_headers, install_tracing, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+INCOMING = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def shutdown(self):
+        pass
+
+
+def make_app():
+    app = FastAPI()
+    install_tracing(app, "gateway-test")
+
+    @app.get("/ping")
+    async def ping():
+        return inject_trace_headers()
+
+    return app
+
+
+def test_parse_traceparent_rejects_invalid_values():
+    assert parse_traceparent(INCOMING) == (TRACE_ID, "00f067aa0ba902b7", "01")
+    for value in (None, "", "garbage", f"ff-{TRACE_ID}-00f067aa0ba902b7-01",
+                  f"00-{'0' * 32}-00f067aa0ba902b7-01", f"00-{TRACE_ID}-{'0' * 16}-01",
+                  f"00-{TRACE_ID[:-1]}z-00f067aa0ba902b7-01"):
+        assert parse_traceparent(value) is None
+
+
+def test_incoming_trace_is_continued_and_propagated():
+    exporter = CollectingExporter()
+    client = TestClient(make_app())
+    tracing.configure_tracing("gateway-test", exporter=exporter)
+    try:
+        response = client.get("/ping", headers={"traceparent": INCOMING})
+    finally:
+        tracing.shutdown_tracing()
+
+    assert response.status_code == 200
+    server_trace, server_span, _ = parse_traceparent(response.headers["traceparent"])
+    assert server_trace == TRACE_ID
+    assert response.headers["x-request-id"] == TRACE_ID
+    # 핸들러에서 만든 업스트림 헤더는 같은 trace, 서버 스팬이 부모
+    upstream_trace, upstream_parent, _ = parse_traceparent(response.json()["traceparent"])
+    assert (upstream_trace, upstream_parent) == (TRACE_ID, server_span)
+
+    [span] = exporter.spans
+    assert span.kind == "server" and span.parent_id == "00f067aa0ba902b7"
+    assert span.attributes["http.status_code"] == 200
+
+
+def test_new_trace_started_without_header():
+    client = TestClient(make_app())
+    first = parse_traceparent(client.get("/ping").headers["traceparent"])
+    second = parse_traceparent(client.get("/ping").headers["traceparent"])
+    assert first and second and first[0] != second[0]
@@ -16,6 +16,14 @@ from fastapi import FastAPI, Request, HTTPException, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
 
+from gateway.app.common.loop_monitor import start_loop_monitor, stop_loop_monitor, loop_monitor_router
+from gateway.app.common.profiler import install_profiler
+from gateway.app.router import metrics_router
+from gateway.app.common.tracing import (
+    install_tracing, start_span, open_span, close_span, inject_trace_headers, shutdown_tracing,
+    TRACEPARENT_HEADER,
+)
+
 # Vercel 환경 확인
 IS_VERCEL = os.getenv("VERCEL") == "1"
 
@@ -105,15 +113,24 @@ async def call_auth_service(endpoint: str, method: str = "GET", data: dict = Non
     url = f"{AUTH_SERVICE_URL}{endpoint}"
     
     try:
-        if method.upper() == "GET":
-            response = await client.get(url)
-        elif method.upper() == "POST":
-            response = await client.post(url, json=data)
-        else:
-            raise HTTPException(status_code=400, detail=f"지원하지 않는 HTTP 메서드: {method}")
-        
-        response.raise_for_status()
-        return response.json()
+        # 업스트림 호출 스팬 + traceparent 전파
+        with start_span(
+            f"auth-service {method.upper()} {endpoint}",
+            kind="client",
+            **{"http.method": method.upper(), "http.url": url, "peer.service": "auth-service"},
+        ) as span:
+            headers = inject_trace_headers()
+            if method.upper() == "GET":
+                response = await client.get(url, headers=headers)
+            elif method.upper() == "POST":
+                response = await client.post(url, json=data, headers=headers)
+            else:
+                raise HTTPException(status_code=400, detail=f"지원하지 않는 HTTP 메서드: {method}")
+            span.set_attribute("http.status_code", response.status_code)
+            
+            response.raise_for_status()
+            with start_span("deserialize auth-service response", **{"payload.bytes": len(response.content)}):
+                return response.json()
     except httpx.TimeoutException:
         logger.error(f"⏰ Auth Service 타임아웃: {url}")
         raise HTTPException(status_code=504, detail="Auth Service 응답 시간 초과")
@@ -128,29 +145,43 @@ async def stream_auth_service(endpoint: str, method: str = "GET", data: dict = N
     """Auth Service 스트림 호출 함수 (비동기 스트림 응답)"""
     client = await get_http_client()
     url = f"{AUTH_SERVICE_URL}{endpoint}"
+    # 제너레이터는 yield 사이에 컨텍스트가 바뀔 수 있으므로 스팬을 활성화하지 않고 직접 관리
+    span = open_span(
+        f"auth-service stream {method.upper()} {endpoint}",
+        kind="client",
+        **{"http.method": method.upper(), "http.url": url, "peer.service": "auth-service"},
+    )
+    headers = {TRACEPARENT_HEADER: span.traceparent}
     
     try:
         if method.upper() == "GET":
-            async with client.stream("GET", url) as response:
+            async with client.stream("GET", url, headers=headers) as response:
+                span.set_attribute("http.status_code", response.status_code)
                 response.raise_for_status()
                 async for chunk in response.aiter_text():
                     yield chunk
         elif method.upper() == "POST":
-            async with client.stream("POST", url, json=data) as response:
+            async with client.stream("POST", url, json=data, headers=headers) as response:
+                span.set_attribute("http.status_code", response.status_code)
                 response.raise_for_status()
                 async for chunk in response.aiter_text():
                     yield chunk
         else:
             raise HTTPException(status_code=400, detail=f"지원하지 않는 HTTP 메서드: {method}")
-    except httpx.TimeoutException:
+    except httpx.TimeoutException as e:
+        span.record_error(e)
         logger.error(f"⏰ Auth Service 스트림 타임아웃: {url}")
         yield json.dumps({"error": "Auth Service 응답 시간 초과"})
     except httpx.HTTPStatusError as e:
+        span.record_error(e)
         logger.error(f"❌ Auth Service 스트림 오류: {e.response.status_code} - {e.response.text}")
         yield json.dumps({"error": f"Auth Service 오류: {e.response.text}"})
     except Exception as e:
+        span.record_error(e)
         logger.error(f"❌ Auth Service 스트림 연결 실패: {str(e)}")
         yield json.dumps({"error": "Auth Service 연결 실패"})
+    finally:
+        close_span(span)
 
 def is_allowed_domain(host: str) -> bool:
     """허용된 도메인인지 확인"""
@@ -174,9 +205,14 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Gateway API 서비스 시작")
     # HTTP 클라이언트 초기화
     await get_http_client()
+    # 이벤트 루프 지연/느린 콜백 모니터 시작
+    await start_loop_monitor("gateway")
     yield
+    await stop_loop_monitor()
     # HTTP 클라이언트 정리
     await close_http_client()
+    # 남은 트레이스 스팬 내보내기
+    shutdown_tracing()
     logger.info("🛑 Gateway API 서비스 종료")
 
 app = FastAPI(
@@ -187,6 +223,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 관리자 전용 프로파일러 (요청 단위 프로파일링 미들웨어가 가장 안쪽에 오도록 먼저 등록)
+install_profiler(app, "gateway")
+
 # CORS 미들웨어 설정
 app.add_middleware(
     CORSMiddleware,
@@ -225,6 +264,9 @@ async def domain_validation_middleware(request: Request, call_next):
     logger.info(f"✅ 허용된 도메인 접근: {host}")
     return await call_next(request)
 
+# 분산 트레이싱 미들웨어 (traceparent 수신/응답 헤더, 요청 단위 서버 스팬)
+install_tracing(app, "gateway")
+
 # 메인 라우터 생성
 gateway_router = APIRouter(prefix="/api/v1", tags=["Gateway API"])
 
@@ -415,6 +457,8 @@ async def auth_signup_stream(request: Request):
 
 # 라우터를 앱에 포함
 app.include_router(gateway_router)
+app.include_router(metrics_router, prefix="/metrics", tags=["Metrics"])
+app.include_router(loop_monitor_router)
 
 # Vercel 서버리스 환경을 위한 핸들러 (Vercel에서만 사용)
 def handler(request, context):
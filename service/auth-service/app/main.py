@@ -9,7 +9,12 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from app.common.loop_monitor import start_loop_monitor, stop_loop_monitor, loop_monitor_router
+from app.common.profiler import install_profiler
+from app.common.tracing import install_tracing, start_span, current_trace_id, shutdown_tracing
 
 # Railway 환경 확인
 IS_RAILWAY = os.getenv("RAILWAY_ENVIRONMENT") == "true" or (os.getenv("PORT") is not None and os.getenv("PORT") != "")
@@ -54,7 +59,8 @@ async def get_db_connection():
             # Railway 환경변수에서 DB 정보 가져오기
             database_url = os.getenv("DATABASE_URL")
             if database_url:
-                conn = await asyncpg.connect(database_url)
+                with start_span("db connect", kind="client", **{"db.system": "postgresql"}):
+                    conn = await asyncpg.connect(database_url)
                 print(f"🚂 Auth Service - Railway DB 연결 성공")
                 return conn
             else:
@@ -77,7 +83,12 @@ async def lifespan(app: FastAPI):
     if db_conn:
         await db_conn.close()
         print("🚂 Auth Service - DB 연결 테스트 성공")
+    # 이벤트 루프 지연/느린 콜백 모니터 시작
+    await start_loop_monitor("auth-service")
     yield
+    await stop_loop_monitor()
+    # 남은 트레이스 스팬 내보내기
+    shutdown_tracing()
     logger.info("🛑 Auth Service 종료")
 
 app = FastAPI(
@@ -87,6 +98,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 관리자 전용 프로파일러 (요청 단위 프로파일링 미들웨어가 가장 안쪽에 오도록 먼저 등록)
+install_profiler(app, "auth-service")
+
 # CORS 설정
 app.add_middleware(
     CORSMiddleware,
@@ -96,6 +110,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 분산 트레이싱 미들웨어 (Gateway가 보낸 traceparent 이어받기)
+install_tracing(app, "auth-service")
+
 @app.post("/signup")
 async def signup(request: Request):
     """회원가입 처리 - Gateway에서 받은 id, pass를 그대로 DB에 저장"""
@@ -105,7 +122,8 @@ async def signup(request: Request):
         print(f"🚂 AUTH SERVICE SIGNUP START: {start_time.isoformat()}")
         logger.info(f"AUTH_SERVICE_SIGNUP_START: {start_time.isoformat()}")
         
-        body = await request.json()
+        with start_span("deserialize signup request"):
+            body = await request.json()
         
         # Gateway에서 받은 id와 pass를 그대로 사용
         user_id = body.get("id", "")
@@ -146,20 +164,22 @@ async def signup(request: Request):
                 db_conn = await get_db_connection()
                 if db_conn:
                     # users 테이블 생성 (없는 경우)
-                    await db_conn.execute("""
-                        CREATE TABLE IF NOT EXISTS users (
-                            id SERIAL PRIMARY KEY,
-                            username VARCHAR(100) UNIQUE NOT NULL,
-                            password VARCHAR(255) NOT NULL,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                        )
-                    """)
+                    with start_span("db CREATE TABLE users", kind="client", **{"db.system": "postgresql"}):
+                        await db_conn.execute("""
+                            CREATE TABLE IF NOT EXISTS users (
+                                id SERIAL PRIMARY KEY,
+                                username VARCHAR(100) UNIQUE NOT NULL,
+                                password VARCHAR(255) NOT NULL,
+                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                            )
+                        """)
                     
                     # Gateway에서 받은 id, pass를 그대로 DB에 저장
-                    await db_conn.execute(
-                        "INSERT INTO users (username, password) VALUES ($1, $2)",
-                        user_id, user_pass
-                    )
+                    with start_span("db INSERT users", kind="client", **{"db.system": "postgresql"}):
+                        await db_conn.execute(
+                            "INSERT INTO users (username, password) VALUES ($1, $2)",
+                            user_id, user_pass
+                        )
                     
                     await db_conn.close()
                     db_saved = True
@@ -201,7 +221,8 @@ async def signup(request: Request):
             "data_flow": "프론트엔드 → Gateway → Auth Service → Railway DB",
             "source": "auth_service",
             "environment": "railway",
-            "request_id": f"signup_{start_time.strftime('%Y%m%d_%H%M%S')}"
+            # 같은 초에 충돌하던 타임스탬프 대신 Gateway와 공유되는 trace-id 사용
+            "request_id": current_trace_id() or f"signup_{start_time.strftime('%Y%m%d_%H%M%S%f')}"
         }
         
         # Railway 로그에 출력 (중요!)
@@ -248,13 +269,21 @@ async def signup(request: Request):
             "error": str(e),
             "railway_status": "error",
             "service": "auth-service",
-            "request_id": f"error_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            "request_id": current_trace_id() or f"error_{datetime.now().strftime('%Y%m%d_%H%M%S%f')}"
         }
         print(f"🚂 AUTH SERVICE ERROR LOG: {json.dumps(error_log, indent=2, ensure_ascii=False)}")
         logger.error(f"AUTH_SERVICE_ERROR_LOG: {json.dumps(error_log, ensure_ascii=False)}")
         
         raise HTTPException(status_code=500, detail=f"회원가입 실패: {str(e)}")
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 메트릭 엔드포인트 (이벤트 루프 지연, 느린 콜백 등)"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+# 관리자 전용 느린 콜백 조회
+app.include_router(loop_monitor_router)
+
 @app.get("/status")
 async def service_status():
     """서비스 상태 확인"""
@@ -275,4 +304,14 @@ async def service_status():
     
     return status_data
 
+# 게이트웨이 헬스 프로버용 - 몇 초마다 호출되므로 로그를 남기지 않음
+@app.get("/health")
+async def health_check():
+    """헬스체크"""
+    return {
+        "status": "healthy",
+        "service": "auth-service",
+        "timestamp": datetime.now().isoformat(),
+    }
+
 # Docker에서 uvicorn으로 실행되므로 직접 실행 코드 제거
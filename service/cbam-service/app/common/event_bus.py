@@ -0,0 +1,489 @@
+# 서비스 간 이벤트 버스 - Redis Streams + 컨슈머 그룹 (EVENT_BUS_URL/REDIS_URL이 없으면 프로세스 내부)
+#
+# events:{type}          이벤트 유형별 스트림 (id, type, source, at, ts, traceparent, data=JSON), MAXLEN으로 제한
+# events:dead-letter     최대 전달 횟수를 넘긴 이벤트 (원본 필드 + stream, group, deliveries, error)
+# events:done:{group}:{event_id}   처리 완료 표시 (TTL) - 재전달된 이벤트는 핸들러를 다시 부르지 않고 ack
+#
+# 발행 쪽: publish_event(..., outbox_key=...)는 발행 전에 EVENT_OUTBOX_DIR에 이벤트를 기록하고 전달되면 지운다.
+# 재시도 끝에 발행하지 못한 이벤트는 남아 있다가 서비스 시작(flush_outbox)과 다음 키 지정 발행 때 다시 발행된다
+# (키마다 최신 이벤트 하나 - 같은 분기의 새 버전이 이전 미발행 버전을 대신함).
+#
+# 전달 보장은 at-least-once: 핸들러가 성공한 뒤에만 ack하며, 실패하거나 컨슈머가 죽어 ack되지 않은 이벤트는
+# RETRY_IDLE_MS 뒤에 같은 그룹의 살아 있는 컨슈머가 가져가 다시 처리한다. 핸들러도 멱등이어야 한다
+# (완료 표시 직전에 죽으면 한 번 더 호출될 수 있음).
+import os
+import re
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from app.common.tracing import inject_trace_headers, start_span
+
+logger = logging.getLogger("event_bus")
+
+EVENT_BUS_URL = os.getenv("EVENT_BUS_URL", os.getenv("REDIS_URL", ""))
+STREAM_PREFIX = "events:"
+DEAD_LETTER_STREAM = "events:dead-letter"
+STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "100000"))
+# 한 번에 읽고 ack하는 이벤트 수 / 새 이벤트가 없을 때 블로킹 대기
+READ_BATCH = int(os.getenv("EVENT_READ_BATCH", "64"))
+BLOCK_MS = 2000
+# 처리되지 않은 이벤트를 다시 전달하기까지의 유휴 시간 / 최대 전달 횟수 (넘으면 dead-letter)
+RETRY_IDLE_MS = int(os.getenv("EVENT_RETRY_IDLE_MS", "30000"))
+MAX_DELIVERIES = int(os.getenv("EVENT_MAX_DELIVERIES", "5"))
+HANDLER_TIMEOUT_SECONDS = float(os.getenv("EVENT_HANDLER_TIMEOUT_SECONDS", "60"))
+DONE_TTL_SECONDS = int(os.getenv("EVENT_DONE_TTL_SECONDS", str(7 * 24 * 3600)))
+OUTBOX_DIR = os.getenv("EVENT_OUTBOX_DIR", os.path.join(os.getcwd(), "data", "event-outbox"))
+# 재전달 대기 중인 이벤트의 마지막 오류 (dead-letter 기록용) - 다른 컨슈머가 가져간 항목은 여기서 지워지지 않으므로 상한
+MAX_TRACKED_ERRORS = 10_000
+
+EVENTS_PUBLISHED = Counter("event_bus_published_total", "Events published", ["type"])
+EVENT_PUBLISH_ERRORS = Counter("event_bus_publish_errors_total", "Events that could not be published", ["type"])
+EVENTS_CONSUMED = Counter(
+    "event_bus_consumed_total", "Event deliveries handled by this consumer (ok, duplicate, failed, dead)",
+    ["type", "result"],
+)
+EVENT_HANDLER_SECONDS = Histogram(
+    "event_bus_handler_seconds", "Event handler execution time", ["type"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 60),
+)
+EVENT_LAG_SECONDS = Histogram(
+    "event_bus_lag_seconds", "Time from publish to successful handling", ["type"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 60, 300, 1800),
+)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _new_event(event_type: str, source: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": uuid.uuid4().hex,
+        "type": event_type,
+        "source": source,
+        "at": datetime.now().isoformat(),
+        "ts": time.time(),
+        # 소비 쪽 처리 스팬이 발행한 요청의 트레이스에 이어지도록
+        "traceparent": inject_trace_headers().get("traceparent", ""),
+        "data": data,
+    }
+
+
+class LocalEventBus:
+    """프로세스 내부 버스 - Redis가 없을 때 (같은 프로세스의 구독자에게만 전달, 재시작하면 유실)"""
+    name = "local"
+
+    def __init__(self, service: str):
+        self.service = service
+        self.handlers: Dict[str, Handler] = {}
+        self.dead: deque = deque(maxlen=1000)
+        self._done: deque = deque(maxlen=10_000)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # 재전달 대기 태스크 참조 - 이벤트 루프는 약한 참조만 두므로 대기 중 GC되지 않게 보관
+        self._retries: set = set()
+
+    def subscribe(self, event_type: str, handler: Handler):
+        """start() 전에 등록 - 유형당 핸들러 하나"""
+        self.handlers[event_type] = handler
+
+    async def _handle(self, event: Dict[str, Any]) -> Optional[str]:
+        """핸들러 실행 - 성공이면 None, 실패면 오류 메시지"""
+        event_type = event["type"]
+        started = time.perf_counter()
+        try:
+            with start_span(f"event {event_type}", kind="consumer", traceparent=event.get("traceparent") or None,
+                            **{"event.id": event["id"], "event.source": event.get("source", "")}):
+                await asyncio.wait_for(self.handlers[event_type](event), HANDLER_TIMEOUT_SECONDS)
+        except Exception as e:
+            EVENTS_CONSUMED.labels(event_type, "failed").inc()
+            error = f"{type(e).__name__}: {e}"
+            logger.warning(f"⚠️ 이벤트 처리 실패 {event_type} {event['id']}: {error}")
+            return error
+        EVENT_HANDLER_SECONDS.labels(event_type).observe(time.perf_counter() - started)
+        EVENT_LAG_SECONDS.labels(event_type).observe(max(time.time() - float(event.get("ts") or time.time()), 0.0))
+        EVENTS_CONSUMED.labels(event_type, "ok").inc()
+        return None
+
+    async def publish(self, event_type: str, data: Dict[str, Any]) -> Optional[str]:
+        event = _new_event(event_type, self.service, data)
+        EVENTS_PUBLISHED.labels(event_type).inc()
+        if self._queue is not None and event_type in self.handlers:
+            self._queue.put_nowait((event, 1))
+        return event["id"]
+
+    async def start(self):
+        if self.handlers and self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._consume())
+            logger.info(f"📨 이벤트 구독 시작 (프로세스 내부): {sorted(self.handlers)}")
+
+    async def _retry_later(self, event: Dict[str, Any], deliveries: int):
+        await asyncio.sleep(RETRY_IDLE_MS / 1000)
+        self._queue.put_nowait((event, deliveries + 1))
+
+    async def _consume(self):
+        while True:
+            event, deliveries = await self._queue.get()
+            if event["id"] in self._done:
+                EVENTS_CONSUMED.labels(event["type"], "duplicate").inc()
+                continue
+            error = await self._handle(event)
+            if error is None:
+                self._done.append(event["id"])
+            elif deliveries >= MAX_DELIVERIES:
+                EVENTS_CONSUMED.labels(event["type"], "dead").inc()
+                self.dead.append({**event, "entry_id": event["id"], "deliveries": deliveries, "error": error})
+                logger.error(f"☠️ 이벤트 dead-letter {event['type']} {event['id']}: {error}")
+            else:
+                task = asyncio.ensure_future(self._retry_later(event, deliveries))
+                self._retries.add(task)
+                task.add_done_callback(self._retries.discard)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._retries):
+            task.cancel()
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "bus": self.name,
+            "subscriptions": sorted(self.handlers),
+            "pending": self._queue.qsize() if self._queue else 0,
+            "dead_letters": len(self.dead),
+        }
+
+    async def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return list(self.dead)[-limit:]
+
+    async def replay_dead_letter(self, entry_id: str) -> bool:
+        for entry in list(self.dead):
+            if entry["entry_id"] == entry_id:
+                self.dead.remove(entry)
+                event = {k: v for k, v in entry.items() if k not in ("entry_id", "deliveries", "error")}
+                if self._queue is not None:
+                    self._queue.put_nowait((event, 1))
+                return True
+        return False
+
+
+class RedisEventBus(LocalEventBus):
+    """Redis Streams 버스 - 그룹(=구독 서비스)마다 각 이벤트를 한 인스턴스가 처리, 인스턴스를 늘리면 나눠 처리"""
+    name = "redis"
+
+    def __init__(self, service: str, client):
+        super().__init__(service)
+        self.redis = client
+        self.group = service
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._errors: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _stream(event_type: str) -> str:
+        return f"{STREAM_PREFIX}{event_type}"
+
+    def _done_key(self, event_id: str) -> str:
+        return f"{STREAM_PREFIX}done:{self.group}:{event_id}"
+
+    async def publish(self, event_type: str, data: Dict[str, Any]) -> Optional[str]:
+        """스트림에 추가 (일시적 오류는 짧게 재시도) - 끝내 실패하면 None, 호출한 요청은 실패시키지 않음"""
+        event = _new_event(event_type, self.service, data)
+        fields = {**event, "data": json.dumps(data, ensure_ascii=False, default=str), "ts": repr(event["ts"])}
+        for attempt in range(3):
+            try:
+                await self.redis.xadd(self._stream(event_type), fields, maxlen=STREAM_MAXLEN, approximate=True)
+                EVENTS_PUBLISHED.labels(event_type).inc()
+                return event["id"]
+            except Exception as e:
+                error = e
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        EVENT_PUBLISH_ERRORS.labels(event_type).inc()
+        logger.error(f"❌ 이벤트 발행 실패 {event_type}: {str(error)}")
+        return None
+
+    @staticmethod
+    def _decode(fields: Dict[bytes, bytes]) -> Dict[str, Any]:
+        event = {k.decode(): v.decode() for k, v in fields.items()}
+        event["data"] = json.loads(event.get("data") or "{}")
+        return event
+
+    async def start(self):
+        if not self.handlers or self._task is not None:
+            return
+        for event_type in self.handlers:
+            try:
+                # 그룹을 처음 만들 때는 이후 이벤트부터 (배포 전에 쌓인 이벤트를 한꺼번에 처리하지 않도록)
+                await self.redis.xgroup_create(self._stream(event_type), self.group, id="$", mkstream=True)
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+        self._task = asyncio.create_task(self._consume())
+        logger.info(f"📨 이벤트 구독 시작: 그룹 {self.group}, 컨슈머 {self.consumer}, {sorted(self.handlers)}")
+
+    async def _consume(self):
+        streams = {self._stream(t): ">" for t in self.handlers}
+        last_retry = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_retry >= RETRY_IDLE_MS / 2000:
+                    last_retry = time.monotonic()
+                    for stream in streams:
+                        await self._retry_pending(stream)
+                response = await self.redis.xreadgroup(
+                    self.group, self.consumer, streams, count=READ_BATCH, block=BLOCK_MS,
+                )
+                for stream, messages in response or []:
+                    await self._process(stream.decode(), messages)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 이벤트 읽기 실패: {str(e)}")
+                await asyncio.sleep(1.0)
+
+    async def _process(self, stream: str, messages: List[Tuple[bytes, Dict[bytes, bytes]]]):
+        """배치 처리 - 완료 표시 확인을 한 번에, 성공/중복 이벤트의 완료 표시와 ack도 한 번에"""
+        events = [(message_id, self._decode(fields)) for message_id, fields in messages if fields]
+        # 스트림에서 잘려 나간(MAXLEN) 대기 항목은 내용 없이 돌아오므로 그대로 ack
+        ack_ids = [message_id for message_id, fields in messages if not fields]
+        done_ids = []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for _, event in events:
+                pipe.exists(self._done_key(event["id"]))
+            seen = await pipe.execute() if events else []
+        for (message_id, event), already in zip(events, seen):
+            if already:
+                EVENTS_CONSUMED.labels(event["type"], "duplicate").inc()
+                ack_ids.append(message_id)
+                continue
+            error = await self._handle(event)
+            if error is None:
+                ack_ids.append(message_id)
+                done_ids.append(event["id"])
+                self._errors.pop(message_id, None)
+            else:
+                # ack하지 않고 대기 목록에 남겨 RETRY_IDLE_MS 뒤 재전달
+                self._errors[message_id] = error
+                self._errors.move_to_end(message_id)
+                while len(self._errors) > MAX_TRACKED_ERRORS:
+                    self._errors.popitem(last=False)
+        if not ack_ids:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for event_id in done_ids:
+                pipe.set(self._done_key(event_id), "1", ex=DONE_TTL_SECONDS)
+            pipe.xack(stream, self.group, *ack_ids)
+            await pipe.execute()
+
+    async def _retry_pending(self, stream: str):
+        """오래 ack되지 않은 이벤트(핸들러 실패, 죽은 컨슈머) 재처리 - 최대 전달 횟수를 넘으면 dead-letter"""
+        pending = await self.redis.xpending_range(
+            stream, self.group, min="-", max="+", count=READ_BATCH, idle=RETRY_IDLE_MS,
+        )
+        if not pending:
+            return
+        retry = [p["message_id"] for p in pending if p["times_delivered"] < MAX_DELIVERIES]
+        dead = {p["message_id"]: p["times_delivered"] for p in pending if p["times_delivered"] >= MAX_DELIVERIES}
+        if dead:
+            await self._dead_letter(stream, dead)
+        if retry:
+            claimed = await self.redis.xclaim(stream, self.group, self.consumer, RETRY_IDLE_MS, retry)
+            logger.info(f"🔁 이벤트 재전달 {stream}: {len(claimed)}건")
+            await self._process(stream, claimed)
+
+    async def _dead_letter(self, stream: str, deliveries: Dict[bytes, int]):
+        claimed = await self.redis.xclaim(stream, self.group, self.consumer, RETRY_IDLE_MS, list(deliveries))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for message_id, fields in claimed:
+                if not fields:
+                    continue
+                event_type = fields.get(b"type", b"").decode()
+                error = self._errors.pop(message_id, "다른 컨슈머에서 처리 실패")
+                EVENTS_CONSUMED.labels(event_type, "dead").inc()
+                logger.error(f"☠️ 이벤트 dead-letter {event_type} {fields.get(b'id', b'').decode()}: {error}")
+                pipe.xadd(DEAD_LETTER_STREAM, {
+                    **fields, "stream": stream, "group": self.group,
+                    "deliveries": deliveries[message_id], "error": error,
+                }, maxlen=STREAM_MAXLEN, approximate=True)
+            pipe.xack(stream, self.group, *deliveries)
+            await pipe.execute()
+
+    async def close(self):
+        await super().close()
+        await self.redis.aclose()
+
+    async def stats(self) -> Dict[str, Any]:
+        streams = {}
+        for event_type in self.handlers:
+            stream = self._stream(event_type)
+            groups = await self.redis.xinfo_groups(stream)
+            group = next((g for g in groups if g["name"].decode() == self.group), {})
+            streams[event_type] = {"length": await self.redis.xlen(stream), "pending": group.get("pending", 0)}
+        return {
+            "bus": self.name,
+            "group": self.group,
+            "consumer": self.consumer,
+            "streams": streams,
+            "dead_letters": await self.redis.xlen(DEAD_LETTER_STREAM),
+        }
+
+    async def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        entries = await self.redis.xrevrange(DEAD_LETTER_STREAM, count=limit)
+        return [{**self._decode(fields), "entry_id": entry_id.decode(), "deliveries": int(fields[b"deliveries"])}
+                for entry_id, fields in entries if fields.get(b"group", b"").decode() == self.group]
+
+    async def replay_dead_letter(self, entry_id: str) -> bool:
+        """dead-letter 항목을 원래 스트림에 다시 넣음 (같은 이벤트 ID - 완료 표시가 없으므로 다시 처리됨)"""
+        entries = await self.redis.xrange(DEAD_LETTER_STREAM, min=entry_id, max=entry_id)
+        if not entries:
+            return False
+        fields = entries[0][1]
+        original = {k: v for k, v in fields.items() if k not in (b"stream", b"group", b"deliveries", b"error")}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(fields[b"stream"].decode(), original, maxlen=STREAM_MAXLEN, approximate=True)
+            pipe.xdel(DEAD_LETTER_STREAM, entry_id)
+            await pipe.execute()
+        return True
+
+
+_bus: Optional[LocalEventBus] = None
+# outbox에 발행하지 못한 이벤트가 남아 있을 수 있음 (시작 시 True - 이전 프로세스가 남긴 항목 확인)
+_outbox_pending = True
+_outbox_lock: Optional[asyncio.Lock] = None
+
+
+def _outbox_path(event_type: str, key: str) -> str:
+    return os.path.join(OUTBOX_DIR, f"{event_type}--{re.sub(r'[^A-Za-z0-9_.-]', '_', key)}.json")
+
+
+def _outbox_write(path: str, entry: Dict[str, Any]):
+    os.makedirs(OUTBOX_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def _outbox_remove(path: str, token: str):
+    """발행한 항목만 삭제 - 그 사이 같은 키의 새 이벤트가 기록됐으면 남겨 둠"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            if json.load(f).get("token") != token:
+                return
+        os.remove(path)
+    except (OSError, ValueError):
+        pass
+
+
+def _outbox_entries() -> List[Tuple[str, Dict[str, Any]]]:
+    if not os.path.isdir(OUTBOX_DIR):
+        return []
+    entries = []
+    for name in sorted(os.listdir(OUTBOX_DIR)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(OUTBOX_DIR, name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries.append((path, json.load(f)))
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ outbox 항목을 읽을 수 없습니다 {name}: {str(e)}")
+    return entries
+
+
+def _delivered(event_id: Optional[str]) -> bool:
+    # Redis 연결에 실패해 프로세스 내부 버스로 대체된 경우에는 다른 서비스에 전달되지 않았으므로 outbox 유지
+    return event_id is not None and (_bus.name != "local" or not EVENT_BUS_URL)
+
+
+async def init_event_bus(service: str) -> LocalEventBus:
+    global _bus
+    if _bus is None:
+        if EVENT_BUS_URL:
+            try:
+                import redis.asyncio as aioredis
+
+                client = aioredis.from_url(EVENT_BUS_URL)
+                await client.ping()
+                logger.info(f"📨 이벤트 버스: Redis Streams ({EVENT_BUS_URL})")
+                _bus = RedisEventBus(service, client)
+            except Exception as e:
+                logger.warning(f"⚠️ Redis 연결 실패 - 프로세스 내부 이벤트 버스 사용 (서비스 간 전달 안 됨): {str(e)}")
+        else:
+            logger.info("📨 이벤트 버스: 프로세스 내부 (EVENT_BUS_URL/REDIS_URL 미설정 - 서비스 간 전달 안 됨)")
+        if _bus is None:
+            _bus = LocalEventBus(service)
+    return _bus
+
+
+def get_event_bus() -> LocalEventBus:
+    if _bus is None:
+        raise RuntimeError("이벤트 버스가 초기화되지 않았습니다")
+    return _bus
+
+
+async def flush_outbox() -> int:
+    """outbox에 남은 이벤트 재발행 (서비스 시작 시, 키 지정 발행 전) → 다시 발행한 수"""
+    global _outbox_pending, _outbox_lock
+    if _bus is None or not _outbox_pending:
+        return 0
+    if _outbox_lock is None:
+        _outbox_lock = asyncio.Lock()
+    async with _outbox_lock:
+        if not _outbox_pending:
+            return 0
+        published, remaining = 0, 0
+        for path, entry in await asyncio.to_thread(_outbox_entries):
+            if _delivered(await _bus.publish(entry["type"], entry["data"])):
+                await asyncio.to_thread(_outbox_remove, path, entry["token"])
+                published += 1
+            else:
+                remaining += 1
+        _outbox_pending = remaining > 0
+    if published:
+        logger.info(f"📨 outbox 이벤트 재발행: {published}건 (남은 {remaining}건)")
+    return published
+
+
+async def publish_event(event_type: str, data: Dict[str, Any], outbox_key: Optional[str] = None) -> Optional[str]:
+    """이벤트 발행 - 버스가 없으면(초기화 전) 건너뜀
+
+    outbox_key를 주면 발행 전에 outbox에 기록해 두고 전달되면 지움 - 발행에 실패하면 서비스 시작이나
+    다음 키 지정 발행 때 다시 발행 (같은 키의 이전 미발행 이벤트는 이번 이벤트로 대체)
+    """
+    global _outbox_pending
+    if outbox_key is None:
+        if _bus is None:
+            logger.warning(f"⚠️ 이벤트 버스 미초기화 - {event_type} 발행 생략")
+            return None
+        return await _bus.publish(event_type, data)
+    # 이전에 발행하지 못한 이벤트부터 (이번 이벤트를 기록하기 전에 - 같은 이벤트를 두 번 보내지 않도록)
+    await flush_outbox()
+    path = _outbox_path(event_type, outbox_key)
+    token = uuid.uuid4().hex
+    await asyncio.to_thread(_outbox_write, path, {"type": event_type, "key": outbox_key, "token": token, "data": data})
+    if _bus is None:
+        logger.warning(f"⚠️ 이벤트 버스 미초기화 - {event_type} outbox에만 기록")
+        _outbox_pending = True
+        return None
+    event_id = await _bus.publish(event_type, data)
+    if _delivered(event_id):
+        await asyncio.to_thread(_outbox_remove, path, token)
+    else:
+        _outbox_pending = True
+    return event_id
+
+
+async def close_event_bus():
+    global _bus
+    if _bus is not None:
+        await _bus.close()
+        _bus = None
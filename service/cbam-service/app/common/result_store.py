@@ -0,0 +1,535 @@
+# 열 단위 결과 저장소 - 회사 × 보고 분기 파티션, mmap 무복사 로드, 열/행 필터 푸시다운
+# (cbam-service / report-service 공용 - 두 서비스의 app/common에 같은 파일을 둔다)
+import os
+import re
+import json
+import mmap
+import time
+import uuid
+import zlib
+import struct
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple, Sequence, Iterator
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("result_store")
+
+RESULT_STORE_DIR = os.getenv("RESULT_STORE_DIR", os.path.join(os.getcwd(), "data", "results"))
+ROW_GROUP_ROWS = int(os.getenv("RESULT_STORE_ROW_GROUP_ROWS", "65536"))
+
+MAGIC = b"CRSTORE\x01"
+ALIGNMENT = 64
+PART_SUFFIX = ".crs"
+_SAFE_KEY = re.compile(r"^[A-Za-z0-9_.\-]{1,128}$")
+
+# 필터 연산자: (열, 연산자, 값)
+OPERATORS = ("==", "!=", "<", "<=", ">", ">=", "in")
+
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+def _check_key(value: str, what: str) -> str:
+    if not _SAFE_KEY.match(value) or value in (".", ".."):
+        raise ValueError(f"{what}에 사용할 수 없는 문자가 있습니다: {value!r}")
+    return value
+
+
+def partition_dir(kind: str, company_id: str, quarter: str, root: Optional[str] = None) -> str:
+    return os.path.join(root or RESULT_STORE_DIR, _check_key(kind, "kind"),
+                        _check_key(company_id, "company_id"), _check_key(quarter, "quarter"))
+
+
+# ---- 쓰기 ----
+
+def _encode_column(name: str, values) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """열 → (저장 배열, 열 메타). 문자열/범주 열은 정렬된 사전 + 최소 폭 정수 코드로 인코딩"""
+    arr = values.to_numpy() if isinstance(values, pd.Series) else values
+    if isinstance(arr, pd.Categorical) or (isinstance(arr, np.ndarray) and arr.dtype == object):
+        series = pd.Series(arr, copy=False).astype(object)
+        missing = series.isna().to_numpy()
+        codes, uniques = pd.factorize(series.where(~missing, None), sort=True)
+        width = np.uint8 if len(uniques) < 2**8 - 1 else np.uint16 if len(uniques) < 2**16 - 1 else np.uint32
+        # 결측값은 코드 최댓값(센티널)
+        sentinel = np.iinfo(width).max
+        stored = np.where(codes < 0, sentinel, codes).astype(width)
+        return stored, {"encoding": "dictionary", "dictionary": [str(u) for u in uniques], "null_code": int(sentinel)}
+    arr = np.asarray(arr)
+    if arr.dtype == np.bool_:
+        return arr.view(np.uint8), {"encoding": "bool"}
+    if arr.dtype.kind not in "iuf":
+        raise ValueError(f"저장할 수 없는 열 dtype: {name} ({arr.dtype})")
+    return np.ascontiguousarray(arr), {"encoding": "plain"}
+
+
+def _zone_map(stored: np.ndarray, bounds: List[Tuple[int, int]], null_code: Optional[int]) -> List[Optional[list]]:
+    """행 그룹별 [최솟값, 최댓값] (필터 푸시다운으로 그룹 건너뛰기에 사용)"""
+    zones = []
+    for start, end in bounds:
+        block = stored[start:end]
+        if null_code is not None:
+            block = block[block != null_code]
+        elif block.dtype.kind == "f":
+            block = block[~np.isnan(block)]
+        zones.append([block.min().item(), block.max().item()] if len(block) else None)
+    return zones
+
+
+def write_columns(path: str, columns: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None,
+                  compression: Optional[str] = None, row_group_rows: int = ROW_GROUP_ROWS) -> str:
+    """열 묶음을 한 파일로 기록 (헤더 JSON + 64바이트 정렬 열 블록, 임시 파일 후 교체)
+
+    compression=None: 원시 배열 → 읽을 때 mmap 뷰 그대로 사용 (무복사)
+    compression="zlib": 행 그룹 단위 압축 → 선택된 행 그룹만 풀어서 읽음
+    """
+    if compression not in (None, "zlib"):
+        raise ValueError(f"지원하지 않는 압축 방식: {compression}")
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    bounds = [(s, min(s + row_group_rows, n_rows)) for s in range(0, n_rows, row_group_rows)]
+    blocks: List[bytes] = []
+    layout: Dict[str, Any] = {}
+    offset = 0
+    for name, values in columns.items():
+        stored, meta = _encode_column(name, values)
+        if len(stored) != n_rows:
+            raise ValueError(f"열 길이가 일치하지 않습니다: {name} ({len(stored)} != {n_rows})")
+        meta.update(dtype=stored.dtype.str, zones=_zone_map(stored, bounds, meta.get("null_code")))
+        if compression:
+            chunks = []
+            for start, end in bounds:
+                payload = zlib.compress(stored[start:end].tobytes(), 1)
+                chunks.append([offset, len(payload)])
+                blocks.append(payload)
+                offset += len(payload)
+            meta.update(codec="zlib", chunks=chunks)
+        else:
+            meta.update(codec="raw", offset=offset)
+            blocks.append(stored.tobytes())
+            offset += len(blocks[-1])
+        # 다음 열이 정렬 경계에서 시작하도록 채움
+        padding = _aligned(offset) - offset
+        if padding:
+            blocks.append(b"\0" * padding)
+            offset += padding
+        layout[name] = meta
+
+    header = json.dumps({
+        "rows": n_rows,
+        "row_groups": bounds,
+        "columns": layout,
+        "metadata": metadata or {},
+        "written_at": time.time(),
+    }, ensure_ascii=False).encode()
+    prefix = len(MAGIC) + 4 + len(header)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * (_aligned(prefix) - prefix))
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_partition(kind: str, company_id: str, quarter: str, columns: Dict[str, Any],
+                    metadata: Optional[Dict[str, Any]] = None, mode: str = "overwrite",
+                    compression: Optional[str] = None, root: Optional[str] = None) -> str:
+    """파티션 쓰기 - overwrite는 기존 파트 파일을 새 파일 하나로 교체, append는 파트 파일 추가
+
+    교체는 새 파일을 먼저 쓴 뒤 옛 파일을 지우므로, 이미 mmap으로 열어 둔 리더는 옛 내용을 계속 읽는다.
+    metadata["key"]가 있는 파티션은 키 파티션: append 파트는 델타(같은 키는 새 파트 값이 우선,
+    metadata["deleted_keys"]는 삭제된 키)이고 읽을 때 최신 값만 남긴다.
+    """
+    if mode not in ("overwrite", "append"):
+        raise ValueError("mode는 overwrite 또는 append 이어야 합니다")
+    directory = partition_dir(kind, company_id, quarter, root)
+    os.makedirs(directory, exist_ok=True)
+    old_parts = _part_files(directory) if mode == "overwrite" else []
+    if mode == "overwrite":
+        # 옛 파트를 지우기 전에 목록을 읽은 리더가 옛 파트를 섞지 않도록 기준 파트로 표시
+        metadata = {**(metadata or {}), "base": True}
+    name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:6]}{PART_SUFFIX}"
+    path = write_columns(os.path.join(directory, name), columns, metadata, compression)
+    for old in old_parts:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    _open_cache.invalidate(directory)
+    logger.info(f"💾 결과 파티션 기록: {kind}/{company_id}/{quarter} ({mode}, {os.path.getsize(path) / 2**20:.1f}MB)")
+    return path
+
+
+# ---- 읽기 ----
+
+class ColumnarFile:
+    """열 저장 파일 하나의 읽기 전용 mmap 뷰"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"결과 저장소 파일 형식이 아닙니다: {path}")
+        (header_len,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._mmap[start:start + header_len])
+        self.data_start = _aligned(start + header_len)
+        self.rows: int = header["rows"]
+        self.row_groups: List[Tuple[int, int]] = [tuple(b) for b in header["row_groups"]]
+        self.columns: Dict[str, Dict[str, Any]] = header["columns"]
+        self.metadata: Dict[str, Any] = header["metadata"]
+        self.written_at: float = header["written_at"]
+        # 사전 열 디코딩용 CategoricalDtype (사전이 큰 열에서 조회마다 카테고리 검증 반복 방지)
+        self._dtypes: Dict[str, pd.CategoricalDtype] = {}
+
+    def _stored(self, name: str, groups: Optional[Sequence[int]] = None) -> np.ndarray:
+        """저장된 (인코딩된) 열 - raw는 mmap 뷰, zlib은 필요한 행 그룹만 해제"""
+        meta = self.columns[name]
+        dtype = np.dtype(meta["dtype"])
+        if meta["codec"] == "raw":
+            view = np.frombuffer(self._mmap, dtype=dtype, count=self.rows, offset=self.data_start + meta["offset"])
+            if groups is None or len(groups) == len(self.row_groups):
+                return view
+            return np.concatenate([view[slice(*self.row_groups[g])] for g in groups]) if groups else view[:0]
+        selected = range(len(self.row_groups)) if groups is None else groups
+        parts = [
+            np.frombuffer(zlib.decompress(self._mmap[self.data_start + off:self.data_start + off + size]), dtype=dtype)
+            for off, size in (meta["chunks"][g] for g in selected)
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    def _decode(self, name: str, stored: np.ndarray):
+        meta = self.columns[name]
+        if meta["encoding"] == "dictionary":
+            codes = stored.astype(np.int64)
+            codes[stored == meta["null_code"]] = -1
+            if name not in self._dtypes:
+                self._dtypes[name] = pd.CategoricalDtype(meta["dictionary"])
+            return pd.Categorical.from_codes(codes, dtype=self._dtypes[name])
+        if meta["encoding"] == "bool":
+            return stored.view(np.bool_)
+        return stored
+
+    def _numeric_value(self, name: str, value):
+        """문자열 필터 값(쿼리 문자열)을 숫자/불리언 열 값으로 변환 - 열 dtype을 알 때만 숫자로 본다"""
+        if not isinstance(value, str):
+            return value
+        if self.columns[name]["encoding"] == "bool":
+            lowered = value.strip().lower()
+            if lowered in ("true", "1", "false", "0"):
+                return int(lowered in ("true", "1"))
+            raise ValueError(f"불리언 열 {name}의 필터 값이 잘못되었습니다: {value!r}")
+        for cast in (int, float):
+            try:
+                return cast(value)
+            except ValueError:
+                continue
+        raise ValueError(f"숫자 열 {name}의 필터 값이 숫자가 아닙니다: {value!r}")
+
+    def _filter_value(self, name: str, op: str, value):
+        """필터 값을 저장 도메인으로 변환 (사전 열은 코드로, 숫자 열은 문자열 값을 숫자로)"""
+        meta = self.columns[name]
+        if meta["encoding"] != "dictionary":
+            return [self._numeric_value(name, v) for v in value] if op == "in" else self._numeric_value(name, value)
+        dictionary = meta["dictionary"]
+        if op == "in":
+            positions = np.searchsorted(dictionary, [str(v) for v in value])
+            return [int(p) for p, v in zip(positions, value) if p < len(dictionary) and dictionary[p] == str(v)]
+        # 정렬된 사전이므로 범위 비교는 삽입 위치로 변환 가능
+        pos = int(np.searchsorted(dictionary, str(value), side="left"))
+        exact = pos < len(dictionary) and dictionary[pos] == str(value)
+        if op in ("==", "!="):
+            return pos if exact else -1
+        if op == "<":
+            return pos - 0.5
+        if op == ">=":
+            return pos - 0.5
+        if op == "<=":
+            return pos if exact else pos - 0.5
+        return pos if exact else pos - 0.5  # ">"
+
+    @staticmethod
+    def _zone_may_match(zone, op: str, value) -> bool:
+        if zone is None:
+            return op == "!="
+        lo, hi = zone
+        if op == "==":
+            return lo <= value <= hi
+        if op == "!=":
+            return not (lo == hi == value)
+        if op == "<":
+            return lo < value
+        if op == "<=":
+            return lo <= value
+        if op == ">":
+            return hi > value
+        if op == ">=":
+            return hi >= value
+        return any(lo <= v <= hi for v in value)  # "in"
+
+    @staticmethod
+    def _row_mask(stored: np.ndarray, op: str, value, null_code: Optional[int]) -> np.ndarray:
+        if op == "in":
+            mask = np.isin(stored, np.asarray(value)) if len(value) else np.zeros(len(stored), dtype=bool)
+        else:
+            mask = {
+                "==": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal,
+                ">": np.greater, ">=": np.greater_equal,
+            }[op](stored, value)
+        if null_code is not None:
+            mask &= stored != null_code
+        return mask
+
+    def scan(self, columns: Optional[Sequence[str]] = None,
+             filters: Optional[Sequence[Tuple[str, str, Any]]] = None) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """열 선택 + 필터 → (열 dict, 통계). 필터가 없으면 raw 열은 mmap 뷰를 그대로 반환"""
+        names = list(columns) if columns else list(self.columns)
+        unknown = [c for c in names if c not in self.columns]
+        if unknown:
+            raise KeyError(f"없는 열: {unknown}")
+        filters = [(c, op, v) for c, op, v in (filters or [])]
+        for column, op, _ in filters:
+            if column not in self.columns:
+                raise KeyError(f"없는 필터 열: {column}")
+            if op not in OPERATORS:
+                raise ValueError(f"지원하지 않는 연산자: {op}")
+        encoded = [(c, op, self._filter_value(c, op, v)) for c, op, v in filters]
+
+        # 1) 행 그룹 건너뛰기 (zone map)
+        groups = [
+            g for g in range(len(self.row_groups))
+            if all(self._zone_may_match(self.columns[c]["zones"][g], op, v) for c, op, v in encoded)
+        ]
+        stats = {"row_groups": len(self.row_groups), "row_groups_scanned": len(groups), "rows_scanned": 0}
+        selected_groups = None if not filters else groups
+        # 2) 남은 그룹에서만 필터 열을 읽어 행 마스크 계산
+        mask = None
+        for column, op, value in encoded:
+            stored = self._stored(column, selected_groups)
+            part = self._row_mask(stored, op, value, self.columns[column].get("null_code"))
+            mask = part if mask is None else mask & part
+        stats["rows_scanned"] = sum(self.row_groups[g][1] - self.row_groups[g][0] for g in groups) if filters else self.rows
+        # 3) 요청 열만 읽고 마스크 적용
+        out = {}
+        for name in names:
+            stored = self._stored(name, selected_groups)
+            if mask is not None:
+                stored = stored[mask]
+            out[name] = self._decode(name, stored)
+        stats["rows"] = int(mask.sum()) if mask is not None else self.rows
+        return out, stats
+
+    def iter_row_groups(self, columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+        """행 그룹 단위 열 dict 순회 - 파일 크기와 무관하게 한 번에 행 그룹 하나만 디코딩"""
+        names = list(columns) if columns else list(self.columns)
+        unknown = [c for c in names if c not in self.columns]
+        if unknown:
+            raise KeyError(f"없는 열: {unknown}")
+        for g in range(len(self.row_groups)):
+            yield {name: self._decode(name, self._stored(name, [g])) for name in names}
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 아직 뷰를 쥔 호출자가 있으면 GC에 맡김
+            pass
+
+
+def _part_files(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(PART_SUFFIX))
+
+
+class _OpenFileCache:
+    """열린 파트 파일 캐시 - 같은 파티션 반복 조회 시 헤더 파싱/mmap 재생성 생략"""
+
+    def __init__(self, max_files: int = 256):
+        self.max_files = max_files
+        self._files: Dict[str, Tuple[float, ColumnarFile]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> ColumnarFile:
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._files.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        handle = ColumnarFile(path)
+        with self._lock:
+            self._files[path] = (mtime, handle)
+            while len(self._files) > self.max_files:
+                self._files.pop(next(iter(self._files)))
+        return handle
+
+    def invalidate(self, directory: str):
+        with self._lock:
+            for path in [p for p in self._files if os.path.dirname(p) == directory]:
+                self._files.pop(path)
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+
+
+_open_cache = _OpenFileCache()
+
+
+def invalidate_partition(kind: str, company_id: str, quarter: str, root: Optional[str] = None):
+    """다른 프로세스가 파티션을 다시 쓴 뒤 열린 파트 핸들 정리 (삭제된 이전 파트의 mmap이 디스크를 붙잡지 않도록)"""
+    _open_cache.invalidate(partition_dir(kind, company_id, quarter, root))
+
+
+def clear_open_files():
+    """열린 파트 핸들 모두 정리 (기본값 테이블 갱신처럼 여러 파티션이 한꺼번에 바뀔 때)"""
+    _open_cache.clear()
+
+
+def _live_parts(handles: List[ColumnarFile]) -> Tuple[Optional[str], List[ColumnarFile], List[set]]:
+    """키 파티션이면 (키 열, 마지막 기준 파트부터의 파트, 파트별로 더 새 파트가 대체/삭제한 키 집합)"""
+    base = max((i for i, h in enumerate(handles) if h.metadata.get("base")), default=0)
+    handles = handles[base:]
+    key = handles[-1].metadata.get("key")
+    if not key:
+        return None, handles, [set()] * len(handles)
+    replaced: List[set] = []
+    newer: set = set()
+    for i in range(len(handles) - 1, -1, -1):
+        replaced.append(newer)
+        if i:
+            keys = np.asarray(handles[i].scan([key])[0][key], dtype=object).tolist()
+            newer = newer | set(keys) | set(handles[i].metadata.get("deleted_keys", ()))
+    return key, handles, replaced[::-1]
+
+
+def _with_key(columns: Optional[Sequence[str]], key: Optional[str]) -> Tuple[Optional[List[str]], bool]:
+    """중복 제거에 키 열이 필요하면 읽을 열에 추가 → (읽을 열, 결과에서 키 열을 뺄지)"""
+    if columns is None or key is None or key in columns:
+        return (None if columns is None else list(columns)), False
+    return list(columns) + [key], True
+
+
+def read_partition(kind: str, company_id: str, quarter: str, columns: Optional[Sequence[str]] = None,
+                   filters: Optional[Sequence[Tuple[str, str, Any]]] = None,
+                   root: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """파티션 읽기 → (열 dict, 통계+메타). 파트가 하나이고 필터가 없으면 숫자 열은 무복사 mmap 뷰"""
+    started = time.perf_counter()
+    directory = partition_dir(kind, company_id, quarter, root)
+    parts = _part_files(directory)
+    if not parts:
+        raise FileNotFoundError(f"결과 파티션이 없습니다: {kind}/{company_id}/{quarter}")
+    key, handles, replaced = _live_parts([_open_cache.get(p) for p in parts])
+    read, drop_key = _with_key(columns, key)
+    results = [h.scan(read, filters) for h in handles]
+    for (data, part_stats), gone in zip(results, replaced):
+        if gone:
+            keep = ~pd.Series(np.asarray(data[key], dtype=object)).isin(gone).to_numpy()
+            for name in data:
+                data[name] = data[name][keep]
+            part_stats["rows"] = int(keep.sum())
+        if drop_key:
+            data.pop(key)
+    if len(results) == 1:
+        data = results[0][0]
+    else:
+        data = {}
+        for name in results[0][0]:
+            values = [r[0][name] for r in results]
+            data[name] = pd.api.types.union_categoricals(values, ignore_order=True) \
+                if isinstance(values[0], pd.Categorical) else np.concatenate(values)
+    stats: Dict[str, Any] = {
+        "parts": len(handles),
+        "rows": sum(r[1]["rows"] for r in results),
+        "rows_scanned": sum(r[1]["rows_scanned"] for r in results),
+        "row_groups": sum(r[1]["row_groups"] for r in results),
+        "row_groups_scanned": sum(r[1]["row_groups_scanned"] for r in results),
+        "metadata": handles[-1].metadata,
+        "written_at": handles[-1].written_at,
+    }
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return data, stats
+
+
+def partition_columns(kind: str, company_id: str, quarter: str, root: Optional[str] = None) -> List[str]:
+    """파티션 열 이름 (파트 헤더만 읽음)"""
+    parts = _part_files(partition_dir(kind, company_id, quarter, root))
+    if not parts:
+        raise FileNotFoundError(f"결과 파티션이 없습니다: {kind}/{company_id}/{quarter}")
+    return list(_open_cache.get(parts[-1]).columns)
+
+
+def iter_partition(kind: str, company_id: str, quarter: str, columns: Optional[Sequence[str]] = None,
+                   root: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """파티션을 파트 파일 → 행 그룹 순서로 청크 단위 순회 (대용량 내보내기/변환용, 키 파티션은 최신 값만)"""
+    parts = _part_files(partition_dir(kind, company_id, quarter, root))
+    if not parts:
+        raise FileNotFoundError(f"결과 파티션이 없습니다: {kind}/{company_id}/{quarter}")
+    key, handles, replaced = _live_parts([_open_cache.get(p) for p in parts])
+    read, drop_key = _with_key(columns, key)
+    for handle, gone in zip(handles, replaced):
+        for chunk in handle.iter_row_groups(read):
+            if gone:
+                keep = ~pd.Series(np.asarray(chunk[key], dtype=object)).isin(gone).to_numpy()
+                chunk = {name: values[keep] for name, values in chunk.items()}
+            if drop_key:
+                chunk.pop(key)
+            yield chunk
+
+
+def list_partitions(kind: str, company_id: Optional[str] = None, root: Optional[str] = None) -> List[Dict[str, Any]]:
+    """저장된 파티션 목록 (회사/분기, 파트 수, 크기)"""
+    base = os.path.join(root or RESULT_STORE_DIR, _check_key(kind, "kind"))
+    companies = [_check_key(company_id, "company_id")] if company_id else \
+        (sorted(os.listdir(base)) if os.path.isdir(base) else [])
+    out = []
+    for company in companies:
+        company_dir = os.path.join(base, company)
+        if not os.path.isdir(company_dir):
+            continue
+        for quarter in sorted(os.listdir(company_dir)):
+            parts = _part_files(os.path.join(company_dir, quarter))
+            if parts:
+                out.append({
+                    "company_id": company,
+                    "quarter": quarter,
+                    "parts": len(parts),
+                    "bytes": sum(os.path.getsize(p) for p in parts),
+                })
+    return out
+
+
+def columns_to_json(data: Dict[str, Any]) -> Dict[str, list]:
+    """JSON 응답용 열 변환 (NaN/결측 → None)"""
+    out = {}
+    for name, values in data.items():
+        if isinstance(values, pd.Categorical):
+            out[name] = [None if pd.isna(v) else v for v in values.astype(object)]
+        elif values.dtype.kind == "f":
+            out[name] = np.where(np.isnan(values), None, values).tolist()
+        else:
+            out[name] = values.tolist()
+    return out
+
+
+def parse_filter(expression: str) -> Tuple[str, str, Any]:
+    """쿼리 문자열 필터 'column:op:value' 파싱 (op: eq, ne, lt, le, gt, ge, in - in은 쉼표 구분)
+
+    값은 문자열 그대로 둔다 - 숫자 변환은 열 dtype을 아는 스캔에서만 (문자열 열의 '007'이 7이 되지 않도록)
+    """
+    try:
+        column, op, raw = expression.split(":", 2)
+    except ValueError:
+        raise ValueError(f"필터 형식은 column:op:value 입니다: {expression!r}")
+    ops = {"eq": "==", "ne": "!=", "lt": "<", "le": "<=", "gt": ">", "ge": ">=", "in": "in"}
+    if op not in ops:
+        raise ValueError(f"지원하지 않는 연산자: {op}")
+    return column, ops[op], raw.split(",") if op == "in" else raw
@@ -1 +1,107 @@
-# Empty main.py file
+# CBAM Service - 내재 배출량/인증서 의무량 계산
+import os
+import sys
+import logging
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from app.common.event_bus import init_event_bus, close_event_bus, flush_outbox
+from app.common.loop_monitor import start_loop_monitor, stop_loop_monitor, loop_monitor_router
+from app.common.profiler import install_profiler
+from app.common.tracing import install_tracing, shutdown_tracing
+from app.router.calculation_router import calculation_router
+from app.router.forecast_router import forecast_router
+from app.router.ingestion_router import ingestion_router
+from app.router.results_router import results_router
+from app.router.run_router import run_router
+from app.service.calculation_engine import get_factor_table
+from app.service.parallel_run import shutdown_executor
+
+# Railway 환경 확인
+IS_RAILWAY = os.getenv("RAILWAY_ENVIRONMENT") == "true" or (os.getenv("PORT") is not None and os.getenv("PORT") != "")
+
+# 로깅 설정
+if IS_RAILWAY:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    print("🚂 CBAM Service - Railway 환경에서 실행 중")
+else:
+    logging.basicConfig(level=logging.INFO)
+    print("🏠 CBAM Service - 로컬 환경에서 실행 중")
+
+logger = logging.getLogger("cbam_service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("🚀 CBAM Service 시작")
+    # 기본값 테이블 미리 로드 (첫 요청 지연 방지)
+    get_factor_table()
+    # 서비스 간 이벤트 버스 (결과 갱신을 report-service 등에 비동기로 알림)
+    await init_event_bus("cbam-service")
+    # 이전 실행에서 발행하지 못한 결과 버전 알림 재발행
+    await flush_outbox()
+    # 이벤트 루프 지연/느린 콜백 모니터 시작
+    await start_loop_monitor("cbam-service")
+    yield
+    await stop_loop_monitor()
+    # 분기 실행 프로세스 풀 정리
+    shutdown_executor()
+    await close_event_bus()
+    # 남은 트레이스 스팬 내보내기
+    shutdown_tracing()
+    logger.info("🛑 CBAM Service 종료")
+
+app = FastAPI(
+    title="CBAM Service",
+    description="CBAM Service - 내재 배출량 및 인증서 의무량 계산",
+    version="0.1.0",
+    lifespan=lifespan
+)
+
+# 관리자 전용 프로파일러 (요청 단위 프로파일링 미들웨어가 가장 안쪽에 오도록 먼저 등록)
+install_profiler(app, "cbam-service")
+
+# CORS 설정
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# 분산 트레이싱 미들웨어 (Gateway가 보낸 traceparent 이어받기)
+install_tracing(app, "cbam-service")
+
+@app.get("/health")
+async def health_check():
+    """헬스체크"""
+    return {
+        "status": "healthy",
+        "service": "cbam-service",
+        "timestamp": datetime.now().isoformat(),
+        "factor_table_version": get_factor_table().version,
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 메트릭 엔드포인트"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+# 라우터를 앱에 포함
+app.include_router(calculation_router)
+app.include_router(ingestion_router)
+app.include_router(results_router)
+app.include_router(run_router)
+app.include_router(forecast_router)
+app.include_router(loop_monitor_router)
+
+# Docker에서 uvicorn으로 실행되므로 직접 실행 코드 제거
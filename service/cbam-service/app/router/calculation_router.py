@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+
+from app.common.tracing import start_span
+from app.common.wire import PACKED_MEDIA_TYPE, accepts_packed, packb
+from app.service.calculation_engine import (
+    CalculationParams, calculate_embedded_emissions, summarize, result_to_columns, get_factor_table,
+)
+
+logger = logging.getLogger("cbam_service")
+
+calculation_router = APIRouter(prefix="/api/v1/cbam", tags=["CBAM Calculation"])
+
+
+class PrecursorColumns(BaseModel):
+    """전구물질 테이블 (열 단위)"""
+    line_index: List[int]
+    cn_code: List[int]
+    mass_per_t: List[float]
+    see: Optional[List[Optional[float]]] = None
+
+
+class CalculationBatchRequest(BaseModel):
+    """신고 라인 배치 (열 단위 JSON - 행 객체 배열보다 파싱/변환 비용이 작음)"""
+    cn_code: List[int]
+    quantity_t: List[float]
+    installation_id: Optional[List[Optional[str]]] = None
+    country_of_origin: Optional[List[Optional[str]]] = None
+    direct_see: Optional[List[Optional[float]]] = None
+    indirect_see: Optional[List[Optional[float]]] = None
+    carbon_price_paid_eur: Optional[List[Optional[float]]] = None
+    precursors: Optional[PrecursorColumns] = None
+    year: int = 2026
+    ets_price_eur: float = Field(80.0, gt=0)
+    default_markup: float = Field(0.0, ge=0)
+    include_lines: bool = True
+
+
+def _run_batch(body: CalculationBatchRequest):
+    lines = body.model_dump(include={
+        "cn_code", "quantity_t", "installation_id", "country_of_origin", "direct_see", "indirect_see", "carbon_price_paid_eur",
+    })
+    params = CalculationParams(year=body.year, ets_price_eur=body.ets_price_eur, default_markup=body.default_markup)
+    precursors = body.precursors.model_dump() if body.precursors else None
+    return calculate_embedded_emissions(lines, params=params, precursors=precursors)
+
+
+@calculation_router.post("/calculate/batch", summary="신고 라인 배치 내재 배출량/인증서 의무량 계산")
+async def calculate_batch(body: CalculationBatchRequest, request: Request):
+    """열 단위 배치 계산 - 계산은 스레드에서 실행해 이벤트 루프를 막지 않음
+
+    내부 호출(게이트웨이)이 Accept로 바이너리 형식을 요청하면 결과 열을 원시 배열 그대로 msgpack으로 응답
+    """
+    started = time.perf_counter()
+    try:
+        with start_span("cbam calculate batch", lines=len(body.cn_code)):
+            result = await asyncio.to_thread(_run_batch, body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    elapsed = time.perf_counter() - started
+    summary = summarize(result)
+    logger.info(f"🧮 CBAM 배치 계산 완료: {summary['lines']}건, {elapsed * 1000:.1f}ms")
+    response = {
+        "status": "success",
+        "factor_table_version": get_factor_table().version,
+        "summary": summary,
+        "elapsed_ms": round(elapsed * 1000, 3),
+    }
+    if accepts_packed(request.headers.get("accept")):
+        if body.include_lines:
+            response["lines"] = result
+        with start_span("serialize cbam result", format="packed"):
+            content = packb(response)
+        return Response(content=content, media_type=PACKED_MEDIA_TYPE, headers={"Vary": "Accept"})
+    if body.include_lines:
+        with start_span("serialize cbam result", format="json"):
+            response["lines"] = result_to_columns(result)
+    return response
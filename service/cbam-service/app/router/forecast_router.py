@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+from app.common.tracing import start_span
+from app.service.calculation_engine import CalculationParams, LINE_COLUMNS
+from app.service.forecast import Portfolio, ForecastParams, run_forecast, DEFAULT_PERCENTILES
+from app.service.incremental import get_quarter
+
+logger = logging.getLogger("cbam_service")
+
+forecast_router = APIRouter(prefix="/api/v1/cbam", tags=["CBAM Forecast"])
+
+
+class ForecastRequest(BaseModel):
+    """인증서 비용 예측 요청 - 포트폴리오는 저장된 분기 결과(company_id + quarter) 또는 열 단위 라인"""
+    company_id: Optional[str] = None
+    quarter: Optional[str] = None
+    cn_code: Optional[List[int]] = None
+    quantity_t: Optional[List[float]] = None
+    direct_see: Optional[List[Optional[float]]] = None
+    indirect_see: Optional[List[Optional[float]]] = None
+    carbon_price_paid_eur: Optional[List[Optional[float]]] = None
+    # 입력 라인이 덮는 기간을 1년으로 환산하는 배수 (분기 결과 기본 4)
+    annualize: Optional[float] = Field(None, gt=0)
+    default_markup: float = Field(0.0, ge=0)
+
+    start_year: int = Field(2026, ge=2023, le=2100)
+    horizon_years: int = Field(8, ge=1, le=50)
+    scenarios: int = Field(10_000, ge=1, le=1_000_000)
+    seed: int = Field(0, ge=0)
+    ets_price_eur: float = Field(80.0, gt=0)
+    price_drift: float = 0.03
+    price_volatility: float = Field(0.25, ge=0, le=2)
+    intensity_sigma: float = Field(0.10, ge=0, le=2)
+    intensity_trend: float = Field(-0.02, gt=-1, lt=1)
+    volume_growth: float = Field(0.0, gt=-1, lt=1)
+    volume_sigma: float = Field(0.05, ge=0, le=2)
+    phase_out: Optional[Dict[int, float]] = None
+    percentiles: List[float] = Field(default_factory=lambda: list(DEFAULT_PERCENTILES))
+
+
+def _portfolio(body: ForecastRequest) -> Portfolio:
+    params = CalculationParams(year=body.start_year, ets_price_eur=body.ets_price_eur, default_markup=body.default_markup)
+    if body.company_id and body.quarter:
+        results = get_quarter(body.company_id, body.quarter)
+        if results is None:
+            raise LookupError("분기 결과를 찾을 수 없습니다")
+        return Portfolio.from_lines(results.effective_lines(), params, annualize=body.annualize or 4.0)
+    if body.cn_code is None or body.quantity_t is None:
+        raise ValueError("company_id + quarter 또는 cn_code + quantity_t 가 필요합니다")
+    lines = body.model_dump(include=set(LINE_COLUMNS))
+    return Portfolio.from_lines(lines, params, annualize=body.annualize or 1.0)
+
+
+def _run(body: ForecastRequest):
+    portfolio = _portfolio(body)
+    params = ForecastParams(**body.model_dump(include=set(ForecastParams.__dataclass_fields__)))
+    result = run_forecast(portfolio, params)
+    result["portfolio"] = {
+        "in_scope_t": portfolio.in_scope_t.tolist(),
+        "benchmark_t": portfolio.benchmark_t.tolist(),
+    }
+    return result
+
+
+@forecast_router.post("/forecast", summary="EU ETS 가격/무상할당 폐지/배출 집약도 불확실성 몬테카를로 비용 예측")
+async def forecast_costs(body: ForecastRequest):
+    """시나리오 × 연도 행렬을 블록 단위로 벡터 계산 (스레드에서 실행) → 연도별 백분위 밴드"""
+    if any(not 0 <= p <= 100 for p in body.percentiles):
+        raise HTTPException(status_code=422, detail="백분위는 0~100 사이여야 합니다")
+    try:
+        with start_span("cbam forecast", scenarios=body.scenarios, horizon=body.horizon_years):
+            return await asyncio.to_thread(_run, body)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
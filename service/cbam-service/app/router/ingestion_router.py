@@ -0,0 +1,86 @@
+import os
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import JSONResponse
+
+from app.service.calculation_engine import CalculationParams
+from app.service.ingestion import IngestionJob, register_job, get_job, new_upload_path
+
+logger = logging.getLogger("cbam_service")
+
+ingestion_router = APIRouter(prefix="/api/v1/cbam/ingest", tags=["CBAM Ingestion"])
+
+MAX_UPLOAD_BYTES = int(os.getenv("CBAM_MAX_UPLOAD_MB", "2048")) * 2**20
+# 동시에 파싱하는 작업 수 상한 (청크 메모리 × 동시 작업 수 = 최대 메모리)
+_ingest_slots = asyncio.Semaphore(int(os.getenv("CBAM_INGEST_CONCURRENCY", "2")))
+_running_tasks = set()
+
+
+async def _run_job(job: IngestionJob):
+    async with _ingest_slots:
+        await asyncio.to_thread(job.run)
+
+
+def _detect_format(request: Request, file_format: Optional[str], file_name: str) -> str:
+    if file_format:
+        return file_format
+    content_type = request.headers.get("content-type", "")
+    if file_name.lower().endswith((".xlsx", ".xlsm")) or "spreadsheetml" in content_type:
+        return "xlsx"
+    return "csv"
+
+
+@ingestion_router.post("", status_code=202, summary="세관 신고 파일 업로드 (CSV/XLSX 원본 바디 스트리밍)")
+async def upload_declarations(
+    request: Request,
+    file_format: Optional[str] = Query(None, alias="format", pattern="^(csv|xlsx)$"),
+    year: int = 2026,
+    ets_price_eur: float = Query(80.0, gt=0),
+    default_markup: float = Query(0.0, ge=0),
+):
+    """요청 바디를 메모리에 올리지 않고 디스크로 흘려 쓴 뒤 백그라운드 청크 처리 작업 등록"""
+    file_name = request.headers.get("x-file-name", "")
+    file_format = _detect_format(request, file_format, file_name)
+    path = new_upload_path(file_format)
+    written = 0
+    try:
+        with open(path, "wb") as f:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if written > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="업로드 파일이 너무 큽니다")
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    if written == 0:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail="빈 파일입니다")
+
+    params = CalculationParams(year=year, ets_price_eur=ets_price_eur, default_markup=default_markup)
+    job = register_job(IngestionJob(path, file_format, params, original_name=file_name))
+    task = asyncio.create_task(_run_job(job))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+    logger.info(f"📤 CBAM 신고 파일 업로드: {file_name or '(이름 없음)'} {written / 2**20:.1f}MB → 작업 {job.job_id}")
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+
+@ingestion_router.get("/{job_id}", summary="적재 작업 상태 (처리 행 수, 행/초, 최대 RSS)")
+async def ingestion_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+    return job.to_dict()
+
+
+@ingestion_router.delete("/{job_id}", summary="적재 작업 취소")
+async def cancel_ingestion(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+    job.cancelled.set()
+    return job.to_dict()
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from app.common.event_bus import publish_event
+from app.common.result_store import parse_filter
+from app.common.tracing import start_span
+from app.service.calculation_engine import (
+    CalculationParams, LINE_COLUMNS, as_columns, invalid_line_mask, reload_factor_table,
+)
+from app.service.incremental import QuarterResults, VersionPruned, get_quarter, all_quarters
+
+logger = logging.getLogger("cbam_service")
+
+results_router = APIRouter(prefix="/api/v1/cbam/results", tags=["CBAM Results"])
+
+
+class LineUpsertRequest(BaseModel):
+    """신고 라인 추가/수정 (열 단위, line_id로 식별) + 삭제할 line_id"""
+    line_id: List[str] = []
+    cn_code: List[int] = []
+    quantity_t: List[float] = []
+    installation_id: Optional[List[Optional[str]]] = None
+    country_of_origin: Optional[List[Optional[str]]] = None
+    direct_see: Optional[List[Optional[float]]] = None
+    indirect_see: Optional[List[Optional[float]]] = None
+    carbon_price_paid_eur: Optional[List[Optional[float]]] = None
+    # 수입 월 (YYYY-MM 또는 날짜) - 대시보드 월별 롤업 차원
+    import_month: Optional[List[Optional[str]]] = None
+    deleted: List[str] = []
+    # 분기 결과를 처음 만들 때만 적용되는 계산 파라미터
+    year: int = 2026
+    ets_price_eur: float = Field(80.0, gt=0)
+    default_markup: float = Field(0.0, ge=0)
+
+
+class SupplierDataRequest(BaseModel):
+    """공급자(설비) 실측 배출 데이터셋"""
+    version: str
+    installation_id: List[str]
+    direct_see: List[Optional[float]]
+    indirect_see: List[Optional[float]]
+
+
+async def _get_or_404(company_id: str, quarter: str) -> QuarterResults:
+    # 처음 조회는 저장소에서 분기 파티션을 읽으므로 (레지스트리 잠금 포함) 스레드에서
+    results = await asyncio.to_thread(get_quarter, company_id, quarter)
+    if results is None:
+        raise HTTPException(status_code=404, detail="분기 결과를 찾을 수 없습니다")
+    return results
+
+
+def _persist(results: QuarterResults, report: dict) -> dict:
+    """새 버전이 생겼으면 결과 저장소에 기록 (보고서/대시보드가 재계산 없이 로드)"""
+    if report["new_version"]:
+        results.persist()
+    return report
+
+
+async def _announce(report: dict, reason: str):
+    """새 결과 버전이 저장소에 기록됐으면 calculation.completed 발행 (보고서 재생성 등은 구독 서비스가 비동기 처리)
+
+    분기별 outbox 키로 발행 - Redis 장애로 발행하지 못한 버전은 다음 쓰기나 서비스 시작 때 최신 버전으로 다시 알림
+    """
+    if report["new_version"]:
+        await publish_event("calculation.completed", {
+            "company_id": report["company_id"],
+            "quarter": report["quarter"],
+            "version": report["version"],
+            "reason": reason,
+            "totals": report["totals"],
+        }, outbox_key=f"{report['company_id']}/{report['quarter']}")
+
+
+def _upsert(results: QuarterResults, body: LineUpsertRequest):
+    columns = as_columns(body.model_dump(include=set(LINE_COLUMNS)), LINE_COLUMNS, required=("cn_code", "quantity_t"))
+    if len(body.line_id) != len(columns["cn_code"]):
+        raise ValueError("line_id와 cn_code 길이가 일치하지 않습니다")
+    invalid = invalid_line_mask(columns)
+    if invalid.any():
+        raise ValueError(f"잘못된 라인이 있습니다: {[body.line_id[i] for i in invalid.nonzero()[0][:10]]}")
+    frame = pd.DataFrame(columns, index=pd.Index(body.line_id, name="line_id"))
+    if body.import_month is not None:
+        if len(body.import_month) != len(frame):
+            raise ValueError("import_month 길이가 일치하지 않습니다")
+        frame["import_month"] = body.import_month
+    with results.lock:
+        report = results.upsert_lines(frame, deleted=body.deleted)
+        return _persist(results, report)
+
+
+def _apply_supplier(results: QuarterResults, body: SupplierDataRequest):
+    frame = pd.DataFrame(body.model_dump(include={"installation_id", "direct_see", "indirect_see"}))
+    frame[["direct_see", "indirect_see"]] = frame[["direct_see", "indirect_see"]].astype(float)
+    with results.lock:
+        return _persist(results, results.apply_supplier_data(frame, body.version))
+
+
+def _refresh(results: QuarterResults):
+    with results.lock:
+        return _persist(results, results.refresh_factors())
+
+
+def _diff(results: QuarterResults, from_version: int, to_version: int, limit: int):
+    with results.lock:
+        return results.diff(from_version, to_version, limit)
+
+
+@results_router.post("/{company_id}/{quarter}/lines", summary="신고 라인 변경 반영 (바뀐 라인만 재계산)")
+async def upsert_lines(company_id: str, quarter: str, body: LineUpsertRequest):
+    params = CalculationParams(year=body.year, ets_price_eur=body.ets_price_eur, default_markup=body.default_markup)
+    results = await asyncio.to_thread(get_quarter, company_id, quarter, create=True, params=params)
+    try:
+        with start_span("cbam incremental upsert", lines=len(body.line_id), deleted=len(body.deleted)):
+            report = await asyncio.to_thread(_upsert, results, body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    await _announce(report, "lines")
+    logger.info(
+        f"♻️ CBAM 증분 재계산 {company_id}/{quarter}: 추가 {report['added']}, 변경 {report['changed']}, "
+        f"유지 {report['unchanged']}, 삭제 {report['deleted']} ({report['elapsed_ms']}ms)"
+    )
+    return report
+
+
+@results_router.post("/{company_id}/{quarter}/supplier-data", summary="공급자 실측 데이터 반영 (해당 설비 라인만 재계산)")
+async def apply_supplier_data(company_id: str, quarter: str, body: SupplierDataRequest):
+    results = await _get_or_404(company_id, quarter)
+    if not (len(body.installation_id) == len(body.direct_see) == len(body.indirect_see)):
+        raise HTTPException(status_code=422, detail="열 길이가 일치하지 않습니다")
+    report = await asyncio.to_thread(_apply_supplier, results, body)
+    await _announce(report, "supplier_data")
+    logger.info(f"🏭 CBAM 공급자 데이터 {body.version} 반영 {company_id}/{quarter}: {report['changed']}건 재계산")
+    return report
+
+
+@results_router.post("/refresh-factors", summary="기본값 테이블 다시 로드 후 모든 분기의 영향받는 라인만 재계산")
+async def refresh_factors():
+    factors = await asyncio.to_thread(reload_factor_table)
+    reports = []
+    for results in all_quarters():
+        report = await asyncio.to_thread(_refresh, results)
+        await _announce(report, "factors")
+        reports.append(report)
+    await publish_event("factors.updated", {
+        "factor_table_version": factors.version,
+        "quarters_changed": sum(r["new_version"] for r in reports),
+    })
+    logger.info(f"🔄 CBAM 기본값 테이블 갱신: {factors.version}, 분기 {len(reports)}개")
+    return {"factor_table_version": factors.version, "quarters": reports}
+
+
+@results_router.get("/{company_id}/{quarter}", summary="분기 결과 합계 (현재 버전)")
+async def quarter_summary(company_id: str, quarter: str):
+    results = await _get_or_404(company_id, quarter)
+    return {
+        "company_id": company_id,
+        "quarter": quarter,
+        "version": results.current_version,
+        "lines": int(len(results.lines)),
+        "totals": results.totals,
+    }
+
+
+@results_router.get("/{company_id}/{quarter}/versions", summary="결과 버전 목록")
+async def list_versions(company_id: str, quarter: str):
+    results = await _get_or_404(company_id, quarter)
+    return {"base_version": results.base_version, "versions": [v.to_dict() for v in results.versions]}
+
+
+@results_router.get("/{company_id}/{quarter}/diff", summary="두 결과 버전 사이 변경 라인과 합계 차이")
+async def diff_versions(
+    company_id: str,
+    quarter: str,
+    from_version: int = Query(..., alias="from", ge=0),
+    to_version: Optional[int] = Query(None, alias="to", ge=0),
+    limit: int = Query(1000, ge=0, le=100_000),
+):
+    results = await _get_or_404(company_id, quarter)
+    to_version = results.current_version if to_version is None else to_version
+    try:
+        return await asyncio.to_thread(_diff, results, from_version, to_version, limit)
+    except VersionPruned as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@results_router.get("/{company_id}/{quarter}/rollup", summary="대시보드 집계 조회 (사전 집계 롤업에서 응답)")
+async def query_rollup(
+    company_id: str,
+    quarter: str,
+    group_by: str = Query("cn_code", description="쉼표로 구분한 차원: cn_code, country, installation, month (빈 값 = 전체 합계)"),
+    where: List[str] = Query([], description="dimension:op:value (op: eq, ne, lt, le, gt, ge, in)"),
+    measures: Optional[str] = Query(None, description="쉼표로 구분한 측정값 (없으면 전체)"),
+    sort: Optional[str] = Query(None, description="내림차순 정렬 기준 측정값"),
+    top: Optional[int] = Query(None, ge=1, le=100_000),
+):
+    """라인을 다시 묶지 않고 롤업 셀/주변 집계만 사용 - 비용은 그룹 수에 비례"""
+    results = await _get_or_404(company_id, quarter)
+    try:
+        filters = [parse_filter(w) for w in where]
+        dims = [d.strip() for d in group_by.split(",") if d.strip()]
+        selected = [m.strip() for m in measures.split(",") if m.strip()] if measures else None
+        response = results.rollup.query(dims, filters, selected, sort, top)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    response["version"] = results.current_version
+    return response
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from app.service.calculation_engine import CalculationParams, LINE_COLUMNS, as_columns, invalid_line_mask
+from app.service.parallel_run import ShardedRun, register_run, get_run, DEFAULT_SHARDS
+
+logger = logging.getLogger("cbam_service")
+
+run_router = APIRouter(prefix="/api/v1/cbam/runs", tags=["CBAM Runs"])
+
+_running_tasks = set()
+
+
+class QuarterlyRunRequest(BaseModel):
+    """분기 전체 실행 입력 (열 단위) + 샤드 설정"""
+    cn_code: List[int]
+    quantity_t: List[float]
+    installation_id: Optional[List[Optional[str]]] = None
+    country_of_origin: Optional[List[Optional[str]]] = None
+    direct_see: Optional[List[Optional[float]]] = None
+    indirect_see: Optional[List[Optional[float]]] = None
+    carbon_price_paid_eur: Optional[List[Optional[float]]] = None
+    year: int = 2026
+    ets_price_eur: float = Field(80.0, gt=0)
+    default_markup: float = Field(0.0, ge=0)
+    shard_by: str = Field("installation", pattern="^(installation|cn_group)$")
+    shards: int = Field(DEFAULT_SHARDS, ge=1, le=1024)
+    label: str = ""
+
+
+def _create_run(body: QuarterlyRunRequest) -> ShardedRun:
+    lines = as_columns(body.model_dump(include=set(LINE_COLUMNS)), LINE_COLUMNS, required=("cn_code", "quantity_t"))
+    invalid = invalid_line_mask(lines)
+    if invalid.any():
+        raise ValueError(f"잘못된 라인 {int(invalid.sum())}건 (첫 행: {int(invalid.argmax())})")
+    params = CalculationParams(year=body.year, ets_price_eur=body.ets_price_eur, default_markup=body.default_markup)
+    return ShardedRun(lines, params, shard_by=body.shard_by, n_shards=body.shards, label=body.label)
+
+
+@run_router.post("", status_code=202, summary="분기 전체 실행 (샤드 단위 프로세스 풀 병렬 계산)")
+async def start_run(body: QuarterlyRunRequest):
+    """입력 검증 후 실행을 등록하고 바로 반환 - 계산은 워커 프로세스에서 진행되어 API 루프를 막지 않음"""
+    try:
+        run = await asyncio.to_thread(_create_run, body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    register_run(run)
+    task = asyncio.create_task(asyncio.to_thread(run.run))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+    logger.info(f"🏭 CBAM 분기 실행 등록 {run.run_id}: {run.n_lines}행, {body.shard_by} 기준 샤드 {body.shards}개")
+    return JSONResponse(status_code=202, content=run.to_dict())
+
+
+@run_router.get("/{run_id}", summary="분기 실행 상태 (샤드별 진행률, 병합된 부분 합계)")
+async def run_status(run_id: str, breakdown: bool = Query(False, description="설비/CN 그룹별 합계 포함")):
+    run = get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="실행을 찾을 수 없습니다")
+    return run.to_dict(include_breakdown=breakdown)
+
+
+@run_router.delete("/{run_id}", summary="분기 실행 취소 (대기 샤드 취소, 실행 중 샤드는 다음 청크에서 중단)")
+async def cancel_run(run_id: str):
+    run = get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="실행을 찾을 수 없습니다")
+    run.cancel()
+    return run.to_dict()
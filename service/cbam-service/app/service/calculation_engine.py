@@ -0,0 +1,263 @@
+# CBAM 내재 배출량 계산 엔진 - 행 단위 루프 없이 NumPy 열 연산으로 일괄 계산
+import os
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Mapping, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.service.cn_index import CNFactorIndex, build_index_file
+
+logger = logging.getLogger("cbam_service")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+DEFAULT_FACTOR_TABLE = os.path.join(DATA_DIR, "default_values_sample.csv")
+
+# 무상할당 단계적 폐지에 따른 CBAM 계수 (연도별 벤치마크 적용 비율)
+CBAM_FACTOR_BY_YEAR = {
+    2026: 0.975,
+    2027: 0.950,
+    2028: 0.900,
+    2029: 0.775,
+    2030: 0.515,
+    2031: 0.390,
+    2032: 0.265,
+    2033: 0.140,
+}
+
+# 입력 열 정의 (이름 → dtype). NaN은 "실제 값 없음"을 의미
+LINE_COLUMNS = {
+    "cn_code": np.int64,
+    "installation_id": object,
+    "country_of_origin": object,
+    "quantity_t": np.float64,
+    "direct_see": np.float64,
+    "indirect_see": np.float64,
+    "carbon_price_paid_eur": np.float64,
+}
+REQUIRED_COLUMNS = ("cn_code", "quantity_t")
+
+# 전구물질 테이블 (라인 인덱스별 가변 개수)
+PRECURSOR_COLUMNS = {
+    "line_index": np.int64,
+    "cn_code": np.int64,
+    "mass_per_t": np.float64,
+    "see": np.float64,
+}
+
+
+def cbam_factor(year: int) -> float:
+    """연도별 CBAM 계수 - 2026년 이전은 무상할당 100%, 2034년부터 0%"""
+    if year < 2026:
+        return 1.0
+    return CBAM_FACTOR_BY_YEAR.get(year, 0.0)
+
+
+@dataclass
+class CalculationParams:
+    """계산 파라미터"""
+    year: int = 2026
+    ets_price_eur: float = 80.0
+    # 기본값 사용 시 가산율 (예: 0.1 = 10%)
+    default_markup: float = 0.0
+
+
+_factor_table: Optional[CNFactorIndex] = None
+
+
+def get_factor_table() -> CNFactorIndex:
+    """기본값 인덱스 싱글톤 - 빌드된 바이너리 인덱스를 mmap (없으면 CSV에서 한 번 빌드)
+
+    CBAM_FACTOR_TABLE: 원본 CSV 경로, CBAM_FACTOR_INDEX: 바이너리 인덱스 경로 (기본: CSV 옆 .cnx)
+    """
+    global _factor_table
+    if _factor_table is None:
+        csv_path = os.getenv("CBAM_FACTOR_TABLE", DEFAULT_FACTOR_TABLE)
+        index_path = os.getenv("CBAM_FACTOR_INDEX", os.path.splitext(csv_path)[0] + ".cnx")
+        stale = os.path.exists(index_path) and os.path.exists(csv_path) and \
+            os.path.getmtime(csv_path) > os.path.getmtime(index_path)
+        if not os.path.exists(index_path) or stale:
+            logger.warning(f"⚠️ CN 인덱스 파일 없음/오래됨 - CSV에서 빌드: {csv_path}")
+            build_index_file(csv_path, index_path)
+        _factor_table = CNFactorIndex.open(index_path)
+        logger.info(f"📚 CBAM 기본값 인덱스 로드: {index_path} ({len(_factor_table)}행, {_factor_table.version})")
+    return _factor_table
+
+
+def as_columns(data, columns: Mapping[str, Any], required=()) -> Dict[str, np.ndarray]:
+    """DataFrame 또는 {열 이름: 배열} 입력을 정해진 dtype의 NumPy 열로 변환"""
+    if isinstance(data, pd.DataFrame):
+        data = {name: data[name] for name in data.columns}
+    missing = [name for name in required if name not in data]
+    if missing:
+        raise ValueError(f"필수 열이 없습니다: {missing}")
+    n = len(data[required[0]]) if required else len(next(iter(data.values()), []))
+    out = {}
+    for name, dtype in columns.items():
+        if name in data and data[name] is not None:
+            values = data[name]
+            if dtype is np.float64 and isinstance(values, np.ndarray) and values.dtype.kind in "fiu":
+                arr = values.astype(np.float64, copy=False)
+            elif dtype is np.float64:
+                # None → NaN (실제 값 없음)
+                arr = pd.to_numeric(pd.Series(values, copy=False), errors="coerce").to_numpy(np.float64)
+            else:
+                arr = np.asarray(values, dtype=dtype)
+            if len(arr) != n:
+                raise ValueError(f"열 길이가 일치하지 않습니다: {name} ({len(arr)} != {n})")
+            out[name] = arr
+        elif dtype is np.float64:
+            out[name] = np.full(n, np.nan)
+        elif dtype is object:
+            out[name] = np.full(n, None, dtype=object)
+        else:
+            out[name] = np.zeros(n, dtype=dtype)
+    return out
+
+
+def reload_factor_table() -> CNFactorIndex:
+    """기본값 인덱스 파일이 교체된 뒤 다시 매핑 (새 버전 공표 시)"""
+    global _factor_table
+    _factor_table = None
+    return get_factor_table()
+
+
+def invalid_line_mask(lines: Dict[str, np.ndarray]) -> np.ndarray:
+    """벡터화된 입력 검증 - 잘못된 행이면 True"""
+    cn = lines["cn_code"]
+    qty = lines["quantity_t"]
+    invalid = (cn < 10_000_000) | (cn > 99_999_999) | ~np.isfinite(qty) | (qty < 0)
+    for name in ("direct_see", "indirect_see", "carbon_price_paid_eur"):
+        invalid |= lines[name] < 0
+    return invalid
+
+
+def validate_lines(lines: Dict[str, np.ndarray]):
+    """잘못된 행이 있으면 개수와 앞쪽 인덱스를 담아 ValueError"""
+    invalid = invalid_line_mask(lines)
+    if invalid.any():
+        bad = np.flatnonzero(invalid)
+        raise ValueError(f"잘못된 신고 라인 {len(bad)}건 (예: 인덱스 {bad[:10].tolist()})")
+
+
+def _precursor_emissions(precursors, n_lines: int, factors: CNFactorIndex,
+                         markup: float) -> Tuple[np.ndarray, np.ndarray]:
+    """전구물질 내재 배출량(t당)과 기본값이 없는 전구물질이 있는 라인 마스크 - 라인별 가변 개수를 bincount로 합산
+
+    실제 값도 기본값도 없는 전구물질은 0으로 합산하지 않고 해당 라인을 factor_missing으로 표시한다.
+    """
+    if precursors is None:
+        return np.zeros(n_lines), np.zeros(n_lines, dtype=bool)
+    cols = as_columns(precursors, PRECURSOR_COLUMNS, required=("line_index", "cn_code", "mass_per_t"))
+    if len(cols["line_index"]) == 0:
+        return np.zeros(n_lines), np.zeros(n_lines, dtype=bool)
+    line_index = cols["line_index"]
+    if (line_index < 0).any() or (line_index >= n_lines).any():
+        raise ValueError("전구물질 line_index가 신고 라인 범위를 벗어났습니다")
+    see = cols["see"]
+    missing = np.isnan(see)
+    if missing.any():
+        idx, found = factors.lookup(cols["cn_code"][missing])
+        fallback = np.where(found, factors.direct_default[idx] + factors.indirect_default[idx], np.nan)
+        see = see.copy()
+        see[missing] = fallback * (1.0 + markup)
+    unresolved = np.isnan(see)
+    line_missing = np.bincount(line_index[unresolved], minlength=n_lines) > 0
+    emissions = np.bincount(line_index, weights=cols["mass_per_t"] * np.nan_to_num(see), minlength=n_lines)
+    return emissions, line_missing
+
+
+def calculate_embedded_emissions(lines, factors: Optional[CNFactorIndex] = None,
+                                 params: Optional[CalculationParams] = None,
+                                 precursors=None) -> Dict[str, np.ndarray]:
+    """신고 라인 배치의 내재 배출량, 기본값 대체, CBAM 인증서 의무량을 열 단위로 계산
+
+    lines: DataFrame 또는 {열 이름: 배열} (LINE_COLUMNS 참고)
+    precursors: 선택 - line_index, cn_code, mass_per_t, see 열을 가진 전구물질 테이블
+    반환: 입력 열 + 계산 결과 열의 dict (모두 길이 n의 NumPy 배열)
+    """
+    factors = factors if factors is not None else get_factor_table()
+    params = params or CalculationParams()
+    cols = as_columns(lines, LINE_COLUMNS, required=REQUIRED_COLUMNS)
+    validate_lines(cols)
+    n = len(cols["cn_code"])
+
+    # 8자리 → 6자리 → 4자리 순으로 가장 구체적인 기본값 매칭
+    idx, factor_level = factors.resolve(cols["cn_code"])
+    found = factor_level > 0
+    markup = 1.0 + params.default_markup
+
+    # 실제 값이 없으면 기본값으로 대체 (기본값도 없으면 NaN 유지 → factor_missing)
+    direct_actual = cols["direct_see"]
+    indirect_actual = cols["indirect_see"]
+    direct_default = np.where(found, factors.direct_default[idx], np.nan) * markup
+    indirect_default = np.where(found, factors.indirect_default[idx], np.nan) * markup
+    direct_is_default = np.isnan(direct_actual)
+    indirect_is_default = np.isnan(indirect_actual)
+    direct_see = np.where(direct_is_default, direct_default, direct_actual)
+    indirect_see = np.where(indirect_is_default, indirect_default, indirect_actual)
+    quantity = cols["quantity_t"]
+    precursor_see, precursor_missing = _precursor_emissions(precursors, n, factors, params.default_markup)
+    factor_missing = np.isnan(direct_see) | np.isnan(indirect_see) | precursor_missing
+
+    embedded_direct = quantity * np.nan_to_num(direct_see)
+    embedded_indirect = quantity * np.nan_to_num(indirect_see)
+    embedded_precursor = quantity * precursor_see
+    embedded_total = embedded_direct + embedded_indirect + embedded_precursor
+
+    # 인증서 의무량: 대상 배출량 - 무상할당 조정분 - 원산지 기지불 탄소가격 환산분
+    indirect_in_scope = found & factors.indirect_in_scope[idx]
+    in_scope = embedded_direct + embedded_precursor + np.where(indirect_in_scope, embedded_indirect, 0.0)
+    benchmark = np.where(found, factors.benchmark[idx], 0.0)
+    benchmark_allocation = quantity * benchmark
+    free_allocation = benchmark_allocation * cbam_factor(params.year)
+    carbon_price_deduction = np.nan_to_num(cols["carbon_price_paid_eur"]) / params.ets_price_eur if params.ets_price_eur > 0 else 0.0
+    certificates = np.maximum(in_scope - free_allocation - carbon_price_deduction, 0.0)
+
+    return {
+        **cols,
+        "direct_see_used": direct_see,
+        "indirect_see_used": indirect_see,
+        "direct_is_default": direct_is_default,
+        "indirect_is_default": indirect_is_default,
+        "factor_level": factor_level,
+        "factor_missing": factor_missing,
+        "embedded_direct_t": embedded_direct,
+        "embedded_indirect_t": embedded_indirect,
+        "embedded_precursor_t": embedded_precursor,
+        "embedded_total_t": embedded_total,
+        "in_scope_t": in_scope,
+        "benchmark_allocation_t": benchmark_allocation,
+        "free_allocation_t": free_allocation,
+        "certificates": certificates,
+        "certificate_cost_eur": certificates * params.ets_price_eur,
+    }
+
+
+def summarize(result: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """계산 결과 합계"""
+    return {
+        "lines": int(len(result["cn_code"])),
+        "quantity_t": float(result["quantity_t"].sum()),
+        "embedded_direct_t": float(result["embedded_direct_t"].sum()),
+        "embedded_indirect_t": float(result["embedded_indirect_t"].sum()),
+        "embedded_precursor_t": float(result["embedded_precursor_t"].sum()),
+        "embedded_total_t": float(result["embedded_total_t"].sum()),
+        "free_allocation_t": float(result["free_allocation_t"].sum()),
+        "certificates": float(result["certificates"].sum()),
+        "certificate_cost_eur": float(result["certificate_cost_eur"].sum()),
+        "default_value_lines": int((result["direct_is_default"] | result["indirect_is_default"]).sum()),
+        "factor_missing_lines": int(result["factor_missing"].sum()),
+    }
+
+
+def result_to_columns(result: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """JSON 응답용 열 변환 (NaN → None)"""
+    out = {}
+    for name, arr in result.items():
+        if arr.dtype.kind == "f":
+            out[name] = np.where(np.isnan(arr), None, arr).tolist()
+        else:
+            out[name] = arr.tolist()
+    return out
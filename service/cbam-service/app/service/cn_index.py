@@ -0,0 +1,188 @@
+# CN 코드 배출계수 인덱스 - 8/6/4자리 계층 접두어 조회 + 메모리 매핑 바이너리 파일
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("cbam_service")
+
+MAGIC = b"CBAMCNX\x01"
+ALIGNMENT = 64
+# 가장 구체적인 단계부터 조회 (자릿수 → 8자리 코드를 해당 단계 키로 바꾸는 나눗수)
+LEVELS = ((8, 1), (6, 100), (4, 10_000))
+FACTOR_COLUMNS = {
+    "direct_default": np.float64,
+    "indirect_default": np.float64,
+    "benchmark": np.float64,
+    "indirect_in_scope": np.bool_,
+}
+
+
+class CNFactorIndex:
+    """CN 코드 배출계수 인덱스
+
+    자릿수 단계별로 정렬된 uint32 코드 구간을 하나의 배열에 이어 붙이고, 계수 열은
+    같은 순서의 행 배열로 둔다. 조회는 단계마다 searchsorted 한 번으로 열 전체를
+    처리하며, 8자리에서 못 찾은 코드만 6자리, 다시 4자리로 내려간다.
+    open()으로 연 인덱스는 파일을 mmap한 읽기 전용 뷰라 워커 간에 페이지 캐시를 공유한다.
+    """
+
+    def __init__(self, codes: np.ndarray, level_bounds: Dict[int, Tuple[int, int]],
+                 columns: Dict[str, np.ndarray], version: str, _mmap: Optional[mmap.mmap] = None):
+        self.codes = codes
+        self.level_bounds = level_bounds
+        self.direct_default = columns["direct_default"]
+        self.indirect_default = columns["indirect_default"]
+        self.benchmark = columns["benchmark"]
+        self.indirect_in_scope = columns["indirect_in_scope"]
+        self.version = version
+        self._mmap = _mmap
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, name: str = "sample") -> "CNFactorIndex":
+        """cn_code 열(4/6/8자리 문자열)과 계수 열을 가진 DataFrame으로 인덱스 구성"""
+        codes_str = df["cn_code"].astype(str).str.strip().str.replace(" ", "", regex=False)
+        digits = codes_str.str.len().to_numpy()
+        bad = ~np.isin(digits, [d for d, _ in LEVELS]) | ~codes_str.str.isdigit().to_numpy()
+        if bad.any():
+            raise ValueError(f"CN 코드는 4/6/8자리 숫자여야 합니다: {codes_str[bad].tolist()[:10]}")
+        codes = codes_str.astype(np.int64).to_numpy()
+
+        # 단계 순서(8→6→4)로, 단계 안에서는 코드 오름차순으로 정렬
+        level_rank = np.select([digits == d for d, _ in LEVELS], list(range(len(LEVELS))))
+        order = np.lexsort((codes, level_rank))
+        codes, level_rank = codes[order], level_rank[order]
+        for rank, (d, _) in enumerate(LEVELS):
+            level_codes = codes[level_rank == rank]
+            if len(np.unique(level_codes)) != len(level_codes):
+                raise ValueError(f"{d}자리 CN 코드가 중복되었습니다")
+
+        bounds = {}
+        for rank, (d, _) in enumerate(LEVELS):
+            start, end = np.searchsorted(level_rank, [rank, rank + 1])
+            bounds[d] = (int(start), int(end))
+        columns = {
+            name_: df[name_].to_numpy(dtype)[order] for name_, dtype in FACTOR_COLUMNS.items()
+        }
+        index = cls(codes.astype(np.uint32), bounds, columns, version="")
+        index.version = f"{name}:{index.content_hash()[:12]}"
+        return index
+
+    @classmethod
+    def from_csv(cls, path: str) -> "CNFactorIndex":
+        df = pd.read_csv(path, comment="#", dtype={"cn_code": str})
+        return cls.from_frame(df, name=os.path.splitext(os.path.basename(path))[0])
+
+    def content_hash(self) -> str:
+        h = hashlib.sha1(self.codes.tobytes())
+        for name in FACTOR_COLUMNS:
+            h.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+        return h.hexdigest()
+
+    def resolve(self, cn_codes) -> Tuple[np.ndarray, np.ndarray]:
+        """8자리 CN 코드 열 → (행 인덱스, 매칭 자릿수 8/6/4, 없으면 0)"""
+        query = np.asarray(cn_codes, dtype=np.int64)
+        idx = np.zeros(len(query), dtype=np.int64)
+        level = np.zeros(len(query), dtype=np.int8)
+        pending = np.arange(len(query))
+        for digits, divisor in LEVELS:
+            start, end = self.level_bounds[digits]
+            if start == end or len(pending) == 0:
+                continue
+            keys = (query[pending] // divisor).astype(np.uint32)
+            segment = self.codes[start:end]
+            pos = np.minimum(np.searchsorted(segment, keys), end - start - 1)
+            hit = segment[pos] == keys
+            hit_rows = pending[hit]
+            idx[hit_rows] = pos[hit] + start
+            level[hit_rows] = digits
+            pending = pending[~hit]
+        return idx, level
+
+    def lookup(self, cn_codes) -> Tuple[np.ndarray, np.ndarray]:
+        """가장 구체적인 매칭 → (행 인덱스, 매칭 여부)"""
+        idx, level = self.resolve(cn_codes)
+        return idx, level > 0
+
+    def row_fingerprints(self, cn_codes) -> np.ndarray:
+        """라인별로 적용되는 계수 행의 지문 (uint64) - 계수 값이 실제로 바뀐 라인만 골라내는 데 사용"""
+        idx, level = self.resolve(cn_codes)
+        found = level > 0
+        frame = pd.DataFrame({"level": level})
+        for name in FACTOR_COLUMNS:
+            frame[name] = np.where(found, getattr(self, name)[idx], 0)
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+    def save(self, path: str):
+        """헤더(JSON) + 64바이트 정렬된 원시 배열로 기록 (임시 파일 후 교체)"""
+        arrays = {"codes": self.codes}
+        arrays.update({name: np.ascontiguousarray(getattr(self, name)) for name in FACTOR_COLUMNS})
+        layout, offset = {}, 0
+        for name, arr in arrays.items():
+            layout[name] = {"offset": offset, "dtype": arr.dtype.str, "count": int(len(arr))}
+            offset += -(-arr.nbytes // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({
+            "version": self.version,
+            "level_bounds": {str(k): v for k, v in self.level_bounds.items()},
+            "arrays": layout,
+        }).encode()
+        prefix = len(MAGIC) + 4 + len(header)
+        data_start = -(-prefix // ALIGNMENT) * ALIGNMENT
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for name, arr in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(arr.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str) -> "CNFactorIndex":
+        """파일을 mmap해서 복사 없이 배열 뷰로 사용"""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:len(MAGIC)] != MAGIC:
+            mm.close()
+            raise ValueError(f"CN 인덱스 파일 형식이 아닙니다: {path}")
+        (header_len,) = struct.unpack_from("<I", mm, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(mm[header_start:header_start + header_len])
+        data_start = -(-(header_start + header_len) // ALIGNMENT) * ALIGNMENT
+        arrays = {
+            name: np.frombuffer(mm, dtype=np.dtype(spec["dtype"]), count=spec["count"],
+                                offset=data_start + spec["offset"])
+            for name, spec in header["arrays"].items()
+        }
+        bounds = {int(k): tuple(v) for k, v in header["level_bounds"].items()}
+        return cls(arrays.pop("codes"), bounds, arrays, header["version"], _mmap=mm)
+
+
+def build_index_file(csv_path: str, out_path: str) -> CNFactorIndex:
+    """CSV 기본값 테이블 → 바이너리 인덱스 파일"""
+    index = CNFactorIndex.from_csv(csv_path)
+    index.save(out_path)
+    logger.info(f"🗂️ CN 인덱스 빌드: {csv_path} → {out_path} ({len(index)}행, {index.version})")
+    return index
+
+
+if __name__ == "__main__":
+    # 사용법: python -m app.service.cn_index build <csv> <out.cnx>
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        print("사용법: python -m app.service.cn_index build <csv> <out.cnx>")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    build_index_file(sys.argv[2], sys.argv[3])
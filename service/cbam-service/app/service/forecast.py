@@ -0,0 +1,171 @@
+# CBAM 인증서 비용 몬테카를로 예측 - 시나리오 × 연도 행렬을 블록 단위로 한 번에 생성/계산
+import os
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+import pandas as pd
+
+from app.service.calculation_engine import CalculationParams, calculate_embedded_emissions, cbam_factor
+
+logger = logging.getLogger("cbam_service")
+
+# 블록 하나의 중간 텐서(시나리오 × 연도 × 품목군) 메모리 상한
+FORECAST_BLOCK_BYTES = int(os.getenv("CBAM_FORECAST_BLOCK_MB", "64")) * 2**20
+# 난수 스트림 단위 - 블록 크기와 무관하게 같은 seed면 같은 결과가 나오도록 고정 크기 구간마다 스트림 분리
+STREAM_SCENARIOS = 4096
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+@dataclass
+class Portfolio:
+    """연간 기준 품목군(CN 4자리 heading)별 합계"""
+    groups: List[str]
+    in_scope_t: np.ndarray          # 인증서 대상 배출량 (tCO2e/년)
+    benchmark_t: np.ndarray         # 벤치마크 × 수량 (CBAM 계수 적용 전 무상할당분)
+    carbon_price_paid_eur: np.ndarray  # 원산지 기지불 탄소가격 (EUR/년)
+
+    @classmethod
+    def from_lines(cls, lines, params: Optional[CalculationParams] = None, annualize: float = 1.0) -> "Portfolio":
+        result = calculate_embedded_emissions(lines, params=params)
+        frame = pd.DataFrame({
+            "group": (result["cn_code"] // 10_000).astype(str),
+            "in_scope_t": result["in_scope_t"],
+            "benchmark_t": result["benchmark_allocation_t"],
+            "carbon_price_paid_eur": np.nan_to_num(result["carbon_price_paid_eur"]),
+        }).groupby("group", sort=True).sum() * annualize
+        return cls(
+            groups=frame.index.tolist(),
+            in_scope_t=frame["in_scope_t"].to_numpy(),
+            benchmark_t=frame["benchmark_t"].to_numpy(),
+            carbon_price_paid_eur=frame["carbon_price_paid_eur"].to_numpy(),
+        )
+
+
+@dataclass
+class ForecastParams:
+    """시나리오 생성 파라미터 (연 단위)"""
+    start_year: int = 2026
+    horizon_years: int = 8
+    scenarios: int = 10_000
+    seed: int = 0
+    # EU ETS 가격 경로: 기하 브라운 운동
+    ets_price_eur: float = 80.0
+    price_drift: float = 0.03
+    price_volatility: float = 0.25
+    # 배출 집약도: 시나리오별 품목군 로그정규 승수 + 연간 추세
+    intensity_sigma: float = 0.10
+    intensity_trend: float = -0.02
+    # 수입 물량: 연간 성장률 + 연도별 로그정규 변동
+    volume_growth: float = 0.0
+    volume_sigma: float = 0.05
+    # 무상할당 폐지 일정 (연도 → CBAM 계수). 없으면 규정 일정 사용
+    phase_out: Optional[Dict[int, float]] = None
+    percentiles: List[float] = field(default_factory=lambda: list(DEFAULT_PERCENTILES))
+
+    @property
+    def years(self) -> np.ndarray:
+        return np.arange(self.start_year, self.start_year + self.horizon_years)
+
+    def cbam_factors(self) -> np.ndarray:
+        schedule = self.phase_out or {}
+        return np.array([schedule.get(int(y), cbam_factor(int(y))) for y in self.years], dtype=np.float64)
+
+
+def _block_size(n_years: int, n_groups: int) -> int:
+    """중간 텐서가 메모리 상한을 넘지 않는 블록 시나리오 수 (난수 스트림 단위의 배수)"""
+    per_scenario = 8 * n_years * max(n_groups, 1) * 3
+    rows = max(FORECAST_BLOCK_BYTES // per_scenario, 1)
+    return max(STREAM_SCENARIOS, rows // STREAM_SCENARIOS * STREAM_SCENARIOS)
+
+
+def _simulate_block(rngs: List[np.random.Generator], portfolio: Portfolio, fp: ForecastParams,
+                    factors: np.ndarray) -> Dict[str, np.ndarray]:
+    """시나리오 블록 하나 계산 → 연도별 가격/인증서/비용 (n × T)"""
+    T = fp.horizon_years
+    t = np.arange(1, T + 1, dtype=np.float64)
+    parts = []
+    for rng in rngs:
+        n = STREAM_SCENARIOS
+        price_shocks = rng.standard_normal((n, T))
+        intensity_shocks = rng.standard_normal((n, len(portfolio.groups)))
+        volume_shocks = rng.standard_normal((n, T))
+        parts.append((price_shocks, intensity_shocks, volume_shocks))
+    price_z = np.concatenate([p[0] for p in parts])
+    intensity_z = np.concatenate([p[1] for p in parts])
+    volume_z = np.concatenate([p[2] for p in parts])
+
+    sigma = fp.price_volatility
+    log_price = np.log(fp.ets_price_eur) + (fp.price_drift - 0.5 * sigma ** 2) * t + sigma * np.cumsum(price_z, axis=1)
+    price = np.exp(log_price)                                                         # (n, T)
+
+    intensity = np.exp(fp.intensity_sigma * intensity_z - 0.5 * fp.intensity_sigma ** 2)  # (n, G)
+    trend = (1.0 + fp.intensity_trend) ** (t - 1)                                     # (T,)
+    volume = (1.0 + fp.volume_growth) ** (t - 1) * np.exp(
+        fp.volume_sigma * volume_z - 0.5 * fp.volume_sigma ** 2)                       # (n, T)
+
+    # (n, T, G): 대상 배출량 - 무상할당 조정분 - 기지불 탄소가격 환산분, 품목군별 0 하한
+    emissions = intensity[:, None, :] * portfolio.in_scope_t[None, None, :] * trend[None, :, None]
+    allocation = portfolio.benchmark_t[None, None, :] * factors[None, :, None]
+    deduction = portfolio.carbon_price_paid_eur[None, None, :] / price[:, :, None]
+    certificates = (np.maximum(emissions - allocation - deduction, 0.0).sum(axis=2)) * volume
+    return {"price": price, "certificates": certificates, "cost": certificates * price}
+
+
+def run_forecast(portfolio: Portfolio, fp: ForecastParams) -> Dict[str, Any]:
+    """몬테카를로 예측 - 블록별로 생성/계산 후 연도별 백분위 밴드 산출 (정확한 백분위)
+
+    난수는 SeedSequence(seed)에서 STREAM_SCENARIOS개 단위로 분기한 독립 스트림을 쓰므로
+    같은 seed/파라미터면 블록 크기와 관계없이 결과가 같다. 보관하는 것은 측정값별 (n × T) float64 행렬뿐
+    (10만 × 8년이면 행렬당 약 6.4MB) - 누적 비용은 연간 비용 밴드를 구한 뒤 같은 버퍼에 누적.
+    """
+    started = time.perf_counter()
+    if fp.scenarios < 1 or fp.horizon_years < 1:
+        raise ValueError("scenarios와 horizon_years는 1 이상이어야 합니다")
+    T = fp.horizon_years
+    n_streams = -(-fp.scenarios // STREAM_SCENARIOS)
+    streams = [np.random.Generator(np.random.PCG64(s)) for s in np.random.SeedSequence(fp.seed).spawn(n_streams)]
+    block_streams = _block_size(T, len(portfolio.groups)) // STREAM_SCENARIOS
+    factors = fp.cbam_factors()
+
+    # 백분위 계산용 결과만 (n × T) 보관 - 중간 텐서는 블록마다 버림
+    price = np.empty((fp.scenarios, T))
+    certificates = np.empty((fp.scenarios, T))
+    cost = np.empty((fp.scenarios, T))
+    for start in range(0, n_streams, block_streams):
+        block = _simulate_block(streams[start:start + block_streams], portfolio, fp, factors)
+        # 마지막 스트림의 남는 시나리오는 버림
+        first = start * STREAM_SCENARIOS
+        rows = slice(first, min(first + len(block["price"]), fp.scenarios))
+        take = rows.stop - rows.start
+        price[rows], certificates[rows], cost[rows] = (
+            block["price"][:take], block["certificates"][:take], block["cost"][:take])
+
+    q = np.asarray(fp.percentiles, dtype=np.float64)
+
+    def bands(matrix: np.ndarray) -> Dict[str, List[float]]:
+        values = np.percentile(matrix, q, axis=0)
+        out = {f"p{p:g}": row.tolist() for p, row in zip(q, values)}
+        out["mean"] = matrix.mean(axis=0).tolist()
+        return out
+
+    price_bands, certificate_bands, annual = bands(price), bands(certificates), bands(cost)
+    cumulative = bands(np.cumsum(cost, axis=1, out=cost))
+    elapsed = time.perf_counter() - started
+    logger.info(f"🎲 CBAM 비용 예측: 시나리오 {fp.scenarios:,} × {T}년, 품목군 {len(portfolio.groups)}개, {elapsed * 1000:.0f}ms")
+    return {
+        "years": fp.years.tolist(),
+        "scenarios": fp.scenarios,
+        "seed": fp.seed,
+        "groups": portfolio.groups,
+        "cbam_factors": factors.tolist(),
+        "ets_price_eur": price_bands,
+        "certificates": certificate_bands,
+        "annual_cost_eur": annual,
+        "cumulative_cost_eur": cumulative,
+        # 총비용 = 누적 비용의 마지막 연도
+        "total_cost_eur": {name: values[-1] for name, values in cumulative.items()},
+        "elapsed_ms": round(elapsed * 1000, 3),
+    }
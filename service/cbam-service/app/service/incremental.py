@@ -0,0 +1,439 @@
+# CBAM 결과 증분 재계산 - 라인별 입력 지문을 저장하고 바뀐 라인만 다시 계산
+import os
+import time
+import logging
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.common.result_store import write_partition, read_partition
+from app.service.calculation_engine import (
+    CalculationParams, calculate_embedded_emissions, get_factor_table, LINE_COLUMNS, as_columns,
+)
+from app.service.rollups import Rollup, DIMENSIONS
+
+logger = logging.getLogger("cbam_service")
+
+# 엔진 입력 열 + 롤업용 수입 월 (YYYY-MM)
+INPUT_COLUMNS = list(LINE_COLUMNS) + ["import_month"]
+RESULT_COLUMNS = [
+    "direct_see_used", "indirect_see_used", "direct_is_default", "indirect_is_default",
+    "factor_level", "factor_missing", "embedded_direct_t", "embedded_indirect_t",
+    "embedded_precursor_t", "embedded_total_t", "free_allocation_t", "certificates", "certificate_cost_eur",
+]
+# 집계/버전 비교 대상 측정값
+MEASURES = [
+    "quantity_t", "embedded_direct_t", "embedded_indirect_t", "embedded_precursor_t",
+    "embedded_total_t", "free_allocation_t", "certificates", "certificate_cost_eur",
+]
+NO_SUPPLIER_VERSION = ""
+# 라인 상태 열 dtype (지문은 uint64 그대로 유지 - float로 바뀌면 정밀도 손실)
+STATE_DTYPES = {
+    **LINE_COLUMNS,
+    "import_month": object,
+    "line_hash": np.uint64,
+    "factor_fp": np.uint64,
+    "supplier_version": object,
+    "supplier_fp": np.uint64,
+    "direct_see_used": np.float64,
+    "indirect_see_used": np.float64,
+    "direct_is_default": np.bool_,
+    "indirect_is_default": np.bool_,
+    "factor_level": np.int8,
+    "factor_missing": np.bool_,
+    **{m: np.float64 for m in MEASURES if m not in LINE_COLUMNS},
+}
+RESULT_KIND = "cbam"
+# 델타 파트가 이만큼 쌓이거나 바뀐 라인이 전체의 절반을 넘으면 파티션 전체를 다시 써서 압축
+MAX_DELTA_PARTS = int(os.getenv("CBAM_RESULT_MAX_DELTA_PARTS", "8"))
+# 분기별로 메모리에 보관하는 최근 버전 델타 수 - 더 오래된 버전은 버리고 diff 가능 범위(base_version)를 올림
+MAX_VERSIONS = int(os.getenv("CBAM_MAX_VERSIONS", "50"))
+
+
+class VersionPruned(ValueError):
+    """요청한 버전의 델타가 이미 정리되어 diff할 수 없음"""
+
+
+def _empty_state(index: pd.Index) -> pd.DataFrame:
+    """새 라인 상태 행 - 결과 열은 NaN(미계산), 지문은 0"""
+    columns = {}
+    for name, dtype in STATE_DTYPES.items():
+        if dtype is object:
+            columns[name] = np.full(len(index), None if name != "supplier_version" else NO_SUPPLIER_VERSION, dtype=object)
+        elif dtype is np.float64:
+            columns[name] = np.full(len(index), np.nan)
+        else:
+            columns[name] = np.zeros(len(index), dtype=dtype)
+    return pd.DataFrame(columns, index=pd.Index(index, name="line_id"))
+
+
+def normalize_months(values, n: int) -> np.ndarray:
+    """수입 일자/월(YYYY-MM, YYYY-MM-DD) → 'YYYY-MM' 문자열 (없으면 None). 값이 있는데 날짜가 아니면 ValueError"""
+    if values is None:
+        return np.full(n, None, dtype=object)
+    series = pd.Series(values, copy=False).astype(object)
+    present = series.notna().to_numpy()
+    # YYYY-MM 또는 YYYY-MM-DD → 앞 7자리만 월로 해석
+    parsed = pd.to_datetime(series.astype(str).str.slice(0, 7), format="%Y-%m", errors="coerce")
+    bad = present & parsed.isna().to_numpy()
+    if bad.any():
+        raise ValueError(f"수입 월 형식이 잘못되었습니다: {series[bad].tolist()[:10]}")
+    months = parsed.dt.strftime("%Y-%m").to_numpy(dtype=object)
+    months[~present] = None
+    return months
+
+
+def hash_lines(frame: pd.DataFrame) -> np.ndarray:
+    """입력 열 값으로 라인 해시(uint64) 계산 - 행 루프 없이 pandas 해시 사용"""
+    return pd.util.hash_pandas_object(frame[INPUT_COLUMNS], index=False).to_numpy()
+
+
+class ResultVersion:
+    """결과 버전 하나 - 바뀐 라인의 이전/이후 측정값만 보관"""
+
+    def __init__(self, number: int, reason: str, factor_version: str, delta: pd.DataFrame, totals: Dict[str, float]):
+        self.number = number
+        self.reason = reason
+        self.factor_version = factor_version
+        self.delta = delta
+        self.totals = dict(totals)
+        self.created_at = datetime.now().isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.number,
+            "reason": self.reason,
+            "factor_version": self.factor_version,
+            "created_at": self.created_at,
+            "changed_lines": int(len(self.delta)),
+            "totals": self.totals,
+        }
+
+
+class QuarterResults:
+    """회사 × 보고 분기 하나의 라인별 결과 저장소
+
+    각 라인은 입력 해시, 적용된 계수 행 지문, 공급자 데이터 지문(버전 + 실측값)을 함께 가진다.
+    신고 변경, 기본값 테이블 교체, 공급자 실측 데이터 수신 시 지문이 달라진
+    라인만 다시 계산하고 합계는 (새 값 - 이전 값)만큼 갱신한다.
+    """
+
+    def __init__(self, company_id: str, quarter: str, params: Optional[CalculationParams] = None):
+        self.company_id = company_id
+        self.quarter = quarter
+        self.params = params or CalculationParams()
+        self.lines = _empty_state(pd.Index([], dtype=object))
+        # 공급자 실측값: installation_id → (direct_see, indirect_see, version)
+        self.supplier = pd.DataFrame(
+            {"direct_see": pd.Series(dtype=np.float64), "indirect_see": pd.Series(dtype=np.float64),
+             "version": pd.Series(dtype=object)}
+        )
+        self.totals: Dict[str, float] = {m: 0.0 for m in MEASURES}
+        self.versions: List[ResultVersion] = []
+        # diff 가능한 가장 오래된 버전 - 저장소에서 다시 불러온 시점 또는 MAX_VERSIONS를 넘어 정리된 마지막 버전
+        self.base_version = 0
+        # 대시보드 롤업 (라인 변경분만 반영)
+        self.rollup = Rollup()
+        self.lock = threading.Lock()
+        # 마지막 저장 이후 바뀐/삭제된 line_id와 저장소의 파트 수 (0 = 아직 저장 전)
+        self._dirty: set = set()
+        self._deleted: set = set()
+        self._stored_parts = 0
+
+    @property
+    def current_version(self) -> int:
+        return self.versions[-1].number if self.versions else self.base_version
+
+    # ---- 저장/복원 ----
+
+    def persist(self) -> str:
+        """라인 상태를 결과 저장소 파티션(cbam/회사/분기)으로 기록
+
+        직전 저장 이후 바뀐 라인만 델타 파트로 추가하고(삭제는 deleted_keys), 처음 저장이거나
+        델타 파트가 쌓였거나 바뀐 라인이 많으면 전체를 새 파트 하나로 다시 쓴다.
+        """
+        full = (self._stored_parts == 0 or self._stored_parts >= MAX_DELTA_PARTS
+                or len(self._dirty) + len(self._deleted) > len(self.lines) // 2)
+        lines = self.lines if full else self.lines.loc[self.lines.index.isin(self._dirty)]
+        columns = {"line_id": lines.index.to_numpy(dtype=object)}
+        columns.update({name: lines[name].to_numpy() for name in STATE_DTYPES})
+        supplier = self.supplier.rename_axis("installation_id").reset_index().astype(object)
+        metadata = {
+            "key": "line_id",
+            "deleted_keys": [] if full else sorted(self._deleted),
+            "version": self.current_version,
+            "factor_version": self.versions[-1].factor_version if self.versions else get_factor_table().version,
+            "params": asdict(self.params),
+            "totals": self.totals,
+            "supplier": supplier.where(supplier.notna(), None).to_dict(orient="list"),
+        }
+        path = write_partition(RESULT_KIND, self.company_id, self.quarter, columns, metadata,
+                               mode="overwrite" if full else "append")
+        self._stored_parts = 1 if full else self._stored_parts + 1
+        self._dirty.clear()
+        self._deleted.clear()
+        return path
+
+    @classmethod
+    def load(cls, company_id: str, quarter: str) -> Optional["QuarterResults"]:
+        """저장소 파티션에서 라인 상태 복원 (숫자 열은 mmap 뷰에서 한 번만 복사)"""
+        try:
+            data, stats = read_partition(RESULT_KIND, company_id, quarter)
+        except FileNotFoundError:
+            return None
+        meta = stats["metadata"]
+        results = cls(company_id, quarter, CalculationParams(**meta["params"]))
+        columns = {}
+        for name, dtype in STATE_DTYPES.items():
+            values = data.get(name)
+            if values is None:
+                columns[name] = _empty_state(pd.RangeIndex(stats["rows"]))[name].to_numpy()
+            elif dtype is object:
+                series = pd.Series(values).astype(object)
+                columns[name] = series.where(series.notna(), None).to_numpy()
+            else:
+                columns[name] = np.array(values, dtype=dtype)
+        results.lines = pd.DataFrame(columns, index=pd.Index(np.asarray(data["line_id"], dtype=object), name="line_id"))
+        supplier = pd.DataFrame(meta.get("supplier") or {"installation_id": [], "direct_see": [],
+                                                         "indirect_see": [], "version": []})
+        results.supplier = supplier.set_index("installation_id").astype(
+            {"direct_see": np.float64, "indirect_see": np.float64, "version": object})
+        results.supplier.index.name = None
+        results.totals = {m: float(meta["totals"].get(m, 0.0)) for m in MEASURES}
+        results.base_version = int(meta["version"])
+        results._stored_parts = stats["parts"]
+        results.rollup.rebuild(results.lines)
+        logger.info(f"📂 CBAM 분기 결과 복원 {company_id}/{quarter}: {len(results.lines)}행, "
+                    f"버전 {results.base_version} ({stats['elapsed_ms']}ms)")
+        return results
+
+    # ---- 재계산 ----
+
+    def _effective_inputs(self, frame: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+        """공급자 실측값 우선 적용 (공급자 > 신고값 > 기본값) 후 입력과 공급자 버전 반환"""
+        frame = frame[INPUT_COLUMNS].copy()
+        versions = np.full(len(frame), NO_SUPPLIER_VERSION, dtype=object)
+        if len(self.supplier) and len(frame):
+            pos = self.supplier.index.get_indexer(frame["installation_id"])
+            has = pos >= 0
+            if has.any():
+                sup = self.supplier.iloc[pos[has]]
+                for col in ("direct_see", "indirect_see"):
+                    values = frame[col].to_numpy(np.float64).copy()
+                    sup_values = sup[col].to_numpy(np.float64)
+                    take = ~np.isnan(sup_values)
+                    target = np.flatnonzero(has)[take]
+                    values[target] = sup_values[take]
+                    frame[col] = values
+                versions[has] = sup["version"].to_numpy()
+        return frame, versions
+
+    def effective_lines(self) -> pd.DataFrame:
+        """공급자 실측값을 적용한 현재 라인 입력 사본 (예측 등 읽기 전용 용도)"""
+        with self.lock:
+            lines, _ = self._effective_inputs(self.lines)
+        return lines
+
+    def _supplier_fingerprints(self, frame: pd.DataFrame) -> np.ndarray:
+        """라인별 적용 공급자 데이터 지문 (버전 + 실측값, 없으면 0) - 같은 버전으로 값만 고쳐 다시 보내도 감지"""
+        fps = np.zeros(len(frame), dtype=np.uint64)
+        if len(self.supplier) and len(frame):
+            pos = self.supplier.index.get_indexer(frame["installation_id"])
+            has = pos >= 0
+            if has.any():
+                per_installation = pd.util.hash_pandas_object(
+                    self.supplier[["direct_see", "indirect_see", "version"]], index=False,
+                ).to_numpy()
+                fps[has] = per_installation[pos[has]]
+        return fps
+
+    def _state(self, line_ids: pd.Index) -> pd.DataFrame:
+        """차원 + 측정값 스냅샷 (아직 계산되지 않은 라인은 제외)"""
+        state = self.lines.reindex(index=line_ids, columns=list(DIMENSIONS) + MEASURES)
+        return state[state["certificates"].notna()]
+
+    @staticmethod
+    def _measures(state: pd.DataFrame, line_ids: pd.Index) -> pd.DataFrame:
+        """스냅샷 → 라인별 측정값 (스냅샷에 없는 새 라인은 0)"""
+        return state[MEASURES].astype(np.float64).reindex(line_ids, fill_value=0.0)
+
+    def _recompute(self, line_ids: pd.Index, reason: str, removed: Optional[pd.DataFrame] = None) -> ResultVersion:
+        """removed: 입력을 덮어쓰기 전에 찍은 스냅샷 (없으면 지금 상태 - 입력 차원이 그대로인 재계산)"""
+        factors = get_factor_table()
+        if removed is None:
+            removed = self._state(line_ids)
+        subset = self.lines.loc[line_ids]
+
+        effective, supplier_versions = self._effective_inputs(subset)
+        result = calculate_embedded_emissions(
+            as_columns(effective, LINE_COLUMNS, required=("cn_code", "quantity_t")),
+            factors=factors, params=self.params,
+        )
+        for name in RESULT_COLUMNS:
+            self.lines.loc[line_ids, name] = result[name]
+        self.lines.loc[line_ids, "factor_fp"] = factors.row_fingerprints(subset["cn_code"].to_numpy(np.int64))
+        self.lines.loc[line_ids, "supplier_version"] = supplier_versions
+        self.lines.loc[line_ids, "supplier_fp"] = self._supplier_fingerprints(subset)
+
+        return self._commit_version(reason, factors.version, line_ids, removed, self._state(line_ids))
+
+    def _commit_version(self, reason: str, factor_version: str, line_ids: pd.Index,
+                        removed: pd.DataFrame, added: Optional[pd.DataFrame]) -> ResultVersion:
+        before = self._measures(removed, line_ids)
+        after = self._measures(added, line_ids) if added is not None else \
+            pd.DataFrame(0.0, index=line_ids, columns=MEASURES)
+        diff = (after - before).sum()
+        for m in MEASURES:
+            self.totals[m] += float(diff[m])
+        if added is None:
+            self._dirty.difference_update(line_ids)
+            self._deleted.update(line_ids)
+        else:
+            self._dirty.update(line_ids)
+            self._deleted.difference_update(line_ids)
+        self.rollup.apply(removed, added)
+        delta = pd.concat([before.add_suffix("_before"), after.add_suffix("_after")], axis=1)
+        version = ResultVersion(self.current_version + 1, reason, factor_version, delta, self.totals)
+        self.versions.append(version)
+        if len(self.versions) > MAX_VERSIONS:
+            self.base_version = self.versions[-MAX_VERSIONS - 1].number
+            del self.versions[:-MAX_VERSIONS]
+        return version
+
+    # ---- 변경 적용 ----
+
+    def upsert_lines(self, frame: pd.DataFrame, deleted: Optional[List[str]] = None) -> Dict[str, Any]:
+        """신고 라인 추가/수정/삭제 - 입력 해시가 같은 라인은 건너뜀"""
+        started = time.perf_counter()
+        months = normalize_months(frame["import_month"] if "import_month" in frame else None, len(frame))
+        frame = pd.DataFrame(as_columns(frame, LINE_COLUMNS, required=("cn_code", "quantity_t")),
+                             index=pd.Index(frame.index.astype(str), name="line_id"))
+        frame["import_month"] = months
+        if frame.index.has_duplicates:
+            raise ValueError("line_id가 중복되었습니다")
+        new_hash = hash_lines(frame)
+        known = frame.index.isin(self.lines.index)
+        old_hash = self.lines["line_hash"].reindex(frame.index[known]).to_numpy()
+        changed = ~known
+        changed[known] = old_hash != new_hash[known]
+        changed_ids = frame.index[changed]
+
+        removed = self._state(changed_ids)
+        added = frame.index[~known]
+        if len(added):
+            self.lines = pd.concat([self.lines, _empty_state(added)])
+        if len(changed_ids):
+            self.lines.loc[changed_ids, INPUT_COLUMNS] = frame.loc[changed_ids, INPUT_COLUMNS]
+            self.lines.loc[changed_ids, "line_hash"] = new_hash[changed]
+
+        stats = {"added": int(len(added)), "changed": int(len(changed_ids) - len(added)),
+                 "unchanged": int((~changed).sum()), "deleted": 0}
+        version = None
+        if len(changed_ids):
+            version = self._recompute(changed_ids, "declarations", removed)
+        if deleted:
+            version = self._delete(pd.Index([str(d) for d in deleted]).intersection(self.lines.index)) or version
+            stats["deleted"] = int(len(version.delta)) if version and version.reason == "deleted" else 0
+        return self._report(stats, version, started)
+
+    def _delete(self, line_ids: pd.Index) -> Optional[ResultVersion]:
+        if not len(line_ids):
+            return None
+        removed = self._state(line_ids)
+        self.lines = self.lines.drop(index=line_ids)
+        return self._commit_version("deleted", get_factor_table().version, line_ids, removed, None)
+
+    def refresh_factors(self) -> Dict[str, Any]:
+        """기본값 테이블이 바뀐 뒤 호출 - 적용 계수 행 지문이 달라진 라인만 재계산"""
+        started = time.perf_counter()
+        factors = get_factor_table()
+        if not len(self.lines):
+            return self._report({"changed": 0, "unchanged": 0}, None, started)
+        new_fp = factors.row_fingerprints(self.lines["cn_code"].to_numpy(np.int64))
+        changed = self.lines["factor_fp"].to_numpy() != new_fp
+        version = self._recompute(self.lines.index[changed], "factors") if changed.any() else None
+        return self._report({"changed": int(changed.sum()), "unchanged": int((~changed).sum())}, version, started)
+
+    def apply_supplier_data(self, supplier: pd.DataFrame, version: str) -> Dict[str, Any]:
+        """공급자 실측 데이터셋(installation_id, direct_see, indirect_see) 반영 - 해당 설비 라인만 재계산"""
+        started = time.perf_counter()
+        supplier = supplier.assign(version=version).set_index("installation_id")[["direct_see", "indirect_see", "version"]]
+        self.supplier = pd.concat([self.supplier[~self.supplier.index.isin(supplier.index)], supplier])
+        if not len(self.lines):
+            return self._report({"changed": 0, "unchanged": 0}, None, started)
+        changed = self.lines["supplier_fp"].to_numpy() != self._supplier_fingerprints(self.lines)
+        result = self._recompute(self.lines.index[changed], "supplier_data") if changed.any() else None
+        return self._report({"changed": int(changed.sum()), "unchanged": int((~changed).sum())}, result, started)
+
+    def _report(self, stats: Dict[str, int], version: Optional[ResultVersion], started: float) -> Dict[str, Any]:
+        return {
+            "company_id": self.company_id,
+            "quarter": self.quarter,
+            "version": version.number if version else self.current_version,
+            "new_version": version is not None,
+            **stats,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+            "totals": self.totals,
+        }
+
+    # ---- 조회 ----
+
+    def diff(self, from_version: int, to_version: int, limit: int = 1000) -> Dict[str, Any]:
+        """두 결과 버전 사이에 바뀐 라인과 합계 변화 (base_version 이전 델타는 정리되어 VersionPruned)"""
+        if from_version < self.base_version and from_version <= to_version <= self.current_version:
+            raise VersionPruned(
+                f"버전 {from_version}의 변경 내역은 정리되었습니다 "
+                f"(비교 가능 범위 {self.base_version}~{self.current_version})"
+            )
+        if not (self.base_version <= from_version <= to_version <= self.current_version):
+            raise ValueError(
+                f"버전 범위가 잘못되었습니다 (비교 가능 범위 {self.base_version}~{self.current_version})"
+            )
+        deltas = [v.delta for v in self.versions if from_version < v.number <= to_version]
+        if not deltas:
+            return {"from": from_version, "to": to_version, "changed_lines": 0, "totals_delta": {}, "lines": []}
+        merged = pd.concat(deltas)
+        grouped = merged.groupby(level=0, sort=False)
+        before = grouped[[f"{m}_before" for m in MEASURES]].first()
+        after = grouped[[f"{m}_after" for m in MEASURES]].last()
+        before.columns = after.columns = MEASURES
+        moved = ~np.isclose(before.to_numpy(), after.to_numpy()).all(axis=1)
+        before, after = before[moved], after[moved]
+        totals_delta = (after - before).sum()
+        lines = pd.concat([before.add_suffix("_before"), after.add_suffix("_after")], axis=1).head(limit)
+        lines.index.name = "line_id"
+        return {
+            "from": from_version,
+            "to": to_version,
+            "changed_lines": int(moved.sum()),
+            "totals_delta": {m: float(totals_delta[m]) for m in MEASURES},
+            "lines": lines.reset_index().to_dict(orient="records"),
+        }
+
+
+_quarters: Dict[Tuple[str, str], QuarterResults] = {}
+_registry_lock = threading.Lock()
+
+
+def get_quarter(company_id: str, quarter: str, create: bool = False,
+                params: Optional[CalculationParams] = None) -> Optional[QuarterResults]:
+    """분기 결과 조회 - 메모리에 없으면 결과 저장소에서 복원, 그래도 없으면 create일 때 새로 생성"""
+    key = (company_id, quarter)
+    with _registry_lock:
+        results = _quarters.get(key)
+        if results is None:
+            results = QuarterResults.load(company_id, quarter)
+            if results is None and create:
+                results = QuarterResults(company_id, quarter, params)
+            if results is not None:
+                _quarters[key] = results
+        return results
+
+
+def all_quarters() -> List[QuarterResults]:
+    with _registry_lock:
+        return list(_quarters.values())
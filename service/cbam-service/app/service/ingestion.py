@@ -0,0 +1,249 @@
+# 세관 신고 파일 청크 단위 스트리밍 적재 - 최대 메모리를 파일 크기와 무관하게 고정
+import os
+import time
+import uuid
+import logging
+import resource
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterator, Optional, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.service.calculation_engine import (
+    CalculationParams, calculate_embedded_emissions, invalid_line_mask, summarize, as_columns, LINE_COLUMNS,
+)
+
+logger = logging.getLogger("cbam_service")
+
+UPLOAD_DIR = os.getenv("CBAM_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "cbam-uploads"))
+CHUNK_ROWS = int(os.getenv("CBAM_INGEST_CHUNK_ROWS", "100000"))
+MAX_ERROR_SAMPLES = 20
+
+# 숫자 열은 문자열로 읽고 청크마다 변환 - 잘못된 셀 하나가 파일 전체 파싱을 실패시키지 않고 그 행만 거부되도록
+NUMERIC_COLUMNS = ("quantity_t", "direct_see", "indirect_see", "carbon_price_paid_eur")
+# 명시적 dtype - 반복 값이 많은 CN 코드/국가/설비는 categorical로 읽어 문자열 복제 방지
+CSV_DTYPES = {
+    "cn_code": "category",
+    "country_of_origin": "category",
+    "installation_id": "category",
+    **{name: str for name in NUMERIC_COLUMNS},
+}
+SUM_FIELDS = (
+    "quantity_t", "embedded_direct_t", "embedded_indirect_t", "embedded_precursor_t", "embedded_total_t",
+    "free_allocation_t", "certificates", "certificate_cost_eur", "default_value_lines", "factor_missing_lines",
+)
+
+
+def current_rss_bytes() -> int:
+    """현재 프로세스 RSS (Linux는 /proc, 그 외는 최대 RSS로 대체)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def iter_csv_chunks(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    present = pd.read_csv(path, nrows=0).columns
+    dtypes = {k: v for k, v in CSV_DTYPES.items() if k in present}
+    usecols = [c for c in present if c in CSV_DTYPES]
+    yield from pd.read_csv(path, chunksize=chunk_rows, dtype=dtypes, usecols=usecols)
+
+
+def iter_xlsx_chunks(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """openpyxl read-only 모드로 행을 스트리밍해 chunk_rows 단위 DataFrame 생성"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+        keep = [i for i, h in enumerate(header) if h in CSV_DTYPES]
+        names = [header[i] for i in keep]
+        buffer: List[tuple] = []
+        for row in rows:
+            buffer.append(tuple(row[i] if i < len(row) else None for i in keep))
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame.from_records(buffer, columns=names).astype(
+                    {k: v for k, v in CSV_DTYPES.items() if k in names and k not in NUMERIC_COLUMNS}
+                )
+                buffer = []
+        if buffer:
+            yield pd.DataFrame.from_records(buffer, columns=names).astype(
+                {k: v for k, v in CSV_DTYPES.items() if k in names and k not in NUMERIC_COLUMNS}
+            )
+    finally:
+        workbook.close()
+
+
+def _coerce_numeric(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """숫자 열 변환 (빈 셀은 NaN = 실제 값 없음) + 값이 있는데 숫자가 아닌 셀 위치 (예: "1O")"""
+    unparseable = pd.DataFrame(index=chunk.index)
+    for name in NUMERIC_COLUMNS:
+        if name not in chunk.columns:
+            continue
+        raw = chunk[name]
+        parsed = pd.to_numeric(raw, errors="coerce")
+        present = raw.notna() & (raw.astype(str).str.strip() != "")
+        unparseable[name] = present & parsed.isna()
+        chunk[name] = parsed.astype(np.float64)
+    return chunk, unparseable
+
+
+def _chunk_to_lines(chunk: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """청크 → 엔진 입력 열. categorical CN 코드는 카테고리만 숫자로 바꾼 뒤 코드로 펼침"""
+    data: Dict[str, Any] = {}
+    for name in chunk.columns:
+        series = chunk[name]
+        if name == "cn_code":
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                categories = pd.to_numeric(series.cat.categories.astype(str), errors="coerce").to_numpy(np.float64)
+                codes = series.cat.codes.to_numpy()
+                values = np.where(codes >= 0, categories[codes], np.nan)
+            else:
+                values = pd.to_numeric(series, errors="coerce").to_numpy(np.float64)
+            # 숫자가 아닌 CN 코드는 0 → 검증 단계에서 거부
+            data[name] = np.nan_to_num(values, nan=0.0).astype(np.int64)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            data[name] = series.astype(object).to_numpy()
+        else:
+            data[name] = series.to_numpy()
+    return as_columns(data, LINE_COLUMNS, required=("cn_code", "quantity_t"))
+
+
+class IngestionJob:
+    """업로드 파일 하나의 적재 작업 상태"""
+
+    def __init__(self, path: str, file_format: str, params: CalculationParams, original_name: str = ""):
+        self.job_id = uuid.uuid4().hex
+        self.path = path
+        self.file_format = file_format
+        self.params = params
+        self.original_name = original_name
+        self.status = "queued"
+        self.bytes = os.path.getsize(path) if os.path.exists(path) else 0
+        self.rows_read = 0
+        self.rows_valid = 0
+        self.rows_rejected = 0
+        self.chunks = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.totals: Dict[str, float] = {field: 0.0 for field in SUM_FIELDS}
+        self.peak_rss_bytes = current_rss_bytes()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.created_at = datetime.now().isoformat()
+        self.error: Optional[str] = None
+        self.cancelled = threading.Event()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def _chunks(self) -> Iterator[pd.DataFrame]:
+        if self.file_format == "xlsx":
+            return iter_xlsx_chunks(self.path)
+        return iter_csv_chunks(self.path)
+
+    def _process_chunk(self, chunk: pd.DataFrame):
+        chunk, unparseable = _coerce_numeric(chunk)
+        lines = _chunk_to_lines(chunk)
+        unparseable_rows = unparseable.to_numpy().any(axis=1) if unparseable.shape[1] else np.zeros(len(chunk), bool)
+        invalid = invalid_line_mask(lines) | unparseable_rows
+        if invalid.any():
+            bad = np.flatnonzero(invalid)
+            self.rows_rejected += len(bad)
+            for i in bad[:max(0, MAX_ERROR_SAMPLES - len(self.errors))]:
+                sample = {"row": int(self.rows_read + i), "cn_code": int(lines["cn_code"][i])}
+                if unparseable_rows[i]:
+                    sample["unparseable"] = unparseable.columns[unparseable.iloc[i].to_numpy()].tolist()
+                self.errors.append(sample)
+            lines = {name: arr[~invalid] for name, arr in lines.items()}
+        if len(lines["cn_code"]):
+            summary = summarize(calculate_embedded_emissions(lines, params=self.params))
+            for field in SUM_FIELDS:
+                self.totals[field] += summary[field]
+            self.rows_valid += summary["lines"]
+        self.rows_read += len(chunk)
+        self.chunks += 1
+
+    def run(self):
+        """청크를 하나씩 읽고 검증/계산 후 버림 (블로킹 - 워커 스레드에서 실행)"""
+        self.status = "running"
+        self.started_at = time.perf_counter()
+        try:
+            for chunk in self._chunks():
+                if self.cancelled.is_set():
+                    self.status = "cancelled"
+                    break
+                self._process_chunk(chunk)
+                del chunk
+                self.peak_rss_bytes = max(self.peak_rss_bytes, current_rss_bytes())
+            else:
+                self.status = "completed"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            logger.error(f"❌ CBAM 적재 실패 {self.job_id}: {str(e)}")
+        finally:
+            self.finished_at = time.perf_counter()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        logger.info(
+            f"📥 CBAM 적재 {self.status} {self.job_id}: {self.rows_read}행, "
+            f"{self.rows_per_second:,.0f}행/s, 최대 RSS {self.peak_rss_bytes / 2**20:.0f}MB"
+        )
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "file_name": self.original_name,
+            "file_format": self.file_format,
+            "bytes": self.bytes,
+            "created_at": self.created_at,
+            "rows_read": self.rows_read,
+            "rows_valid": self.rows_valid,
+            "rows_rejected": self.rows_rejected,
+            "chunks": self.chunks,
+            "elapsed_s": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "peak_rss_mb": round(self.peak_rss_bytes / 2**20, 1),
+            "totals": self.totals,
+            "error_samples": self.errors,
+            "error": self.error,
+        }
+
+
+_jobs: Dict[str, IngestionJob] = {}
+MAX_JOBS = 200
+
+
+def register_job(job: IngestionJob) -> IngestionJob:
+    _jobs[job.job_id] = job
+    # 오래된 완료 작업부터 정리
+    while len(_jobs) > MAX_JOBS:
+        oldest = next((jid for jid, j in _jobs.items() if j.status not in ("queued", "running")), None)
+        if oldest is None:
+            break
+        _jobs.pop(oldest)
+    return job
+
+
+def get_job(job_id: str) -> Optional[IngestionJob]:
+    return _jobs.get(job_id)
+
+
+def new_upload_path(suffix: str) -> str:
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    return os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}.{suffix}")
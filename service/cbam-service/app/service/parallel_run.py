@@ -0,0 +1,434 @@
+# 대규모 분기 실행 병렬화 - 설비/CN 그룹 단위 샤드를 프로세스 풀에서 계산, 배열은 공유 메모리로 전달
+import os
+import time
+import uuid
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, Any, Optional, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.service.calculation_engine import (
+    CalculationParams, calculate_embedded_emissions, get_factor_table, reload_factor_table, summarize, as_columns,
+    LINE_COLUMNS,
+)
+from app.service.cn_index import CNFactorIndex
+from app.service.ingestion import SUM_FIELDS
+
+logger = logging.getLogger("cbam_service")
+
+RUN_WORKERS = int(os.getenv("CBAM_RUN_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# 워커가 샤드 안에서 진행률 갱신/취소 확인을 하는 단위
+RUN_CHUNK_ROWS = int(os.getenv("CBAM_RUN_CHUNK_ROWS", "50000"))
+DEFAULT_SHARDS = int(os.getenv("CBAM_RUN_SHARDS", "0")) or RUN_WORKERS * 4
+
+# 공유 메모리로 넘기는 숫자 열 (문자열 열은 범주 코드로 바꿔서 전달)
+SHARED_COLUMNS = {
+    "cn_code": np.int64,
+    "quantity_t": np.float64,
+    "direct_see": np.float64,
+    "indirect_see": np.float64,
+    "carbon_price_paid_eur": np.float64,
+    "installation_code": np.int64,
+    "cn_group_code": np.int64,
+}
+# 제어 블록: [취소 플래그, 샤드별 처리 행 수...] (int64)
+CANCEL_SLOT = 0
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    """워커 프로세스 시작 시 기본값 인덱스를 mmap (페이지 캐시는 프로세스 간 공유)"""
+    get_factor_table()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """프로세스 풀 싱글톤 - 스레드가 있는 API 프로세스를 fork하지 않도록 spawn 사용"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=RUN_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            logger.info(f"🧵 CBAM 실행 프로세스 풀 시작: 워커 {RUN_WORKERS}개")
+        return _executor
+
+
+def reset_executor(broken: ProcessPoolExecutor):
+    """워커 프로세스가 비정상 종료해 깨진 풀 폐기 - 다음 get_executor()가 새 풀을 만든다"""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+class SharedColumns:
+    """이름 붙은 열 묶음을 공유 메모리 블록 하나에 배치 (워커는 이름 + 레이아웃만 받아 뷰로 연결)"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: Dict[str, Tuple[int, str, int]], owner: bool):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+
+    @classmethod
+    def create(cls, columns: Dict[str, np.ndarray]) -> "SharedColumns":
+        layout, offset = {}, 0
+        for name, arr in columns.items():
+            layout[name] = (offset, arr.dtype.str, len(arr))
+            offset += -(-arr.nbytes // 64) * 64
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        shared = cls(shm, layout, owner=True)
+        for name, arr in columns.items():
+            shared.view(name)[:] = arr
+        return shared
+
+    @classmethod
+    def attach(cls, name: str, layout: Dict[str, Tuple[int, str, int]]) -> "SharedColumns":
+        return cls(shared_memory.SharedMemory(name=name), layout, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def view(self, column: str) -> np.ndarray:
+        offset, dtype, count = self.layout[column]
+        return np.ndarray((count,), dtype=np.dtype(dtype), buffer=self.shm.buf, offset=offset)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker_factor_table(version: str) -> CNFactorIndex:
+    """워커에 캐시된 기본값 인덱스가 API 프로세스와 다른 버전이면 (/refresh-factors 이후) 다시 매핑"""
+    factors = get_factor_table()
+    if factors.version != version:
+        factors = reload_factor_table()
+    if factors.version != version:
+        raise RuntimeError(f"워커 기본값 인덱스 버전 불일치: {factors.version} != {version}")
+    return factors
+
+
+def _group_aggregate(codes: np.ndarray, result: Dict[str, np.ndarray], n_groups: int) -> Dict[str, np.ndarray]:
+    return {
+        field: np.bincount(codes, weights=result[field], minlength=n_groups)
+        for field in ("quantity_t", "embedded_total_t", "certificates", "certificate_cost_eur")
+    }
+
+
+def _run_chunks(data: SharedColumns, control: np.ndarray, shard: int, start: int, end: int,
+                factors: CNFactorIndex, params: CalculationParams, n_installations: int,
+                n_groups: int) -> Dict[str, Any]:
+    totals = {field: 0.0 for field in SUM_FIELDS}
+    by_installation = by_group = None
+    cancelled = False
+    for chunk_start in range(start, end, RUN_CHUNK_ROWS):
+        if control[CANCEL_SLOT]:
+            cancelled = True
+            break
+        chunk = slice(chunk_start, min(chunk_start + RUN_CHUNK_ROWS, end))
+        lines = {name: data.view(name)[chunk] for name in LINE_COLUMNS if name in data.layout}
+        result = calculate_embedded_emissions(lines, factors=factors, params=params)
+        summary = summarize(result)
+        for field in SUM_FIELDS:
+            totals[field] += summary[field]
+        inst = _group_aggregate(data.view("installation_code")[chunk], result, n_installations)
+        grp = _group_aggregate(data.view("cn_group_code")[chunk], result, n_groups)
+        if by_installation is None:
+            by_installation, by_group = inst, grp
+        else:
+            for field in inst:
+                by_installation[field] += inst[field]
+                by_group[field] += grp[field]
+        control[1 + shard] = chunk.stop - start
+    return {
+        "shard": shard,
+        "rows": int(control[1 + shard]),
+        "cancelled": cancelled,
+        "totals": totals,
+        "by_installation": by_installation,
+        "by_cn_group": by_group,
+    }
+
+
+def run_shard(data_name: str, data_layout, control_name: str, shard: int, start: int, end: int,
+              factor_version: str, params: CalculationParams, n_installations: int,
+              n_groups: int) -> Dict[str, Any]:
+    """워커 프로세스: 정렬된 공유 배열의 [start, end) 구간을 청크 단위로 계산해 부분 합계 반환
+
+    제어 블록의 취소 플래그를 청크마다 확인하고, 샤드별 처리 행 수를 같은 블록에 기록한다.
+    반환값은 합계/그룹별 bincount 같은 작은 배열뿐이라 피클 비용이 입력 크기와 무관하다.
+    """
+    started = time.perf_counter()
+    factors = _worker_factor_table(factor_version)
+    data = SharedColumns.attach(data_name, data_layout)
+    control_shm = shared_memory.SharedMemory(name=control_name)
+    try:
+        control = np.ndarray((control_shm.size // 8,), dtype=np.int64, buffer=control_shm.buf)
+        part = _run_chunks(data, control, shard, start, end, factors, params, n_installations, n_groups)
+        # 공유 메모리를 닫기 전에 버퍼 뷰 해제
+        del control
+    finally:
+        control_shm.close()
+        data.close()
+    part["elapsed_s"] = time.perf_counter() - started
+    part["pid"] = os.getpid()
+    return part
+
+
+def plan_shards(keys: np.ndarray, n_shards: int) -> List[Tuple[int, int]]:
+    """정렬된 그룹 키 배열을 행 수가 비슷한 구간으로 나누되 같은 그룹은 한 샤드에 둠"""
+    n = len(keys)
+    if n == 0:
+        return []
+    n_shards = max(1, min(n_shards, n))
+    boundaries = np.flatnonzero(np.diff(keys)) + 1
+    targets = (np.arange(1, n_shards) * n) // n_shards
+    # 목표 지점 이후 첫 그룹 경계에서 자름
+    cut_pos = np.searchsorted(boundaries, targets)
+    cuts = np.unique(boundaries[cut_pos[cut_pos < len(boundaries)]])
+    edges = np.concatenate([[0], cuts, [n]])
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+class ShardedRun:
+    """분기 실행 하나 - 입력을 그룹 키로 정렬해 공유 메모리에 올리고 샤드별로 프로세스 풀에 제출"""
+
+    def __init__(self, lines, params: CalculationParams, shard_by: str = "installation",
+                 n_shards: int = DEFAULT_SHARDS, label: str = ""):
+        if shard_by not in ("installation", "cn_group"):
+            raise ValueError("shard_by는 installation 또는 cn_group 이어야 합니다")
+        self.run_id = uuid.uuid4().hex
+        self.label = label
+        self.params = params
+        self.shard_by = shard_by
+        self.cols = as_columns(lines, LINE_COLUMNS, required=("cn_code", "quantity_t"))
+        self.n_lines = len(self.cols["cn_code"])
+        self.n_shards = n_shards
+        self.status = "queued"
+        self.shards: List[Dict[str, Any]] = []
+        self.totals: Dict[str, float] = {field: 0.0 for field in SUM_FIELDS}
+        self.by_installation: Dict[str, Dict[str, float]] = {}
+        self.by_cn_group: Dict[str, Dict[str, float]] = {}
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancelled = threading.Event()
+        self._control: Optional[np.ndarray] = None
+        self._control_lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def _prepare(self) -> Tuple[SharedColumns, Dict[str, Any]]:
+        installation_code, installations = pd.factorize(pd.Series(self.cols["installation_id"]).fillna(""))
+        # CN 그룹 = 4자리 heading (같은 heading은 같은 기본값 구간을 공유)
+        cn_group_code, cn_groups = pd.factorize(self.cols["cn_code"] // 10_000)
+        key = installation_code if self.shard_by == "installation" else cn_group_code
+        order = np.argsort(key, kind="stable")
+        columns = {
+            name: np.ascontiguousarray(self.cols[name][order], dtype=dtype)
+            for name, dtype in SHARED_COLUMNS.items() if name in self.cols
+        }
+        columns["installation_code"] = installation_code[order].astype(np.int64)
+        columns["cn_group_code"] = cn_group_code[order].astype(np.int64)
+        meta = {
+            "installations": installations.astype(str).tolist(),
+            "cn_groups": [f"{int(g):04d}" for g in cn_groups],
+            "ranges": plan_shards(key[order], self.n_shards),
+        }
+        return SharedColumns.create(columns), meta
+
+    def run(self):
+        """샤드 제출 후 완료되는 순서대로 부분 합계 병합 (블로킹 - 워커 스레드에서 실행)"""
+        self.status = "running"
+        self.started_at = time.perf_counter()
+        data = control_shm = None
+        pending: Dict[Any, int] = {}
+        try:
+            data, meta = self._prepare()
+            # 입력 열은 공유 메모리로 옮겼으므로 해제
+            self.cols = None
+            ranges = meta["ranges"]
+            self.shards = [
+                {"shard": i, "start": a, "rows": b - a, "rows_done": 0, "status": "queued"}
+                for i, (a, b) in enumerate(ranges)
+            ]
+            control_shm = shared_memory.SharedMemory(create=True, size=8 * (1 + len(ranges)))
+            with self._control_lock:
+                self._control = np.ndarray((1 + len(ranges),), dtype=np.int64, buffer=control_shm.buf)
+                self._control[:] = 0
+
+            # 워커는 이 버전의 기본값 인덱스로 계산 (캐시가 다르면 워커에서 다시 매핑)
+            shard_args = (data, control_shm, ranges, get_factor_table().version,
+                          len(meta["installations"]), len(meta["cn_groups"]))
+            executor = get_executor()
+            try:
+                pending = self._submit(executor, *shard_args, range(len(ranges)))
+            except BrokenProcessPool:
+                # 유휴 상태에서 워커가 죽어 이미 깨진 풀 - 새 풀로 교체 후 제출
+                reset_executor(executor)
+                executor = get_executor()
+                pending = self._submit(executor, *shard_args, range(len(ranges)))
+            retried = False
+            for shard in self.shards:
+                shard["status"] = "running"
+            inst_acc = grp_acc = None
+            while pending:
+                if self.cancelled.is_set():
+                    with self._control_lock:
+                        self._control[CANCEL_SLOT] = 1
+                    for future in pending:
+                        future.cancel()
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                broken = []
+                for future in done:
+                    i = pending.pop(future)
+                    if future.cancelled():
+                        self.shards[i]["status"] = "cancelled"
+                        continue
+                    if isinstance(future.exception(), BrokenProcessPool):
+                        broken.append(i)
+                        continue
+                    part = future.result()
+                    shard = self.shards[i]
+                    shard.update(status="cancelled" if part["cancelled"] else "completed",
+                                 rows_done=part["rows"], elapsed_s=round(part["elapsed_s"], 3), pid=part["pid"])
+                    for field in SUM_FIELDS:
+                        self.totals[field] += part["totals"][field]
+                    if part["by_installation"] is not None:
+                        if inst_acc is None:
+                            inst_acc, grp_acc = part["by_installation"], part["by_cn_group"]
+                        else:
+                            for field in inst_acc:
+                                inst_acc[field] += part["by_installation"][field]
+                                grp_acc[field] += part["by_cn_group"][field]
+                if broken:
+                    # 워커 하나가 죽으면 풀 전체가 깨짐 - 새 풀에 끝나지 않은 샤드를 한 번만 다시 제출
+                    if retried:
+                        raise BrokenProcessPool("CBAM 실행 워커 프로세스가 재시도 후에도 비정상 종료했습니다")
+                    retried = True
+                    retry = sorted(broken + list(pending.values()))
+                    logger.warning(f"⚠️ CBAM 실행 프로세스 풀 손상 {self.run_id}: 샤드 {len(retry)}개 새 풀에서 재시도")
+                    reset_executor(executor)
+                    executor = get_executor()
+                    pending = self._submit(executor, *shard_args, retry)
+            self.status = "cancelled" if self.cancelled.is_set() else "completed"
+            if inst_acc is not None:
+                self.by_installation = self._breakdown(meta["installations"], inst_acc)
+                self.by_cn_group = self._breakdown(meta["cn_groups"], grp_acc)
+        except Exception as e:
+            # 실패한 실행의 남은 샤드가 풀을 계속 점유하지 않도록 취소
+            for future in pending:
+                future.cancel()
+            self.status = "failed"
+            self.error = str(e)
+            logger.error(f"❌ CBAM 분기 실행 실패 {self.run_id}: {str(e)}")
+        finally:
+            self.finished_at = time.perf_counter()
+            self._snapshot_progress()
+            with self._control_lock:
+                self._control = None
+            if control_shm is not None:
+                control_shm.close()
+                control_shm.unlink()
+            if data is not None:
+                data.close()
+        logger.info(
+            f"🏭 CBAM 분기 실행 {self.status} {self.run_id}: {self.n_lines}행, 샤드 {len(self.shards)}개, "
+            f"{self.elapsed:.2f}s"
+        )
+
+    def _submit(self, executor: ProcessPoolExecutor, data: SharedColumns, control_shm: shared_memory.SharedMemory,
+                ranges: List[Tuple[int, int]], factor_version: str, n_installations: int, n_groups: int,
+                shards: Sequence[int]) -> Dict[Any, int]:
+        return {
+            executor.submit(run_shard, data.name, data.layout, control_shm.name, i, *ranges[i], factor_version,
+                            self.params, n_installations, n_groups): i
+            for i in shards
+        }
+
+    @staticmethod
+    def _breakdown(names: List[str], acc: Dict[str, np.ndarray]) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {field: float(values[i]) for field, values in acc.items()}
+            for i, name in enumerate(names)
+        }
+
+    def _snapshot_progress(self):
+        """워커가 공유 제어 블록에 기록한 샤드별 처리 행 수 반영"""
+        with self._control_lock:
+            if self._control is None:
+                return
+            for shard in self.shards:
+                if shard["status"] in ("queued", "running"):
+                    shard["rows_done"] = int(self._control[1 + shard["shard"]])
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def to_dict(self, include_breakdown: bool = False) -> Dict[str, Any]:
+        self._snapshot_progress()
+        rows_done = sum(s["rows_done"] for s in self.shards)
+        out = {
+            "run_id": self.run_id,
+            "label": self.label,
+            "status": self.status,
+            "created_at": self.created_at,
+            "lines": self.n_lines,
+            "shard_by": self.shard_by,
+            "shards_total": len(self.shards),
+            "shards_completed": sum(s["status"] == "completed" for s in self.shards),
+            "rows_done": rows_done,
+            "progress": round(rows_done / self.n_lines, 4) if self.n_lines else 1.0,
+            "elapsed_s": round(self.elapsed, 3),
+            "totals": self.totals,
+            "shards": self.shards,
+            "error": self.error,
+        }
+        if include_breakdown:
+            out["by_installation"] = self.by_installation
+            out["by_cn_group"] = self.by_cn_group
+        return out
+
+
+_runs: Dict[str, ShardedRun] = {}
+MAX_RUNS = 100
+
+
+def register_run(run: ShardedRun) -> ShardedRun:
+    _runs[run.run_id] = run
+    while len(_runs) > MAX_RUNS:
+        oldest = next((rid for rid, r in _runs.items() if r.status not in ("queued", "running")), None)
+        if oldest is None:
+            break
+        _runs.pop(oldest)
+    return run
+
+
+def get_run(run_id: str) -> Optional[ShardedRun]:
+    return _runs.get(run_id)
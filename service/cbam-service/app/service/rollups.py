@@ -0,0 +1,149 @@
+# 대시보드용 사전 집계(롤업) - 라인 변경분만 더하고 빼서 유지, 조회는 그룹 수에 비례
+import threading
+from typing import Dict, Any, Optional, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 롤업 차원 (라인 상태 열 이름 → 차원 이름)
+DIMENSIONS = {
+    "cn_code": "cn_code",
+    "country_of_origin": "country",
+    "installation_id": "installation",
+    "import_month": "month",
+}
+ROLLUP_MEASURES = [
+    "quantity_t", "embedded_direct_t", "embedded_indirect_t", "embedded_precursor_t",
+    "embedded_total_t", "free_allocation_t", "certificates", "certificate_cost_eur",
+]
+COUNT_MEASURE = "lines"
+MISSING = "(none)"
+
+
+def _dimension_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """라인 상태 → 차원 열 (결측값은 MISSING 그룹, CN 코드는 8자리 문자열)"""
+    dims = pd.DataFrame(index=frame.index)
+    for column, dim in DIMENSIONS.items():
+        values = frame[column]
+        if column == "cn_code":
+            dims[dim] = values.astype(np.int64).astype(str).str.zfill(8)
+        else:
+            dims[dim] = values.astype(object).where(values.notna(), MISSING)
+    return dims
+
+
+class Rollup:
+    """분기 하나의 롤업 큐브
+
+    cells: 모든 차원 조합(셀)별 측정값 합계와 라인 수
+    marginals: 차원 하나짜리 집계 (대시보드 기본 화면 - 셀 재집계 없이 바로 반환)
+    갱신은 바뀐 라인의 이전 값을 빼고 새 값을 더하는 방식이라 비용이 변경 라인 수에 비례한다.
+    """
+
+    def __init__(self):
+        self.dims = list(DIMENSIONS.values())
+        self.columns = ROLLUP_MEASURES + [COUNT_MEASURE]
+        self.cells = self._empty(self.dims)
+        self.marginals: Dict[str, pd.DataFrame] = {dim: self._empty([dim]) for dim in self.dims}
+        self.lock = threading.Lock()
+
+    def _empty(self, dims: List[str]) -> pd.DataFrame:
+        index = pd.MultiIndex.from_arrays([[] for _ in dims], names=dims) if len(dims) > 1 else \
+            pd.Index([], name=dims[0], dtype=object)
+        return pd.DataFrame({c: pd.Series(dtype=np.float64) for c in self.columns}, index=index)
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.cells)
+
+    def _signed(self, frame: Optional[pd.DataFrame], sign: float) -> Optional[pd.DataFrame]:
+        if frame is None or not len(frame):
+            return None
+        signed = _dimension_frame(frame)
+        for m in ROLLUP_MEASURES:
+            signed[m] = frame[m].to_numpy(np.float64) * sign
+        signed[COUNT_MEASURE] = sign
+        return signed
+
+    @staticmethod
+    def _merge(target: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+        merged = target.add(delta, fill_value=0.0)
+        # 라인이 하나도 남지 않은 그룹 제거
+        return merged[merged[COUNT_MEASURE].round() != 0]
+
+    def apply(self, removed: Optional[pd.DataFrame], added: Optional[pd.DataFrame]):
+        """removed: 이전 상태 라인(차원 + 측정값), added: 새 상태 라인 → 셀/주변 집계에 반영"""
+        parts = [p for p in (self._signed(removed, -1.0), self._signed(added, 1.0)) if p is not None]
+        if not parts:
+            return
+        delta = pd.concat(parts, ignore_index=True)
+        cell_delta = delta.groupby(self.dims, sort=False, dropna=False)[self.columns].sum()
+        with self.lock:
+            self.cells = self._merge(self.cells, cell_delta)
+            for dim in self.dims:
+                self.marginals[dim] = self._merge(
+                    self.marginals[dim], delta.groupby(dim, sort=False)[self.columns].sum()
+                )
+
+    def rebuild(self, lines: pd.DataFrame):
+        """라인 상태 전체에서 다시 구성 (저장소에서 분기 결과를 복원할 때)"""
+        computed = lines[lines["certificates"].notna()]
+        with self.lock:
+            self.cells = self._empty(self.dims)
+            self.marginals = {dim: self._empty([dim]) for dim in self.dims}
+        self.apply(None, computed)
+
+    @staticmethod
+    def _filter_mask(index_values: pd.Index, op: str, value) -> np.ndarray:
+        values = index_values.astype(str)
+        if op == "in":
+            return values.isin([str(v) for v in value])
+        value = str(value)
+        return {
+            "==": values == value, "!=": values != value, "<": values < value,
+            "<=": values <= value, ">": values > value, ">=": values >= value,
+        }[op]
+
+    def query(self, group_by: Sequence[str], filters: Sequence[Tuple[str, str, Any]] = (),
+              measures: Optional[Sequence[str]] = None, sort: Optional[str] = None,
+              top: Optional[int] = None) -> Dict[str, Any]:
+        """대시보드 조각 조회 - 차원 하나 + 필터 없음이면 주변 집계, 그 외에는 셀을 다시 묶음 (O(셀 수))"""
+        unknown = [d for d in list(group_by) + [f[0] for f in filters] if d not in self.dims]
+        if unknown:
+            raise ValueError(f"알 수 없는 차원: {unknown} (가능: {self.dims})")
+        columns = list(measures) if measures else self.columns
+        bad = [m for m in columns if m not in self.columns]
+        if bad:
+            raise ValueError(f"알 수 없는 측정값: {bad}")
+        with self.lock:
+            if len(group_by) == 1 and not filters:
+                table = self.marginals[group_by[0]][columns]
+                source = "marginal"
+            else:
+                cells = self.cells
+                mask = np.ones(len(cells), dtype=bool)
+                for dim, op, value in filters:
+                    mask &= self._filter_mask(cells.index.get_level_values(dim), op, value)
+                cells = cells[mask]
+                if group_by:
+                    table = cells.groupby(level=list(group_by), sort=False)[columns].sum()
+                else:
+                    table = cells[columns].sum().to_frame().T
+                source = "cells"
+        if sort:
+            if sort not in columns:
+                raise ValueError(f"정렬 기준은 조회 측정값 중 하나여야 합니다: {sort}")
+            table = table.sort_values(sort, ascending=False)
+        total_groups = len(table)
+        if top:
+            table = table.head(top)
+        rows = table.reset_index() if group_by else table
+        if COUNT_MEASURE in rows:
+            rows = rows.assign(**{COUNT_MEASURE: rows[COUNT_MEASURE].round().astype(np.int64)})
+        return {
+            "group_by": list(group_by),
+            "source": source,
+            "groups": total_groups,
+            "cells": self.n_cells,
+            "rows": rows.to_dict(orient="records"),
+        }
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+내부 직렬화 형식 벤치마크 스크립트
+CBAM 배치 계산 결과(/api/v1/cbam/calculate/batch 응답)를 JSON과 내부 바이너리(msgpack + 원시 배열)로
+직렬화할 때의 CPU 시간과 전송 바이트를 비교합니다.
+
+  cd service/cbam-service && python bench_wire_format.py [--lines 1000 10000 100000] [--repeat 5]
+
+- 서비스 인코딩: JSON은 result_to_columns + json.dumps, 바이너리는 ndarray 그대로 packb
+- 내부 디코딩: JSON은 json.loads, 바이너리는 unpackb (numpy, 복사 없는 배열)
+- 공개 API 응답: 게이트웨이는 서비스 JSON을 그대로 중계 - 비교용으로 packed → JSON 변환(packed_to_json) 비용도 측정
+  (변환 비용이 서비스 JSON 인코딩과 비슷하면 게이트웨이에서 변환해도 JSON 비용이 옮겨갈 뿐)
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+
+import numpy as np
+
+os.environ.setdefault("TRACE_EXPORTER", "none")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.common.wire import packb, unpackb, packed_to_json  # noqa: E402
+from app.service.calculation_engine import (  # noqa: E402
+    calculate_embedded_emissions, get_factor_table, result_to_columns, summarize,
+)
+
+
+def sample_result(n_lines: int, seed: int = 0):
+    """대표 배치 - 설비 200곳, 원산지 8개국, 30%는 공급자 실측 배출값"""
+    rng = np.random.default_rng(seed)
+    codes = np.asarray(get_factor_table().codes)
+    codes = codes[codes >= 10_000_000]
+    measured = rng.random(n_lines) < 0.3
+    lines = {
+        "cn_code": codes[rng.integers(0, len(codes), n_lines)].tolist(),
+        "quantity_t": rng.uniform(1, 500, n_lines).round(3).tolist(),
+        "installation_id": [f"INST-{i:04d}" for i in rng.integers(0, 200, n_lines)],
+        "country_of_origin": rng.choice(["CN", "IN", "TR", "UA", "RU", "KR", "VN", "EG"], n_lines).tolist(),
+        "direct_see": np.where(measured, rng.uniform(0.5, 3.0, n_lines), np.nan).tolist(),
+        "indirect_see": np.where(measured, rng.uniform(0.0, 0.5, n_lines), np.nan).tolist(),
+        "carbon_price_paid_eur": [None] * n_lines,
+    }
+    lines = {k: [None if isinstance(v, float) and v != v else v for v in col] for k, col in lines.items()}
+    result = calculate_embedded_emissions(lines)
+    return {"status": "success", "factor_table_version": get_factor_table().version,
+            "summary": summarize(result), "elapsed_ms": 0.0}, result
+
+
+def timed(fn, repeat: int):
+    """repeat회 중 최솟값 (ms)과 마지막 결과"""
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, out
+
+
+def bench(n_lines: int, repeat: int):
+    head, result = sample_result(n_lines)
+
+    def encode_json():
+        return json.dumps({**head, "lines": result_to_columns(result)}, ensure_ascii=False,
+                          allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    json_enc_ms, json_body = timed(encode_json, repeat)
+    json_dec_ms, _ = timed(lambda: json.loads(json_body), repeat)
+    packed_enc_ms, packed_body = timed(lambda: packb({**head, "lines": result}), repeat)
+    packed_dec_ms, decoded = timed(lambda: unpackb(packed_body), repeat)
+    transcode_ms, transcoded = timed(lambda: packed_to_json(packed_body), repeat)
+
+    # 변환 결과가 서비스의 JSON 응답과 같아야 함
+    assert json.loads(transcoded) == json.loads(json_body), "packed → JSON 변환 결과 불일치"
+    assert np.array_equal(decoded["lines"]["certificates"], result["certificates"])
+
+    print(f"\n📊 {n_lines:,}라인 ({len(result)}열)")
+    print(f"  {'형식':<8} {'본문':>12} {'gzip':>12} {'인코딩 ms':>10} {'디코딩 ms':>10}")
+    for name, body, enc, dec in (
+        ("JSON", json_body, json_enc_ms, json_dec_ms),
+        ("packed", packed_body, packed_enc_ms, packed_dec_ms),
+    ):
+        print(f"  {name:<8} {len(body):>12,} {len(gzip.compress(body, 1)):>12,} {enc:>10.2f} {dec:>10.2f}")
+    print(f"  → 바이트 {len(json_body) / len(packed_body):.1f}배 감소, "
+          f"서비스 인코딩 {json_enc_ms / packed_enc_ms:.1f}배, 내부 디코딩 {json_dec_ms / packed_dec_ms:.0f}배 빠름")
+    # 공개 API 경로: 서비스 JSON 인코딩 + 게이트웨이 무변경 중계 vs 서비스 packed 인코딩 + 게이트웨이 변환
+    relay_ms, via_packed_ms = json_enc_ms, packed_enc_ms + transcode_ms
+    print(f"  → 공개 API 응답: JSON 그대로 중계 {relay_ms:.2f}ms, packed 경유 변환 {via_packed_ms:.2f}ms "
+          f"(packed → JSON {transcode_ms:.2f}ms) → 중계가 {via_packed_ms / relay_ms:.2f}배 빠름")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="내부 직렬화 형식 벤치마크")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(f"🚀 직렬화 벤치마크: CBAM 배치 계산 결과, 각 {args.repeat}회 중 최솟값")
+    for n in args.lines:
+        bench(n, args.repeat)
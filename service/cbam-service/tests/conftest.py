@@ -0,0 +1,14 @@
+# 테스트 공통 설정 - 서비스 루트(app 패키지)를 import 경로에 추가, 파일 출력은 임시 디렉터리로
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_scratch = tempfile.mkdtemp(prefix="cbam-tests-")
+os.environ.setdefault("TRACE_EXPORTER", "none")
+os.environ.setdefault("RESULT_STORE_DIR", os.path.join(_scratch, "results"))
+os.environ.setdefault("CBAM_UPLOAD_DIR", os.path.join(_scratch, "uploads"))
+os.environ.setdefault("CBAM_FACTOR_INDEX", os.path.join(_scratch, "factors.cnx"))
+os.environ.setdefault("EVENT_OUTBOX_DIR", os.path.join(_scratch, "event-outbox"))
+os.environ.pop("REDIS_URL", None)
@@ -0,0 +1,56 @@
+# 내재 배출량 계산 - 기본값 대체(8/6/4자리), 무상할당 차감, 기본값 없는 전구물질 표시
+import numpy as np
+import pytest
+
+from app.service.calculation_engine import CalculationParams, calculate_embedded_emissions, summarize
+
+
+def lines(**overrides):
+    base = {
+        "cn_code": [72081000, 72085100, 72089000, 99999999],
+        "quantity_t": [10.0, 10.0, 10.0, 10.0],
+        "direct_see": [1.0, None, None, None],
+        "indirect_see": [0.1, None, None, None],
+    }
+    base.update(overrides)
+    return base
+
+
+def test_default_values_fall_back_to_shorter_cn_codes():
+    result = calculate_embedded_emissions(lines(), params=CalculationParams(year=2026))
+    assert result["factor_level"].tolist() == [8, 6, 4, 0]
+    assert result["direct_is_default"].tolist() == [False, True, True, True]
+    # 실측값 우선, 6자리 heading 720851 = 2.15 + 0.18, 4자리 7208 = 2.20 + 0.20
+    np.testing.assert_allclose(result["embedded_total_t"][:3], [11.0, 23.3, 24.0])
+    assert result["factor_missing"].tolist() == [False, False, False, True]
+    assert summarize(result)["factor_missing_lines"] == 1
+
+
+def test_free_allocation_and_carbon_price_reduce_certificates():
+    params = CalculationParams(year=2026, ets_price_eur=80.0)
+    result = calculate_embedded_emissions(
+        {"cn_code": [72081000], "quantity_t": [10.0], "carbon_price_paid_eur": [80.0]}, params=params,
+    )
+    # 직접 21.5t (간접은 철강 대상 아님) - 무상할당 13.7t × 0.975 - 기지불 1t
+    expected = 21.5 - 13.7 * 0.975 - 1.0
+    assert result["certificates"][0] == pytest.approx(expected)
+    assert result["certificate_cost_eur"][0] == pytest.approx(expected * 80.0)
+
+
+def test_precursor_without_any_factor_marks_line_missing():
+    precursors = {
+        "line_index": [0, 0, 1],
+        "cn_code": [72011011, 99999999, 72011011],
+        "mass_per_t": [1.0, 0.5, 1.0],
+        "see": [None, None, 3.0],
+    }
+    result = calculate_embedded_emissions(lines(), precursors=precursors)
+    # 라인 0: 선철 기본값 2.0만 합산되고 기본값 없는 전구물질 때문에 factor_missing
+    np.testing.assert_allclose(result["embedded_precursor_t"][:2], [20.0, 30.0])
+    assert result["factor_missing"].tolist() == [True, False, False, True]
+    assert summarize(result)["factor_missing_lines"] == 2
+
+
+def test_invalid_lines_are_rejected():
+    with pytest.raises(ValueError, match="잘못된 신고 라인 1건"):
+        calculate_embedded_emissions(lines(quantity_t=[10.0, -1.0, 10.0, 10.0]))
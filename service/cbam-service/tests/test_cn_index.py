@@ -0,0 +1,42 @@
+# CN 코드 인덱스 - 8/6/4자리 접두어 대체, 파일 왕복(mmap) 후 같은 조회 결과, 잘못된 코드 거절
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.service.cn_index import CNFactorIndex
+
+
+def frame(codes):
+    n = len(codes)
+    return pd.DataFrame({
+        "cn_code": codes,
+        "direct_default": np.arange(n, dtype=float) + 1,
+        "indirect_default": np.zeros(n),
+        "benchmark": np.ones(n),
+        "indirect_in_scope": [False] * n,
+    })
+
+
+def test_most_specific_prefix_wins():
+    index = CNFactorIndex.from_frame(frame(["72081000", "720851", "7208", "7601"]))
+    idx, level = index.resolve([72081000, 72085100, 72089000, 76011000, 28041000])
+    assert level.tolist() == [8, 6, 4, 4, 0]
+    assert index.direct_default[idx[:4]].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_saved_index_is_mapped_with_identical_lookups(tmp_path):
+    index = CNFactorIndex.from_frame(frame(["72081000", "720851", "7208"]))
+    path = str(tmp_path / "factors.cnx")
+    index.save(path)
+    opened = CNFactorIndex.open(path)
+    query = [72081000, 72085100, 72089999, 10000000]
+    for a, b in zip(index.resolve(query), opened.resolve(query)):
+        np.testing.assert_array_equal(a, b)
+    assert opened.version == index.version
+    assert not opened.direct_default.flags.writeable
+
+
+@pytest.mark.parametrize("codes", [["720810"] * 2, ["7208100"], ["72A81000"]])
+def test_invalid_or_duplicate_codes_rejected(codes):
+    with pytest.raises(ValueError):
+        CNFactorIndex.from_frame(frame(codes))
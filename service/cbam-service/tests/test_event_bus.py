@@ -0,0 +1,150 @@
+# 이벤트 버스 - 실패한 이벤트는 재전달 후 dead-letter, 발행하지 못한 키 지정 이벤트는 outbox에서 다시 발행
+import asyncio
+import os
+
+import fakeredis
+import pytest
+
+from app.common import event_bus
+from app.common.event_bus import RedisEventBus, flush_outbox, publish_event
+
+
+@pytest.fixture
+def fast_bus(monkeypatch):
+    monkeypatch.setattr(event_bus, "RETRY_IDLE_MS", 50)
+    monkeypatch.setattr(event_bus, "BLOCK_MS", 10)
+    monkeypatch.setattr(event_bus, "MAX_DELIVERIES", 3)
+    server = fakeredis.FakeServer()
+    return server, lambda service: RedisEventBus(service, fakeredis.aioredis.FakeRedis(server=server))
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("timed out")
+        await asyncio.sleep(0.02)
+
+
+def test_failed_event_is_redelivered_then_acked(fast_bus):
+    _, make_bus = fast_bus
+    calls = []
+
+    async def flaky(event):
+        calls.append(event["data"]["version"])
+        if len(calls) == 1:
+            raise RuntimeError("report store busy")
+
+    async def run():
+        consumer = make_bus("report-service")
+        consumer.subscribe("calculation.completed", flaky)
+        await consumer.start()
+        producer = make_bus("cbam-service")
+        await producer.publish("calculation.completed", {"version": 7})
+
+        async def acked():
+            return len(calls) == 2 and (await consumer.stats())["streams"]["calculation.completed"]["pending"] == 0
+
+        await _wait_for(acked)
+        stats = await consumer.stats()
+        await consumer.close()
+        return stats
+
+    stats = asyncio.run(run())
+    assert calls == [7, 7]
+    assert stats["dead_letters"] == 0
+
+
+def test_event_goes_to_dead_letter_and_can_be_replayed(fast_bus):
+    _, make_bus = fast_bus
+    calls = []
+
+    async def run():
+        fixed = asyncio.Event()
+
+        async def broken(event):
+            calls.append(event["id"])
+            if not fixed.is_set():
+                raise ValueError("bad payload")
+
+        consumer = make_bus("report-service")
+        consumer.subscribe("calculation.completed", broken)
+        await consumer.start()
+        event_id = await make_bus("cbam-service").publish("calculation.completed", {"version": 1})
+
+        async def dead():
+            return bool(await consumer.dead_letters())
+
+        await _wait_for(dead)
+        letters = await consumer.dead_letters()
+        fixed.set()
+        assert await consumer.replay_dead_letter(letters[0]["entry_id"])
+
+        async def replayed():
+            return calls.count(event_id) == event_bus.MAX_DELIVERIES + 1
+
+        await _wait_for(replayed)
+        remaining = await consumer.dead_letters()
+        await consumer.close()
+        return event_id, letters, remaining
+
+    event_id, letters, remaining = asyncio.run(run())
+    assert letters[0]["id"] == event_id and letters[0]["deliveries"] == event_bus.MAX_DELIVERIES
+    assert letters[0]["error"] == "ValueError: bad payload"
+    assert remaining == []
+
+
+def test_tracked_errors_are_bounded(fast_bus, monkeypatch):
+    _, make_bus = fast_bus
+    monkeypatch.setattr(event_bus, "MAX_TRACKED_ERRORS", 2)
+
+    async def failing(event):
+        raise RuntimeError("down")
+
+    async def run():
+        bus = make_bus("report-service")
+        bus.subscribe("calculation.completed", failing)
+        messages = [(f"1-{i}".encode(), {b"id": f"e{i}".encode(), b"type": b"calculation.completed",
+                                         b"data": b"{}", b"ts": b"0"}) for i in range(5)]
+        await bus._process("events:calculation.completed", messages)
+        return list(bus._errors)
+
+    assert asyncio.run(run()) == [b"1-3", b"1-4"]
+
+
+def test_unpublished_event_stays_in_outbox_until_the_next_write(fast_bus, monkeypatch, tmp_path):
+    server, make_bus = fast_bus
+    monkeypatch.setattr(event_bus, "OUTBOX_DIR", str(tmp_path / "outbox"))
+    monkeypatch.setattr(event_bus, "EVENT_BUS_URL", "redis://bus")
+    monkeypatch.setattr(event_bus, "_outbox_pending", True)
+    monkeypatch.setattr(event_bus, "_outbox_lock", None)
+
+    async def stream_versions():
+        reader = fakeredis.aioredis.FakeRedis(server=server)
+        entries = await reader.xrange("events:calculation.completed")
+        return [fields[b"data"].decode() for _, fields in entries]
+
+    async def run():
+        monkeypatch.setattr(event_bus, "_bus", make_bus("cbam-service"))
+        server.connected = False
+        lost = await publish_event("calculation.completed", {"quarter": "2026Q1", "version": 3}, outbox_key="co/2026Q1")
+        kept = os.listdir(tmp_path / "outbox")
+        server.connected = True
+        # 재시작 - 시작 시 flush가 남은 이벤트를 발행
+        monkeypatch.setattr(event_bus, "_bus", make_bus("cbam-service"))
+        monkeypatch.setattr(event_bus, "_outbox_pending", True)
+        republished = await flush_outbox()
+        after_start = await stream_versions()
+
+        # 발행 실패 후 다른 분기 쓰기 - 그 발행 전에 남은 이벤트부터 다시 보냄
+        server.connected = False
+        await publish_event("calculation.completed", {"quarter": "2026Q2", "version": 1}, outbox_key="co/2026Q2")
+        server.connected = True
+        await publish_event("calculation.completed", {"quarter": "2026Q3", "version": 1}, outbox_key="co/2026Q3")
+        return lost, kept, republished, after_start, await stream_versions(), os.listdir(tmp_path / "outbox")
+
+    lost, kept, republished, after_start, versions, left = asyncio.run(run())
+    assert lost is None and kept == ["calculation.completed--co_2026Q1.json"]
+    assert republished == 1 and after_start == ['{"quarter": "2026Q1", "version": 3}']
+    assert versions[1:] == ['{"quarter": "2026Q2", "version": 1}', '{"quarter": "2026Q3", "version": 1}']
+    assert left == []
@@ -0,0 +1,33 @@
+# 비용 예측 - 백분위 밴드는 시뮬레이션 경로의 정확한 백분위이고 블록 크기와 무관
+import numpy as np
+import pytest
+
+from app.service import forecast
+from app.service.forecast import ForecastParams, Portfolio, run_forecast
+
+
+def portfolio():
+    return Portfolio(groups=["7208", "7601"], in_scope_t=np.array([1000.0, 400.0]),
+                     benchmark_t=np.array([600.0, 100.0]), carbon_price_paid_eur=np.array([0.0, 5000.0]))
+
+
+def test_bands_are_exact_percentiles_of_the_simulated_paths():
+    params = ForecastParams(scenarios=10_000, horizon_years=4, seed=5, percentiles=[5, 50, 95])
+    result = run_forecast(portfolio(), params)
+    n_streams = -(-params.scenarios // forecast.STREAM_SCENARIOS)
+    streams = [np.random.Generator(np.random.PCG64(s)) for s in np.random.SeedSequence(5).spawn(n_streams)]
+    block = forecast._simulate_block(streams, portfolio(), params, params.cbam_factors())
+    cost = block["cost"][:params.scenarios]
+    np.testing.assert_allclose(result["annual_cost_eur"]["p50"], np.percentile(cost, 50, axis=0))
+    np.testing.assert_allclose(result["cumulative_cost_eur"]["p95"], np.percentile(np.cumsum(cost, axis=1), 95, axis=0))
+    np.testing.assert_allclose(result["ets_price_eur"]["mean"], block["price"][:params.scenarios].mean(axis=0))
+
+
+def test_forecast_does_not_depend_on_block_size(monkeypatch):
+    params = ForecastParams(scenarios=10_000, horizon_years=5, seed=3)
+    first = run_forecast(portfolio(), params)
+    monkeypatch.setattr(forecast, "FORECAST_BLOCK_BYTES", 1)
+    second = run_forecast(portfolio(), params)
+    assert first["cumulative_cost_eur"] == second["cumulative_cost_eur"]
+    assert first["total_cost_eur"]["p50"] == pytest.approx(first["cumulative_cost_eur"]["p50"][-1])
+    assert first["total_cost_eur"]["p5"] < first["total_cost_eur"]["p50"] < first["total_cost_eur"]["p95"]
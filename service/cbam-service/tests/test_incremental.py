@@ -0,0 +1,67 @@
+# 증분 재계산 - 바뀐 라인만 다시 계산하고 합계는 차이만큼 갱신, 공급자 값 정정은 같은 버전이어도 반영,
+# 오래된 버전 델타는 상한을 넘으면 정리
+import pandas as pd
+import pytest
+
+from app.service.calculation_engine import calculate_embedded_emissions
+from app.service import incremental
+from app.service.incremental import QuarterResults, VersionPruned
+
+
+def declarations(quantities=(10.0, 20.0, 30.0)):
+    return pd.DataFrame({
+        "cn_code": [72081000, 72081000, 76011000],
+        "quantity_t": list(quantities),
+        "installation_id": ["INST-A", "INST-A", "INST-B"],
+        "import_month": ["2026-01", "2026-02", "2026-03"],
+    }, index=["l1", "l2", "l3"])
+
+
+def full_recalculation(results: QuarterResults) -> float:
+    return float(calculate_embedded_emissions(results.effective_lines(), params=results.params)["certificates"].sum())
+
+
+def supplier(direct_see):
+    return pd.DataFrame({"installation_id": ["INST-A"], "direct_see": [direct_see], "indirect_see": [0.1]})
+
+
+def test_only_changed_lines_are_recomputed():
+    results = QuarterResults("acme", "2026Q1")
+    first = results.upsert_lines(declarations())
+    assert (first["added"], first["version"]) == (3, 1)
+
+    second = results.upsert_lines(declarations(quantities=(10.0, 25.0, 30.0)))
+    assert (second["changed"], second["unchanged"]) == (1, 2)
+    assert results.totals["certificates"] == pytest.approx(full_recalculation(results))
+    assert results.diff(1, 2)["changed_lines"] == 1
+
+    assert results.upsert_lines(declarations(quantities=(10.0, 25.0, 30.0)))["new_version"] is False
+
+
+def test_supplier_values_corrected_under_same_version_are_applied():
+    results = QuarterResults("acme", "2026Q1")
+    results.upsert_lines(declarations())
+
+    applied = results.apply_supplier_data(supplier(1.5), "2026-03")
+    assert (applied["changed"], applied["new_version"]) == (2, True)
+    assert results.apply_supplier_data(supplier(1.5), "2026-03")["new_version"] is False
+
+    corrected = results.apply_supplier_data(supplier(1.2), "2026-03")
+    assert (corrected["changed"], corrected["unchanged"]) == (2, 1)
+    assert results.lines.loc[["l1", "l2"], "direct_see_used"].tolist() == [1.2, 1.2]
+    assert results.totals["certificates"] == pytest.approx(full_recalculation(results))
+
+
+def test_old_version_deltas_are_pruned(monkeypatch):
+    monkeypatch.setattr(incremental, "MAX_VERSIONS", 3)
+    results = QuarterResults("acme", "2026Q1")
+    for quantity in (10.0, 11.0, 12.0, 13.0, 14.0):
+        results.upsert_lines(declarations(quantities=(quantity, 20.0, 30.0)))
+
+    assert [v.number for v in results.versions] == [3, 4, 5]
+    assert results.base_version == 2 and results.current_version == 5
+    assert results.diff(2, 5)["changed_lines"] == 1
+    with pytest.raises(VersionPruned):
+        results.diff(1, 5)
+    with pytest.raises(ValueError):
+        results.diff(2, 6)
@@ -0,0 +1,56 @@
+# 신고 파일 적재 - 숫자가 아닌 셀이 있는 행만 거부하고 나머지는 계속 계산
+import pytest
+
+from app.service.calculation_engine import CalculationParams
+from app.service.ingestion import IngestionJob
+
+ROWS = [
+    ("72081000", "10", "1.0", "0.1"),
+    ("72081000", "1O", "", ""),        # 수량 오타 → 거부
+    ("72081000", "5", "abc", ""),      # 직접 배출 오타 → 거부
+    ("72081000", "5", "", ""),         # 빈 칸은 기본값 사용
+    ("1234", "5", "", ""),             # 잘못된 CN 코드 → 거부
+]
+
+
+def run_job(path, file_format):
+    job = IngestionJob(str(path), file_format, CalculationParams())
+    job.run()
+    return job
+
+
+def write_csv(path):
+    header = "cn_code,quantity_t,direct_see,indirect_see\n"
+    path.write_text(header + "".join(",".join(row) + "\n" for row in ROWS))
+
+
+def test_bad_cells_reject_only_their_rows(tmp_path):
+    path = tmp_path / "declarations.csv"
+    write_csv(path)
+    job = run_job(path, "csv")
+
+    assert job.status == "completed", job.error
+    assert (job.rows_read, job.rows_valid, job.rows_rejected) == (5, 2, 3)
+    assert job.totals["quantity_t"] == pytest.approx(15.0)
+    assert job.totals["default_value_lines"] == 1
+    samples = {sample["row"]: sample for sample in job.errors}
+    assert samples[1]["unparseable"] == ["quantity_t"]
+    assert samples[2]["unparseable"] == ["direct_see"]
+    assert "unparseable" not in samples[4]
+
+
+def test_xlsx_text_in_numeric_cell_is_rejected(tmp_path):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["cn_code", "quantity_t", "direct_see", "indirect_see"])
+    sheet.append([72081000, 10, 1.0, 0.1])
+    sheet.append([72081000, "1O", None, None])
+    path = tmp_path / "declarations.xlsx"
+    workbook.save(path)
+
+    job = run_job(path, "xlsx")
+    assert job.status == "completed", job.error
+    assert (job.rows_valid, job.rows_rejected) == (1, 1)
+    assert job.errors == [{"row": 1, "cn_code": 72081000, "unparseable": ["quantity_t"]}]
@@ -0,0 +1,89 @@
+# 샤드 병렬 실행 - 같은 그룹은 한 샤드, 합계/설비별 집계가 단일 계산과 같음, 깨진 풀/바뀐 기본값 인덱스 복구
+import os
+import signal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.service import parallel_run
+from app.service.calculation_engine import (
+    DEFAULT_FACTOR_TABLE, CalculationParams, calculate_embedded_emissions, reload_factor_table, summarize,
+)
+from app.service.cn_index import build_index_file
+from app.service.parallel_run import ShardedRun, plan_shards
+
+
+@pytest.fixture(scope="module", autouse=True)
+def executor():
+    yield
+    parallel_run.shutdown_executor()
+
+
+def sample_lines(n=5_000, seed=1):
+    rng = np.random.default_rng(seed)
+    return {
+        "cn_code": rng.choice([72081000, 72142000, 76011000, 25231000], n),
+        "quantity_t": rng.uniform(1, 100, n).round(3),
+        "installation_id": [f"INST-{i}" for i in rng.integers(0, 37, n)],
+        "direct_see": np.where(rng.random(n) < 0.3, 1.5, np.nan),
+    }
+
+
+def test_shards_never_split_a_group():
+    keys = np.repeat(np.arange(10), [5, 1, 1, 20, 2, 2, 2, 30, 1, 1])
+    ranges = plan_shards(keys, 4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(keys)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and keys[end - 1] != keys[end]
+
+
+@pytest.mark.parametrize("shard_by", ["installation", "cn_group"])
+def test_sharded_totals_match_single_pass(shard_by):
+    lines = sample_lines()
+    params = CalculationParams(year=2027)
+    expected = summarize(calculate_embedded_emissions(lines, params=params))
+
+    run = ShardedRun(lines, params, shard_by=shard_by, n_shards=6)
+    run.run()
+
+    assert run.status == "completed", run.error
+    assert run.to_dict()["progress"] == 1.0
+    for field in ("quantity_t", "embedded_total_t", "certificates", "default_value_lines"):
+        assert run.totals[field] == pytest.approx(expected[field])
+    by_installation = sum(v["certificates"] for v in run.by_installation.values())
+    assert by_installation == pytest.approx(expected["certificates"])
+
+
+def _run_matches_single_pass(lines, params):
+    run = ShardedRun(lines, params, n_shards=4)
+    run.run()
+    assert run.status == "completed", run.error
+    expected = summarize(calculate_embedded_emissions(lines, params=params))
+    assert run.totals["certificates"] == pytest.approx(expected["certificates"])
+    return run
+
+
+def test_workers_follow_a_reloaded_factor_table(tmp_path):
+    lines, params = sample_lines(n=2_000), CalculationParams(year=2027)
+    _run_matches_single_pass(lines, params)
+    index_path = os.environ["CBAM_FACTOR_INDEX"]
+    table = pd.read_csv(DEFAULT_FACTOR_TABLE, comment="#", dtype={"cn_code": str})
+    table["direct_default"] *= 2
+    table.to_csv(tmp_path / "doubled.csv", index=False)
+    try:
+        build_index_file(str(tmp_path / "doubled.csv"), index_path)
+        reload_factor_table()
+        # 워커는 첫 실행 때의 인덱스를 캐시하고 있음 - 버전이 달라 다시 매핑해야 결과가 맞음
+        _run_matches_single_pass(lines, params)
+    finally:
+        build_index_file(DEFAULT_FACTOR_TABLE, index_path)
+        reload_factor_table()
+
+
+def test_pool_is_replaced_after_a_worker_dies():
+    lines, params = sample_lines(n=2_000), CalculationParams(year=2027)
+    pids = {s["pid"] for s in _run_matches_single_pass(lines, params).shards}
+    os.kill(next(iter(pids)), signal.SIGKILL)
+    run = _run_matches_single_pass(lines, params)
+    assert not pids & {s["pid"] for s in run.shards}
@@ -0,0 +1,60 @@
+# 결과 저장소 - 쿼리 문자열 필터는 열 dtype에 맞게 비교, 증분 저장은 델타 파트로 추가하고 읽을 때 최신 값만
+import numpy as np
+import pandas as pd
+
+from app.common.result_store import parse_filter, read_partition, iter_partition, write_partition
+from app.service.incremental import QuarterResults
+
+
+def declarations(ids, quantities):
+    return pd.DataFrame({
+        "cn_code": [72081000] * len(ids),
+        "quantity_t": list(quantities),
+        "installation_id": ["INST-A"] * len(ids),
+    }, index=ids)
+
+
+def test_query_string_filters_follow_column_type(tmp_path):
+    write_partition("test", "acme", "2026Q1", {
+        "code": np.array(["007", "7", "070"], dtype=object),
+        "quantity": np.array([1.0, 7.0, 70.0]),
+    }, root=str(tmp_path))
+
+    data, _ = read_partition("test", "acme", "2026Q1", filters=[parse_filter("code:eq:007")], root=str(tmp_path))
+    assert data["code"].tolist() == ["007"]
+
+    data, _ = read_partition("test", "acme", "2026Q1", filters=[parse_filter("quantity:ge:007")], root=str(tmp_path))
+    assert data["quantity"].tolist() == [7.0, 70.0]
+
+
+def test_persist_appends_changed_lines_and_load_sees_latest_state():
+    ids = [f"l{i}" for i in range(10)]
+    results = QuarterResults("delta-co", "2026Q1")
+    results.upsert_lines(declarations(ids, [10.0] * 10))
+    results.persist()
+
+    results.upsert_lines(declarations(["l3"], [99.0]), deleted=["l7"])
+    results.persist()
+
+    data, stats = read_partition("cbam", "delta-co", "2026Q1", columns=["quantity_t"])
+    assert stats["parts"] == 2
+    assert stats["rows"] == 9
+    assert sorted(data["quantity_t"].tolist()) == [10.0] * 8 + [99.0]
+    chunks = list(iter_partition("cbam", "delta-co", "2026Q1", columns=["line_id"]))
+    assert sorted(v for c in chunks for v in c["line_id"]) == sorted(set(ids) - {"l7"})
+
+    loaded = QuarterResults.load("delta-co", "2026Q1")
+    pd.testing.assert_frame_equal(loaded.lines.sort_index(), results.lines.sort_index(), check_index_type=False)
+    assert loaded.totals == results.totals
+
+
+def test_many_changed_lines_compact_the_partition():
+    ids = [f"l{i}" for i in range(4)]
+    results = QuarterResults("compact-co", "2026Q1")
+    results.upsert_lines(declarations(ids, [1.0] * 4))
+    results.persist()
+    results.upsert_lines(declarations(ids, [2.0] * 4))
+    results.persist()
+
+    data, stats = read_partition("cbam", "compact-co", "2026Q1", columns=["quantity_t"])
+    assert (stats["parts"], data["quantity_t"].tolist()) == (1, [2.0] * 4)
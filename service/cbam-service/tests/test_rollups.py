@@ -0,0 +1,48 @@
+# 대시보드 롤업 - 변경분만 더하고 빼도 라인 전체를 다시 묶은 결과와 같아야 함
+import pandas as pd
+import pytest
+
+from app.common.result_store import parse_filter
+from app.service.incremental import QuarterResults
+
+
+def declarations(quantities, countries=("CN", "CN", "IN")):
+    return pd.DataFrame({
+        "cn_code": [72081000, 72081000, 76011000],
+        "quantity_t": list(quantities),
+        "country_of_origin": list(countries),
+        "import_month": ["2026-01", "2026-02", "2026-02"],
+    }, index=["l1", "l2", "l3"])
+
+
+def regrouped(results: QuarterResults, column: str) -> dict:
+    lines = results.lines[results.lines["certificates"].notna()]
+    return lines.groupby(column)["certificates"].sum().to_dict()
+
+
+def by_group(response: dict, dim: str) -> dict:
+    return {row[dim]: row["certificates"] for row in response["rows"]}
+
+
+def test_rollup_tracks_updates_moves_and_deletions():
+    results = QuarterResults("rollup-co", "2026Q1")
+    results.upsert_lines(declarations([10.0, 20.0, 30.0]))
+    # 수량 변경 + 국가 이동 + 삭제
+    results.upsert_lines(declarations([15.0, 20.0, 30.0], countries=("CN", "IN", "IN")), deleted=["l3"])
+
+    marginal = results.rollup.query(["country"])
+    assert marginal["source"] == "marginal"
+    assert by_group(marginal, "country") == pytest.approx(regrouped(results, "country_of_origin"))
+    assert {row["country"]: row["lines"] for row in marginal["rows"]} == {"CN": 1, "IN": 1}
+
+
+def test_rollup_filters_compare_dimension_strings():
+    results = QuarterResults("rollup-co", "2026Q2")
+    results.upsert_lines(declarations([10.0, 20.0, 30.0]))
+
+    steel = results.rollup.query(["month"], [parse_filter("cn_code:eq:72081000")])
+    assert steel["source"] == "cells"
+    assert sorted(by_group(steel, "month")) == ["2026-01", "2026-02"]
+
+    total = results.rollup.query([], [parse_filter("month:ge:2026-02")])
+    assert total["rows"][0]["lines"] == 2
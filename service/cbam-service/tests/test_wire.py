@@ -0,0 +1,41 @@
+# 내부 바이너리 인코딩 - 숫자 열은 원시 배열로, 디코더가 못 읽는 dtype은 리스트로, JSON 변환은 JSON 응답과 같게
+import json
+
+import msgpack
+import numpy as np
+import pytest
+
+from app.common.wire import ARRAY_EXT, accepts_packed, packb, packed_to_json, unpackb
+
+
+def test_numeric_columns_round_trip_as_arrays():
+    body = {"q": np.array([1.5, np.nan, 3.0]), "n": np.arange(3, dtype=np.int32), "ok": np.array([True, False])}
+    decoded = unpackb(packb(body))
+    assert decoded["q"].dtype == np.float64 and decoded["n"].dtype == np.int32
+    np.testing.assert_array_equal(decoded["q"], body["q"])
+    assert json.loads(packed_to_json(packb(body))) == {"q": [1.5, None, 3.0], "n": [0, 1, 2], "ok": [True, False]}
+
+
+@pytest.mark.parametrize("dtype", ["float16", "complex64"])
+def test_unsupported_dtypes_fall_back_to_lists(dtype):
+    values = np.arange(3).astype(dtype)
+    if dtype == "complex64":
+        # JSON으로도 보낼 수 없는 값 - 원시 배열로 잘못 싣지 않고 직렬화 오류
+        with pytest.raises(TypeError):
+            packb({"v": values})
+        return
+    assert unpackb(packb({"v": values})) == {"v": [0.0, 1.0, 2.0]}
+    assert json.loads(packed_to_json(packb({"v": values}))) == {"v": [0.0, 1.0, 2.0]}
+
+
+def test_unknown_array_dtype_is_rejected_clearly():
+    payload = msgpack.packb({"v": msgpack.ExtType(ARRAY_EXT, b"<f2" + b"\x00" * 4)}, use_bin_type=True)
+    with pytest.raises(ValueError, match="dtype"):
+        unpackb(payload, numpy_arrays=False)
+
+
+def test_accept_negotiation():
+    assert accepts_packed("application/vnd.cbam.packed+msgpack, application/json;q=0.5")
+    assert not accepts_packed("application/vnd.cbam.packed+msgpack;q=0")
+    assert not accepts_packed("application/json")
+    assert not accepts_packed(None)
@@ -1 +1,103 @@
-# Empty main.py file
+# Chatbot Service - CBAM/LCA 규정 Q&A
+import os
+import sys
+import asyncio
+import logging
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from app.common.loop_monitor import start_loop_monitor, stop_loop_monitor, loop_monitor_router
+from app.common.profiler import install_profiler
+from app.common.tracing import install_tracing, shutdown_tracing
+from app.router.chat_router import chat_router
+from app.service.answer_cache import init_answer_cache, close_answer_cache
+from app.service.cbam_chat import get_index, open_index
+from app.service.conversation import init_conversation_store, close_conversation_store
+from app.service.llm import get_chat_model
+
+# Railway 환경 확인
+IS_RAILWAY = os.getenv("RAILWAY_ENVIRONMENT") == "true" or (os.getenv("PORT") is not None and os.getenv("PORT") != "")
+
+# 로깅 설정
+if IS_RAILWAY:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    print("🚂 Chatbot Service - Railway 환경에서 실행 중")
+else:
+    logging.basicConfig(level=logging.INFO)
+    print("🏠 Chatbot Service - 로컬 환경에서 실행 중")
+
+logger = logging.getLogger("chatbot_service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("🚀 Chatbot Service 시작")
+    # 검색 색인 미리 열기 (없으면 코퍼스로 생성 - 첫 질문 지연 방지)
+    await asyncio.to_thread(get_index)
+    # 의미 기반 답변 캐시 (Redis 공유, 없으면 프로세스 내부)
+    await init_answer_cache()
+    # 대화 기억 저장소 (Redis 공유, 없으면 프로세스 내부)
+    await init_conversation_store()
+    get_chat_model()
+    # 이벤트 루프 지연/느린 콜백 모니터 시작
+    await start_loop_monitor("chatbot-service")
+    yield
+    await stop_loop_monitor()
+    await close_answer_cache()
+    await close_conversation_store()
+    # 남은 트레이스 스팬 내보내기
+    shutdown_tracing()
+    logger.info("🛑 Chatbot Service 종료")
+
+app = FastAPI(
+    title="Chatbot Service",
+    description="Chatbot Service - CBAM 규정 근거 검색 및 Q&A",
+    version="0.1.0",
+    lifespan=lifespan
+)
+
+# 관리자 전용 프로파일러 (요청 단위 프로파일링 미들웨어가 가장 안쪽에 오도록 먼저 등록)
+install_profiler(app, "chatbot-service")
+
+# CORS 설정
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# 분산 트레이싱 미들웨어 (Gateway가 보낸 traceparent 이어받기)
+install_tracing(app, "chatbot-service")
+
+@app.get("/health")
+async def health_check():
+    """헬스체크 - 이미 열린 색인 정보만 반환 (프로버가 몇 초마다 호출하므로 파일 확인/재생성 없음)"""
+    index = open_index()
+    return {
+        "status": "healthy",
+        "service": "chatbot-service",
+        "timestamp": datetime.now().isoformat(),
+        "corpus_version": index.corpus_version if index is not None else None,
+        "index_vectors": index.size if index is not None else 0,
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 메트릭 엔드포인트"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+# 라우터를 앱에 포함
+app.include_router(chat_router)
+app.include_router(loop_monitor_router)
+
+# Docker에서 uvicorn으로 실행되므로 직접 실행 코드 제거
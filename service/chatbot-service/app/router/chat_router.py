@@ -0,0 +1,148 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.common.tracing import start_span
+from app.service.answer_cache import init_answer_cache
+from app.service.cbam_chat import (
+    TOP_K, answer_question, batcher_stats, get_index, rebuild_index, retrieve, save_document, stream_answer,
+)
+from app.service.conversation import (
+    TOKEN_BUDGET, delete_conversation, history_tokens, load_history, validate_conversation_id,
+)
+
+logger = logging.getLogger("chatbot_service")
+
+chat_router = APIRouter(prefix="/api/v1/chatbot/cbam", tags=["CBAM Chatbot"])
+
+
+class SearchRequest(BaseModel):
+    question: str = Field(..., min_length=1, max_length=4000)
+    k: int = Field(TOP_K, ge=1, le=50)
+    # 검증용 - IVF 색인이 있어도 전수 비교
+    exact: Optional[bool] = None
+
+
+class AskRequest(BaseModel):
+    question: str = Field(..., min_length=1, max_length=4000)
+    k: int = Field(TOP_K, ge=1, le=20)
+    # false면 의미 캐시를 건너뛰고 새로 생성 (결과는 캐시에 저장)
+    use_cache: bool = True
+    # 있으면 이전 대화(요약 + 최근 턴)를 프롬프트에 넣고 이번 질문/답변을 이어 저장
+    conversation_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class DocumentRequest(BaseModel):
+    """추가 문서 (마크다운, '## 소제목' 단위로 청크 분할)"""
+    doc_id: str = Field(..., min_length=1, max_length=128)
+    title: str = ""
+    text: str = Field(..., min_length=1)
+
+
+@chat_router.post("/search", summary="CBAM 규정 근거 문단 검색 (top-k)")
+async def search_chunks(body: SearchRequest):
+    started = time.perf_counter()
+    with start_span("chatbot retrieval", k=body.k):
+        # 동시 요청과 묶어 임베딩/행렬곱을 배치로 실행 (스레드에서, numpy 연산 중 GIL 해제)
+        result = await retrieve(body.question, body.k, body.exact)
+    result["took_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+@chat_router.post("/ask", summary="CBAM 규정 Q&A (의미 캐시 → 근거 검색 → 답변 생성)")
+async def ask(body: AskRequest):
+    started = time.perf_counter()
+    with start_span("chatbot answer", k=body.k) as span:
+        result = await answer_question(body.question, body.k, body.use_cache, body.conversation_id)
+        span.set_attribute("cached", result["cached"])
+    result["took_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+@chat_router.post("/chat/stream", summary="CBAM 규정 Q&A 토큰 스트리밍 (SSE: sources → token … → done)")
+async def chat_stream(body: AskRequest):
+    """모델이 토큰을 내는 즉시 한 이벤트씩 전송 - 클라이언트가 끊으면 응답 태스크가 취소되며 생성도 중단"""
+
+    async def event_source():
+        events = stream_answer(body.question, body.k, body.use_cache, body.conversation_id)
+        try:
+            async for event in events:
+                yield f"event: {event.pop('type')}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            # 헤더가 이미 나갔으므로 오류도 이벤트로 알림
+            logger.error(f"❌ 답변 스트림 오류: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)}, ensure_ascii=False)}\n\n"
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        # 중간 프록시 버퍼링 방지
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _rebuild():
+    """재색인 후 코퍼스 버전이 바뀌었으면 이전 버전 캐시 답변 폐기"""
+    previous = (await asyncio.to_thread(get_index)).corpus_version
+    index = await asyncio.to_thread(rebuild_index)
+    if index.corpus_version != previous:
+        await (await init_answer_cache()).invalidate(previous)
+    return index.stats()
+
+
+@chat_router.get("/index", summary="검색 색인 상태")
+async def index_stats():
+    return {**(await asyncio.to_thread(get_index)).stats(), "batchers": batcher_stats()}
+
+
+@chat_router.post("/index/rebuild", summary="문서 재청크/재색인 (캐시에 없는 청크만 임베딩)")
+async def rebuild():
+    return await _rebuild()
+
+
+@chat_router.post("/documents", summary="문서 추가/교체 후 재색인")
+async def add_document(body: DocumentRequest):
+    try:
+        await asyncio.to_thread(save_document, body.doc_id, body.title, body.text)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    logger.info(f"📄 검색 문서 추가: {body.doc_id}")
+    return await _rebuild()
+
+
+@chat_router.get("/conversations/{conversation_id}", summary="대화 기억 조회 (요약 + 최근 턴)")
+async def get_conversation(conversation_id: str):
+    try:
+        validate_conversation_id(conversation_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    state = await load_history(conversation_id)
+    return {
+        "conversation_id": conversation_id,
+        "summary": state["s"],
+        "summary_tokens": state["sn"],
+        "folded_through": state["f"],
+        "turns": [{"seq": seq, "role": "user" if role == "u" else "assistant", "text": text, "tokens": tokens}
+                  for seq, role, text, tokens in state["t"]],
+        "history_tokens": history_tokens(state),
+        "token_budget": TOKEN_BUDGET,
+    }
+
+
+@chat_router.delete("/conversations/{conversation_id}", summary="대화 기억 삭제")
+async def remove_conversation(conversation_id: str):
+    try:
+        validate_conversation_id(conversation_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    await delete_conversation(conversation_id)
+    logger.info(f"🗑️ 대화 기억 삭제: {conversation_id}")
+    return {"conversation_id": conversation_id, "deleted": True}
@@ -0,0 +1,233 @@
+# 의미 기반 답변 캐시 - 질문 임베딩의 최근접 캐시 질문이 임계 유사도 이상이면 저장된 답변 반환
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger("chatbot_service")
+
+REDIS_URL = os.getenv("REDIS_URL", "")
+# 코사인 유사도 임계값 - 잘못된 답을 돌려주는 것보다 놓치는 편이 나으므로 보수적으로
+SIMILARITY_THRESHOLD = float(os.getenv("CHAT_ANSWER_CACHE_THRESHOLD", "0.92"))
+MAX_ENTRIES = int(os.getenv("CHAT_ANSWER_CACHE_MAX_ENTRIES", "20000"))
+TTL_SECONDS = int(os.getenv("CHAT_ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Redis 스트림에서 한 번에 가져오는 항목 수
+SYNC_BATCH = 1000
+
+CACHE_LOOKUPS = Counter("chatbot_answer_cache_total", "Semantic answer cache lookups", ["result"])
+CACHE_SAVED_SECONDS = Counter(
+    "chatbot_answer_cache_saved_seconds_total", "Answer generation time avoided by cache hits (minus lookup time)",
+)
+CACHE_LOOKUP_SECONDS = Histogram(
+    "chatbot_answer_cache_lookup_seconds", "Semantic cache lookup latency",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+CACHE_ENTRIES = Gauge("chatbot_answer_cache_entries", "Cached answers for the active corpus version in this instance")
+
+
+class _Mirror:
+    """코퍼스 버전 × 범위(모델, k) 하나의 캐시 항목 - 질문 벡터 행렬(내적 = 코사인) + 답변, 가장 오래된 것부터 밀어냄"""
+
+    def __init__(self, version: str, scope: str = ""):
+        self.version = version
+        self.scope = scope
+        self.vectors: Optional[np.ndarray] = None
+        self.size = 0
+        self.entries: deque = deque()
+        # Redis 스트림에서 마지막으로 반영한 항목 ID
+        self.last_id = "-"
+
+    def add(self, vector: np.ndarray, entry: Dict[str, Any]):
+        if self.vectors is None or self.vectors.shape[1] != len(vector):
+            self.vectors = np.empty((min(64, MAX_ENTRIES), len(vector)), dtype=np.float32)
+            self.size = 0
+            self.entries.clear()
+        if self.size == len(self.vectors):
+            if self.size >= MAX_ENTRIES:
+                # 오래된 절반을 버려 밀어내기 비용을 분할 상환
+                keep = MAX_ENTRIES // 2
+                self.vectors[:keep] = self.vectors[self.size - keep:self.size]
+                for _ in range(self.size - keep):
+                    self.entries.popleft()
+                self.size = keep
+            else:
+                grown = np.empty((min(2 * len(self.vectors), MAX_ENTRIES), self.vectors.shape[1]), dtype=np.float32)
+                grown[:self.size] = self.vectors[:self.size]
+                self.vectors = grown
+        self.vectors[self.size] = vector
+        self.entries.append(entry)
+        self.size += 1
+
+    def nearest(self, vector: np.ndarray) -> Tuple[Optional[Dict[str, Any]], float]:
+        if not self.size or self.vectors.shape[1] != len(vector):
+            return None, 0.0
+        scores = self.vectors[:self.size] @ vector
+        best = int(np.argmax(scores))
+        return self.entries[best], float(scores[best])
+
+
+class LocalAnswerCache:
+    """프로세스 내부 캐시 - REDIS_URL이 없거나 연결되지 않을 때"""
+    name = "local"
+
+    def __init__(self):
+        self.version = ""
+        self.mirrors: Dict[str, _Mirror] = {}
+
+    async def close(self):
+        pass
+
+    def _mirror_for(self, version: str, scope: str) -> _Mirror:
+        # 코퍼스 버전이 바뀌면 이전 버전 답변은 모두 무효
+        if self.version != version:
+            self.version = version
+            self.mirrors = {}
+        mirror = self.mirrors.get(scope)
+        if mirror is None:
+            mirror = self.mirrors[scope] = _Mirror(version, scope)
+        return mirror
+
+    def _entries(self) -> int:
+        return sum(mirror.size for mirror in self.mirrors.values())
+
+    async def _sync(self, mirror: _Mirror):
+        pass
+
+    async def _publish(self, mirror: _Mirror, vector: np.ndarray, entry: Dict[str, Any]) -> bool:
+        return False
+
+    async def lookup(self, version: str, scope: str, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """임계값 이상인 최근접 캐시 답변 (similarity 포함) 또는 None
+
+        scope는 답변을 바꾸는 생성 조건(모델, 근거 문단 수 k) - 다른 조건으로 만든 답은 돌려주지 않음
+        """
+        started = time.perf_counter()
+        mirror = self._mirror_for(version, scope)
+        await self._sync(mirror)
+        entry, similarity = mirror.nearest(vector)
+        elapsed = time.perf_counter() - started
+        CACHE_LOOKUP_SECONDS.observe(elapsed)
+        CACHE_ENTRIES.set(self._entries())
+        if entry is None or similarity < SIMILARITY_THRESHOLD:
+            CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        CACHE_LOOKUPS.labels("hit").inc()
+        CACHE_SAVED_SECONDS.inc(max(entry["generation_seconds"] - elapsed, 0.0))
+        return {**entry, "similarity": round(similarity, 4)}
+
+    async def store(self, version: str, scope: str, question: str, vector: np.ndarray, payload: Dict[str, Any],
+                    generation_seconds: float):
+        entry = {"question": question, "payload": payload, "generation_seconds": generation_seconds}
+        vector = np.asarray(vector, dtype=np.float32)
+        mirror = self._mirror_for(version, scope)
+        # Redis에 올렸으면 다음 동기화 때 자기 항목도 스트림에서 받아 반영
+        if not await self._publish(mirror, vector, entry):
+            mirror.add(vector, entry)
+            CACHE_ENTRIES.set(self._entries())
+
+    async def invalidate(self, version: str):
+        if self.version == version:
+            self.version = ""
+            self.mirrors = {}
+
+
+class RedisAnswerCache(LocalAnswerCache):
+    """Redis 스트림 공유 캐시 - 여러 chatbot-service 인스턴스가 같은 답변을 재사용
+
+    chatbot:answers:{corpus_version}:{scope}   항목 스트림 (q: 질문, v: float32 벡터, e: 답변 JSON), MAXLEN/TTL로 제한
+    인스턴스는 스트림을 마지막 ID 이후만 읽어 로컬 행렬에 반영하고 최근접 탐색은 로컬에서 수행
+    Redis 오류 시에는 로컬 항목만으로 동작 (요청은 실패시키지 않음)
+    """
+    name = "redis"
+
+    def __init__(self, client):
+        super().__init__()
+        self.redis = client
+        self._sync_lock: Optional[asyncio.Lock] = None
+
+    async def close(self):
+        await self.redis.aclose()
+
+    @staticmethod
+    def _key(version: str, scope: str) -> str:
+        return f"chatbot:answers:{version}:{scope}"
+
+    async def _sync(self, mirror: _Mirror):
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        # 동시 조회가 같은 구간을 두 번 반영하지 않도록 직렬화
+        async with self._sync_lock:
+            await self._read_stream(mirror)
+
+    async def _read_stream(self, mirror: _Mirror):
+        try:
+            while True:
+                start = "-" if mirror.last_id == "-" else f"({mirror.last_id}"
+                items = await self.redis.xrange(self._key(mirror.version, mirror.scope), min=start, count=SYNC_BATCH)
+                for item_id, fields in items:
+                    mirror.last_id = item_id.decode()
+                    mirror.add(np.frombuffer(fields[b"v"], dtype=np.float32), json.loads(fields[b"e"]))
+                if len(items) < SYNC_BATCH:
+                    return
+        except Exception as e:
+            logger.warning(f"⚠️ 답변 캐시 Redis 동기화 실패 - 로컬 항목만 사용: {str(e)}")
+
+    async def _publish(self, mirror: _Mirror, vector: np.ndarray, entry: Dict[str, Any]) -> bool:
+        key = self._key(mirror.version, mirror.scope)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.xadd(
+                    key, {"q": entry["question"], "v": vector.tobytes(), "e": json.dumps(entry, ensure_ascii=False)},
+                    maxlen=MAX_ENTRIES, approximate=True,
+                )
+                pipe.expire(key, TTL_SECONDS)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ 답변 캐시 Redis 저장 실패 - 로컬에만 저장: {str(e)}")
+            return False
+
+    async def invalidate(self, version: str):
+        await super().invalidate(version)
+        try:
+            keys = [key async for key in self.redis.scan_iter(match=self._key(version, "*"), count=100)]
+            if keys:
+                await self.redis.delete(*keys)
+        except Exception as e:
+            logger.warning(f"⚠️ 답변 캐시 Redis 삭제 실패 (TTL로 만료): {str(e)}")
+
+
+_cache: Optional[LocalAnswerCache] = None
+
+
+async def init_answer_cache() -> LocalAnswerCache:
+    global _cache
+    if _cache is None:
+        if REDIS_URL:
+            try:
+                import redis.asyncio as aioredis
+
+                client = aioredis.from_url(REDIS_URL)
+                await client.ping()
+                logger.info(f"🗃️ 답변 캐시: Redis ({REDIS_URL})")
+                _cache = RedisAnswerCache(client)
+            except Exception as e:
+                logger.warning(f"⚠️ Redis 연결 실패 - 프로세스 내부 답변 캐시 사용: {str(e)}")
+        else:
+            logger.info("🗃️ 답변 캐시: 프로세스 내부 (REDIS_URL 미설정)")
+        if _cache is None:
+            _cache = LocalAnswerCache()
+    return _cache
+
+
+async def close_answer_cache():
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
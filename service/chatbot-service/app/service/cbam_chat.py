@@ -0,0 +1,890 @@
+# CBAM 규정 Q&A 검색 - 문서 청크 분할/임베딩, memmap float32 벡터 행렬, 정확 top-k 또는 IVF 분할 색인
+import os
+import re
+import json
+import math
+import uuid
+import time
+import fcntl
+import shutil
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import Counter as TermCounter
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.service.answer_cache import init_answer_cache
+from app.service.conversation import append_turn, history_messages, load_history, record_prompt
+from app.service.llm import get_chat_model
+from app.service.micro_batch import MicroBatcher
+
+logger = logging.getLogger("chatbot_service")
+
+CORPUS_DIR = os.getenv("CHAT_CORPUS_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cbam_regulation"))
+DATA_DIR = os.getenv("CHAT_DATA_DIR", os.path.join(os.getcwd(), "data", "chatbot"))
+# 업로드한 추가 문서 (내장 코퍼스와 함께 색인)
+DOCS_DIR = os.path.join(DATA_DIR, "documents")
+INDEX_DIR = os.path.join(DATA_DIR, "index")
+EMBED_CACHE_DIR = os.path.join(DATA_DIR, "embed-cache")
+
+CHUNK_WORDS = int(os.getenv("CHAT_CHUNK_WORDS", "180"))
+CHUNK_OVERLAP = int(os.getenv("CHAT_CHUNK_OVERLAP", "30"))
+TOP_K = int(os.getenv("CHAT_TOP_K", "5"))
+EMBEDDER = os.getenv("CHAT_EMBEDDER", "local")
+HASHING_DIM = int(os.getenv("CHAT_HASHING_DIM", "512"))
+# 벡터 수가 이 값 이하이면 전수 비교, 초과하면 IVF 색인 사용
+EXACT_MAX_VECTORS = int(os.getenv("CHAT_EXACT_MAX_VECTORS", "20000"))
+# IVF 리스트 수 (0이면 4·√n) / 질의당 탐색 리스트 수
+IVF_LISTS = int(os.getenv("CHAT_IVF_LISTS", "0"))
+IVF_NPROBE = int(os.getenv("CHAT_IVF_NPROBE", "8"))
+IVF_ITERATIONS = 12
+IVF_SAMPLE_PER_LIST = 64
+# 전수 비교 시 한 번에 읽는 행 수 (memmap 페이지 단위로 순차 접근)
+SEARCH_BLOCK_ROWS = 65536
+EMBED_BATCH = 256
+SYSTEM_PROMPT = (
+    "You are a CBAM (EU Carbon Border Adjustment Mechanism) compliance assistant. "
+    "Answer only from the numbered excerpts provided, cite them as [n], and say so when the excerpts do not "
+    "contain the answer. Answer in the language of the question."
+)
+
+RETRIEVAL_SECONDS = Histogram(
+    "chatbot_retrieval_seconds", "Vector search latency", ["mode"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+EMBED_CACHE = Counter("chatbot_embedding_cache_total", "Chunk embedding cache lookups", ["result"])
+INDEX_VECTORS = Gauge("chatbot_index_vectors", "Vectors in the active retrieval index")
+ANSWER_SECONDS = Histogram(
+    "chatbot_answer_seconds", "Question answering latency by source", ["source"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+TTFT_SECONDS = Histogram(
+    "chatbot_time_to_first_token_seconds", "Request start to first answer token", ["source"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+STREAM_TOKENS = Counter("chatbot_stream_tokens_total", "Answer text pieces streamed", ["source"])
+STREAM_CANCELLED = Counter(
+    "chatbot_stream_cancelled_total", "Answer generations stopped before completion (client disconnected)", ["source"],
+)
+
+_TOKEN = re.compile(r"[0-9a-z가-힣]+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_DOC_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+
+
+# ---------------------------------------------------------------------------
+# 문서 / 청크
+# ---------------------------------------------------------------------------
+
+def _read_document(path: str) -> Dict[str, str]:
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    doc_id = os.path.splitext(os.path.basename(path))[0]
+    title = next((line[2:].strip() for line in text.splitlines() if line.startswith("# ")), doc_id)
+    return {"doc_id": doc_id, "title": title, "text": text, "source": path}
+
+
+def load_documents() -> List[Dict[str, str]]:
+    """내장 코퍼스 + 업로드 문서 (같은 doc_id면 업로드 문서가 우선)"""
+    documents: Dict[str, Dict[str, str]] = {}
+    for directory in (CORPUS_DIR, DOCS_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if name.lower() == "readme.md" or not name.endswith((".md", ".txt")):
+                continue
+            document = _read_document(os.path.join(directory, name))
+            documents[document["doc_id"]] = document
+    return list(documents.values())
+
+
+def save_document(doc_id: str, title: str, text: str) -> str:
+    if not _DOC_ID.match(doc_id):
+        raise ValueError(f"doc_id 형식 오류: {doc_id}")
+    os.makedirs(DOCS_DIR, exist_ok=True)
+    path = os.path.join(DOCS_DIR, f"{doc_id}.md")
+    body = text if text.lstrip().startswith("# ") else f"# {title or doc_id}\n\n{text}"
+    tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(body)
+    os.replace(tmp, path)
+    return path
+
+
+def _split_long(paragraph: str, max_words: int) -> List[str]:
+    """최대 길이를 넘는 문단은 문장 단위로, 문장도 길면 단어 창으로 분할"""
+    pieces: List[str] = []
+    for sentence in _SENTENCE.split(paragraph):
+        words = sentence.split()
+        for start in range(0, len(words), max_words):
+            pieces.append(" ".join(words[start:start + max_words]))
+    return pieces
+
+
+def _sections(text: str) -> List[Tuple[str, List[str]]]:
+    """마크다운 → (소제목, 문단 목록) - 목록 항목은 같은 문단으로 유지"""
+    sections: List[Tuple[str, List[str]]] = [("", [])]
+    lines: List[str] = []
+
+    def flush():
+        if lines:
+            sections[-1][1].append(" ".join(lines))
+            lines.clear()
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.startswith("#"):
+            flush()
+            if not line.startswith("# "):
+                sections.append((line.lstrip("#").strip(), []))
+        elif not line:
+            flush()
+        else:
+            lines.append(line)
+    flush()
+    return [(heading, paragraphs) for heading, paragraphs in sections if paragraphs]
+
+
+def chunk_document(doc_id: str, title: str, text: str,
+                   max_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[Dict[str, Any]]:
+    """소제목 구간 안에서 문단을 max_words 단어까지 묶고, 다음 청크는 직전 청크 끝 overlap 단어로 시작"""
+    chunks: List[Dict[str, Any]] = []
+    for section, paragraphs in _sections(text):
+        pieces: List[str] = []
+        for paragraph in paragraphs:
+            pieces.extend(_split_long(paragraph, max_words) if len(paragraph.split()) > max_words else [paragraph])
+        current: List[str] = []
+        fresh = 0
+        for piece in pieces:
+            words = piece.split()
+            if fresh and len(current) + len(words) > max_words:
+                chunks.append(_chunk(doc_id, title, section, current, len(chunks)))
+                current = current[-overlap:] if overlap else []
+                fresh = 0
+            current.extend(words)
+            fresh += len(words)
+        if fresh:
+            chunks.append(_chunk(doc_id, title, section, current, len(chunks)))
+    return chunks
+
+
+def _chunk(doc_id: str, title: str, section: str, words: List[str], seq: int) -> Dict[str, Any]:
+    body = " ".join(words)
+    # 임베딩 입력에 문서 제목/소제목을 붙여 짧은 청크도 주제 문맥을 갖도록 함
+    embed_text = f"{title} - {section}\n{body}" if section else f"{title}\n{body}"
+    return {
+        "chunk_id": f"{doc_id}#{seq}",
+        "doc_id": doc_id,
+        "title": title,
+        "section": section,
+        "text": body,
+        "embed_text": embed_text,
+        "hash": hashlib.sha256(embed_text.encode("utf-8")).hexdigest(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 임베더
+# ---------------------------------------------------------------------------
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class Embedder:
+    """텍스트 → L2 정규화된 float32 벡터 (내적 = 코사인 유사도)"""
+    name = "base"
+    dim = 0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+@lru_cache(maxsize=2**18)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+class HashingEmbedder(Embedder):
+    """결정적 로컬 임베더 - 단어/바이그램/문자 트라이그램 특징 해싱 (외부 API 없이 오프라인 테스트)"""
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-v1-{dim}"
+
+    def _features(self, text: str) -> TermCounter:
+        words = [w for w in _TOKEN.findall(text.lower()) if w not in _STOP_WORDS]
+        features: TermCounter = TermCounter()
+        for word in words:
+            features[word] += 1.0
+            if len(word) >= 4:
+                # 어형 변화(emission/emissions) 흡수용 문자 트라이그램
+                padded = f"#{word}#"
+                for i in range(len(padded) - 2):
+                    features["c:" + padded[i:i + 3]] += 0.2
+        for first, second in zip(words, words[1:]):
+            features[f"b:{first} {second}"] += 0.5
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vector = vectors[row]
+            for feature, weight in self._features(text).items():
+                index, sign = _bucket(feature, self.dim)
+                # 빈도는 로그로 눌러 긴 청크의 반복 단어가 지배하지 않도록 함
+                vector[index] += sign * (1.0 + math.log(weight) if weight > 1.0 else weight)
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder(Embedder):
+    """OpenAI 임베딩 API (OPENAI_API_KEY 필요, 클라이언트는 첫 호출 때 생성)"""
+
+    def __init__(self, model: str, dim: int):
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}"
+        self._client = None
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI()
+        rows: List[List[float]] = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            response = self._client.embeddings.create(model=self.model, input=texts[start:start + EMBED_BATCH])
+            rows.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        vectors = np.asarray(rows, dtype=np.float32).reshape(len(texts), -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"임베딩 차원 불일치: {vectors.shape[1]} != {self.dim} (CHAT_EMBEDDING_DIM 확인)")
+        return _normalize(vectors)
+
+
+_embedder: Optional[Embedder] = None
+
+
+def get_embedder() -> Embedder:
+    global _embedder
+    if _embedder is None:
+        if EMBEDDER == "openai":
+            _embedder = OpenAIEmbedder(
+                os.getenv("CHAT_EMBEDDING_MODEL", "text-embedding-3-small"),
+                int(os.getenv("CHAT_EMBEDDING_DIM", "1536")),
+            )
+        elif EMBEDDER == "local":
+            _embedder = HashingEmbedder()
+        else:
+            raise ValueError(f"알 수 없는 CHAT_EMBEDDER: {EMBEDDER}")
+    return _embedder
+
+
+# ---------------------------------------------------------------------------
+# 임베딩 캐시 (청크 해시 → 벡터)
+# ---------------------------------------------------------------------------
+
+class EmbeddingCache:
+    """임베더별 추가 전용 파일 쌍 - .keys(32바이트 sha256 연속) + .f32(행 단위 벡터), 읽기는 memmap
+
+    벡터를 먼저 쓰고 키를 나중에 쓰므로 중간에 죽어도 키가 있는 행은 항상 완전함.
+    같은 볼륨을 쓰는 복제본끼리는 .lock 파일 flock으로 추가를 직렬화하고, 파일의 행 수가 알고 있는 것보다
+    많으면 다른 복제본이 추가한 키를 읽어 들인 뒤 그 뒤에 붙인다 (행 번호는 항상 파일 기준).
+    """
+
+    def __init__(self, directory: str, embedder: Embedder):
+        self.embedder = embedder
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", embedder.name)
+        os.makedirs(directory, exist_ok=True)
+        self.keys_path = os.path.join(directory, f"{safe_name}.keys")
+        self.vectors_path = os.path.join(directory, f"{safe_name}.f32")
+        self.lock_path = os.path.join(directory, f"{safe_name}.lock")
+        self._lock = threading.Lock()
+        self._rows: Dict[bytes, int] = {}
+        self._count = 0
+        self._matrix: Optional[np.ndarray] = None
+        with self._file_lock(fcntl.LOCK_EX):
+            self._sync(repair=True)
+
+    @contextmanager
+    def _file_lock(self, mode: int):
+        with open(self.lock_path, "ab") as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync(self, repair: bool):
+        """파일에 있는 완전한 행 중 아직 모르는 것 반영 (파일 잠금 안에서 호출)
+
+        repair면 (배타 잠금) 끝이 잘린 키/벡터를 잘라내 다음 추가가 올바른 행 번호에 붙도록 함
+        """
+        row_bytes = 4 * self.embedder.dim
+        keys_size = os.path.getsize(self.keys_path) if os.path.exists(self.keys_path) else 0
+        vector_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        count = min(keys_size // 32, vector_rows)
+        if count < self._count:
+            # 파일이 새로 만들어짐 - 처음부터 다시 읽음
+            self._rows, self._count = {}, 0
+        if count > self._count:
+            with open(self.keys_path, "rb") as f:
+                f.seek(self._count * 32)
+                keys = f.read((count - self._count) * 32)
+            for i in range(count - self._count):
+                self._rows.setdefault(keys[i * 32:(i + 1) * 32], self._count + i)
+            self._count = count
+        if repair:
+            for path, size in ((self.keys_path, count * 32), (self.vectors_path, count * row_bytes)):
+                if os.path.exists(path) and os.path.getsize(path) != size:
+                    os.truncate(path, size)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _view(self) -> np.ndarray:
+        if self._matrix is None or len(self._matrix) < self._count:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r").reshape(-1, self.embedder.dim)
+        return self._matrix
+
+    def embed(self, texts: List[str], hashes: List[str]) -> np.ndarray:
+        """캐시에 있는 청크는 memmap에서 읽고 나머지만 배치로 임베딩해 추가"""
+        keys = [bytes.fromhex(h) for h in hashes]
+        out = np.empty((len(texts), self.embedder.dim), dtype=np.float32)
+        with self._lock:
+            with self._file_lock(fcntl.LOCK_SH):
+                self._sync(repair=False)
+            missing = [i for i, key in enumerate(keys) if key not in self._rows]
+            hit_rows = [(i, self._rows[key]) for i, key in enumerate(keys) if key in self._rows]
+            if hit_rows:
+                view = self._view()
+                positions, rows = zip(*hit_rows)
+                out[list(positions)] = view[list(rows)]
+        EMBED_CACHE.labels("hit").inc(len(hit_rows))
+        EMBED_CACHE.labels("miss").inc(len(missing))
+        if not missing:
+            return out
+        # 같은 배치 안의 중복 청크는 한 번만 임베딩
+        first: Dict[bytes, int] = {}
+        for i in missing:
+            first.setdefault(keys[i], i)
+        unique = list(first)
+        fresh = self.embedder.embed([texts[first[key]] for key in unique]).astype(np.float32, copy=False)
+        position = {key: j for j, key in enumerate(unique)}
+        for i in missing:
+            out[i] = fresh[position[keys[i]]]
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            # 그 사이 다른 복제본이 붙인 행까지 반영한 뒤 파일 끝 행 번호부터 추가
+            self._sync(repair=True)
+            new_keys = [key for key in unique if key not in self._rows]
+            if new_keys:
+                vectors = np.ascontiguousarray(fresh[[position[key] for key in new_keys]])
+                with open(self.vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(self.keys_path, "ab") as f:
+                    f.write(b"".join(new_keys))
+                for key in new_keys:
+                    self._rows[key] = self._count
+                    self._count += 1
+        return out
+
+
+# ---------------------------------------------------------------------------
+# 벡터 색인
+# ---------------------------------------------------------------------------
+
+def _topk(scores: np.ndarray, k: int) -> np.ndarray:
+    """점수 내림차순 상위 k개 위치 (argpartition 후 k개만 정렬)"""
+    if len(scores) > k:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def train_ivf(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """구면 k-means (정규화 벡터, 내적 기준) - 표본으로 학습, 빈 리스트는 무작위 표본으로 재시드"""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, nlist * IVF_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(IVF_ITERATIONS):
+        assign = _nearest(sample, centroids)
+        counts = np.bincount(assign, minlength=nlist)
+        order = np.argsort(assign, kind="stable")
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[filled])[:-1]))
+        sums = np.zeros_like(centroids)
+        sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _manifest_stamp(directory: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(os.path.join(directory, "manifest.json"))
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+class VectorIndex:
+    """디렉터리 하나 = 색인 한 판
+
+    - vectors.f32: n×dim float32 (IVF 리스트 순으로 정렬, 리스트마다 연속 구간) - memmap으로 열어 상주 메모리 최소화
+    - chunks.jsonl: 행 순서와 같은 청크 메타데이터
+    - ivf.npz: 중심 벡터 + 리스트 시작 오프셋 (벡터 수가 EXACT_MAX_VECTORS 이하이면 없음)
+    - manifest.json: 임베더, 차원, 벡터 수, corpus_version
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # manifest 파일 식별자 - 다른 인스턴스가 색인을 교체했는지 stat 한 번으로 확인
+        self.stamp = _manifest_stamp(directory)
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        self.dim = int(self.manifest["dim"])
+        self.size = int(self.manifest["vectors"])
+        with open(os.path.join(directory, "chunks.jsonl"), encoding="utf-8") as f:
+            self.chunks = [json.loads(line) for line in f]
+        if self.size:
+            self.vectors = np.memmap(os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="r",
+                                     shape=(self.size, self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self.centroids: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        ivf_path = os.path.join(directory, "ivf.npz")
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                self.centroids = ivf["centroids"]
+                self.offsets = ivf["offsets"]
+
+    @property
+    def corpus_version(self) -> str:
+        return self.manifest["corpus_version"]
+
+    @property
+    def mode(self) -> str:
+        return "ivf" if self.centroids is not None else "exact"
+
+    @classmethod
+    def build(cls, directory: str, chunks: List[Dict[str, Any]], vectors: np.ndarray, embedder_name: str,
+              nlist: int = IVF_LISTS) -> "VectorIndex":
+        """임시 디렉터리에 모두 쓴 뒤 rename으로 교체 - 검색 중인 이전 색인의 memmap은 그대로 유효"""
+        n, dim = vectors.shape
+        digest = hashlib.sha256(f"{embedder_name}:{dim}".encode())
+        for chunk in chunks:
+            digest.update(bytes.fromhex(chunk["hash"]))
+        manifest: Dict[str, Any] = {
+            "embedder": embedder_name,
+            "dim": dim,
+            "vectors": n,
+            "documents": len({chunk["doc_id"] for chunk in chunks}),
+            "corpus_version": digest.hexdigest()[:16],
+        }
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp = os.path.join(parent, f".{os.path.basename(directory)}.tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            order = np.arange(n)
+            if n > EXACT_MAX_VECTORS:
+                lists = nlist or int(4 * math.sqrt(n))
+                centroids = train_ivf(vectors, lists)
+                assign = _nearest(vectors, centroids)
+                order = np.argsort(assign, kind="stable")
+                offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=lists)))).astype(np.int64)
+                np.savez(os.path.join(tmp, "ivf.npz"), centroids=centroids, offsets=offsets)
+                manifest["ivf_lists"] = lists
+            with open(os.path.join(tmp, "vectors.f32"), "wb") as f:
+                for start in range(0, n, SEARCH_BLOCK_ROWS):
+                    rows = order[start:start + SEARCH_BLOCK_ROWS]
+                    f.write(np.ascontiguousarray(vectors[rows], dtype=np.float32).tobytes())
+            with open(os.path.join(tmp, "chunks.jsonl"), "w", encoding="utf-8") as f:
+                for row in order:
+                    chunk = {key: value for key, value in chunks[row].items() if key != "embed_text"}
+                    f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            old = None
+            if os.path.exists(directory):
+                old = os.path.join(parent, f".{os.path.basename(directory)}.old-{uuid.uuid4().hex}")
+                os.rename(directory, old)
+            os.rename(tmp, directory)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+        return cls(directory)
+
+    def search(self, queries: np.ndarray, k: int, exact: Optional[bool] = None,
+               nprobe: int = IVF_NPROBE) -> List[List[Tuple[int, float]]]:
+        """질의 벡터들(m×dim) → 질의마다 (행, 점수) 상위 k개"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.size == 0 or k <= 0:
+            return [[] for _ in queries]
+        use_exact = self.centroids is None if exact is None else exact or self.centroids is None
+        if use_exact:
+            return self._search_exact(queries, k)
+        return [self._search_ivf(query, k, nprobe) for query in queries]
+
+    def _search_exact(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """블록마다 (질의 m × 블록 행) 점수 행렬 하나 → 질의별 상위 k를 한 번에 뽑아 후보만 누적"""
+        candidate_rows: List[np.ndarray] = []
+        candidate_scores: List[np.ndarray] = []
+        for start in range(0, self.size, SEARCH_BLOCK_ROWS):
+            scores = queries @ np.asarray(self.vectors[start:start + SEARCH_BLOCK_ROWS]).T
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            candidate_rows.append(top + start)
+            candidate_scores.append(np.take_along_axis(scores, top, axis=1))
+        rows, scores = np.concatenate(candidate_rows, axis=1), np.concatenate(candidate_scores, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        rows, scores = np.take_along_axis(rows, order, axis=1), np.take_along_axis(scores, order, axis=1)
+        return [[(int(r), float(v)) for r, v in zip(row, score)] for row, score in zip(rows, scores)]
+
+    def _search_ivf(self, query: np.ndarray, k: int, nprobe: int) -> List[Tuple[int, float]]:
+        probed = [i for i in _topk(self.centroids @ query, min(nprobe, len(self.centroids)))
+                  if self.offsets[i + 1] > self.offsets[i]]
+        if not probed:
+            return []
+        candidates = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in probed])
+        # 리스트가 연속 구간이라 memmap을 구간 단위로 순차 읽기
+        scores = np.concatenate([np.asarray(self.vectors[self.offsets[i]:self.offsets[i + 1]]) @ query for i in probed])
+        top = _topk(scores, k)
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.manifest, "mode": self.mode, "directory": self.directory}
+
+
+# ---------------------------------------------------------------------------
+# 서비스 진입점
+# ---------------------------------------------------------------------------
+
+_index: Optional[VectorIndex] = None
+_cache: Optional[EmbeddingCache] = None
+_index_lock = threading.Lock()
+
+
+def _embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(EMBED_CACHE_DIR, get_embedder())
+    return _cache
+
+
+def rebuild_index() -> VectorIndex:
+    """전체 문서 재청크 → 캐시에 없는 청크만 임베딩 → 새 색인으로 교체"""
+    global _index
+    with _index_lock:
+        embedder = get_embedder()
+        chunks = [
+            chunk
+            for document in load_documents()
+            for chunk in chunk_document(document["doc_id"], document["title"], document["text"])
+        ]
+        cache = _embedding_cache()
+        cached_before = len(cache)
+        vectors = np.empty((len(chunks), embedder.dim), dtype=np.float32)
+        for start in range(0, len(chunks), EMBED_BATCH):
+            batch = chunks[start:start + EMBED_BATCH]
+            vectors[start:start + len(batch)] = cache.embed([c["embed_text"] for c in batch], [c["hash"] for c in batch])
+        _index = VectorIndex.build(INDEX_DIR, chunks, vectors, embedder.name)
+        INDEX_VECTORS.set(_index.size)
+        logger.info(
+            f"📚 검색 색인 생성: 문서 {_index.manifest['documents']}개, 청크 {_index.size}개 "
+            f"(새 임베딩 {len(cache) - cached_before}개, {_index.mode}, 버전 {_index.corpus_version})"
+        )
+        return _index
+
+
+def _reopen_if_replaced():
+    """볼륨을 공유하는 다른 인스턴스가 재색인했으면 새 판으로 교체 (manifest의 corpus_version 비교)"""
+    global _index
+    stamp = _manifest_stamp(INDEX_DIR)
+    if stamp is None or stamp == _index.stamp:
+        return
+    with _index_lock:
+        if _index.stamp == stamp:
+            return
+        try:
+            index = VectorIndex(INDEX_DIR)
+        except (OSError, ValueError) as e:
+            # 교체(rename) 도중이면 이전 판으로 계속 검색하고 다음 조회에서 다시 확인
+            logger.warning(f"⚠️ 검색 색인 다시 열기 실패 - 이전 판 사용: {str(e)}")
+            return
+        if index.manifest["embedder"] != get_embedder().name:
+            return
+        if index.corpus_version != _index.corpus_version:
+            logger.info(f"📚 다른 인스턴스의 재색인 반영: 버전 {_index.corpus_version} → {index.corpus_version}")
+        _index = index
+        INDEX_VECTORS.set(index.size)
+
+
+def open_index() -> Optional[VectorIndex]:
+    """이미 열린 색인 (없으면 None) - 파일 확인/재생성 없이 상태만 볼 때 (/health)"""
+    return _index
+
+
+def get_index() -> VectorIndex:
+    """저장된 색인을 열고, 없거나 임베더가 바뀌었으면 새로 생성 - 열린 뒤에는 다른 인스턴스의 교체를 확인"""
+    global _index
+    if _index is not None:
+        _reopen_if_replaced()
+    if _index is None:
+        with _index_lock:
+            if _index is None and os.path.exists(os.path.join(INDEX_DIR, "manifest.json")):
+                index = VectorIndex(INDEX_DIR)
+                if index.manifest["embedder"] == get_embedder().name:
+                    _index = index
+                    INDEX_VECTORS.set(index.size)
+        if _index is None:
+            return rebuild_index()
+    return _index
+
+
+def embed_question(question: str) -> np.ndarray:
+    return get_embedder().embed([question])[0]
+
+
+def search(question: str, k: int = TOP_K, exact: Optional[bool] = None,
+           query: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """질문과 가장 가까운 청크 k개 (점수 = 코사인 유사도) - 이미 임베딩한 질문 벡터가 있으면 재사용"""
+    index = get_index()
+    if query is None:
+        query = embed_question(question)
+    mode = "exact" if exact or index.mode == "exact" else "ivf"
+    with RETRIEVAL_SECONDS.labels(mode).time():
+        rows = index.search(query, k, exact=exact)[0]
+    hits = [{**index.chunks[row], "score": round(score, 4)} for row, score in rows]
+    return {"mode": mode, "corpus_version": index.corpus_version, "hits": hits}
+
+
+def _search_batch(items: List[Tuple[np.ndarray, int]]) -> List[Dict[str, Any]]:
+    """질문 벡터 여러 개를 한 번에 검색 - 전수 비교는 memmap을 한 번만 훑는 행렬곱 하나로 처리"""
+    index = get_index()
+    k = max(item_k for _, item_k in items)
+    with RETRIEVAL_SECONDS.labels(index.mode).time():
+        results = index.search(np.stack([query for query, _ in items]), k)
+    return [
+        {
+            "mode": index.mode,
+            "corpus_version": index.corpus_version,
+            "hits": [{**index.chunks[row], "score": round(score, 4)} for row, score in rows[:item_k]],
+        }
+        for (_, item_k), rows in zip(items, results)
+    ]
+
+
+# 동시 요청의 질문 임베딩/벡터 검색을 모아 배치 호출 (OpenAI 임베더면 HTTP 요청 수, 로컬이면 스레드 전환·행렬곱 횟수 절감)
+_embed_batcher = MicroBatcher("embed", lambda texts: get_embedder().embed(texts))
+_search_batcher = MicroBatcher("search", _search_batch)
+
+
+async def embed_question_batched(question: str) -> np.ndarray:
+    return await _embed_batcher.submit(question)
+
+
+async def retrieve(question: str, k: int = TOP_K, exact: Optional[bool] = None,
+                   query: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """search()의 비동기 배치 버전 - exact 지정(검증용)은 배치 없이 단독 실행"""
+    if exact is not None:
+        return await asyncio.to_thread(search, question, k, exact, query)
+    if query is None:
+        query = await embed_question_batched(question)
+    return await _search_batcher.submit((query, k))
+
+
+def batcher_stats() -> List[Dict[str, Any]]:
+    return [_embed_batcher.stats(), _search_batcher.stats()]
+
+
+def format_context(hits: List[Dict[str, Any]]) -> str:
+    """LLM 프롬프트에 넣을 근거 문단 (출처 표기 포함)"""
+    return "\n\n".join(
+        f"[{i}] {hit['title']}{' - ' + hit['section'] if hit['section'] else ''}\n{hit['text']}"
+        for i, hit in enumerate(hits, 1)
+    )
+
+
+# ---------------------------------------------------------------------------
+# 답변 생성 (의미 캐시 → 검색 → LLM)
+# ---------------------------------------------------------------------------
+
+# 같은 질문이 동시에 들어오면 생성은 한 번만 (코퍼스 버전, 캐시 범위, 정규화 질문) → 진행 중 태스크
+_inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+
+
+def _cache_scope(k: int) -> str:
+    """답변을 바꾸는 생성 조건 - 모델이나 근거 문단 수가 다르면 의미 캐시를 공유하지 않음"""
+    return f"{get_chat_model().name}:k{k}"
+
+
+def build_messages(question: str, hits: List[Dict[str, Any]],
+                   history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    """system → 대화 요약/최근 턴 → 이번 질문의 근거 문단 + 질문"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *(history or []),
+        {"role": "user", "content": f"Excerpts:\n{format_context(hits)}\n\nQuestion: {question}"},
+    ]
+
+
+async def _history(conversation_id: Optional[str]) -> Tuple[List[Dict[str, str]], int]:
+    if not conversation_id:
+        return [], 0
+    return history_messages(await load_history(conversation_id))
+
+
+def _sources(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{key: hit[key] for key in ("chunk_id", "doc_id", "title", "section", "score")} for hit in hits]
+
+
+async def _prepare(question: str, k: int, use_cache: bool) -> Tuple[str, np.ndarray, Optional[Dict[str, Any]]]:
+    """코퍼스 버전, 질문 벡터, 의미 캐시 적중 항목"""
+    index = await asyncio.to_thread(get_index)
+    query = await embed_question_batched(question)
+    hit = await (await init_answer_cache()).lookup(index.corpus_version, _cache_scope(k), query) if use_cache else None
+    return index.corpus_version, query, hit
+
+
+async def _store(version: str, k: int, question: str, query: np.ndarray, result: Dict[str, Any],
+                 payload: Dict[str, Any], elapsed: float):
+    # 근거 없이 만든 답은 캐시하지 않음 (문서가 추가되면 바로 답할 수 있도록)
+    if result["hits"] and result["corpus_version"] == version:
+        await (await init_answer_cache()).store(version, _cache_scope(k), question, query, payload, elapsed)
+
+
+async def _generate(question: str, k: int, query: np.ndarray, version: str,
+                    history: Optional[List[Dict[str, str]]] = None, history_tokens: int = 0) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result = await retrieve(question, k, query=query)
+    model = get_chat_model()
+    messages = build_messages(question, result["hits"], history)
+    prompt_tokens = record_prompt(messages, history_tokens)
+    parts = [part async for part in model.stream(messages, result["hits"])]
+    payload = {
+        "answer": "".join(parts),
+        "model": model.name,
+        "corpus_version": result["corpus_version"],
+        "sources": _sources(result["hits"]),
+    }
+    elapsed = time.perf_counter() - started
+    ANSWER_SECONDS.labels("llm").observe(elapsed)
+    # 대화 맥락에 기대 만든 답은 다른 사용자의 같은 질문에 맞지 않으므로 캐시하지 않음
+    if not history:
+        await _store(version, k, question, query, result, payload, elapsed)
+    return {**payload, "prompt_tokens": prompt_tokens}
+
+
+async def answer_question(question: str, k: int = TOP_K, use_cache: bool = True,
+                          conversation_id: Optional[str] = None) -> Dict[str, Any]:
+    """의미 캐시 조회 → 없으면 검색 + 답변 생성 후 캐시에 저장 (conversation_id가 있으면 대화 기억 사용/갱신)"""
+    started = time.perf_counter()
+    history, history_tokens = await _history(conversation_id)
+    version, query, hit = await _prepare(question, k, use_cache and not history)
+    if hit is not None:
+        ANSWER_SECONDS.labels("cache").observe(time.perf_counter() - started)
+        response = {**hit["payload"], "cached": True, "similarity": hit["similarity"],
+                    "cached_question": hit["question"], "prompt_tokens": 0}
+    elif history:
+        response = {**await _generate(question, k, query, version, history, history_tokens), "cached": False}
+    else:
+        key = (version, _cache_scope(k), " ".join(_TOKEN.findall(question.lower())))
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_generate(question, k, query, version))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        # 요청이 끊겨도 같은 질문을 기다리는 다른 요청을 위해 생성은 계속
+        response = {**await asyncio.shield(task), "cached": False}
+    if conversation_id:
+        await append_turn(conversation_id, question, response["answer"])
+    return response
+
+
+async def stream_answer(question: str, k: int = TOP_K, use_cache: bool = True,
+                        conversation_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """스트리밍 답변 이벤트: sources → token(모델이 내는 즉시) … → done
+
+    소비자가 닫으면(클라이언트 연결 끊김) 모델 스트림을 즉시 닫아 업스트림 생성을 중단 (끊긴 답변은 대화에 남기지 않음)
+    """
+    started = time.perf_counter()
+    history, history_tokens = await _history(conversation_id)
+    version, query, hit = await _prepare(question, k, use_cache and not history)
+    if hit is not None:
+        payload = hit["payload"]
+        yield {"type": "sources", "cached": True, "similarity": hit["similarity"],
+               "corpus_version": payload["corpus_version"], "sources": payload["sources"]}
+        TTFT_SECONDS.labels("cache").observe(time.perf_counter() - started)
+        STREAM_TOKENS.labels("cache").inc()
+        yield {"type": "token", "text": payload["answer"]}
+        ANSWER_SECONDS.labels("cache").observe(time.perf_counter() - started)
+        if conversation_id:
+            await append_turn(conversation_id, question, payload["answer"])
+        yield {"type": "done", "model": payload["model"], "cached": True, "prompt_tokens": 0,
+               "took_ms": round((time.perf_counter() - started) * 1000, 2)}
+        return
+    result = await retrieve(question, k, query=query)
+    yield {"type": "sources", "cached": False, "corpus_version": result["corpus_version"],
+           "sources": _sources(result["hits"])}
+    model = get_chat_model()
+    messages = build_messages(question, result["hits"], history)
+    prompt_tokens = record_prompt(messages, history_tokens)
+    tokens = model.stream(messages, result["hits"])
+    parts: List[str] = []
+    first_token: Optional[float] = None
+    completed = False
+    try:
+        async for text in tokens:
+            if first_token is None:
+                first_token = time.perf_counter() - started
+                TTFT_SECONDS.labels(model.name).observe(first_token)
+            parts.append(text)
+            yield {"type": "token", "text": text}
+        completed = True
+    finally:
+        await tokens.aclose()
+        STREAM_TOKENS.labels(model.name).inc(len(parts))
+        if not completed:
+            STREAM_CANCELLED.labels(model.name).inc()
+            logger.info(f"✂️ 답변 스트림 중단: 토큰 {len(parts)}개 후 클라이언트 연결 종료")
+    elapsed = time.perf_counter() - started
+    ANSWER_SECONDS.labels("llm").observe(elapsed)
+    payload = {"answer": "".join(parts), "model": model.name, "corpus_version": result["corpus_version"],
+               "sources": _sources(result["hits"])}
+    if history:
+        await append_turn(conversation_id, question, payload["answer"])
+    else:
+        await _store(version, k, question, query, result, payload, elapsed)
+        if conversation_id:
+            await append_turn(conversation_id, question, payload["answer"])
+    yield {"type": "done", "model": model.name, "cached": False, "prompt_tokens": prompt_tokens,
+           "ttft_ms": round(first_token * 1000, 2) if first_token is not None else None,
+           "took_ms": round(elapsed * 1000, 2)}
@@ -0,0 +1,338 @@
+# 대화 기억 저장소 - 최근 턴은 그대로(압축 JSON), 토큰 예산을 넘은 오래된 턴은 누적 요약으로 접어 프롬프트 크기를 일정하게 유지
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Callable, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from app.service.llm import OpenAIChatModel, get_chat_model
+
+logger = logging.getLogger("chatbot_service")
+
+REDIS_URL = os.getenv("REDIS_URL", "")
+TTL_SECONDS = int(os.getenv("CHAT_MEMORY_TTL_SECONDS", str(24 * 3600)))
+# 요약 + 최근 턴 토큰 예산 - 넘으면 오래된 턴부터 요약으로 접어 예산의 FOLD_TARGET 비율까지 줄임
+TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "1200"))
+SUMMARY_TOKENS = int(os.getenv("CHAT_MEMORY_SUMMARY_TOKENS", "300"))
+MIN_RECENT_TURNS = int(os.getenv("CHAT_MEMORY_MIN_RECENT_TURNS", "4"))
+FOLD_TARGET = 0.6
+# 로컬 저장소 최대 대화 수 (오래 쓰지 않은 것부터 제거)
+LOCAL_MAX_CONVERSATIONS = 10_000
+
+_CONVERSATION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_TOKEN_PIECE = re.compile(r"[A-Za-z]+|\d+|[가-힣]|[^\sA-Za-z\d가-힣]")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+PROMPT_TOKENS = Histogram(
+    "chatbot_prompt_tokens", "Estimated prompt tokens per answered turn", ["part"],
+    buckets=(50, 100, 200, 400, 800, 1200, 1600, 2400, 3200, 4800, 6400),
+)
+MEMORY_FOLDS = Counter("chatbot_memory_folds_total", "Rolling summary updates", ["summarizer"])
+MEMORY_FOLDED_TURNS = Counter("chatbot_memory_folded_turns_total", "Conversation turns folded into summaries")
+
+
+def _piece_tokens(piece: str) -> int:
+    return 1 + len(piece) // 6 if piece.isascii() and piece.isalpha() else 1
+
+
+def count_tokens(text: str) -> int:
+    """프롬프트 토큰 수 추정 - 영문 단어/숫자/기호 1개, 한글 음절 1개 (tiktoken 없이 상한 쪽으로 근사)"""
+    return sum(_piece_tokens(piece) for piece in _TOKEN_PIECE.findall(text))
+
+
+def clip_tokens(text: str, limit: int) -> str:
+    """앞에서부터 limit 토큰까지만 남기고 잘린 자리에 … 표시 (표시 토큰 포함)"""
+    if count_tokens(text) <= limit:
+        return text
+    used, end = 1, 0
+    for match in _TOKEN_PIECE.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > limit:
+            break
+        end = match.end()
+    return f"{text[:end]} …" if end else ""
+
+
+def validate_conversation_id(conversation_id: str):
+    if not _CONVERSATION_ID.match(conversation_id):
+        raise ValueError("conversation_id는 영문/숫자/_/- 64자 이내여야 합니다")
+
+
+def _empty() -> Dict[str, Any]:
+    # s: 요약, sn: 요약 토큰, f: 요약에 접힌 마지막 턴 번호, n: 다음 턴 번호, t: [번호, 역할(u/a), 본문, 토큰]
+    return {"s": "", "sn": 0, "f": -1, "n": 0, "t": []}
+
+
+def _encode(state: Dict[str, Any]) -> str:
+    return json.dumps(state, ensure_ascii=False, separators=(",", ":"))
+
+
+def history_tokens(state: Dict[str, Any]) -> int:
+    return state["sn"] + sum(turn[3] for turn in state["t"])
+
+
+class LocalConversationStore:
+    """프로세스 내부 저장소 - REDIS_URL이 없거나 연결되지 않을 때 (TTL/개수 제한은 조회 시 정리)"""
+    name = "local"
+
+    def __init__(self):
+        self.items: Dict[str, tuple] = {}
+
+    async def close(self):
+        pass
+
+    async def load(self, conversation_id: str) -> Dict[str, Any]:
+        item = self.items.get(conversation_id)
+        if item is None or item[0] < time.monotonic():
+            self.items.pop(conversation_id, None)
+            return _empty()
+        return json.loads(item[1])
+
+    async def update(self, conversation_id: str, apply: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        state = apply(await self.load(conversation_id))
+        self.items.pop(conversation_id, None)
+        self.items[conversation_id] = (time.monotonic() + TTL_SECONDS, _encode(state))
+        while len(self.items) > LOCAL_MAX_CONVERSATIONS:
+            # dict는 삽입 순서 유지 - 가장 오래 갱신되지 않은 대화부터 제거
+            self.items.pop(next(iter(self.items)))
+        return state
+
+    async def delete(self, conversation_id: str):
+        self.items.pop(conversation_id, None)
+
+
+class RedisConversationStore:
+    """Redis 저장소 - 대화당 키 하나 (chatbot:conv:{id}, 압축 JSON, 쓸 때마다 TTL 갱신)
+
+    갱신은 WATCH/MULTI 낙관적 잠금 - 여러 인스턴스가 같은 대화에 턴을 붙이거나 요약해도 유실 없음
+    """
+    name = "redis"
+
+    def __init__(self, client):
+        self.redis = client
+
+    async def close(self):
+        await self.redis.aclose()
+
+    @staticmethod
+    def _key(conversation_id: str) -> str:
+        return f"chatbot:conv:{conversation_id}"
+
+    async def load(self, conversation_id: str) -> Dict[str, Any]:
+        raw = await self.redis.get(self._key(conversation_id))
+        return json.loads(raw) if raw else _empty()
+
+    async def update(self, conversation_id: str, apply: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        from redis.exceptions import WatchError
+
+        key = self._key(conversation_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    raw = await pipe.get(key)
+                    state = apply(json.loads(raw) if raw else _empty())
+                    pipe.multi()
+                    pipe.set(key, _encode(state), ex=TTL_SECONDS)
+                    await pipe.execute()
+                    return state
+                except WatchError:
+                    continue
+
+    async def delete(self, conversation_id: str):
+        await self.redis.delete(self._key(conversation_id))
+
+
+# ---------------------------------------------------------------------------
+# 요약
+# ---------------------------------------------------------------------------
+
+def _trim_summary(lines: List[str]) -> str:
+    """요약 예산을 넘으면 가장 오래된 줄부터 버림"""
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > SUMMARY_TOKENS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def _extractive_summary(previous: str, turns: List[list]) -> str:
+    """결정적 로컬 요약 - 턴마다 첫 문장(최대 40단어)을 Q:/A: 한 줄로"""
+    lines = [line for line in previous.splitlines() if line]
+    for _, role, text, _ in turns:
+        first = " ".join(_SENTENCE.split(text.strip())[0].split()[:40])
+        lines.append(f"{'Q' if role == 'u' else 'A'}: {first}")
+    return _trim_summary(lines)
+
+
+async def summarize(previous: str, turns: List[list]) -> str:
+    model = get_chat_model()
+    if not isinstance(model, OpenAIChatModel):
+        MEMORY_FOLDS.labels("extractive").inc()
+        return _extractive_summary(previous, turns)
+    transcript = "\n".join(f"{'User' if role == 'u' else 'Assistant'}: {text}" for _, role, text, _ in turns)
+    messages = [
+        {"role": "system", "content": (
+            f"Update the running summary of a CBAM compliance conversation in at most {SUMMARY_TOKENS * 3 // 4} "
+            "words. Keep facts, numbers, product/CN codes, deadlines and open questions. Output only the summary."
+        )},
+        {"role": "user", "content": f"Current summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"},
+    ]
+    summary = "".join([part async for part in model.stream(messages, [])]).strip()
+    MEMORY_FOLDS.labels(model.name).inc()
+    return _trim_summary(summary.splitlines())
+
+
+# ---------------------------------------------------------------------------
+# 서비스 진입점
+# ---------------------------------------------------------------------------
+
+_store = None
+# 이 인스턴스에서 요약 중인 대화 → 요약 태스크 (같은 대화 요약을 중복 실행하지 않고, 태스크 참조도 유지)
+_compacting: Dict[str, asyncio.Future] = {}
+
+
+async def init_conversation_store():
+    global _store
+    if _store is None:
+        if REDIS_URL:
+            try:
+                import redis.asyncio as aioredis
+
+                client = aioredis.from_url(REDIS_URL)
+                await client.ping()
+                logger.info(f"🧠 대화 기억 저장소: Redis ({REDIS_URL})")
+                _store = RedisConversationStore(client)
+            except Exception as e:
+                logger.warning(f"⚠️ Redis 연결 실패 - 프로세스 내부 대화 저장소 사용: {str(e)}")
+        else:
+            logger.info("🧠 대화 기억 저장소: 프로세스 내부 (REDIS_URL 미설정)")
+        if _store is None:
+            _store = LocalConversationStore()
+    return _store
+
+
+async def close_conversation_store():
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
+
+
+async def load_history(conversation_id: str) -> Dict[str, Any]:
+    return await (await init_conversation_store()).load(conversation_id)
+
+
+def history_messages(state: Dict[str, Any]) -> Tuple[List[Dict[str, str]], int]:
+    """요약은 system 메시지로, 최근 턴은 원문 그대로 user/assistant 메시지로 (메시지, 토큰 수)
+
+    백그라운드 요약이 아직 끝나지 않았어도 예산을 넘는 오래된 턴은 프롬프트에서 뺌. 최근 2턴은 항상 포함하되
+    둘만으로 예산을 넘으면(긴 답변 등) 남은 예산을 나눠 각 턴의 앞부분만 남김
+    """
+    summary, summary_tokens = state["s"], state["sn"]
+    if summary_tokens > TOKEN_BUDGET:
+        # 요약 상한(SUMMARY_TOKENS)이 전체 예산보다 크게 설정된 경우
+        summary = clip_tokens(summary, TOKEN_BUDGET)
+        summary_tokens = count_tokens(summary)
+    budget = TOKEN_BUDGET - summary_tokens
+    turns: List[list] = state["t"][-2:]
+    if sum(turn[3] for turn in turns) > budget:
+        turns = _clipped(turns, max(budget, 0))
+    else:
+        budget -= sum(turn[3] for turn in turns)
+        older: List[list] = []
+        for turn in reversed(state["t"][:-2]):
+            if turn[3] > budget:
+                break
+            budget -= turn[3]
+            older.append(turn)
+        turns = older[::-1] + turns
+    messages = []
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    messages.extend({"role": "user" if role == "u" else "assistant", "content": text} for _, role, text, _ in turns)
+    return messages, summary_tokens + sum(turn[3] for turn in turns)
+
+
+def _clipped(turns: List[list], budget: int) -> List[list]:
+    """예산을 턴마다 고르게 나눔 - 짧은 턴은 그대로, 남는 몫은 긴 턴으로 (잘라 낸 턴은 토큰 수를 다시 셈)"""
+    shares: Dict[int, int] = {}
+    left = budget
+    for position, turn in sorted(enumerate(turns), key=lambda item: item[1][3]):
+        shares[position] = min(turn[3], left // (len(turns) - len(shares)))
+        left -= shares[position]
+    clipped = []
+    for position, (seq, role, text, tokens) in enumerate(turns):
+        if shares[position] < tokens:
+            text = clip_tokens(text, shares[position])
+            tokens = count_tokens(text)
+        if text:
+            clipped.append([seq, role, text, tokens])
+    return clipped
+
+
+def record_prompt(messages: List[Dict[str, str]], history: int) -> int:
+    total = sum(count_tokens(message["content"]) + 4 for message in messages)
+    PROMPT_TOKENS.labels("total").observe(total)
+    PROMPT_TOKENS.labels("history").observe(history)
+    return total
+
+
+async def append_turn(conversation_id: str, question: str, answer: str) -> Dict[str, Any]:
+    """질문/답변 한 쌍 추가 - 예산을 넘으면 백그라운드에서 요약 (다음 질문 응답을 막지 않음)"""
+
+    def apply(state):
+        for role, text in (("u", question), ("a", answer)):
+            text = " ".join(text.split())
+            state["t"].append([state["n"], role, text, count_tokens(text)])
+            state["n"] += 1
+        return state
+
+    state = await (await init_conversation_store()).update(conversation_id, apply)
+    if history_tokens(state) > TOKEN_BUDGET and conversation_id not in _compacting:
+        task = asyncio.ensure_future(compact(conversation_id))
+        _compacting[conversation_id] = task
+        task.add_done_callback(lambda _: _compacting.pop(conversation_id, None))
+    return state
+
+
+async def compact(conversation_id: str):
+    """오래된 턴을 요약으로 접어 요약+최근 턴을 예산의 FOLD_TARGET 이하로 (최근 MIN_RECENT_TURNS개는 유지)"""
+    store = await init_conversation_store()
+    try:
+        state = await store.load(conversation_id)
+        turns = state["t"]
+        target = TOKEN_BUDGET * FOLD_TARGET - SUMMARY_TOKENS
+        remaining = sum(turn[3] for turn in turns)
+        fold = 0
+        while fold < len(turns) - MIN_RECENT_TURNS and remaining > target:
+            remaining -= turns[fold][3]
+            fold += 1
+        # 질문/답변 쌍이 갈라지지 않도록 답변 턴까지 포함
+        if fold < len(turns) and fold and turns[fold][1] == "a":
+            fold += 1
+        if not fold:
+            return
+        folded = turns[:fold]
+        summary = await summarize(state["s"], folded)
+        last_seq = folded[-1][0]
+
+        def apply(current):
+            # 그 사이 다른 인스턴스가 먼저 요약했으면 그대로 둠
+            if current["f"] != state["f"]:
+                return current
+            current["s"], current["sn"], current["f"] = summary, count_tokens(summary), last_seq
+            current["t"] = [turn for turn in current["t"] if turn[0] > last_seq]
+            return current
+
+        await store.update(conversation_id, apply)
+        MEMORY_FOLDED_TURNS.inc(len(folded))
+        logger.info(f"🧠 대화 요약: {conversation_id} 턴 {len(folded)}개 접음 (요약 {count_tokens(summary)} 토큰)")
+    except Exception as e:
+        logger.warning(f"⚠️ 대화 요약 실패 ({conversation_id}): {str(e)}")
+
+
+async def delete_conversation(conversation_id: str):
+    await (await init_conversation_store()).delete(conversation_id)
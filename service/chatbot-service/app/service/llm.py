@@ -0,0 +1,95 @@
+# 답변 생성 모델 - 토큰 단위 비동기 스트림 (OpenAI / 로컬 가짜 모델)
+import os
+import re
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, AsyncIterator
+
+logger = logging.getLogger("chatbot_service")
+
+# openai(Chat Completions 스트리밍) / extractive(근거 문단 발췌, 지연 없음) / fake(지연을 흉내 내는 테스트·벤치마크용)
+LLM = os.getenv("CHAT_LLM", "openai" if os.getenv("OPENAI_API_KEY") else "extractive")
+LLM_MODEL = os.getenv("CHAT_LLM_MODEL", "gpt-3.5-turbo")
+# 가짜 모델의 첫 토큰 지연 / 토큰 간 간격 / 최소 토큰 수 (발췌문이 짧으면 반복해 채움)
+FAKE_FIRST_TOKEN_MS = float(os.getenv("CHAT_FAKE_FIRST_TOKEN_MS", "300"))
+FAKE_TOKEN_MS = float(os.getenv("CHAT_FAKE_TOKEN_MS", "20"))
+FAKE_MIN_TOKENS = int(os.getenv("CHAT_FAKE_MIN_TOKENS", "0"))
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+class ChatModel:
+    """messages(OpenAI 형식) → 답변 텍스트 조각 스트림
+
+    소비자가 중간에 멈추면(클라이언트 연결 끊김) 제너레이터가 취소/종료되며, 구현은 finally에서 생성을 중단해야 함
+    """
+    name = "base"
+
+    def stream(self, messages: List[Dict[str, str]], hits: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+
+class OpenAIChatModel(ChatModel):
+    """OpenAI Chat Completions 스트리밍 (OPENAI_API_KEY 필요)"""
+
+    def __init__(self, model: str):
+        self.name = model
+        self._client = None
+
+    async def stream(self, messages: List[Dict[str, str]], hits: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI()
+        response = await self._client.chat.completions.create(
+            model=self.name, messages=messages, temperature=0, stream=True,
+        )
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # 끝까지 읽지 않은 상태로 HTTP 응답을 닫아야 OpenAI 쪽 생성도 중단됨
+            await response.response.aclose()
+
+
+class LocalChatModel(ChatModel):
+    """최상위 근거 문단의 앞 두 문장을 단어 단위로 내보내는 결정적 모델 (외부 호출 없음)"""
+
+    def __init__(self, name: str, first_token_delay: float = 0.0, token_delay: float = 0.0, min_tokens: int = 0):
+        self.name = name
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.min_tokens = min_tokens
+
+    @staticmethod
+    def _answer(hits: List[Dict[str, Any]]) -> str:
+        return " ".join(_SENTENCE.split(hits[0]["text"])[:2]) + " [1]"
+
+    async def stream(self, messages: List[Dict[str, str]], hits: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        words = self._answer(hits).split() if hits else ["관련", "근거를", "찾지", "못했습니다."]
+        while len(words) < self.min_tokens:
+            words = words + words
+        if self.first_token_delay:
+            await asyncio.sleep(self.first_token_delay)
+        for i, word in enumerate(words):
+            if i and self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
+
+_model: Optional[ChatModel] = None
+
+
+def get_chat_model() -> ChatModel:
+    global _model
+    if _model is None:
+        if LLM == "openai":
+            _model = OpenAIChatModel(LLM_MODEL)
+        elif LLM == "extractive":
+            _model = LocalChatModel("extractive")
+        elif LLM == "fake":
+            _model = LocalChatModel("fake", FAKE_FIRST_TOKEN_MS / 1000, FAKE_TOKEN_MS / 1000, FAKE_MIN_TOKENS)
+        else:
+            raise ValueError(f"알 수 없는 CHAT_LLM: {LLM}")
+        logger.info(f"🤖 답변 모델: {_model.name}")
+    return _model
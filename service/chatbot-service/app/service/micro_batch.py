@@ -0,0 +1,105 @@
+# 마이크로 배칭 - 동시에 들어온 임베딩/점수 계산 요청을 몇 ms 또는 N건까지 모아 한 번의 배치 호출로 처리
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger("chatbot_service")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+MAX_WAIT_MS = float(os.getenv("CHAT_BATCH_MAX_WAIT_MS", "2"))
+MAX_BATCH = int(os.getenv("CHAT_BATCH_MAX_SIZE", "64"))
+# 배처당 동시에 실행하는 배치 호출 수 (가득 차면 대기 항목이 다음 배치로 더 모임)
+MAX_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "2"))
+
+BATCH_SIZE = Histogram(
+    "chatbot_batch_size", "Items per batched call", ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+BATCH_WAIT_SECONDS = Histogram(
+    "chatbot_batch_wait_seconds", "Time the oldest item waited before its batch started", ["batcher"],
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+BATCH_ERRORS = Counter("chatbot_batch_errors_total", "Batched calls that raised", ["batcher"])
+
+
+class MicroBatcher(Generic[T, R]):
+    """submit(item)을 기다리는 코루틴들의 항목을 모아 fn(items) 한 번으로 처리하고 결과를 순서대로 돌려줌
+
+    - 첫 항목 도착 후 max_wait 안에 또는 max_batch건이 차면 배치 실행
+    - 실행 중 배치가 max_concurrency개면 새 항목은 슬롯이 빌 때까지 쌓여 더 큰 배치가 됨 (부하에 따라 자동 확대)
+    - fn은 동기 함수로 스레드에서 실행 (numpy/BLAS, 외부 API 호출이 이벤트 루프를 막지 않도록)
+    - fn이 예외를 내면 그 배치의 모든 대기자에게 같은 예외 전달, 취소된 대기자의 항목은 실행 전에 제외
+    """
+
+    def __init__(self, name: str, fn: Callable[[List[T]], Sequence[R]], max_batch: int = MAX_BATCH,
+                 max_wait_ms: float = MAX_WAIT_MS, max_concurrency: int = MAX_CONCURRENCY):
+        self.name = name
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_concurrency = max(1, max_concurrency)
+        self._pending: List[Tuple[T, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running = 0
+        # 실행 중 배치 태스크 참조 - 이벤트 루프는 약한 참조만 두므로 완료 전에 GC되지 않게 보관
+        self._tasks = set()
+
+    async def submit(self, item: T) -> R:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch or self.max_wait == 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    async def submit_many(self, items: Sequence[T]) -> List[R]:
+        return list(await asyncio.gather(*(self.submit(item) for item in items)))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending and self._running < self.max_concurrency:
+            batch = [entry for entry in self._pending[:self.max_batch] if not entry[1].done()]
+            del self._pending[:self.max_batch]
+            if batch:
+                self._running += 1
+                task = asyncio.ensure_future(self._run(batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        # 슬롯이 없어 남은 항목은 실행 중 배치가 끝날 때 바로 처리 (_run의 finally)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future, float]]):
+        started = time.perf_counter()
+        BATCH_SIZE.labels(self.name).observe(len(batch))
+        BATCH_WAIT_SECONDS.labels(self.name).observe(started - batch[0][2])
+        try:
+            results = await asyncio.to_thread(self.fn, [item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} 배치 결과 수 불일치: {len(results)} != {len(batch)}")
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            BATCH_ERRORS.labels(self.name).inc()
+            logger.warning(f"⚠️ 배치 호출 실패 ({self.name}, {len(batch)}건): {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._running -= 1
+            if self._pending:
+                self._flush()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name, "pending": len(self._pending), "running": self._running,
+            "max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000, "max_concurrency": self.max_concurrency,
+        }
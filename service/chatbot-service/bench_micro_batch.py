@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+마이크로 배칭 벤치마크 스크립트
+동시 요청을 하나씩 처리할 때와 MicroBatcher로 모아 처리할 때의 처리량/지연을 비교합니다.
+
+  cd service/chatbot-service && python bench_micro_batch.py [--requests 2000] [--concurrency 64]
+
+1) 원격 임베딩 API 흉내 (호출당 고정 지연 + 항목당 지연) - 호출 횟수가 줄어드는 효과
+2) 전수 비교 벡터 검색 (memmap 행렬) - 질문마다 행렬을 훑는 대신 한 번의 행렬곱으로 처리하는 효과
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+import numpy as np
+
+os.environ.setdefault("TRACE_EXPORTER", "none")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.service import cbam_chat  # noqa: E402
+from app.service.micro_batch import MicroBatcher  # noqa: E402
+
+
+class SimulatedRemoteEmbedder(cbam_chat.Embedder):
+    """HashingEmbedder 결과 + 네트워크 왕복 지연 (호출당 base_ms, 항목당 per_item_ms)"""
+
+    def __init__(self, base_ms: float, per_item_ms: float):
+        self.inner = cbam_chat.HashingEmbedder()
+        self.dim = self.inner.dim
+        self.name = "simulated-remote"
+        self.base = base_ms / 1000
+        self.per_item = per_item_ms / 1000
+
+    def embed(self, texts):
+        time.sleep(self.base + self.per_item * len(texts))
+        return self.inner.embed(texts)
+
+
+async def run_load(call, requests: int, concurrency: int):
+    """concurrency개 코루틴이 requests건을 나눠 호출 - (초당 처리량, p50 ms, p99 ms)"""
+    latencies = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return requests / elapsed, p50, p99
+
+
+def report(title: str, results):
+    print(f"\n📊 {title}")
+    print(f"  {'방식':<10} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'평균 배치':>9}")
+    for name, (throughput, p50, p99), batch in results:
+        print(f"  {name:<10} {throughput:>10.0f} {p50:>9.2f} {p99:>9.2f} {batch:>9.1f}")
+    print(f"  → 처리량 {results[1][1][0] / results[0][1][0]:.1f}배")
+
+
+def bench_embedding(args):
+    embedder = SimulatedRemoteEmbedder(args.remote_base_ms, args.remote_item_ms)
+    questions = [f"What is the CBAM default value for product {i} imported in quarter {i % 4 + 1}?" for i in range(997)]
+    calls = {"n": 0}
+
+    def embed_batch(texts):
+        calls["n"] += 1
+        return embedder.embed(texts)
+
+    async def main():
+        single = await run_load(
+            lambda i: asyncio.to_thread(embed_batch, [questions[i % len(questions)]]), args.requests, args.concurrency,
+        )
+        single_calls, calls["n"] = calls["n"], 0
+        batcher = MicroBatcher("bench-embed", embed_batch, args.max_batch, args.max_wait_ms, args.batch_concurrency)
+        batched = await run_load(lambda i: batcher.submit(questions[i % len(questions)]), args.requests, args.concurrency)
+        return [("개별", single, args.requests / single_calls), ("배치", batched, args.requests / calls["n"])]
+
+    report(f"원격 임베딩 (호출당 {args.remote_base_ms}ms + 항목당 {args.remote_item_ms}ms)", asyncio.run(main()))
+
+
+def bench_search(args):
+    rng = np.random.default_rng(0)
+    dim = 256
+    vectors = cbam_chat._normalize(rng.standard_normal((args.vectors, dim)).astype(np.float32))
+    chunks = [{"chunk_id": str(i), "doc_id": "bench", "title": "", "section": "", "text": "", "hash": f"{i:064x}"}
+              for i in range(args.vectors)]
+    # 배치 효과를 보려는 것이므로 IVF 없이 전수 비교 색인으로 생성
+    cbam_chat.EXACT_MAX_VECTORS = args.vectors
+    with tempfile.TemporaryDirectory() as tmp:
+        index = cbam_chat.VectorIndex.build(os.path.join(tmp, "index"), chunks, vectors, "bench")
+        queries = cbam_chat._normalize(rng.standard_normal((512, dim)).astype(np.float32))
+        sizes = []
+
+        def search_batch(items):
+            sizes.append(len(items))
+            results = index.search(np.stack(items), 5)
+            return results
+
+        async def main():
+            single = await run_load(
+                lambda i: asyncio.to_thread(search_batch, [queries[i % len(queries)]]), args.requests, args.concurrency,
+            )
+            sizes.clear()
+            batcher = MicroBatcher("bench-search", search_batch, args.max_batch, args.max_wait_ms,
+                                   args.batch_concurrency)
+            batched = await run_load(lambda i: batcher.submit(queries[i % len(queries)]), args.requests, args.concurrency)
+            return [("개별", single, 1.0), ("배치", batched, float(np.mean(sizes)))]
+
+        report(f"전수 비교 검색 ({args.vectors:,}×{dim} float32 memmap, top-5)", asyncio.run(main()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MicroBatcher 처리량 벤치마크")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--batch-concurrency", type=int, default=2)
+    parser.add_argument("--remote-base-ms", type=float, default=15.0)
+    parser.add_argument("--remote-item-ms", type=float, default=0.05)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    args = parser.parse_args()
+    print(f"🚀 마이크로 배칭 벤치마크: 요청 {args.requests}건, 동시 {args.concurrency}, "
+          f"배치 최대 {args.max_batch}건/{args.max_wait_ms}ms, 동시 배치 {args.batch_concurrency}")
+    bench_embedding(args)
+    bench_search(args)
@@ -0,0 +1,14 @@
+# 테스트 공통 설정 - 서비스 루트(app 패키지)를 import 경로에 추가, 색인/캐시는 임시 디렉터리로, 외부 모델 없이
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_scratch = tempfile.mkdtemp(prefix="chatbot-tests-")
+os.environ.setdefault("TRACE_EXPORTER", "none")
+os.environ.setdefault("CHAT_DATA_DIR", os.path.join(_scratch, "chatbot"))
+os.environ.setdefault("CHAT_EMBEDDER", "local")
+os.environ.setdefault("CHAT_LLM", "extractive")
+os.environ.pop("REDIS_URL", None)
+os.environ.pop("OPENAI_API_KEY", None)
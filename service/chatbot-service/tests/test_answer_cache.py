@@ -0,0 +1,55 @@
+# 의미 답변 캐시 - 임계 유사도 이상만 적중, 코퍼스 버전이 바뀌면 무효, Redis 스트림으로 인스턴스 간 공유
+import asyncio
+
+import fakeredis
+import numpy as np
+
+from app.service.answer_cache import LocalAnswerCache, RedisAnswerCache, SIMILARITY_THRESHOLD
+
+
+def unit(*values) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+PAYLOAD = {"answer": "By 31 May.", "model": "extractive", "corpus_version": "v1", "sources": []}
+
+
+def test_local_cache_threshold_and_version():
+    async def run():
+        cache = LocalAnswerCache()
+        await cache.store("v1", "m:k5", "when to surrender", unit(1, 0, 0), PAYLOAD, 1.5)
+        near = await cache.lookup("v1", "m:k5", unit(1, 0.05, 0))
+        far = await cache.lookup("v1", "m:k5", unit(1, 1, 0))
+        other_scope = await cache.lookup("v1", "m:k3", unit(1, 0, 0))
+        other_version = await cache.lookup("v2", "m:k5", unit(1, 0, 0))
+        return near, far, other_scope, other_version
+
+    near, far, other_scope, other_version = asyncio.run(run())
+    assert near["payload"] == PAYLOAD and near["similarity"] >= SIMILARITY_THRESHOLD
+    assert far is None and other_scope is None and other_version is None
+
+
+def test_redis_cache_is_shared_and_invalidated_across_scopes():
+    server = fakeredis.FakeServer()
+
+    async def run():
+        writer = RedisAnswerCache(fakeredis.aioredis.FakeRedis(server=server))
+        reader = RedisAnswerCache(fakeredis.aioredis.FakeRedis(server=server))
+        await writer.store("v1", "m:k5", "when to surrender", unit(0, 1, 0), PAYLOAD, 2.0)
+        await writer.store("v1", "m:k3", "when to surrender", unit(0, 1, 0), PAYLOAD, 2.0)
+        shared = await reader.lookup("v1", "m:k5", unit(0, 1, 0))
+        # 자기 항목은 스트림에서 한 번만 반영
+        await writer.lookup("v1", "m:k5", unit(0, 1, 0))
+        await writer.lookup("v1", "m:k5", unit(0, 1, 0))
+        own = writer.mirrors["m:k5"].size
+        await writer.invalidate("v1")
+        keys = await writer.redis.keys("chatbot:answers:*")
+        fresh = RedisAnswerCache(fakeredis.aioredis.FakeRedis(server=server))
+        gone = await fresh.lookup("v1", "m:k3", unit(0, 1, 0))
+        return shared, own, keys, gone
+
+    shared, own, keys, gone = asyncio.run(run())
+    assert shared["question"] == "when to surrender" and shared["similarity"] == 1.0
+    assert own == 1
+    assert keys == [] and gone is None
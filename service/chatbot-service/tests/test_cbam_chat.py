@@ -0,0 +1,77 @@
+# 규정 Q&A - 의미 캐시는 생성 조건(모델, k)별로 나뉘고, 다른 인스턴스의 재색인/임베딩 캐시 추가는 다음 조회에서 반영
+import asyncio
+import hashlib
+
+import numpy as np
+
+from app.service import cbam_chat
+from app.service.cbam_chat import (
+    EmbeddingCache, VectorIndex, answer_question, get_embedder, get_index, rebuild_index, INDEX_DIR,
+)
+
+QUESTION = "Who must surrender CBAM certificates and by when?"
+
+
+def test_answer_cache_is_scoped_by_k():
+    async def run():
+        first = await answer_question(QUESTION, k=2)
+        again = await answer_question(QUESTION, k=2)
+        wider = await answer_question(QUESTION, k=4)
+        return first, again, wider
+
+    first, again, wider = asyncio.run(run())
+    assert first["cached"] is False
+    assert again["cached"] is True and again["answer"] == first["answer"]
+    assert wider["cached"] is False
+    assert len(wider["sources"]) == 4 and len(again["sources"]) == 2
+
+
+def test_replica_picks_up_index_rebuilt_elsewhere():
+    before = rebuild_index()
+    # 다른 인스턴스가 같은 볼륨에 새 판을 쓴 상황 - 이 프로세스의 _index는 건드리지 않음
+    chunks = [dict(chunk, hash=f"{i:064x}") for i, chunk in enumerate(before.chunks[:3])]
+    vectors = get_embedder().embed([chunk["text"] for chunk in chunks])
+    replaced = VectorIndex.build(INDEX_DIR, chunks, vectors.astype(np.float32), get_embedder().name)
+    assert cbam_chat._index is before and replaced.corpus_version != before.corpus_version
+
+    current = get_index()
+    assert current.corpus_version == replaced.corpus_version
+    assert current.size == 3
+    rebuild_index()
+
+
+class CountingEmbedder:
+    def __init__(self, embedder):
+        self.name, self.dim, self.inner, self.texts = embedder.name, embedder.dim, embedder, []
+
+    def embed(self, texts):
+        self.texts.extend(texts)
+        return self.inner.embed(texts)
+
+
+def test_replicas_sharing_the_embedding_cache_keep_rows_aligned(tmp_path):
+    texts = ["carbon price paid in the country of origin", "default values for indirect emissions", "benchmarks"]
+    hashes = [hashlib.sha256(t.encode()).hexdigest() for t in texts]
+    a, b = CountingEmbedder(get_embedder()), CountingEmbedder(get_embedder())
+    replica_a, replica_b = EmbeddingCache(str(tmp_path), a), EmbeddingCache(str(tmp_path), b)
+
+    replica_a.embed(texts[:1], hashes[:1])
+    # B는 A가 쓴 행 뒤에 붙여야 함 - 자기 프로세스의 행 수(0)부터 번호를 매기면 A의 벡터를 돌려줌
+    replica_b.embed(texts[1:2], hashes[1:2])
+    replica_a.embed(texts[2:], hashes[2:])
+    expected = get_embedder().embed(texts)
+    np.testing.assert_allclose(replica_b.embed(texts, hashes), expected, rtol=1e-6)
+    np.testing.assert_allclose(replica_a.embed(texts, hashes), expected, rtol=1e-6)
+    assert a.texts == [texts[0], texts[2]] and b.texts == [texts[1]]
+    assert len(EmbeddingCache(str(tmp_path), get_embedder())) == 3
+
+
+def test_health_does_not_open_the_index(monkeypatch):
+    from app import main
+
+    def fail():
+        raise AssertionError("get_index called from /health")
+
+    monkeypatch.setattr(main, "get_index", fail)
+    monkeypatch.setattr(cbam_chat, "_index", None)
+    assert asyncio.run(main.health_check())["index_vectors"] == 0
@@ -0,0 +1,51 @@
+# 대화 기억 - 요약 + 최근 턴이 토큰 예산을 넘지 않아야 함 (최근 두 턴만으로 넘어도)
+import asyncio
+
+from app.service import conversation
+from app.service.conversation import (
+    LocalConversationStore, append_turn, clip_tokens, count_tokens, history_messages, history_tokens,
+)
+
+LONG = " ".join(f"Installation {i} reported embedded emissions of {i}.5 tCO2e per tonne." for i in range(40))
+
+
+def test_clip_tokens_respects_the_limit():
+    clipped = clip_tokens(LONG, 50)
+    assert count_tokens(clipped) <= 50 and clipped.endswith(" …")
+    assert LONG.startswith(clipped[:-2])
+    assert clip_tokens("short answer", 50) == "short answer"
+
+
+def test_recent_turns_are_trimmed_to_the_budget(monkeypatch):
+    monkeypatch.setattr(conversation, "TOKEN_BUDGET", 300)
+    state = {"s": "Q: scope of CBAM", "sn": count_tokens("Q: scope of CBAM"), "f": 1, "n": 4, "t": [
+        [2, "u", "What about steel?", count_tokens("What about steel?")],
+        [3, "a", LONG, count_tokens(LONG)],
+    ]}
+    assert history_tokens(state) > 300
+    messages, tokens = history_messages(state)
+    assert tokens <= 300
+    assert tokens == state["sn"] + sum(count_tokens(m["content"]) for m in messages[1:])
+    assert [m["role"] for m in messages] == ["system", "user", "assistant"]
+    # 짧은 질문은 그대로, 긴 답변만 앞부분으로
+    assert messages[1]["content"] == "What about steel?"
+    assert messages[2]["content"].endswith(" …")
+
+
+def test_older_turns_drop_before_recent_ones(monkeypatch):
+    monkeypatch.setattr(conversation, "TOKEN_BUDGET", 120)
+    monkeypatch.setattr(conversation, "SUMMARY_TOKENS", 40)
+    monkeypatch.setattr(conversation, "_store", LocalConversationStore())
+    monkeypatch.setattr(conversation, "_compacting", {})
+
+    async def run():
+        for i in range(6):
+            await append_turn("conv-1", f"Question number {i} about CN 7208?", f"Answer {i}: " + LONG[:200])
+        await asyncio.gather(*conversation._compacting.values())
+        return await conversation.load_history("conv-1")
+
+    state = asyncio.run(run())
+    assert state["f"] >= 0 and state["sn"] <= 40
+    messages, tokens = history_messages(state)
+    assert tokens <= 120
+    assert messages[-1]["role"] == "assistant" and messages[-1]["content"].startswith("Answer 5")
@@ -0,0 +1,76 @@
+# 마이크로 배칭 - 동시 요청은 한 번의 호출로 묶이고, 결과는 제자리로, 실패는 그 배치 대기자 모두에게
+import asyncio
+import threading
+
+import pytest
+
+from app.service.micro_batch import MicroBatcher
+
+
+def test_concurrent_submits_share_one_call_and_keep_order():
+    calls = []
+
+    def square(items):
+        calls.append(list(items))
+        return [item * item for item in items]
+
+    async def run():
+        batcher = MicroBatcher("test", square, max_batch=4, max_wait_ms=20)
+        return await batcher.submit_many(range(10))
+
+    assert asyncio.run(run()) == [i * i for i in range(10)]
+    assert [len(batch) for batch in calls] == [4, 4, 2]
+    assert sorted(item for batch in calls for item in batch) == list(range(10))
+
+
+def test_busy_slots_grow_the_next_batch():
+    release = threading.Event()
+    calls = []
+
+    def slow(items):
+        calls.append(len(items))
+        release.wait(5)
+        return items
+
+    async def run():
+        batcher = MicroBatcher("test", slow, max_batch=64, max_wait_ms=0, max_concurrency=1)
+        first = asyncio.ensure_future(batcher.submit(0))
+        await asyncio.sleep(0.05)
+        # 첫 배치가 실행 중인 동안 들어온 항목은 쌓였다가 한 배치로 실행
+        rest = asyncio.ensure_future(batcher.submit_many(range(1, 9)))
+        await asyncio.sleep(0.05)
+        assert batcher.stats()["pending"] == 8
+        release.set()
+        return await first, await rest
+
+    assert asyncio.run(run()) == (0, list(range(1, 9)))
+    assert calls == [1, 8]
+
+
+def test_failure_reaches_every_waiter_and_cancelled_items_are_skipped():
+    seen = []
+
+    def failing(items):
+        seen.append(list(items))
+        raise ValueError("boom")
+
+    async def run():
+        batcher = MicroBatcher("test", failing, max_batch=8, max_wait_ms=20)
+        cancelled = asyncio.ensure_future(batcher.submit("gone"))
+        waiters = [asyncio.ensure_future(batcher.submit(i)) for i in range(3)]
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert seen == [[0, 1, 2]]
+
+
+def test_result_count_mismatch_is_an_error():
+    async def run():
+        batcher = MicroBatcher("test", lambda items: items[:1], max_batch=2, max_wait_ms=10)
+        return await batcher.submit_many([1, 2])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
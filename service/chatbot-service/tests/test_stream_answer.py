@@ -0,0 +1,73 @@
+# 답변 스트리밍 - sources → token … → done 순서, 소비자가 닫으면 모델 스트림도 닫히고 대화/캐시에 남지 않음
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.router.chat_router import chat_router
+from app.service import cbam_chat
+from app.service.llm import LocalChatModel
+
+QUESTION = "What are embedded emissions of imported goods?"
+
+
+class RecordingModel(LocalChatModel):
+    """모델 스트림이 끝까지 갔는지/중간에 닫혔는지 기록"""
+
+    def __init__(self):
+        super().__init__("recording", min_tokens=40)
+        self.closed = 0
+        self.finished = 0
+
+    async def stream(self, messages, hits):
+        try:
+            async for text in super().stream(messages, hits):
+                yield text
+            self.finished += 1
+        finally:
+            self.closed += 1
+
+
+def events(body: str):
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        yield name[len("event: "):], json.loads(data[len("data: "):])
+
+
+def test_sse_events_in_order(monkeypatch):
+    monkeypatch.setattr(cbam_chat, "get_chat_model", RecordingModel)
+    app = FastAPI()
+    app.include_router(chat_router)
+    response = TestClient(app).post("/api/v1/chatbot/cbam/chat/stream",
+                                    json={"question": QUESTION, "k": 3, "use_cache": False})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    received = list(events(response.text))
+    names = [name for name, _ in received]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) - 2 >= 40
+    assert len(received[0][1]["sources"]) == 3
+    assert received[-1][1]["cached"] is False and received[-1][1]["ttft_ms"] is not None
+
+
+def test_closing_the_stream_stops_generation(monkeypatch):
+    model = RecordingModel()
+    monkeypatch.setattr(cbam_chat, "get_chat_model", lambda: model)
+    stored = []
+
+    async def no_store(*args):
+        stored.append(args)
+
+    monkeypatch.setattr(cbam_chat, "_store", no_store)
+
+    async def run():
+        stream = cbam_chat.stream_answer(QUESTION, k=3, use_cache=False)
+        received = [await stream.__anext__() for _ in range(4)]
+        await stream.aclose()
+        return received
+
+    received = asyncio.run(run())
+    assert [event["type"] for event in received] == ["sources", "token", "token", "token"]
+    assert model.closed == 1 and model.finished == 0
+    assert stored == []
@@ -0,0 +1,383 @@
+# 분산 트레이싱 - W3C traceparent 전파, 스팬 기록, JSONL/OTLP 내보내기
+import os
+import json
+import time
+import atexit
+import logging
+import secrets
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+import httpx
+
+logger = logging.getLogger("tracing")
+
+TRACEPARENT_HEADER = "traceparent"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# OTLP SpanKind 값 (INTERNAL=1, SERVER=2, CLIENT=3)
+_OTLP_SPAN_KIND = {"internal": 1, "server": 2, "client": 3}
+
+
+def new_trace_id() -> str:
+    """128비트 trace-id 생성 (32자리 hex)"""
+    return secrets.token_hex(16)
+
+
+def new_span_id() -> str:
+    """64비트 span-id 생성 (16자리 hex)"""
+    return secrets.token_hex(8)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, str]]:
+    """traceparent 헤더 파싱 - (trace_id, parent_span_id, flags) 또는 None"""
+    if not value:
+        return None
+    parts = value.strip().lower().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    _, trace_id, span_id, flags = parts[:4]
+    if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        int(trace_id, 16), int(span_id, 16), int(flags, 16)
+    except ValueError:
+        return None
+    # 전부 0인 ID는 W3C 규격상 무효
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, flags
+
+
+class Span:
+    """하나의 작업 구간 (시작/종료 시각, 속성, 상태)"""
+
+    __slots__ = (
+        "name", "service", "kind", "trace_id", "span_id", "parent_id", "flags",
+        "attributes", "start_ns", "end_ns", "status", "error",
+    )
+
+    def __init__(self, name: str, service: str, kind: str, trace_id: str,
+                 parent_id: Optional[str] = None, flags: str = "01",
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.service = service
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.flags = flags
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "unset"
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{self.flags}"
+
+    @property
+    def sampled(self) -> bool:
+        return int(self.flags, 16) & 0x01 == 1
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.status == "unset":
+                self.status = "ok"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class JsonlSpanExporter:
+    """스팬을 로컬 JSONL 파일에 한 줄씩 기록"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+                f.write("\n")
+
+    def shutdown(self):
+        pass
+
+
+class OtlpHttpSpanExporter:
+    """OTLP/HTTP JSON 형식으로 컬렉터(또는 호환 stand-in)에 스팬 전송"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        endpoint = endpoint.rstrip("/")
+        self.url = endpoint if endpoint.endswith("/v1/traces") else f"{endpoint}/v1/traces"
+        self._client = httpx.Client(timeout=timeout)
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _encode(self, spans: List[Span]) -> Dict[str, Any]:
+        # 서비스별로 resourceSpans 묶기
+        by_service: Dict[str, List[Dict[str, Any]]] = {}
+        for span in spans:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": _OTLP_SPAN_KIND.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": [self._attribute(k, v) for k, v in span.attributes.items()],
+                "status": {"code": 2 if span.status == "error" else 1, "message": span.error or ""},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            by_service.setdefault(span.service, []).append(otlp_span)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [self._attribute("service.name", service)]},
+                    "scopeSpans": [{"scope": {"name": "app.common.tracing"}, "spans": otlp_spans}],
+                }
+                for service, otlp_spans in by_service.items()
+            ]
+        }
+
+    def export(self, spans: List[Span]):
+        response = self._client.post(self.url, json=self._encode(spans))
+        response.raise_for_status()
+
+    def shutdown(self):
+        self._client.close()
+
+
+class BatchSpanProcessor:
+    """종료된 스팬을 모아 백그라운드 스레드에서 일괄 내보내기 (이벤트 루프 비차단)"""
+
+    def __init__(self, exporter, max_queue_size: int = 10000, batch_size: int = 512,
+                 interval: float = 2.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: deque = deque(maxlen=max_queue_size)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span):
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(span)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _drain(self):
+        while self._queue:
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                logger.warning(f"⚠️ 스팬 내보내기 실패 ({len(batch)}개 폐기): {str(e)}")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self._drain()
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self._drain()
+        self.exporter.shutdown()
+
+
+# 현재 활성 스팬 (요청/태스크 단위 컨텍스트)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+_service_name = os.getenv("TRACE_SERVICE_NAME", "unknown-service")
+_processor: Optional[BatchSpanProcessor] = None
+
+
+def _build_exporter():
+    """TRACE_EXPORTER 환경변수로 내보내기 대상 선택 (jsonl | otlp | none)"""
+    kind = os.getenv("TRACE_EXPORTER", "jsonl").lower()
+    if kind == "none":
+        return None
+    if kind == "otlp":
+        endpoint = os.getenv("OTLP_ENDPOINT", "http://localhost:4318")
+        return OtlpHttpSpanExporter(endpoint)
+    path = os.getenv("TRACE_JSONL_PATH", os.path.join("traces", f"{_service_name}.jsonl"))
+    return JsonlSpanExporter(path)
+
+
+def configure_tracing(service_name: str, exporter=None):
+    """서비스 이름과 내보내기 대상 설정 (앱 생성 시 1회 호출)"""
+    global _service_name, _processor
+    _service_name = os.getenv("TRACE_SERVICE_NAME", service_name)
+    if _processor is not None:
+        _processor.shutdown()
+        _processor = None
+    exporter = exporter if exporter is not None else _build_exporter()
+    if exporter is not None:
+        _processor = BatchSpanProcessor(exporter)
+        logger.info(f"🔭 트레이싱 활성화: {_service_name} → {type(exporter).__name__}")
+
+
+def shutdown_tracing():
+    """남은 스팬을 모두 내보내고 종료"""
+    global _processor
+    if _processor is not None:
+        _processor.shutdown()
+        _processor = None
+
+
+atexit.register(shutdown_tracing)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def open_span(name: str, kind: str = "internal", traceparent: Optional[str] = None,
+              **attributes) -> Span:
+    """스팬 생성만 하고 활성화하지 않음 (스트림 제너레이터처럼 컨텍스트를 넘나드는 경우용)"""
+    parent = _current_span.get()
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote:
+        trace_id, parent_id, flags = remote
+    elif parent:
+        trace_id, parent_id, flags = parent.trace_id, parent.span_id, parent.flags
+    else:
+        trace_id, parent_id, flags = new_trace_id(), None, "01"
+    return Span(name, _service_name, kind, trace_id, parent_id, flags, attributes)
+
+
+def close_span(span: Span):
+    """스팬 종료 후 내보내기 큐에 등록"""
+    span.end()
+    if _processor is not None and span.sampled:
+        _processor.on_end(span)
+
+
+@contextmanager
+def start_span(name: str, kind: str = "internal", traceparent: Optional[str] = None,
+               **attributes) -> Iterator[Span]:
+    """스팬 시작 - 현재 스팬(또는 전달받은 traceparent)의 자식으로 생성"""
+    span = open_span(name, kind, traceparent, **attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        close_span(span)
+
+
+def inject_trace_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """업스트림 호출 헤더에 현재 스팬의 traceparent 추가"""
+    headers = dict(headers or {})
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.traceparent
+    return headers
+
+
+class TracingMiddleware:
+    """요청 단위 서버 스팬 - 순수 ASGI 미들웨어
+
+    응답 메시지를 그대로 통과시키므로 스트리밍/SSE/zero-copy(pathsend, zerocopysend) 응답도 버퍼링이나
+    메시지 형식 제약 없이 전달되고, 스팬은 본문 전송이 끝날 때 닫힌다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = scope["path"]
+        traceparent = next(
+            (v.decode("latin-1") for k, v in scope["headers"] if k == TRACEPARENT_HEADER.encode()), None,
+        )
+        with start_span(
+            f"{scope['method']} {route}",
+            kind="server",
+            traceparent=traceparent,
+            **{"http.method": scope["method"], "http.target": route},
+        ) as span:
+            extra = {
+                TRACEPARENT_HEADER.encode(): span.traceparent.encode(),
+                REQUEST_ID_HEADER.lower().encode(): span.trace_id.encode(),
+            }
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    span.set_attribute("http.status_code", status)
+                    if status >= 500:
+                        span.status = "error"
+                    headers = [(k, v) for k, v in message.get("headers", []) if k.lower() not in extra]
+                    message = {**message, "headers": headers + list(extra.items())}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+
+def install_tracing(app, service_name: str):
+    """FastAPI 앱에 요청 단위 서버 스팬 미들웨어 등록"""
+    configure_tracing(service_name)
+    app.add_middleware(TracingMiddleware)
+    return app
@@ -1 +1,110 @@
-# Empty main.py file
+# Report Service - CBAM/LCA 보고서 생성 및 저장된 결과 조회
+import os
+import sys
+import logging
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from app.common.event_bus import init_event_bus, close_event_bus
+from app.common.loop_monitor import start_loop_monitor, stop_loop_monitor, loop_monitor_router
+from app.common.profiler import install_profiler
+from app.common.result_store import RESULT_STORE_DIR
+from app.common.tracing import install_tracing, shutdown_tracing
+from app.router.convert_router import convert_router
+from app.router.event_router import event_router
+from app.router.job_router import job_router, artifact_router
+from app.router.lca_router import lca_router
+from app.router.results_router import results_router
+from app.service.event_handlers import register_event_handlers
+from app.service.lca_uncertainty import shutdown_executor
+from app.service.report_jobs import start_job_runner, stop_job_runner
+
+# Railway 환경 확인
+IS_RAILWAY = os.getenv("RAILWAY_ENVIRONMENT") == "true" or (os.getenv("PORT") is not None and os.getenv("PORT") != "")
+
+# 로깅 설정
+if IS_RAILWAY:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    print("🚂 Report Service - Railway 환경에서 실행 중")
+else:
+    logging.basicConfig(level=logging.INFO)
+    print("🏠 Report Service - 로컬 환경에서 실행 중")
+
+logger = logging.getLogger("report_service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"🚀 Report Service 시작 (결과 저장소: {RESULT_STORE_DIR})")
+    # 이벤트 루프 지연/느린 콜백 모니터 시작
+    await start_loop_monitor("report-service")
+    # 보고서 작업 큐 디스패처 + 워커 프로세스 풀
+    await start_job_runner()
+    # cbam-service 이벤트 구독 (calculation.completed → 보고서 재생성, factors.updated)
+    bus = await init_event_bus("report-service")
+    register_event_handlers(bus)
+    await bus.start()
+    yield
+    await close_event_bus()
+    await stop_job_runner()
+    await stop_loop_monitor()
+    # 불확실성 분석 워커 프로세스 정리
+    shutdown_executor()
+    # 남은 트레이스 스팬 내보내기
+    shutdown_tracing()
+    logger.info("🛑 Report Service 종료")
+
+app = FastAPI(
+    title="Report Service",
+    description="Report Service - CBAM/LCA 보고서 및 결과 조회",
+    version="0.1.0",
+    lifespan=lifespan
+)
+
+# 관리자 전용 프로파일러 (요청 단위 프로파일링 미들웨어가 가장 안쪽에 오도록 먼저 등록)
+install_profiler(app, "report-service")
+
+# CORS 설정
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# 분산 트레이싱 미들웨어 (Gateway가 보낸 traceparent 이어받기)
+install_tracing(app, "report-service")
+
+@app.get("/health")
+async def health_check():
+    """헬스체크"""
+    return {
+        "status": "healthy",
+        "service": "report-service",
+        "timestamp": datetime.now().isoformat(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 메트릭 엔드포인트"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+# 라우터를 앱에 포함
+app.include_router(results_router)
+app.include_router(lca_router)
+app.include_router(job_router)
+app.include_router(artifact_router)
+app.include_router(convert_router)
+app.include_router(event_router)
+app.include_router(loop_monitor_router)
+
+# Docker에서 uvicorn으로 실행되므로 직접 실행 코드 제거
@@ -0,0 +1,167 @@
+import os
+import time
+import asyncio
+import logging
+import tempfile
+from typing import Optional, Iterator
+
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter
+
+from app.common.result_store import partition_columns
+from app.service.artifact_store import content_disposition
+from app.service.format_transfort import (
+    FORMATS, MEDIA_TYPES, READERS, EXPORT_FIELDS, SCHEMALESS_SOURCES, OPEN_KEY_TARGETS, ConversionError,
+    open_records, scan_fields, convert, partition_records,
+)
+
+logger = logging.getLogger("report_service")
+
+convert_router = APIRouter(prefix="/api/v1/report/convert", tags=["Report Conversion"])
+
+MAX_UPLOAD_BYTES = int(os.getenv("REPORT_CONVERT_MAX_UPLOAD_MB", "2048")) * 2**20
+UPLOAD_DIR = os.getenv("REPORT_CONVERT_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "report-convert"))
+FORMAT_PATTERN = "^(" + "|".join(FORMATS) + ")$"
+
+CONVERT_ROWS = Counter("report_convert_rows_total", "Records converted", ["source", "target"])
+CONVERT_BYTES = Counter("report_convert_bytes_total", "Bytes streamed by format conversion", ["target"])
+
+
+def _detect_format(request: Request, file_name: str) -> Optional[str]:
+    content_type = request.headers.get("content-type", "")
+    extension = os.path.splitext(file_name.lower())[1].lstrip(".")
+    if extension in ("xlsx", "xlsm") or "spreadsheetml" in content_type:
+        return "xlsx"
+    if extension in FORMATS:
+        return extension
+    for name, media_type in MEDIA_TYPES.items():
+        if content_type.startswith(media_type.split(";")[0]):
+            return name
+    return None
+
+
+def _streamed(chunks: Iterator[bytes], source: str, target: str, label: str, stats: dict,
+              cleanup: Optional[str] = None) -> Iterator[bytes]:
+    """응답 청크 전달 + 완료 시 메트릭/로그, 업로드 임시 파일 정리 (클라이언트가 끊어도 실행)"""
+    started = time.perf_counter()
+    try:
+        yield from chunks
+        logger.info(
+            f"🔁 형식 변환 {label} {source}→{target}: {stats['rows']}행, "
+            f"{stats['bytes'] / 2**20:.1f}MB, {time.perf_counter() - started:.2f}s"
+        )
+    except ConversionError as e:
+        # 응답 헤더가 이미 나갔으므로 상태 코드로 알릴 수 없음 - 스트림을 끊어 클라이언트가 불완전 응답을 인지
+        logger.warning(f"⚠️ 형식 변환 중단 {label}: {e}")
+        raise
+    finally:
+        CONVERT_ROWS.labels(source, target).inc(stats.get("rows", 0))
+        CONVERT_BYTES.labels(target).inc(stats.get("bytes", 0))
+        if cleanup:
+            try:
+                os.remove(cleanup)
+            except OSError:
+                pass
+
+
+def _response(chunks: Iterator[bytes], target: str, filename: str) -> StreamingResponse:
+    # Content-Length 없이 청크 전송 - 첫 청크(헤더/첫 레코드)가 바로 클라이언트에 도달
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[target],
+        headers={"Content-Disposition": content_disposition(filename), "X-Accel-Buffering": "no"},
+    )
+
+
+def _scan_upload(path: str, source: str):
+    with open(path, "rb") as stream:
+        return scan_fields(READERS[source](stream))
+
+
+@convert_router.post("", summary="업로드 파일 형식 변환 (CSV/XLSX/JSON/NDJSON/레지스트리 XML, 청크 응답 스트리밍)")
+async def convert_upload(
+    request: Request,
+    target: str = Query(..., pattern=FORMAT_PATTERN),
+    source: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+    company_id: str = Query("", description="레지스트리 XML 신고인 식별자"),
+    quarter: str = Query("", description="레지스트리 XML 보고 기간 (예: 2026Q1)"),
+    fields: Optional[str] = Query(None, description="쉼표로 구분한 출력 열 (없으면 입력의 모든 키)"),
+):
+    """요청 바디를 디스크로 흘려 쓴 뒤 레코드 단위로 읽고 쓰며 응답 (XLSX 입력은 zip이라 seek 필요)"""
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    file_name = request.headers.get("x-file-name", "")
+    source = source or _detect_format(request, file_name)
+    if source is None:
+        raise HTTPException(status_code=422, detail="입력 형식을 알 수 없습니다 (source 파라미터 지정)")
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=f".{source}", dir=UPLOAD_DIR)
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if written > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="업로드 파일이 너무 큽니다")
+                await asyncio.to_thread(f.write, chunk)
+        if written == 0:
+            raise HTTPException(status_code=400, detail="빈 파일입니다")
+        # 레코드마다 키가 다를 수 있는 입력: JSON/NDJSON/XML 출력은 레코드별 키를 그대로 써서 바로 스트리밍,
+        # CSV/XLSX처럼 고정 헤더가 필요한 출력만 응답 전에 전체 키를 모음 (파일 전체 오류도 422)
+        open_keys = selected is None and source in SCHEMALESS_SOURCES and target in OPEN_KEY_TARGETS
+        if selected is None and source in SCHEMALESS_SOURCES and not open_keys:
+            selected = await asyncio.to_thread(_scan_upload, path, source)
+        stream = open(path, "rb")
+        try:
+            # 첫 레코드까지는 응답 전에 읽어 형식 오류를 422로 돌려줌
+            columns, records = await asyncio.to_thread(
+                open_records, READERS[source](stream), selected, open_keys)
+        except Exception:
+            stream.close()
+            raise
+    except HTTPException:
+        os.remove(path)
+        raise
+    except ConversionError as e:
+        os.remove(path)
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        os.remove(path)
+        raise HTTPException(status_code=422, detail=f"{source} 입력을 읽을 수 없습니다: {e}")
+
+    def chunks():
+        with stream:
+            yield from convert(records, columns, target, company_id, quarter, stats, open_keys=open_keys)
+
+    stats: dict = {}
+    base = os.path.splitext(os.path.basename(file_name))[0] or "converted"
+    label = file_name or f"업로드 {written / 2**20:.1f}MB"
+    return _response(_streamed(chunks(), source, target, label, stats, cleanup=path), target, f"{base}.{target}")
+
+
+@convert_router.get("/results/{kind}/{company_id}/{quarter}", summary="저장된 결과 파티션 내보내기 (행 그룹 단위 스트리밍)")
+async def export_results(
+    kind: str,
+    company_id: str,
+    quarter: str,
+    target: str = Query("csv", pattern=FORMAT_PATTERN),
+    columns: Optional[str] = Query(None, description="쉼표로 구분한 열 이름 (없으면 기본 내보내기 열)"),
+):
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    try:
+        if selected is None:
+            available = set(await asyncio.to_thread(partition_columns, kind, company_id, quarter))
+            selected = [c for c in EXPORT_FIELDS if c in available]
+        fields, records = await asyncio.to_thread(
+            open_records, partition_records(kind, company_id, quarter, selected), selected,
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    stats: dict = {}
+    chunks = convert(records, fields, target, company_id, quarter, stats)
+    label = f"{kind}/{company_id}/{quarter}"
+    return _response(_streamed(chunks, "store", target, label, stats), target, f"{kind}_{company_id}_{quarter}.{target}")
@@ -0,0 +1,31 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.common.event_bus import get_event_bus
+
+logger = logging.getLogger("report_service")
+
+event_router = APIRouter(prefix="/api/v1/report/events", tags=["Report Events"])
+
+
+@event_router.get("", summary="이벤트 구독 상태 (스트림 길이, 처리 대기, dead-letter 수)")
+async def event_stats():
+    return await get_event_bus().stats()
+
+
+@event_router.get("/dead-letter", summary="처리에 계속 실패한 이벤트 목록 (최근 순)")
+async def list_dead_letters(limit: int = Query(100, ge=1, le=1000)):
+    return {"events": await get_event_bus().dead_letters(limit)}
+
+
+@event_router.post("/dead-letter/{entry_id}/replay", summary="dead-letter 이벤트를 원래 스트림에 다시 넣어 재처리")
+async def replay_dead_letter(entry_id: str):
+    try:
+        replayed = await get_event_bus().replay_dead_letter(entry_id)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not replayed:
+        raise HTTPException(status_code=404, detail="dead-letter 이벤트를 찾을 수 없습니다")
+    logger.info(f"🔁 dead-letter 이벤트 재처리 요청: {entry_id}")
+    return {"entry_id": entry_id, "replayed": True}
@@ -0,0 +1,107 @@
+import json
+import logging
+import mimetypes
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.service.artifact_store import ArtifactResponse, get_store
+from app.service.report_jobs import (
+    submit_job, get_job, cancel_job, stream_events, artifact_file, PRIORITIES, JOB_TYPES,
+)
+
+logger = logging.getLogger("report_service")
+
+job_router = APIRouter(prefix="/api/v1/report/jobs", tags=["Report Jobs"])
+artifact_router = APIRouter(prefix="/api/v1/report/artifacts", tags=["Report Jobs"])
+
+
+class JobRequest(BaseModel):
+    """보고서 작업 등록 - type별 params는 JOB_TYPES 참고"""
+    type: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    priority: str = Field("normal", pattern="^(" + "|".join(PRIORITIES) + ")$")
+    label: str = ""
+
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in job.items() if k != "submitted_ts"}
+
+
+@job_router.get("/types", summary="등록 가능한 작업 유형과 필수 파라미터")
+async def job_types():
+    return {name: {"required": list(t.required)} for name, t in JOB_TYPES.items()}
+
+
+@job_router.post("", status_code=202, summary="보고서 작업 등록 (즉시 작업 ID 반환, 실행은 워커 프로세스)")
+async def create_job(body: JobRequest):
+    try:
+        job = await submit_job(body.type, body.params, body.priority, body.label)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    logger.info(f"📄 보고서 작업 등록 {job['job_id']}: {body.type} ({body.priority})")
+    return JSONResponse(status_code=202, content=_public(job))
+
+
+@job_router.get("/{job_id}", summary="작업 상태 (진행률, 산출물 목록)")
+async def job_status(job_id: str):
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+    return _public(job)
+
+
+@job_router.delete("/{job_id}", summary="작업 취소 (대기 중이면 즉시, 실행 중이면 다음 진행 보고 시점에 중단)")
+async def delete_job(job_id: str):
+    job = await cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+    return _public(job)
+
+
+@job_router.get("/{job_id}/events", summary="진행 이벤트 스트림 (SSE, Last-Event-ID로 이어받기)")
+async def job_events(job_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    if await get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def event_source():
+        async for event in stream_events(job_id, after):
+            if await request.is_disconnected():
+                return
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            data = json.dumps(event, ensure_ascii=False)
+            yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        # 중간 프록시 버퍼링 방지
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@job_router.api_route("/{job_id}/artifacts/{name}", methods=["GET", "HEAD"],
+                      summary="작업 산출물 다운로드 (강한 ETag, If-None-Match, Range 이어받기)")
+async def download_artifact(job_id: str, name: str, request: Request):
+    job = await get_job(job_id)
+    found = artifact_file(job, name) if job is not None else None
+    if found is None:
+        raise HTTPException(status_code=404, detail="산출물을 찾을 수 없습니다")
+    path, etag, entry = found
+    return ArtifactResponse(request, path, etag, entry["content_type"], filename=name)
+
+
+@artifact_router.api_route("/{sha256}", methods=["GET", "HEAD"],
+                           summary="내용 주소(sha256)로 산출물 다운로드 - 작업과 무관하게 같은 내용이면 같은 URL")
+async def download_object(sha256: str, request: Request, name: Optional[str] = None):
+    store = get_store()
+    if not store.exists(sha256):
+        raise HTTPException(status_code=404, detail="산출물을 찾을 수 없습니다")
+    store.touch(sha256)
+    media_type = (mimetypes.guess_type(name)[0] if name else None) or "application/octet-stream"
+    return ArtifactResponse(request, store.path(sha256), f'"{sha256}"', media_type, filename=name)
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+
+from app.common.tracing import start_span
+from app.common.wire import PACKED_MEDIA_TYPE, accepts_packed, packb
+from app.service.lca_engine import get_database, get_solver, footprints, reload_database
+from app.service.lca_report import steel_footprint_report
+from app.service.lca_uncertainty import UncertaintyAnalysis, register_analysis, get_analysis, DEFAULT_PERCENTILES
+
+logger = logging.getLogger("report_service")
+
+lca_router = APIRouter(prefix="/api/v1/report/lca", tags=["LCA"])
+
+_running_tasks = set()
+
+
+class FootprintRequest(BaseModel):
+    """기능단위 수요 목록 - 각 항목은 {활동 id: 수요량}"""
+    demands: List[Dict[str, float]] = Field(..., min_length=1, max_length=100_000)
+    methods: Optional[List[str]] = None
+
+
+@lca_router.get("/database", summary="LCA 데이터베이스 정보 (버전, 행렬 크기, 영향평가 방법)")
+async def database_info():
+    db = await asyncio.to_thread(get_database)
+    return {
+        "version": db.version,
+        "activities": db.n_activities,
+        "flows": len(db.flows),
+        "technosphere_nnz": int(db.technosphere.nnz),
+        "biosphere_nnz": int(db.biosphere.nnz),
+        "methods": db.methods.to_dict(orient="records"),
+    }
+
+
+@lca_router.post("/database/reload", summary="데이터베이스 파일 다시 로드 (버전이 바뀌면 다음 계산에서 재분해)")
+async def database_reload():
+    db = await asyncio.to_thread(reload_database)
+    return {"version": db.version}
+
+
+def _footprints(body: FootprintRequest, packed: bool):
+    # 첫 호출이면 분해까지 이 스레드에서 수행
+    get_solver()
+    result = footprints(body.demands, body.methods, arrays=packed)
+    # 직렬화도 이벤트 루프 밖에서
+    return packb(result) if packed else result
+
+
+@lca_router.post("/footprints", summary="기능단위 수요 묶음 footprint (캐시된 LU 분해로 다중 우변 일괄 풀이)")
+async def compute_footprints(body: FootprintRequest, request: Request):
+    """Accept에 내부 바이너리 형식이 있으면 impacts 행을 원시 float64 배열로 담아 응답"""
+    packed = accepts_packed(request.headers.get("accept"))
+    try:
+        with start_span("lca footprints", demands=len(body.demands), format="packed" if packed else "json"):
+            result = await asyncio.to_thread(_footprints, body, packed)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if packed:
+        return Response(content=result, media_type=PACKED_MEDIA_TYPE, headers={"Vary": "Accept"})
+    return result
+
+
+@lca_router.get("/products", summary="철강 제품별 단위 footprint 보고서 (+ 공정 기여도)")
+async def product_report(
+    activity_ids: Optional[str] = Query(None, description="쉼표로 구분한 활동 id (없으면 전체)"),
+    methods: Optional[str] = Query(None, description="쉼표로 구분한 영향평가 방법 (없으면 전체)"),
+    top: int = Query(5, ge=1, le=50),
+):
+    ids = [a.strip() for a in activity_ids.split(",") if a.strip()] if activity_ids else None
+    selected = [m.strip() for m in methods.split(",") if m.strip()] if methods else None
+    try:
+        return await asyncio.to_thread(steel_footprint_report, ids, selected, top)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=e.args[0])
+
+
+class UncertaintyRequest(BaseModel):
+    """기능단위 하나의 몬테카를로 불확실성/민감도 분석"""
+    demand: Dict[str, float] = Field(..., min_length=1)
+    methods: Optional[List[str]] = None
+    samples: int = Field(10_000, ge=2, le=1_000_000)
+    seed: int = 0
+    top: int = Field(10, ge=1, le=100)
+    percentiles: List[float] = Field(default_factory=lambda: list(DEFAULT_PERCENTILES), max_length=20)
+    label: str = ""
+
+
+@lca_router.post("/uncertainty", status_code=202, summary="불확실성/민감도 분석 시작 (샘플 배치를 프로세스 풀에서 풀이)")
+async def start_uncertainty(body: UncertaintyRequest):
+    """입력 검증 후 분석을 등록하고 바로 반환 - 진행률은 GET으로 조회"""
+    if any(not 0 <= p <= 100 for p in body.percentiles):
+        raise HTTPException(status_code=422, detail="percentiles는 0~100 사이여야 합니다")
+    try:
+        analysis = await asyncio.to_thread(
+            UncertaintyAnalysis, body.demand, body.methods, body.samples, body.seed, body.top,
+            body.percentiles, body.label,
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    register_analysis(analysis)
+    task = asyncio.create_task(asyncio.to_thread(analysis.run))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+    logger.info(f"🎲 LCA 불확실성 분석 등록 {analysis.analysis_id}: 샘플 {body.samples:,}")
+    return JSONResponse(status_code=202, content=analysis.to_dict(include_results=False))
+
+
+@lca_router.get("/uncertainty/{analysis_id}", summary="불확실성 분석 상태/결과 (진행률, 분포, 기여도, 민감도 순위)")
+async def uncertainty_status(analysis_id: str):
+    analysis = get_analysis(analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="분석을 찾을 수 없습니다")
+    return analysis.to_dict()
+
+
+@lca_router.delete("/uncertainty/{analysis_id}", summary="불확실성 분석 취소 (대기 중인 청크 취소)")
+async def cancel_uncertainty(analysis_id: str):
+    analysis = get_analysis(analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="분석을 찾을 수 없습니다")
+    analysis.cancel()
+    return analysis.to_dict(include_results=False)
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.common.result_store import read_partition, list_partitions, columns_to_json, parse_filter
+from app.common.tracing import start_span
+
+logger = logging.getLogger("report_service")
+
+results_router = APIRouter(prefix="/api/v1/report/results", tags=["Report Results"])
+
+
+def _read(kind: str, company_id: str, quarter: str, columns: Optional[List[str]], filters, limit: int):
+    data, stats = read_partition(kind, company_id, quarter, columns=columns, filters=filters)
+    if limit:
+        data = {name: values[:limit] for name, values in data.items()}
+    return columns_to_json(data), stats
+
+
+@results_router.get("/{kind}/{company_id}", summary="저장된 결과 파티션(분기) 목록")
+async def list_results(kind: str, company_id: str):
+    try:
+        return {"partitions": await asyncio.to_thread(list_partitions, kind, company_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@results_router.get("/{kind}/{company_id}/{quarter}", summary="분기 결과 로드 (열 선택 + 행 필터 푸시다운)")
+async def get_results(
+    kind: str,
+    company_id: str,
+    quarter: str,
+    columns: Optional[str] = Query(None, description="쉼표로 구분한 열 이름 (없으면 전체)"),
+    where: List[str] = Query([], description="column:op:value (op: eq, ne, lt, le, gt, ge, in)"),
+    limit: int = Query(10_000, ge=0, le=1_000_000, description="반환 행 수 상한 (0 = 제한 없음)"),
+):
+    """결과 저장소 파티션을 mmap으로 열어 필요한 열/행 그룹만 읽음"""
+    try:
+        filters = [parse_filter(w) for w in where]
+        selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+        with start_span("report read results", kind=kind, company_id=company_id, quarter=quarter):
+            data, stats = await asyncio.to_thread(_read, kind, company_id, quarter, selected, filters, limit)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    logger.info(
+        f"📊 결과 로드 {kind}/{company_id}/{quarter}: {stats['rows']}행 "
+        f"(행 그룹 {stats['row_groups_scanned']}/{stats['row_groups']}), {stats['elapsed_ms']}ms"
+    )
+    return {"stats": stats, "columns": data}
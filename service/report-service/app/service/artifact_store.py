@@ -0,0 +1,319 @@
+# 보고서 산출물 내용 주소 저장소 - sha256 이름의 불변 객체, 크기 상한 LRU 제거, ETag/Range 다운로드 응답
+import os
+import re
+import stat
+import time
+import shutil
+import hashlib
+import logging
+import mimetypes
+import threading
+from email.utils import formatdate
+from typing import Dict, Any, Optional, List, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Scope, Receive, Send
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger("report_service")
+
+STORE_DIR = os.getenv("REPORT_ARTIFACT_STORE_DIR", os.path.join(os.getcwd(), "data", "artifact-store"))
+STORE_MAX_BYTES = int(os.getenv("REPORT_ARTIFACT_STORE_MAX_MB", "2048")) * 2**20
+# 상한을 넘으면 이 비율까지 줄여 제거가 매번 일어나지 않게 함
+LOW_WATERMARK = 0.9
+# 다운로드 시 LRU 시각(mtime) 갱신 최소 간격 - 요청마다 메타데이터를 쓰지 않음
+TOUCH_INTERVAL_SECONDS = 300
+HASH_BLOCK = 1 << 20
+# zero-copy 전송을 지원하지 않는 서버에서 파일을 읽어 보내는 단위
+SEND_BLOCK = 1 << 20
+# 내용이 sha256으로 고정되므로 같은 URL은 항상 같은 바이트 - 클라이언트/프록시가 재검증 없이 캐시 가능
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+ARTIFACT_DOWNLOADS = Counter(
+    "report_artifact_downloads_total", "Artifact download responses by status", ["status"],
+)
+ARTIFACT_BYTES_SENT = Counter("report_artifact_bytes_sent_total", "Artifact body bytes sent", ["mode"])
+STORE_BYTES = Gauge("report_artifact_store_bytes", "Bytes held in the content-addressed artifact store")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """objects/ab/abcdef... 구조의 불변 파일 저장소
+
+    같은 내용은 한 번만 저장되고(여러 작업이 같은 차트/표를 만들어도 공유), 크기 상한을 넘으면
+    가장 오래 쓰이지 않은(mtime 기준) 객체부터 제거한다. 객체 등록은 작업 워커 프로세스에서,
+    크기 집계/제거는 서비스 프로세스에서 수행 - 여러 인스턴스가 볼륨을 공유해도 제거 시 디스크를 다시 훑는다.
+    """
+
+    def __init__(self, root: str = STORE_DIR, max_bytes: int = STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._total: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return len(sha256) == 64 and all(c in "0123456789abcdef" for c in sha256) and os.path.isfile(self.path(sha256))
+
+    def ingest(self, path: str) -> Tuple[str, int, bool]:
+        """파일을 저장소로 이동 → (sha256, 크기, 새 객체 여부). 이미 있는 내용이면 원본만 삭제"""
+        sha256 = file_sha256(path)
+        size = os.path.getsize(path)
+        target = self.path(sha256)
+        if os.path.exists(target):
+            os.utime(target)
+            os.remove(path)
+            return sha256, size, False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # 읽기 전용으로 두어 내용 주소가 가리키는 바이트가 바뀌지 않게 함
+        os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        try:
+            os.replace(path, target)
+        except OSError:
+            # 다른 파일시스템 - 임시 이름으로 복사 후 원자적 교체
+            tmp = f"{target}.{os.getpid()}.tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+            os.remove(path)
+        return sha256, size, True
+
+    def ingest_dir(self, directory: str) -> List[Dict[str, Any]]:
+        """작업 산출물 디렉터리의 파일을 모두 저장소로 옮기고 산출물 목록 반환 (디렉터리는 삭제)"""
+        artifacts = []
+        for name in sorted(os.listdir(directory)):
+            sha256, size, created = self.ingest(os.path.join(directory, name))
+            artifacts.append({
+                "name": name,
+                "bytes": size,
+                "content_type": mimetypes.guess_type(name)[0] or "application/octet-stream",
+                "sha256": sha256,
+                "stored": created,
+            })
+        os.rmdir(directory)
+        return artifacts
+
+    def touch(self, sha256: str):
+        """다운로드 시 LRU 시각 갱신 (TOUCH_INTERVAL_SECONDS 안에 이미 갱신됐으면 생략)"""
+        path = self.path(sha256)
+        try:
+            if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL_SECONDS:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        objects = os.path.join(self.root, "objects")
+        if not os.path.isdir(objects):
+            return entries
+        for prefix in os.scandir(objects):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def added(self, new_bytes: int) -> int:
+        """새로 저장된 바이트 반영 후 상한을 넘으면 제거 → 제거한 객체 수"""
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._scan())
+            else:
+                self._total += new_bytes
+            if self._total <= self.max_bytes:
+                STORE_BYTES.set(self._total)
+                return 0
+            entries = sorted(self._scan())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes * LOW_WATERMARK:
+                    break
+                try:
+                    # 전송 중인 파일도 열린 디스크립터로는 계속 읽힘
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            self._total = total
+            STORE_BYTES.set(total)
+        if removed:
+            logger.info(f"🧹 산출물 저장소 LRU 제거: {removed}개, 현재 {total / 2**20:.1f}MB")
+        return removed
+
+
+_store: Optional[ArtifactStore] = None
+
+
+def get_store() -> ArtifactStore:
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
+
+
+# ---- 다운로드 응답 ----
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    """If-None-Match(약한 비교) / If-Range(강한 비교) 값에 etag가 있는지"""
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """단일 "bytes=a-b" / "a-" / "-n" → (시작, 끝 포함). 형식이 다르거나 여러 범위면 None (전체 응답)
+
+    만족할 수 없는 범위는 ValueError.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = (part.strip() for part in spec.partition("-"))
+    if not dash or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("빈 접미 범위")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError("범위가 파일 밖입니다")
+    return start, end
+
+
+def content_disposition(filename: str) -> str:
+    """다운로드 헤더 값 - ASCII로 바꾼 filename(따옴표/제어문자 제거) + 원래 이름은 RFC 5987 filename*"""
+    fallback = re.sub(r'[^\x20-\x7e]|["\\]', "_", filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+class ArtifactResponse(Response):
+    """불변 파일 다운로드 - 강한 ETag, If-None-Match(304), Range/If-Range(206/416)
+
+    ASGI 서버가 zero-copy 확장(http.response.zerocopysend / pathsend)을 제공하면 커널이 파일을 직접 소켓으로
+    보내고, 없으면 SEND_BLOCK 단위 pread로 보낸다 (이벤트 루프 밖 스레드에서 읽음).
+    """
+
+    def __init__(self, request: Request, path: str, etag: str, media_type: str, filename: Optional[str] = None):
+        st = os.stat(path)
+        self.path = path
+        self.size = st.st_size
+        self.range: Optional[Tuple[int, int]] = None
+        self.head = request.method == "HEAD"
+        self.background = None
+        # 길이/형식 헤더는 상태별로 직접 정함 (init_headers가 빈 body 길이를 넣지 않도록)
+        self.body = None
+        self.media_type = None
+        headers = {
+            "etag": etag,
+            "accept-ranges": "bytes",
+            "cache-control": CACHE_CONTROL,
+            "last-modified": formatdate(st.st_mtime, usegmt=True),
+        }
+        if filename:
+            headers["content-disposition"] = content_disposition(filename)
+        status = 200
+        if_none_match = request.headers.get("if-none-match")
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if if_none_match is not None and _etag_matches(if_none_match, etag, weak=True):
+            status = 304
+        elif range_header and request.method in ("GET", "HEAD") and (
+                if_range is None or _etag_matches(if_range, etag, weak=False)):
+            try:
+                self.range = parse_range(range_header, self.size)
+            except ValueError:
+                status = 416
+                headers["content-range"] = f"bytes */{self.size}"
+            if self.range is not None:
+                status = 206
+                headers["content-range"] = f"bytes {self.range[0]}-{self.range[1]}/{self.size}"
+        if status == 200:
+            headers["content-length"] = str(self.size)
+        elif status == 206:
+            headers["content-length"] = str(self.range[1] - self.range[0] + 1)
+        elif status == 416:
+            headers["content-length"] = "0"
+        if status != 304:
+            headers["content-type"] = f"{media_type}; charset=utf-8" if media_type.startswith("text/") else media_type
+        self.status_code = status
+        self.init_headers(headers)
+        ARTIFACT_DOWNLOADS.labels(str(status)).inc()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.head or self.status_code not in (200, 206):
+            await send({"type": "http.response.body", "body": b""})
+            return
+        offset, end = self.range if self.range else (0, self.size - 1)
+        count = end - offset + 1
+        extensions = scope.get("extensions") or {}
+        if "http.response.pathsend" in extensions and self.range is None:
+            await send({"type": "http.response.pathsend", "path": self.path})
+            ARTIFACT_BYTES_SENT.labels("pathsend").inc(count)
+            return
+        async with anyio.create_task_group() as group:
+            async def stream():
+                await self._send_file(send, extensions, offset, count)
+                group.cancel_scope.cancel()
+
+            async def disconnected():
+                # 클라이언트가 끊으면 남은 파일 읽기/전송을 중단
+                while True:
+                    message = await receive()
+                    if message["type"] == "http.disconnect":
+                        group.cancel_scope.cancel()
+                        return
+
+            group.start_soon(stream)
+            group.start_soon(disconnected)
+
+    async def _send_file(self, send: Send, extensions: Dict[str, Any], offset: int, count: int):
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            if "http.response.zerocopysend" in extensions:
+                await send({"type": "http.response.zerocopysend", "file": fd, "offset": offset, "count": count})
+                ARTIFACT_BYTES_SENT.labels("zerocopy").inc(count)
+                return
+            sent = 0
+            while sent < count:
+                block = await anyio.to_thread.run_sync(os.pread, fd, min(SEND_BLOCK, count - sent), offset + sent)
+                if not block:
+                    break
+                sent += len(block)
+                await send({"type": "http.response.body", "body": block, "more_body": sent < count})
+            if sent < count:
+                await send({"type": "http.response.body", "body": b""})
+            ARTIFACT_BYTES_SENT.labels("read").inc(sent)
+        finally:
+            os.close(fd)
@@ -0,0 +1,136 @@
+# CBAM 분기 보고서 - 결과 저장소 파티션(cbam/회사/분기)을 읽어 차원별 집계표 생성
+import re
+import logging
+from typing import Dict, Any, Callable, Optional, List
+
+import numpy as np
+import pandas as pd
+
+from app.common.result_store import read_partition
+from app.service.charts import ChartSpec
+
+logger = logging.getLogger("report_service")
+
+RESULT_KIND = "cbam"
+# cbam-service 라인 상태 열 중 보고서 집계 대상 측정값
+MEASURES = [
+    "quantity_t", "embedded_direct_t", "embedded_indirect_t", "embedded_precursor_t",
+    "embedded_total_t", "free_allocation_t", "certificates", "certificate_cost_eur",
+]
+# 보고서 표 이름 → 집계 차원 열
+BREAKDOWNS = {
+    "by_cn_code": "cn_code",
+    "by_country": "country_of_origin",
+    "by_installation": "installation_id",
+    "by_month": "import_month",
+}
+MISSING = "(none)"
+# 차트에 표시할 상위 그룹 수 / 국가별 월 추이 차트 수
+CHART_TOP = 15
+CHART_MAX_COUNTRIES = 12
+
+ProgressCallback = Callable[[float, str], None]
+
+
+def _noop(fraction: float, message: str):
+    pass
+
+
+def load_quarter_lines(company_id: str, quarter: str) -> pd.DataFrame:
+    """계산된 라인만 DataFrame으로 로드 (필요한 열만 읽음)"""
+    columns = list(BREAKDOWNS.values()) + MEASURES
+    data, stats = read_partition(RESULT_KIND, company_id, quarter, columns=columns)
+    frame = pd.DataFrame({name: np.asarray(values) if not isinstance(values, pd.Categorical) else values
+                          for name, values in data.items()})
+    frame.attrs["metadata"] = stats["metadata"]
+    return frame[frame["certificates"].notna()]
+
+
+def _breakdown(lines: pd.DataFrame, column: str) -> pd.DataFrame:
+    keys = lines[column]
+    if column == "cn_code":
+        keys = keys.astype(np.int64).astype(str).str.zfill(8)
+    else:
+        keys = keys.astype(object).where(keys.notna(), MISSING)
+    table = lines[MEASURES].groupby(keys.rename(column), sort=True).sum()
+    table.insert(0, "lines", keys.groupby(keys).size())
+    return table.sort_values("embedded_total_t", ascending=False).reset_index()
+
+
+def _country_month(lines: pd.DataFrame) -> pd.DataFrame:
+    """국가 × 수입 월 인증서 수 (행: 국가, 열: 월)"""
+    country = lines["country_of_origin"].astype(object).where(lines["country_of_origin"].notna(), MISSING)
+    month = lines["import_month"].astype(object).where(lines["import_month"].notna(), MISSING)
+    table = lines["certificates"].groupby([country.rename("country_of_origin"), month.rename("month")]).sum()
+    return table.unstack("month", fill_value=0.0).reset_index()
+
+
+def build_quarter_report(company_id: str, quarter: str,
+                         progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """분기 보고서 데이터 - 합계 + 차원별 집계표 (DataFrame)"""
+    progress = progress or _noop
+    progress(0.05, "결과 파티션 로드")
+    lines = load_quarter_lines(company_id, quarter)
+    metadata = lines.attrs.get("metadata", {})
+    tables: Dict[str, pd.DataFrame] = {}
+    for i, (name, column) in enumerate(BREAKDOWNS.items()):
+        progress(0.1 + 0.8 * i / len(BREAKDOWNS), f"{column} 기준 집계")
+        tables[name] = _breakdown(lines, column)
+    progress(0.9, "국가 × 월 집계")
+    tables["by_country_month"] = _country_month(lines)
+    totals = {m: float(lines[m].sum()) for m in MEASURES}
+    totals["lines"] = int(len(lines))
+    return {
+        "company_id": company_id,
+        "quarter": quarter,
+        "result_version": metadata.get("version"),
+        "factor_version": metadata.get("factor_version"),
+        "params": metadata.get("params"),
+        "totals": totals,
+        "tables": tables,
+    }
+
+
+def quarter_chart_specs(report: Dict[str, Any], tables: Dict[str, pd.DataFrame],
+                        fmt: str = "png") -> List[ChartSpec]:
+    """분기 보고서 차트 목록 - 데이터가 같으면 스펙도 같아 렌더링 캐시를 그대로 재사용"""
+    title = f"{report['company_id']} {report['quarter']}"
+    by_cn = tables["by_cn_code"].head(CHART_TOP)
+    by_country = tables["by_country"]
+    by_installation = tables["by_installation"].sort_values("certificates", ascending=False).head(CHART_TOP)
+    by_month = tables["by_month"].sort_values("import_month")
+    specs = [
+        ChartSpec("embedded_by_cn_code", "barh", {
+            "labels": by_cn["cn_code"], "embedded tCO2e": by_cn["embedded_total_t"],
+        }, title=f"{title} - embedded emissions by CN code (top {CHART_TOP})", format=fmt,
+            style={"height": 6.0}),
+        ChartSpec("embedded_by_country", "stacked_bar", {
+            "labels": by_country["country_of_origin"],
+            "direct": by_country["embedded_direct_t"],
+            "indirect": by_country["embedded_indirect_t"],
+            "precursor": by_country["embedded_precursor_t"],
+        }, title=f"{title} - embedded emissions by country", options={"ylabel": "tCO2e"}, format=fmt),
+        ChartSpec("certificates_share_by_country", "donut", {
+            "labels": by_country["country_of_origin"], "certificates": by_country["certificates"],
+        }, title=f"{title} - certificate share by country", format=fmt, style={"width": 6.0, "height": 6.0}),
+        ChartSpec("certificates_by_installation", "barh", {
+            "labels": by_installation["installation_id"], "certificates": by_installation["certificates"],
+        }, title=f"{title} - certificates by installation (top {CHART_TOP})", format=fmt,
+            style={"height": 6.0}),
+        ChartSpec("certificates_by_month", "line", {
+            "labels": by_month["import_month"], "certificates": by_month["certificates"],
+        }, title=f"{title} - certificates by import month", format=fmt),
+        ChartSpec("cost_by_month", "bar", {
+            "labels": by_month["import_month"], "EUR": by_month["certificate_cost_eur"],
+        }, title=f"{title} - certificate cost by import month", format=fmt),
+    ]
+    country_month = tables["by_country_month"].set_index("country_of_origin")
+    months = list(country_month.columns)
+    for country in by_country["country_of_origin"].head(CHART_MAX_COUNTRIES):
+        # 차트 이름은 산출물 파일 이름으로 쓰임
+        safe = re.sub(r"[^0-9A-Za-z_-]", "_", str(country))
+        specs.append(ChartSpec(f"certificates_by_month_{safe}", "bar", {
+            "labels": months, "certificates": country_month.loc[country, months].to_numpy(),
+        }, title=f"{title} - {country} certificates by import month", format=fmt,
+            style={"width": 6.0, "height": 3.5}))
+    return specs
@@ -0,0 +1,350 @@
+# 보고서 차트 렌더링 - Agg 백엔드 워커 프로세스 풀, 재사용 Figure 템플릿, 데이터/스타일 내용 해시 캐시
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Sequence, Tuple
+
+import numpy as np
+
+# GUI 백엔드가 로드되지 않도록 matplotlib import 전에 지정 (워커 프로세스도 환경변수를 상속)
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+logger = logging.getLogger("report_service")
+
+CHART_WORKERS = int(os.getenv("REPORT_CHART_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+CHART_CACHE_DIR = os.getenv("REPORT_CHART_CACHE_DIR", os.path.join(os.getcwd(), "data", "charts"))
+CHART_CACHE_MAX_BYTES = int(os.getenv("REPORT_CHART_CACHE_MAX_MB", "512")) * 2**20
+# 렌더링할 차트가 이 수 이하이면 풀을 거치지 않고 현재 프로세스에서 그림
+# (보고서 작업 워커는 차트 명세만 돌려주고 API 프로세스가 이 풀로 렌더링 - 작업 풀 안에 풀을 중첩하지 않음)
+CHART_INLINE_MAX = int(os.getenv("REPORT_CHART_INLINE_MAX", "1"))
+# 템플릿 그리기 코드가 바뀌면 올려서 캐시 무효화
+TEMPLATE_VERSION = "1"
+FORMATS = ("png", "svg")
+
+DEFAULT_STYLE = {
+    "theme": "whitegrid",
+    "palette": "deep",
+    "width": 8.0,
+    "height": 4.5,
+    "dpi": 110,
+}
+
+
+@dataclass
+class ChartSpec:
+    """차트 하나 - template + 열 단위 데이터 + 옵션/스타일
+
+    data: {"labels": [...], "<계열 이름>": [...], ...} (계열 순서 = 범례 순서)
+    """
+    name: str
+    template: str
+    data: Dict[str, Sequence[Any]]
+    title: str = ""
+    options: Dict[str, Any] = field(default_factory=dict)
+    style: Dict[str, Any] = field(default_factory=dict)
+    format: str = "png"
+
+    def resolved_style(self) -> Dict[str, Any]:
+        return {**DEFAULT_STYLE, **self.style}
+
+
+def _plain(values: Sequence[Any]) -> list:
+    """numpy/pandas 값 → JSON 직렬화 가능한 리스트 (NaN → None)"""
+    arr = np.asarray(values, dtype=object) if not isinstance(values, np.ndarray) else values
+    out = arr.tolist() if hasattr(arr, "tolist") else list(arr)
+    return [None if isinstance(v, float) and v != v else v for v in out]
+
+
+def chart_key(spec: ChartSpec) -> str:
+    """데이터 + 스타일 + 템플릿 버전 + 라이브러리 버전의 내용 해시 (같은 숫자면 같은 키)"""
+    import matplotlib
+    import seaborn
+
+    payload = {
+        "template": spec.template,
+        "template_version": TEMPLATE_VERSION,
+        "libs": [matplotlib.__version__, seaborn.__version__],
+        "data": {k: _plain(v) for k, v in spec.data.items()},
+        "title": spec.title,
+        "options": spec.options,
+        "style": spec.resolved_style(),
+        "format": spec.format,
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def cache_path(key: str, fmt: str) -> str:
+    return os.path.join(CHART_CACHE_DIR, key[:2], f"{key}.{fmt}")
+
+
+# ---------------------------------------------------------------------------
+# 템플릿 (워커 프로세스에서 실행)
+# ---------------------------------------------------------------------------
+
+def _series(spec: ChartSpec) -> Tuple[list, List[Tuple[str, np.ndarray]]]:
+    labels = [str(v) for v in _plain(spec.data["labels"])]
+    series = [(name, np.asarray(_plain(values), dtype=np.float64))
+              for name, values in spec.data.items() if name != "labels"]
+    return labels, series
+
+
+def _bar(fig, ax, spec: ChartSpec, colors):
+    labels, series = _series(spec)
+    x = np.arange(len(labels))
+    width = 0.8 / max(len(series), 1)
+    for i, (name, values) in enumerate(series):
+        ax.bar(x + (i - (len(series) - 1) / 2) * width, values, width, label=name, color=colors[i % len(colors)])
+    ax.set_xticks(x, labels, rotation=spec.options.get("rotation", 0))
+
+
+def _barh(fig, ax, spec: ChartSpec, colors):
+    labels, series = _series(spec)
+    y = np.arange(len(labels))
+    height = 0.8 / max(len(series), 1)
+    for i, (name, values) in enumerate(series):
+        ax.barh(y + (i - (len(series) - 1) / 2) * height, values, height, label=name, color=colors[i % len(colors)])
+    ax.set_yticks(y, labels)
+    ax.invert_yaxis()
+
+
+def _stacked_bar(fig, ax, spec: ChartSpec, colors):
+    labels, series = _series(spec)
+    x = np.arange(len(labels))
+    bottom = np.zeros(len(labels))
+    for i, (name, values) in enumerate(series):
+        values = np.nan_to_num(values)
+        ax.bar(x, values, 0.7, bottom=bottom, label=name, color=colors[i % len(colors)])
+        bottom += values
+    ax.set_xticks(x, labels, rotation=spec.options.get("rotation", 0))
+
+
+def _line(fig, ax, spec: ChartSpec, colors):
+    labels, series = _series(spec)
+    for i, (name, values) in enumerate(series):
+        ax.plot(labels, values, marker="o", label=name, color=colors[i % len(colors)])
+
+
+def _donut(fig, ax, spec: ChartSpec, colors):
+    labels, series = _series(spec)
+    values = np.nan_to_num(series[0][1])
+    ax.pie(values, labels=labels, colors=colors[:len(values)], startangle=90, counterclock=False,
+           wedgeprops={"width": 0.4}, autopct="%1.0f%%", pctdistance=0.8)
+    ax.axis("equal")
+    ax.grid(False)
+
+
+TEMPLATES = {
+    "bar": _bar,
+    "barh": _barh,
+    "stacked_bar": _stacked_bar,
+    "line": _line,
+    "donut": _donut,
+}
+
+# 워커별 재사용 Figure (테마/크기/해상도별) - pyplot 상태 관리자 없이 clear 후 다시 그림
+_figures: Dict[Tuple[str, float, float, int], Any] = {}
+_palettes: Dict[str, List[Any]] = {}
+_current_theme: Optional[Tuple[str, str]] = None
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    import seaborn  # noqa: F401 - 워커 시작 시 한 번만 import 비용 지불
+
+
+def _figure(style: Dict[str, Any]):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    # 배경색 등 테마 rcParams는 Figure 생성 시점에 적용되므로 테마도 키에 포함
+    key = (style["theme"], float(style["width"]), float(style["height"]), int(style["dpi"]))
+    fig = _figures.get(key)
+    if fig is None:
+        fig = Figure(figsize=key[1:3], dpi=key[3], layout="tight")
+        FigureCanvasAgg(fig)
+        _figures[key] = fig
+    fig.clear()
+    return fig
+
+
+def _palette(style: Dict[str, Any]) -> List[Any]:
+    """seaborn 테마 적용 (직전과 다를 때만) + 팔레트 색 목록 (팔레트별 캐시)"""
+    import seaborn as sns
+
+    global _current_theme
+    key = (style["theme"], style["palette"])
+    if key != _current_theme:
+        sns.set_theme(style=style["theme"], palette=style["palette"])
+        _current_theme = key
+    colors = _palettes.get(style["palette"])
+    if colors is None:
+        colors = _palettes[style["palette"]] = sns.color_palette(style["palette"], 10)
+    return colors
+
+
+def render_chart(spec: ChartSpec, path: str) -> int:
+    """차트 하나를 path에 기록 (임시 파일 → rename으로 원자적 교체), 바이트 수 반환"""
+    if spec.template not in TEMPLATES:
+        raise ValueError(f"알 수 없는 차트 템플릿: {spec.template}")
+    style = spec.resolved_style()
+    colors = _palette(style)
+    fig = _figure(style)
+    ax = fig.add_subplot()
+    TEMPLATES[spec.template](fig, ax, spec, colors)
+    if spec.title:
+        ax.set_title(spec.title)
+    if spec.options.get("xlabel"):
+        ax.set_xlabel(spec.options["xlabel"])
+    if spec.options.get("ylabel"):
+        ax.set_ylabel(spec.options["ylabel"])
+    if spec.template != "donut" and len(spec.data) > 2:
+        ax.legend(frameon=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fig.savefig(tmp, format=spec.format)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def _render_batch(items: List[Tuple[ChartSpec, str]]) -> List[int]:
+    return [render_chart(spec, path) for spec, path in items]
+
+
+# ---------------------------------------------------------------------------
+# 호출 쪽: 캐시 조회 → 누락분만 풀에서 병렬 렌더링
+# ---------------------------------------------------------------------------
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_prune_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """렌더링 프로세스 풀 싱글톤 (spawn - 워커는 Agg 백엔드만 로드)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=CHART_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            logger.info(f"🖼️ 차트 렌더링 프로세스 풀 시작: 워커 {CHART_WORKERS}개")
+        return _executor
+
+
+def shutdown_executor(wait: bool = False):
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait, cancel_futures=True)
+            _executor = None
+
+
+def prune_cache(max_bytes: Optional[int] = None, keep: Sequence[str] = ()) -> int:
+    """캐시 용량 상한 초과 시 가장 오래 쓰이지 않은(mtime) 파일부터 삭제, 삭제 수 반환 (keep 경로는 제외)"""
+    max_bytes = CHART_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    keep = {os.path.abspath(p) for p in keep}
+    with _prune_lock:
+        entries = []
+        for root, _, files in os.walk(CHART_CACHE_DIR):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            if os.path.abspath(path) in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def _publish(path: str, output_dir: str, filename: str) -> str:
+    """캐시 파일을 산출물 디렉터리에 하드링크 (다른 파일시스템이면 복사)"""
+    os.makedirs(output_dir, exist_ok=True)
+    target = os.path.join(output_dir, filename)
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(path, target)
+    except OSError:
+        shutil.copyfile(path, target)
+    return target
+
+
+def render_charts(specs: Sequence[ChartSpec], output_dir: Optional[str] = None) -> Dict[str, Any]:
+    """차트 묶음 렌더링 - 내용 해시가 캐시에 있으면 재사용, 없으면 워커 풀에서 병렬로 그림
+
+    output_dir가 있으면 각 차트를 {name}.{format} 으로 연결해 둔다.
+    """
+    started = time.perf_counter()
+    for spec in specs:
+        if spec.format not in FORMATS:
+            raise ValueError(f"지원하지 않는 차트 형식: {spec.format} (가능: {FORMATS})")
+        if spec.template not in TEMPLATES:
+            raise ValueError(f"알 수 없는 차트 템플릿: {spec.template}")
+    keys = [chart_key(spec) for spec in specs]
+    # 같은 키는 한 번만 렌더링
+    missing: Dict[str, Tuple[ChartSpec, str]] = {}
+    for spec, key in zip(specs, keys):
+        path = cache_path(key, spec.format)
+        if os.path.exists(path):
+            # LRU 정리 기준이 되는 mtime 갱신
+            os.utime(path)
+        elif key not in missing:
+            missing[key] = (spec, path)
+
+    items = list(missing.values())
+    if len(items) <= CHART_INLINE_MAX:
+        _init_worker()
+        _render_batch(items)
+    else:
+        executor = get_executor()
+        # 워커 수의 몇 배로 나눠 제출해 IPC 횟수를 줄이면서 부하를 고르게 분산
+        n_batches = min(len(items), CHART_WORKERS * 4)
+        futures = [executor.submit(_render_batch, items[i::n_batches]) for i in range(n_batches)]
+        for future in futures:
+            future.result()
+
+    charts = []
+    paths = []
+    for spec, key in zip(specs, keys):
+        path = cache_path(key, spec.format)
+        entry = {"name": spec.name, "key": key, "format": spec.format, "cached": key not in missing,
+                 "bytes": os.path.getsize(path)}
+        if output_dir:
+            _publish(path, output_dir, f"{spec.name}.{spec.format}")
+        charts.append(entry)
+        paths.append(path)
+    # 이번 묶음의 차트를 모두 쓴 뒤에 정리 - 방금 쓴(또는 재사용한) 캐시 파일은 지우지 않음
+    if items:
+        prune_cache(keep=paths)
+    elapsed = time.perf_counter() - started
+    logger.info(f"🖼️ 차트 {len(specs)}개: 캐시 적중 {len(specs) - len(items)}, 렌더링 {len(items)}, {elapsed:.2f}s")
+    return {
+        "charts": charts,
+        "rendered": len(items),
+        "cache_hits": len(specs) - len(items),
+        "elapsed_ms": round(elapsed * 1000, 3),
+    }
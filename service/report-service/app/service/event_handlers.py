@@ -0,0 +1,46 @@
+# cbam-service 이벤트 구독 - 결과가 바뀌면 열린 파티션 정리 + 분기 보고서 자동 재생성 (HTTP 호출 체인 없이 비동기)
+import os
+import logging
+from typing import Dict, Any
+
+from app.common.event_bus import LocalEventBus
+from app.common.result_store import clear_open_files, invalidate_partition
+from app.service.cbam_report import RESULT_KIND
+from app.service.report_jobs import PRIORITIES, submit_job_once
+
+logger = logging.getLogger("report_service")
+
+# calculation.completed를 받으면 분기 보고서 작업 등록 (0이면 파티션 정리만)
+AUTO_REPORTS = os.getenv("REPORT_AUTO_REGENERATE", "1") == "1"
+AUTO_REPORT_PRIORITY = os.getenv("REPORT_AUTO_PRIORITY", "low")
+if AUTO_REPORT_PRIORITY not in PRIORITIES:
+    raise ValueError(f"REPORT_AUTO_PRIORITY는 {PRIORITIES} 중 하나여야 합니다")
+
+
+async def on_calculation_completed(event: Dict[str, Any]):
+    """새 결과 버전 - 같은 버전 재전달이나 대기 중인 작업이 있으면 새 작업을 만들지 않음 (멱등)"""
+    data = event["data"]
+    company_id, quarter, version = data["company_id"], data["quarter"], int(data["version"])
+    invalidate_partition(RESULT_KIND, company_id, quarter)
+    if not AUTO_REPORTS:
+        return
+    job, created = await submit_job_once(
+        f"cbam_quarter_report:{company_id}:{quarter}", version, "cbam_quarter_report",
+        {"company_id": company_id, "quarter": quarter, "version": version},
+        priority=AUTO_REPORT_PRIORITY, label=f"auto v{version} ({data.get('reason', '')})",
+    )
+    logger.info(
+        f"📨 결과 갱신 {company_id}/{quarter} v{version}: "
+        f"{'보고서 작업 등록' if created else '기존 작업 사용'} {job['job_id']}"
+    )
+
+
+async def on_factors_updated(event: Dict[str, Any]):
+    """기본값 테이블 갱신 - 영향받은 분기는 각각 calculation.completed로 오므로 열린 파일만 모두 정리"""
+    clear_open_files()
+    logger.info(f"📨 기본값 테이블 갱신 수신: {event['data'].get('factor_table_version')}")
+
+
+def register_event_handlers(bus: LocalEventBus):
+    bus.subscribe("calculation.completed", on_calculation_completed)
+    bus.subscribe("factors.updated", on_factors_updated)
@@ -0,0 +1,788 @@
+# CBAM 데이터 형식 변환 - CSV / XLSX / JSON / NDJSON / EU CBAM 레지스트리 분기 보고서 XML
+# 모든 리더는 레코드(dict)를 하나씩 내보내는 제너레이터, 모든 라이터는 레코드를 받아 바이트 청크를 내보내는
+# 제너레이터라서 변환 중 메모리는 입력 크기와 무관하게 일정하고 첫 바이트는 첫 레코드 직후 바로 나간다
+import io
+import os
+import re
+import csv
+import json
+import math
+import zipfile
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Iterator, Iterable, Sequence, Tuple, BinaryIO
+from xml.etree import ElementTree
+from xml.etree.ElementTree import iterparse
+from xml.parsers import expat
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+import pandas as pd
+
+from app.common.result_store import iter_partition
+
+logger = logging.getLogger("report_service")
+
+FORMATS = ("csv", "xlsx", "json", "ndjson", "xml")
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "xml": "application/xml",
+}
+# 라이터가 모아서 내보내는 최소 청크 크기 (너무 잘게 쪼개면 청크 인코딩/소켓 쓰기 부담)
+FLUSH_BYTES = int(os.getenv("REPORT_CONVERT_FLUSH_KB", "64")) * 1024
+READ_BYTES = 1 << 16
+
+# 결과 저장소 cbam 파티션에서 내보내는 기본 열 (파티션에 없는 열은 건너뜀)
+EXPORT_FIELDS = [
+    "line_id", "cn_code", "country_of_origin", "installation_id", "import_month",
+    "quantity_t", "direct_see", "indirect_see", "carbon_price_paid_eur",
+    "direct_see_used", "indirect_see_used", "direct_is_default", "indirect_is_default", "factor_missing",
+    "embedded_direct_t", "embedded_indirect_t", "embedded_precursor_t", "embedded_total_t",
+    "free_allocation_t", "certificates", "certificate_cost_eur",
+]
+# 텍스트 형식(CSV/XLSX 문자열 셀/XML)에서 읽을 때 숫자/불리언으로 되돌릴 열
+FLOAT_FIELDS = {
+    "quantity_t", "direct_see", "indirect_see", "carbon_price_paid_eur", "direct_see_used", "indirect_see_used",
+    "embedded_direct_t", "embedded_indirect_t", "embedded_precursor_t", "embedded_total_t",
+    "free_allocation_t", "certificates", "certificate_cost_eur",
+}
+BOOL_FIELDS = {"direct_is_default", "indirect_is_default", "factor_missing"}
+
+# 레지스트리 분기 보고서 GoodsImported 항목 안의 경로 (cn_code는 HsCode 6자리 + CnCode 2자리로 나눠 기록)
+REGISTRY_ROOT = "QReport"
+REGISTRY_ITEM = "GoodsImported"
+REGISTRY_FIELDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("line_id", ("ItemReference",)),
+    ("country_of_origin", ("OriginCountry", "CountryCodeIso")),
+    ("import_month", ("ImportedQuantity", "ImportMonth")),
+    ("quantity_t", ("ImportedQuantity", "GoodsMeasure", "NetMass")),
+    ("installation_id", ("GoodsEmissions", "Installation", "InstallationId")),
+    ("direct_see", ("GoodsEmissions", "ReportedEmissions", "SpecificDirectEmissions")),
+    ("indirect_see", ("GoodsEmissions", "ReportedEmissions", "SpecificIndirectEmissions")),
+    ("direct_see_used", ("GoodsEmissions", "AppliedEmissions", "SpecificDirectEmissions")),
+    ("indirect_see_used", ("GoodsEmissions", "AppliedEmissions", "SpecificIndirectEmissions")),
+    ("direct_is_default", ("GoodsEmissions", "AppliedEmissions", "DirectDefaultValue")),
+    ("indirect_is_default", ("GoodsEmissions", "AppliedEmissions", "IndirectDefaultValue")),
+    ("factor_missing", ("GoodsEmissions", "AppliedEmissions", "DefaultValueMissing")),
+    ("embedded_direct_t", ("GoodsEmissions", "EmbeddedEmissions", "Direct")),
+    ("embedded_indirect_t", ("GoodsEmissions", "EmbeddedEmissions", "Indirect")),
+    ("embedded_precursor_t", ("GoodsEmissions", "EmbeddedEmissions", "Precursors")),
+    ("embedded_total_t", ("GoodsEmissions", "EmbeddedEmissions", "Total")),
+    ("carbon_price_paid_eur", ("CarbonPriceDue", "AmountEur")),
+    ("free_allocation_t", ("Obligation", "FreeAllocationAdjustment")),
+    ("certificates", ("Obligation", "Certificates")),
+    ("certificate_cost_eur", ("Obligation", "CertificateCostEur")),
+]
+# 위 목록에 없는 열은 이름을 속성으로 단 보충 요소로 기록해 왕복 변환에서 잃지 않음
+REGISTRY_EXTRA = "AdditionalInformation"
+# XML 분기 합계로 누적하는 열
+REGISTRY_TOTALS = ("quantity_t", "embedded_total_t", "certificates", "certificate_cost_eur")
+_XLSX_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_XLSX_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_XLSX_T, _XLSX_SI = _XLSX_MAIN + "t", _XLSX_MAIN + "si"
+_QUARTER = re.compile(r"^(\d{4})\D*Q([1-4])$", re.IGNORECASE)
+# XML 1.0 Char 범위 밖 문자 (제어문자, 서로게이트, U+FFFE/FFFF) - escape로는 표현할 수 없어 대체 문자로 바꿈
+_XML_ILLEGAL = re.compile("[^\x09\x0a\x0d\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]")
+
+
+class ConversionError(ValueError):
+    """입력 형식 오류 (행 번호 포함)"""
+
+
+# ---- 값 정규화 ----
+
+def _clean(value):
+    """NumPy 스칼라/NaN → JSON 호환 Python 값"""
+    if value is None:
+        return None
+    if isinstance(value, (np.floating, float)):
+        return None if math.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _from_text(name: str, text: Optional[str]):
+    """문자열 셀 → 필드 타입 (빈 값은 None)"""
+    if text is None or text == "":
+        return None
+    if name in FLOAT_FIELDS:
+        return float(text)
+    if name in BOOL_FIELDS:
+        return text.strip().lower() in ("true", "1", "yes")
+    return text
+
+
+def _to_text(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _xml_text(value) -> str:
+    """값 → XML 문자 데이터 (허용되지 않는 문자는 U+FFFD로 바꾼 뒤 escape)"""
+    return escape(_XML_ILLEGAL.sub("\ufffd", _to_text(value)))
+
+
+def normalize_cn_code(value) -> Optional[str]:
+    """CN 코드는 숫자로 읽혀도 8자리 문자열로 통일 (선행 0 보존)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, float):
+        value = int(value)
+    return str(value).strip().zfill(8)
+
+
+def _normalized(records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for record in records:
+        if "cn_code" in record:
+            record["cn_code"] = normalize_cn_code(record["cn_code"])
+        yield record
+
+
+# ---- 리더 ----
+
+def read_csv(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    for row in reader:
+        try:
+            yield {name: _from_text(name, value) for name, value in row.items() if name is not None}
+        except ValueError as e:
+            raise ConversionError(f"CSV {reader.line_num}행: {e}")
+
+
+def read_ndjson(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    for number, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8"), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ConversionError(f"NDJSON {number}행: {e.msg}")
+        if not isinstance(record, dict):
+            raise ConversionError(f"NDJSON {number}행: 객체가 아닙니다")
+        yield record
+
+
+def read_json(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """최상위 배열을 원소 단위로 점진 파싱 (전체 문서를 메모리에 올리지 않음)"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = text.read(READ_BYTES)
+        buffer = buffer[position:] + chunk
+        position = 0
+        eof = not chunk
+        return bool(chunk)
+
+    def skip(chars: str):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in chars:
+                position += 1
+            if position < len(buffer) or not fill():
+                return
+
+    skip(" \t\r\n")
+    if buffer[position:position + 1] != "[":
+        raise ConversionError("JSON 입력은 레코드 객체의 배열이어야 합니다")
+    position += 1
+    count = 0
+    while True:
+        skip(" \t\r\n")
+        if buffer[position:position + 1] == "]":
+            return
+        if count:
+            if buffer[position:position + 1] != ",":
+                raise ConversionError(f"JSON {count}번째 원소 뒤에 ',' 또는 ']'가 필요합니다")
+            position += 1
+            skip(" \t\r\n")
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+                # 숫자가 버퍼 끝에서 잘렸을 수 있으므로 끝에 닿았으면 더 읽고 다시 해석
+                if end < len(buffer) or eof:
+                    break
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ConversionError(f"JSON {count + 1}번째 원소: {e.msg}")
+            fill()
+        if not isinstance(record, dict):
+            raise ConversionError(f"JSON {count + 1}번째 원소가 객체가 아닙니다")
+        position = end
+        count += 1
+        yield record
+
+
+def _xlsx_first_sheet(archive: zipfile.ZipFile) -> str:
+    """workbook.xml의 첫 시트 → 관계 파일에서 시트 XML 경로"""
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    sheet = workbook.find(f"{_XLSX_MAIN}sheets/{_XLSX_MAIN}sheet")
+    if sheet is None:
+        raise ConversionError("XLSX에 시트가 없습니다")
+    rel_id = sheet.get(f"{_XLSX_REL}id")
+    rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    target = next((r.get("Target") for r in rels if r.get("Id") == rel_id), "worksheets/sheet1.xml")
+    return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+
+
+def _xlsx_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings: List[str] = []
+    parts: List[str] = []
+    with archive.open("xl/sharedStrings.xml") as f:
+        for _, element in iterparse(f):
+            if element.tag == _XLSX_T:
+                parts.append(element.text or "")
+            elif element.tag == _XLSX_SI:
+                strings.append("".join(parts))
+                parts = []
+                element.clear()
+    return strings
+
+
+def _xlsx_column(ref: str) -> int:
+    """셀 참조 "AB12" → 0부터 시작하는 열 번호"""
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + (ord(char.upper()) - 64)
+    return index - 1
+
+
+def _xlsx_number(text: str):
+    return int(text) if text.lstrip("-").isdigit() else float(text)
+
+
+def iter_xlsx_rows(stream: BinaryIO) -> Iterator[List[Any]]:
+    """첫 시트를 행 단위로 스트리밍 (셀 값 리스트, 빈 셀은 None)
+
+    시트 XML을 zip에서 풀면서 expat 콜백으로 셀만 모으므로 메모리는 공유 문자열 표 크기로 고정된다.
+    셀 스타일/날짜 서식은 해석하지 않고 저장된 숫자를 그대로 반환.
+    """
+    with zipfile.ZipFile(stream) as archive:
+        shared = _xlsx_shared_strings(archive)
+        sheet_path = _xlsx_first_sheet(archive)
+        text: List[str] = []
+        ready: List[List[Any]] = []
+        cells: Dict[int, Any] = {}
+        cell: Dict[str, Any] = {"column": -1, "type": None, "value": None}
+
+        def start(tag, attrs):
+            tag = tag.rpartition(":")[2]
+            if tag == "c":
+                ref = attrs.get("r")
+                cell["column"] = _xlsx_column(ref) if ref else cell["column"] + 1
+                cell["type"] = attrs.get("t")
+                cell["value"] = None
+            elif tag == "row":
+                cell["column"] = -1
+            text.clear()
+
+        def end(tag):
+            tag = tag.rpartition(":")[2]
+            if tag == "v" or tag == "t":
+                # 인라인 서식 문자열(<r><t>)은 조각을 이어 붙임
+                cell["value"] = (cell["value"] or "") + "".join(text) if tag == "t" else "".join(text)
+            elif tag == "c":
+                kind, value = cell["type"], cell["value"]
+                if value is None:
+                    pass
+                elif kind == "s":
+                    cells[cell["column"]] = shared[int(value)]
+                elif kind == "b":
+                    cells[cell["column"]] = value == "1"
+                elif kind in ("str", "e", "inlineStr"):
+                    cells[cell["column"]] = value
+                else:
+                    cells[cell["column"]] = _xlsx_number(value)
+            elif tag == "row":
+                row = [None] * (max(cells) + 1) if cells else []
+                for column, value in cells.items():
+                    row[column] = value
+                cells.clear()
+                ready.append(row)
+            text.clear()
+
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = text.append
+        with archive.open(sheet_path) as sheet:
+            try:
+                while True:
+                    chunk = sheet.read(READ_BYTES)
+                    parser.Parse(chunk, not chunk)
+                    yield from ready
+                    ready.clear()
+                    if not chunk:
+                        return
+            except expat.ExpatError as e:
+                raise ConversionError(f"XLSX 시트 형식 오류: {e}")
+
+
+def read_xlsx(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """첫 시트를 행 단위 스트리밍 (첫 행은 헤더)"""
+    rows = iter_xlsx_rows(stream)
+    header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+    for number, row in enumerate(rows, start=2):
+        record = {}
+        for name, value in itertools.zip_longest(header, row[:len(header)]):
+            if not name:
+                continue
+            try:
+                record[name] = _from_text(name, value) if isinstance(value, str) else _clean(value)
+            except ValueError as e:
+                raise ConversionError(f"XLSX {number}행 {name}: {e}")
+        if any(v is not None for v in record.values()):
+            yield record
+
+
+def _registry_trie() -> Dict[str, Any]:
+    """GoodsImported 하위 경로 → 필드 이름 트라이 (말단 값이 필드 이름)"""
+    trie: Dict[str, Any] = {}
+    paths = REGISTRY_FIELDS + [("_hs", ("CommodityCode", "HsCode")), ("_cn", ("CommodityCode", "CnCode"))]
+    for name, path in paths:
+        node = trie
+        for tag in path[:-1]:
+            node = node.setdefault(tag, {})
+        node[path[-1]] = name
+    return trie
+
+
+def read_registry_xml(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """레지스트리 분기 보고서 XML → GoodsImported 항목별 레코드
+
+    expat 콜백에서 경로 트라이만 따라가며 필드를 채움 - 요소 트리를 만들지 않아 메모리가 일정하고
+    iterparse + 트리 정리보다 빠름. 입력은 READ_BYTES씩 넣고 그 사이 완성된 레코드를 내보냄.
+    """
+    item_trie = _registry_trie()
+    # 항목 밖은 None, 항목 안은 현재 위치의 트라이 노드(dict) 또는 필드 이름(str), 모르는 요소는 빈 dict
+    nodes: List[Any] = [None]
+    text: List[str] = []
+    ready: List[Dict[str, Any]] = []
+    unknown: Dict[str, Any] = {}
+    state: Dict[str, Any] = {"record": None, "number": 0, "extra": None}
+
+    def start(tag, attrs):
+        if ":" in tag:
+            tag = tag.rpartition(":")[2]
+        parent = nodes[-1]
+        text.clear()
+        if parent is None:
+            if tag == REGISTRY_ITEM:
+                state["record"] = {}
+                state["number"] += 1
+                nodes.append(item_trie)
+            else:
+                nodes.append(None)
+            return
+        if parent is item_trie and tag == REGISTRY_EXTRA:
+            state["extra"] = attrs.get("name")
+            nodes.append(REGISTRY_EXTRA)
+            return
+        nodes.append(parent.get(tag, unknown) if isinstance(parent, dict) else unknown)
+
+    def end(tag):
+        node = nodes.pop()
+        if node is item_trie:
+            record = state["record"]
+            hs = record.pop("_hs", None) or ""
+            cn = record.pop("_cn", None) or ""
+            if hs:
+                record["cn_code"] = hs + cn
+            ready.append(record)
+            state["record"] = None
+        elif node.__class__ is str:
+            record = state["record"]
+            value = "".join(text).strip()
+            try:
+                if node is REGISTRY_EXTRA:
+                    if state["extra"]:
+                        record[state["extra"]] = value or None
+                else:
+                    if node == "_hs" and "cn_code" not in record:
+                        # 열 순서를 쓸 때와 같게 유지 (cn_code가 앞쪽)
+                        record["cn_code"] = None
+                    record[node] = _from_text(node, value)
+            except ValueError as e:
+                raise ConversionError(f"XML {state['number']}번째 {REGISTRY_ITEM} {tag}: {e}")
+        text.clear()
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = text.append
+    try:
+        while True:
+            chunk = stream.read(READ_BYTES)
+            parser.Parse(chunk, not chunk)
+            yield from ready
+            ready.clear()
+            if not chunk:
+                return
+    except expat.ExpatError as e:
+        raise ConversionError(f"XML 형식 오류: {e}")
+
+
+def partition_records(kind: str, company_id: str, quarter: str,
+                      columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+    """결과 저장소 파티션 → 레코드 (행 그룹 하나씩 디코딩)"""
+    for chunk in iter_partition(kind, company_id, quarter, columns):
+        names = list(chunk)
+        values = []
+        for name in names:
+            column = chunk[name]
+            if name == "cn_code" and not isinstance(column, pd.Categorical):
+                values.append([normalize_cn_code(int(v)) for v in column])
+            elif isinstance(column, pd.Categorical):
+                values.append([None if pd.isna(v) else v for v in column.astype(object)])
+            elif column.dtype.kind == "f":
+                values.append(np.where(np.isnan(column), None, column).tolist())
+            else:
+                values.append(column.tolist())
+        for row in zip(*values):
+            yield dict(zip(names, row))
+
+
+READERS = {
+    "csv": read_csv,
+    "xlsx": read_xlsx,
+    "json": read_json,
+    "ndjson": read_ndjson,
+    "xml": read_registry_xml,
+}
+# 레코드마다 키가 다를 수 있는 입력 - 첫 레코드만으로는 열 목록을 정할 수 없음
+SCHEMALESS_SOURCES = ("json", "ndjson", "xml")
+# 레코드마다 자기 키를 그대로 쓸 수 있는 출력 (CSV/XLSX처럼 고정 헤더가 필요 없어 열 목록을 미리 훑지 않음)
+OPEN_KEY_TARGETS = ("json", "ndjson", "xml")
+
+
+# ---- 라이터 ----
+
+class _ChunkSink(io.RawIOBase):
+    """쓰기만 되는 버퍼 - 쌓인 바이트를 drain()으로 꺼내 응답 청크로 내보냄 (zipfile은 seek 불가 출력으로 기록)"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        self.size = 0
+        return data
+
+
+def write_csv(records: Iterable[Dict[str, Any]], fields: Sequence[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(fields)
+    for record in records:
+        writer.writerow(["" if v is None else _to_text(v) for v in (record.get(f) for f in fields)])
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def write_ndjson(records: Iterable[Dict[str, Any]], fields: Sequence[str],
+                 open_keys: bool = False) -> Iterator[bytes]:
+    """open_keys면 fields로 자르지 않고 레코드의 키를 그대로 기록"""
+    encode = json.JSONEncoder(ensure_ascii=False, allow_nan=False).encode
+    parts: List[str] = []
+    size = 0
+    for record in records:
+        line = encode(record if open_keys else {f: record.get(f) for f in fields}) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    yield "".join(parts).encode("utf-8")
+
+
+def write_json(records: Iterable[Dict[str, Any]], fields: Sequence[str],
+               open_keys: bool = False) -> Iterator[bytes]:
+    """open_keys면 fields로 자르지 않고 레코드의 키를 그대로 기록"""
+    encode = json.JSONEncoder(ensure_ascii=False, allow_nan=False).encode
+    parts: List[str] = ["["]
+    size = 1
+    separator = "\n"
+    for record in records:
+        item = separator + encode(record if open_keys else {f: record.get(f) for f in fields})
+        separator = ",\n"
+        parts.append(item)
+        size += len(item)
+        if size >= FLUSH_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    parts.append("\n]\n")
+    yield "".join(parts).encode("utf-8")
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="lines" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{_to_text(value)}</v></c>"
+    # 공유 문자열 표 없이 인라인 문자열 - 표를 만들려면 전체 문자열을 끝까지 모아야 함
+    return f'<c t="inlineStr"><is><t>{_xml_text(value)}</t></is></c>'
+
+
+def write_xlsx(records: Iterable[Dict[str, Any]], fields: Sequence[str]) -> Iterator[bytes]:
+    """XLSX(zip)를 seek 없이 순차 기록 - 시트 XML을 행 단위로 압축 스트림에 흘려 씀"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                '<row>' + "".join(_xlsx_cell(f) for f in fields) + '</row>'
+            ).encode("utf-8"))
+            rows: List[str] = []
+            for record in records:
+                rows.append("<row>" + "".join(_xlsx_cell(record.get(f)) for f in fields) + "</row>")
+                if len(rows) >= 1000:
+                    sheet.write("".join(rows).encode("utf-8"))
+                    rows = []
+                    if sink.size >= FLUSH_BYTES:
+                        yield sink.drain()
+            sheet.write(("".join(rows) + "</sheetData></worksheet>").encode("utf-8"))
+    yield sink.drain()
+
+
+def _registry_tree(fields: Sequence[str]) -> List:
+    """기록할 열 → GoodsImported 하위 요소 트리 [(태그, 열 이름 | 하위 트리)] (경로 첫 등장 순서 유지)"""
+    tree: List = []
+    for name, path in REGISTRY_FIELDS:
+        if name not in fields:
+            continue
+        level = tree
+        for tag in path[:-1]:
+            node = next((n for n in level if n[0] == tag and isinstance(n[1], list)), None)
+            if node is None:
+                node = (tag, [])
+                level.append(node)
+            level = node[1]
+        level.append((path[-1], name))
+    return tree
+
+
+def _registry_element(tag: str, content, record: Dict[str, Any]) -> str:
+    if isinstance(content, list):
+        inner = "".join(_registry_element(t, c, record) for t, c in content)
+        return f"<{tag}>{inner}</{tag}>"
+    value = record.get(content)
+    # 값이 없어도 빈 요소를 남겨 다시 읽을 때 열 목록이 첫 항목에서 온전히 정해지게 함
+    return f"<{tag}/>" if value is None else f"<{tag}>{_xml_text(value)}</{tag}>"
+
+
+def write_registry_xml(records: Iterable[Dict[str, Any]], fields: Sequence[str],
+                       company_id: str = "", quarter: str = "", open_keys: bool = False) -> Iterator[bytes]:
+    """EU CBAM 레지스트리 분기 보고서 구조로 기록 - 항목을 만나는 대로 쓰고 분기 합계는 마지막에 기록
+
+    open_keys면 fields 밖의 키도 항목마다 AdditionalInformation으로 기록 (열 목록을 미리 훑지 않음)
+    """
+    match = _QUARTER.match(quarter or "")
+    period = (f"<ReportingPeriod>Q{match.group(2)}</ReportingPeriod><Year>{match.group(1)}</Year>"
+              if match else f"<ReportingPeriod>{_xml_text(quarter)}</ReportingPeriod>")
+    parts: List[str] = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        f"<{REGISTRY_ROOT}>",
+        f"<DraftReportId>{_xml_text(company_id)}-{_xml_text(quarter)}</DraftReportId>" if company_id else "",
+        f"<ReportDate>{datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}</ReportDate>",
+        period,
+        f"<Declarant><IdentificationNumber>{_xml_text(company_id)}</IdentificationNumber></Declarant>\n",
+    ]
+    # 헤더는 레코드를 기다리지 않고 바로 내보냄
+    yield "".join(parts).encode("utf-8")
+    tree = _registry_tree(fields)
+    known = {name for name, _ in REGISTRY_FIELDS} | {"cn_code"}
+    extras = [f for f in fields if f not in known]
+    with_code = "cn_code" in fields
+    # open_keys: 트리/품목 코드로 기록하지 않는 키는 모두 보충 요소로
+    covered = {name for name, _ in REGISTRY_FIELDS if name in fields} | ({"cn_code"} if with_code else set())
+    totals = dict.fromkeys(REGISTRY_TOTALS, 0.0)
+    parts, size, count = [], 0, 0
+    for record in records:
+        count += 1
+        item = [f"<{REGISTRY_ITEM}><ItemNumber>{count}</ItemNumber>"]
+        if with_code:
+            code = record.get("cn_code") or ""
+            item.append(f"<CommodityCode><HsCode>{_xml_text(code[:6])}</HsCode>"
+                        f"<CnCode>{_xml_text(code[6:])}</CnCode></CommodityCode>")
+        item.extend(_registry_element(tag, content, record) for tag, content in tree)
+        for name in ([k for k in record if k not in covered] if open_keys else extras):
+            if record.get(name) is not None:
+                item.append(f"<{REGISTRY_EXTRA} name={quoteattr(_XML_ILLEGAL.sub(chr(0xfffd), name))}>"
+                            f"{_xml_text(record[name])}</{REGISTRY_EXTRA}>")
+        item.append(f"</{REGISTRY_ITEM}>\n")
+        for name in REGISTRY_TOTALS:
+            value = record.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[name] += value
+        text = "".join(item)
+        parts.append(text)
+        size += len(text)
+        if size >= FLUSH_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    parts.append(
+        f"<TotalGoodsImported><NumberOfItems>{count}</NumberOfItems>"
+        f"<NetMass>{_to_text(totals['quantity_t'])}</NetMass>"
+        f"<TotalEmissions>{_to_text(totals['embedded_total_t'])}</TotalEmissions>"
+        f"<Certificates>{_to_text(totals['certificates'])}</Certificates>"
+        f"<CertificateCostEur>{_to_text(totals['certificate_cost_eur'])}</CertificateCostEur>"
+        f"</TotalGoodsImported>\n</{REGISTRY_ROOT}>\n"
+    )
+    yield "".join(parts).encode("utf-8")
+
+
+WRITERS = {
+    "csv": write_csv,
+    "xlsx": write_xlsx,
+    "json": write_json,
+    "ndjson": write_ndjson,
+    "xml": write_registry_xml,
+}
+
+
+# ---- 변환 ----
+
+def scan_fields(records: Iterable[Dict[str, Any]]) -> List[str]:
+    """입력 전체를 한 번 훑어 모든 키를 처음 나온 순서대로 모음 (스키마 없는 입력의 열 목록)"""
+    seen: Dict[str, None] = {}
+    for record in records:
+        for key in record:
+            if key not in seen:
+                seen[key] = None
+    return list(seen)
+
+
+def _checked(records: Iterator[Dict[str, Any]], fields: Sequence[str]) -> Iterator[Dict[str, Any]]:
+    """추론한 열 목록에 없는 키가 나오면 조용히 버리지 않고 변환을 중단"""
+    known = set(fields)
+    for row, record in enumerate(records, start=2):
+        if not known.issuperset(record):
+            extra = sorted(set(record) - known)
+            raise ConversionError(f"{row}번째 레코드에 열 목록에 없는 키가 있습니다: {extra} (fields 파라미터로 열 지정)")
+        yield record
+
+
+def open_records(records: Iterator[Dict[str, Any]], fields: Optional[Sequence[str]] = None,
+                 open_keys: bool = False) -> Tuple[List[str], Iterator[Dict[str, Any]]]:
+    """첫 레코드를 미리 읽어 입력 오류를 응답 시작 전에 드러내고, 열 목록(CSV/XLSX 헤더)을 정함
+
+    fields를 주면 그 열만 내보내고, 없으면 첫 레코드의 키를 쓰되 이후 레코드에 새 키가 나오면
+    ConversionError - 키가 레코드마다 다른 입력은 scan_fields로 열 목록을 먼저 구해 넘기거나,
+    레코드별 키를 그대로 쓰는 출력(OPEN_KEY_TARGETS)이면 open_keys로 검사를 생략
+    """
+    records = _normalized(records)
+    first = next(records, None)
+    if first is None:
+        return list(fields or []), iter(())
+    if fields:
+        return list(fields), itertools.chain([first], records)
+    fields = list(first)
+    return fields, itertools.chain([first], records if open_keys else _checked(records, fields))
+
+
+def convert(records: Iterator[Dict[str, Any]], fields: Sequence[str], target: str,
+            company_id: str = "", quarter: str = "", stats: Optional[Dict[str, Any]] = None,
+            open_keys: bool = False) -> Iterator[bytes]:
+    """레코드 → 대상 형식 바이트 청크. stats를 넘기면 rows/bytes를 채움
+
+    open_keys면 (OPEN_KEY_TARGETS만) fields 밖의 키도 레코드마다 그대로 기록
+    """
+    if target not in WRITERS:
+        raise ValueError(f"지원하지 않는 출력 형식: {target}")
+    if open_keys and target not in OPEN_KEY_TARGETS:
+        raise ValueError(f"{target} 출력은 고정 열 목록이 필요합니다")
+    stats = stats if stats is not None else {}
+    stats.update(rows=0, bytes=0)
+
+    def counted():
+        for record in records:
+            stats["rows"] += 1
+            yield record
+
+    if target == "xml":
+        chunks = write_registry_xml(counted(), fields, company_id, quarter, open_keys=open_keys)
+    elif open_keys:
+        chunks = WRITERS[target](counted(), fields, open_keys=True)
+    else:
+        chunks = WRITERS[target](counted(), fields)
+    for chunk in chunks:
+        if chunk:
+            stats["bytes"] += len(chunk)
+            yield chunk
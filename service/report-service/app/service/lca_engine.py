@@ -0,0 +1,334 @@
+# LCA 인벤토리 계산 엔진 - 희소 technology/intervention 행렬, LU 분해 캐시, 다중 수요 벡터 일괄 풀이
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Sequence, Mapping
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu
+
+logger = logging.getLogger("report_service")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+DEFAULT_DATABASE_DIR = os.path.join(DATA_DIR, "lca_steel_sample")
+# 한 번에 푸는 수요 벡터 수 (밀집 해 행렬 n × 블록 크기의 메모리 상한)
+SOLVE_BLOCK_COLUMNS = int(os.getenv("LCA_SOLVE_BLOCK_COLUMNS", "512"))
+MAX_CACHED_FACTORIZATIONS = int(os.getenv("LCA_MAX_CACHED_FACTORIZATIONS", "4"))
+# 열 순서: btf = 공급망 위상 순서(블록 삼각형)로 재배열 후 NATURAL, 그 외는 SuperLU permc_spec 그대로
+LCA_ORDERING = os.getenv("LCA_ORDERING", "btf")
+
+
+def _read_csv(directory: str, name: str) -> pd.DataFrame:
+    return pd.read_csv(os.path.join(directory, name), comment="#", skipinitialspace=True)
+
+
+def _no_uncertainty() -> Dict[str, np.ndarray]:
+    return {"row": np.empty(0, np.int64), "col": np.empty(0, np.int64),
+            "value": np.empty(0, np.float64), "sigma": np.empty(0, np.float64)}
+
+
+def _uncertain_exchanges(frame: pd.DataFrame, rows: np.ndarray, cols: np.ndarray,
+                         values: np.ndarray) -> Dict[str, np.ndarray]:
+    """gsd 열(기하 표준편차, 로그정규) → 불확실한 교환의 행렬 위치/기준값/σ = ln(gsd)"""
+    if "gsd" not in frame:
+        return _no_uncertainty()
+    gsd = frame["gsd"].fillna(1.0).to_numpy(np.float64)
+    if (gsd < 1.0).any():
+        raise ValueError("gsd(기하 표준편차)는 1 이상이어야 합니다")
+    keep = gsd > 1.0
+    return {"row": rows[keep].astype(np.int64), "col": cols[keep].astype(np.int64),
+            "value": values[keep], "sigma": np.log(gsd[keep])}
+
+
+class LCADatabase:
+    """희소 행렬 형태의 LCA 데이터베이스
+
+    technosphere (A, 활동 × 활동): 대각은 기준 제품 산출(+), 비대각은 투입(-)
+    biosphere (B, 흐름 × 활동): 활동 1단위당 환경 교환
+    characterization (C, 방법 × 흐름): 영향평가 특성화 계수
+    uncertainty: 불확실한 교환(gsd > 1)만 모은 배열 - {"technosphere"|"biosphere": {row, col, value, sigma}}
+    version은 행렬/불확실성/색인의 내용 해시 - 분해 캐시 키로 사용
+    """
+
+    def __init__(self, activities: pd.DataFrame, flows: pd.DataFrame, technosphere: sparse.csc_matrix,
+                 biosphere: sparse.csr_matrix, characterization: sparse.csr_matrix,
+                 methods: pd.DataFrame, name: str = "lca",
+                 uncertainty: Optional[Dict[str, Dict[str, np.ndarray]]] = None):
+        self.activities = activities.reset_index(drop=True)
+        self.flows = flows.reset_index(drop=True)
+        self.methods = methods.reset_index(drop=True)
+        self.technosphere = technosphere.tocsc()
+        self.biosphere = biosphere.tocsr()
+        self.characterization = characterization.tocsr()
+        self.activity_position = pd.Index(self.activities["id"])
+        self.method_position = pd.Index(self.methods["method"])
+        self.uncertainty = {kind: (uncertainty or {}).get(kind) or _no_uncertainty()
+                            for kind in ("technosphere", "biosphere")}
+        self.name = name
+        self.version = f"{name}:{self.content_hash()[:12]}"
+
+    @property
+    def n_activities(self) -> int:
+        return self.technosphere.shape[0]
+
+    @classmethod
+    def from_directory(cls, directory: str) -> "LCADatabase":
+        """activities/technosphere/flows/biosphere/characterization CSV → 희소 행렬 (COO로 한 번에 조립)"""
+        activities = _read_csv(directory, "activities.csv")
+        flows = _read_csv(directory, "flows.csv")
+        tech = _read_csv(directory, "technosphere.csv")
+        bio = _read_csv(directory, "biosphere.csv")
+        cf = _read_csv(directory, "characterization.csv")
+
+        act_index = pd.Index(activities["id"])
+        flow_index = pd.Index(flows["id"])
+        if act_index.has_duplicates or flow_index.has_duplicates:
+            raise ValueError("활동/흐름 id가 중복되었습니다")
+
+        def positions(index: pd.Index, values: pd.Series, what: str) -> np.ndarray:
+            pos = index.get_indexer(values)
+            if (pos < 0).any():
+                raise ValueError(f"정의되지 않은 {what}: {values[pos < 0].unique().tolist()[:10]}")
+            return pos
+
+        n = len(act_index)
+        tech_rows = positions(act_index, tech["producer"], "producer")
+        tech_cols = positions(act_index, tech["consumer"], "consumer")
+        tech_vals = -tech["amount"].to_numpy(np.float64)
+        rows = np.concatenate([np.arange(n), tech_rows])
+        cols = np.concatenate([np.arange(n), tech_cols])
+        vals = np.concatenate([np.ones(n), tech_vals])
+        # 같은 (producer, consumer) 교환은 COO → CSC 변환 시 합산됨
+        technosphere = sparse.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsc()
+
+        bio_rows = positions(flow_index, bio["flow"], "flow")
+        bio_cols = positions(act_index, bio["activity"], "activity")
+        bio_vals = bio["amount"].to_numpy(np.float64)
+        biosphere = sparse.coo_matrix((bio_vals, (bio_rows, bio_cols)), shape=(len(flow_index), n)).tocsr()
+
+        methods = cf.groupby("method", sort=False)["unit"].first().reset_index()
+        method_index = pd.Index(methods["method"])
+        characterization = sparse.coo_matrix(
+            (cf["factor"].to_numpy(np.float64),
+             (method_index.get_indexer(cf["method"]), positions(flow_index, cf["flow"], "flow"))),
+            shape=(len(method_index), len(flow_index)),
+        ).tocsr()
+        uncertainty = {
+            "technosphere": _uncertain_exchanges(tech, tech_rows, tech_cols, tech_vals),
+            "biosphere": _uncertain_exchanges(bio, bio_rows, bio_cols, bio_vals),
+        }
+        return cls(activities, flows, technosphere, biosphere, characterization, methods,
+                   name=os.path.basename(os.path.normpath(directory)), uncertainty=uncertainty)
+
+    def content_hash(self) -> str:
+        h = hashlib.sha1()
+        for matrix in (self.technosphere, self.biosphere, self.characterization):
+            m = matrix.copy()
+            m.sum_duplicates()
+            m.sort_indices()
+            for arr in (m.indptr, m.indices, m.data):
+                h.update(np.ascontiguousarray(arr).tobytes())
+        for kind in ("technosphere", "biosphere"):
+            for key in ("row", "col", "value", "sigma"):
+                h.update(np.ascontiguousarray(self.uncertainty[kind][key]).tobytes())
+        for index in (self.activities["id"], self.flows["id"], self.methods["method"]):
+            h.update("\x00".join(map(str, index)).encode())
+        return h.hexdigest()
+
+    def activity_positions(self, activity_ids: Sequence[str]) -> np.ndarray:
+        pos = self.activity_position.get_indexer(list(activity_ids))
+        if (pos < 0).any():
+            missing = [a for a, p in zip(activity_ids, pos) if p < 0]
+            raise KeyError(f"없는 활동: {missing[:10]}")
+        return pos
+
+    def method_positions(self, methods: Optional[Sequence[str]]) -> np.ndarray:
+        if not methods:
+            return np.arange(len(self.method_position))
+        pos = self.method_position.get_indexer(list(methods))
+        if (pos < 0).any():
+            missing = [m for m, p in zip(methods, pos) if p < 0]
+            raise KeyError(f"없는 영향평가 방법: {missing}")
+        return pos
+
+    def demand_matrix(self, demands: Sequence[Mapping[str, float]]) -> sparse.csc_matrix:
+        """[{활동 id: 수요량}, ...] → 희소 수요 행렬 (활동 × 기능단위 수)"""
+        rows, cols, vals = [], [], []
+        for j, demand in enumerate(demands):
+            if not demand:
+                raise ValueError(f"수요가 비어 있습니다 (기능단위 {j})")
+            ids = list(demand.keys())
+            rows.append(self.activity_positions(ids))
+            cols.append(np.full(len(ids), j))
+            vals.append(np.fromiter(demand.values(), dtype=np.float64, count=len(ids)))
+        if not demands:
+            return sparse.csc_matrix((self.n_activities, 0))
+        return sparse.coo_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(self.n_activities, len(demands)),
+        ).tocsc()
+
+
+def block_triangular_order(technosphere: sparse.spmatrix) -> np.ndarray:
+    """공급망 순서 - 강연결요소(순환 공급)를 묶고 상류 → 하류 위상 정렬한 활동 순서
+
+    이 순서로 행/열을 재배열하면 A가 블록 상삼각이 되어 LU 채움(fill-in)이 순환 블록 안으로 한정된다.
+    """
+    n = technosphere.shape[0]
+    coo = technosphere.tocoo()
+    off = coo.row != coo.col
+    # producer(행) → consumer(열) 간선
+    graph = sparse.csr_matrix((np.ones(off.sum()), (coo.row[off], coo.col[off])), shape=(n, n))
+    n_comp, labels = connected_components(graph, directed=True, connection="strong")
+    # 요소 간 간선 → Kahn 위상 정렬
+    src, dst = labels[coo.row[off]], labels[coo.col[off]]
+    cross = src != dst
+    edges = np.unique(np.stack([src[cross], dst[cross]], axis=1), axis=0) if cross.any() else np.empty((0, 2), int)
+    indegree = np.bincount(edges[:, 1], minlength=n_comp)
+    children = np.split(edges[:, 1], np.searchsorted(edges[:, 0], np.arange(1, n_comp)))
+    queue = list(np.flatnonzero(indegree == 0))
+    rank = np.empty(n_comp, dtype=np.int64)
+    position = 0
+    while queue:
+        comp = queue.pop()
+        rank[comp] = position
+        position += 1
+        for child in children[comp]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+    return np.lexsort((np.arange(n), rank[labels]))
+
+
+class LCASolver:
+    """technology 행렬 LU 분해 1회 → 여러 수요 벡터를 블록 단위 다중 우변으로 풀이"""
+
+    def __init__(self, db: LCADatabase):
+        self.db = db
+        self.version = db.version
+        if LCA_ORDERING == "btf":
+            self._order = block_triangular_order(db.technosphere)
+            permuted = db.technosphere[self._order][:, self._order].tocsc()
+            self._lu = splu(permuted, permc_spec="NATURAL")
+        else:
+            self._order = None
+            self._lu = splu(db.technosphere, permc_spec=LCA_ORDERING)
+        # 특성화 × intervention 을 미리 곱해 둠 (방법 × 활동, 희소)
+        self.impact_per_activity = (db.characterization @ db.biosphere).tocsr()
+        logger.info(
+            f"🧮 LCA 분해 완료 {db.version}: 활동 {db.n_activities}개, "
+            f"A nnz {db.technosphere.nnz}, L+U nnz {self._lu.L.nnz + self._lu.U.nnz}"
+        )
+
+    def supply(self, demand) -> np.ndarray:
+        """A s = f 풀이 - demand: (n,) 또는 (n, k) 밀집/희소 → 공급량 (n, k)"""
+        f = demand.toarray() if sparse.issparse(demand) else np.asarray(demand, dtype=np.float64)
+        squeeze = f.ndim == 1
+        f = f.reshape(self.db.n_activities, -1)
+        out = np.empty_like(f)
+        for start in range(0, f.shape[1], SOLVE_BLOCK_COLUMNS):
+            block = slice(start, start + SOLVE_BLOCK_COLUMNS)
+            if self._order is None:
+                out[:, block] = self._lu.solve(np.ascontiguousarray(f[:, block]))
+            else:
+                # P A Pᵀ (P s) = P f
+                out[self._order, block] = self._lu.solve(np.ascontiguousarray(f[self._order, block]))
+        return out[:, 0] if squeeze else out
+
+    def adjoint(self, weights: np.ndarray) -> np.ndarray:
+        """Aᵀ λ = w 풀이 (같은 분해 재사용) - 결과 h = wᵀ s 의 A 원소별 민감도 계산용"""
+        w = np.asarray(weights, dtype=np.float64)
+        if self._order is None:
+            return self._lu.solve(np.ascontiguousarray(w), trans="T")
+        out = np.empty_like(w)
+        # (P A Pᵀ)ᵀ (P λ) = P w
+        out[self._order] = self._lu.solve(np.ascontiguousarray(w[self._order]), trans="T")
+        return out
+
+    def inventory(self, demand) -> np.ndarray:
+        """환경 교환 인벤토리 g = B s (흐름 × k)"""
+        return self.db.biosphere @ self.supply(demand)
+
+    def impacts(self, demand, methods: Optional[Sequence[str]] = None) -> np.ndarray:
+        """영향평가 결과 h = C B s (방법 × k) - C B는 미리 곱한 희소 행렬"""
+        cb = self.impact_per_activity[self.db.method_positions(methods)]
+        if sparse.issparse(demand) and demand.shape[1] > SOLVE_BLOCK_COLUMNS:
+            # 수요가 많으면 블록마다 풀고 바로 곱해 밀집 해 행렬을 오래 들고 있지 않음
+            return np.hstack([
+                cb @ self.supply(demand[:, start:start + SOLVE_BLOCK_COLUMNS])
+                for start in range(0, demand.shape[1], SOLVE_BLOCK_COLUMNS)
+            ])
+        return cb @ self.supply(demand)
+
+    def unit_impacts(self, activity_ids: Optional[Sequence[str]] = None,
+                     methods: Optional[Sequence[str]] = None) -> np.ndarray:
+        """활동별 기준 제품 1단위 footprint (방법 × 활동) - 단위 수요 벡터를 한 번에 풀이"""
+        positions = self.db.activity_positions(activity_ids) if activity_ids else np.arange(self.db.n_activities)
+        demand = sparse.csc_matrix(
+            (np.ones(len(positions)), (positions, np.arange(len(positions)))),
+            shape=(self.db.n_activities, len(positions)),
+        )
+        return self.impacts(demand, methods)
+
+
+_database: Optional[LCADatabase] = None
+_database_lock = threading.Lock()
+_solvers: "OrderedDict[str, LCASolver]" = OrderedDict()
+_solver_lock = threading.Lock()
+
+
+def get_database() -> LCADatabase:
+    """LCA 데이터베이스 싱글톤 (LCA_DATABASE_DIR, 기본: 철강 샘플)"""
+    global _database
+    with _database_lock:
+        if _database is None:
+            directory = os.getenv("LCA_DATABASE_DIR", DEFAULT_DATABASE_DIR)
+            _database = LCADatabase.from_directory(directory)
+            logger.info(f"📚 LCA 데이터베이스 로드: {_database.version} ({_database.n_activities}개 활동)")
+        return _database
+
+
+def reload_database() -> LCADatabase:
+    """데이터베이스 파일 교체 후 다시 로드 (버전이 같으면 기존 분해를 그대로 재사용)"""
+    global _database
+    with _database_lock:
+        _database = None
+    return get_database()
+
+
+def get_solver(db: Optional[LCADatabase] = None) -> LCASolver:
+    """데이터베이스 버전별 분해 캐시 (LRU) - 같은 버전이면 분해를 다시 하지 않음"""
+    db = db if db is not None else get_database()
+    with _solver_lock:
+        solver = _solvers.get(db.version)
+        if solver is not None:
+            _solvers.move_to_end(db.version)
+            return solver
+        solver = _solvers[db.version] = LCASolver(db)
+        while len(_solvers) > MAX_CACHED_FACTORIZATIONS:
+            _solvers.popitem(last=False)
+        return solver
+
+
+def footprints(demands: Sequence[Mapping[str, float]], methods: Optional[Sequence[str]] = None,
+               db: Optional[LCADatabase] = None, arrays: bool = False) -> Dict[str, Any]:
+    """기능단위 수요 묶음 → 방법별 영향 (다중 우변 한 번에 풀이)
+
+    arrays=True면 impacts 행을 float64 배열로 둠 (내부 바이너리 응답이 리스트 변환 없이 원시 바이트로 전송)
+    """
+    db = db if db is not None else get_database()
+    solver = get_solver(db)
+    method_pos = db.method_positions(methods)
+    impacts = solver.impacts(db.demand_matrix(demands), methods)
+    return {
+        "database_version": db.version,
+        "methods": [
+            {"method": db.methods["method"][i], "unit": db.methods["unit"][i]} for i in method_pos
+        ],
+        "impacts": list(np.ascontiguousarray(impacts.T)) if arrays else impacts.T.tolist(),
+    }
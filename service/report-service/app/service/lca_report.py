@@ -0,0 +1,70 @@
+# LCA 보고서 - 제품별 footprint 표와 공정 기여도 (분해 캐시를 공유하는 일괄 풀이)
+import time
+from typing import Dict, Any, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from app.service.lca_engine import get_database, get_solver
+
+DEFAULT_METHOD = "ipcc2021_gwp100"
+
+
+def product_footprint_table(activity_ids: Optional[Sequence[str]] = None,
+                            methods: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """활동별 기준 제품 1단위 footprint 표 (행: 활동, 열: 방법)"""
+    db = get_database()
+    solver = get_solver(db)
+    ids = list(activity_ids) if activity_ids else db.activities["id"].tolist()
+    method_pos = db.method_positions(methods)
+    impacts = solver.unit_impacts(ids, methods)
+    table = pd.DataFrame(impacts.T, index=pd.Index(ids, name="activity_id"),
+                         columns=db.methods["method"].to_numpy()[method_pos])
+    # 활동 표의 "id" 대신 표의 키 이름(activity_id)을 유지
+    meta = db.activities.set_index("id").loc[ids, ["reference_product", "unit"]].rename_axis("activity_id")
+    return meta.join(table)
+
+
+def contribution_table(activity_ids: Sequence[str], method: str = DEFAULT_METHOD, top: int = 5) -> Dict[str, Any]:
+    """제품별 footprint에 대한 공정(활동) 직접 배출 기여도 상위 N개"""
+    db = get_database()
+    solver = get_solver(db)
+    positions = db.activity_positions(activity_ids)
+    demand = sparse.csc_matrix(
+        (np.ones(len(positions)), (positions, np.arange(len(positions)))),
+        shape=(db.n_activities, len(positions)),
+    )
+    supply = solver.supply(demand)                                           # (n, k)
+    per_activity = solver.impact_per_activity[db.method_positions([method])].toarray()[0]  # (n,)
+    contributions = supply.T * per_activity[None, :]                         # (k, n)
+    order = np.argsort(-np.abs(contributions), axis=1)[:, :top]
+    names = db.activities["id"].to_numpy()
+    out = {}
+    for row, activity_id in enumerate(activity_ids):
+        total = contributions[row].sum()
+        out[activity_id] = [
+            {
+                "activity_id": names[j],
+                "value": float(contributions[row, j]),
+                "share": float(contributions[row, j] / total) if total else 0.0,
+            }
+            for j in order[row]
+        ]
+    return out
+
+
+def steel_footprint_report(activity_ids: Optional[Sequence[str]] = None,
+                           methods: Optional[Sequence[str]] = None, top: int = 5) -> Dict[str, Any]:
+    """철강 제품 footprint 보고서 데이터 (표 + GWP100 기여도)"""
+    started = time.perf_counter()
+    db = get_database()
+    table = product_footprint_table(activity_ids, methods)
+    ids = table.index.tolist()
+    contributions = contribution_table(ids, DEFAULT_METHOD, top) if DEFAULT_METHOD in db.method_position else {}
+    return {
+        "database_version": db.version,
+        "products": table.reset_index().to_dict(orient="records"),
+        "contributions": {"method": DEFAULT_METHOD, "top": top, "by_product": contributions},
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
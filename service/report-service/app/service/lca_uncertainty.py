@@ -0,0 +1,459 @@
+# LCA 불확실성/민감도 분석 - 교환값을 배치로 샘플링하고 기준 LU 분해를 재사용해 풀이, 프로세스 풀 병렬 실행
+import os
+import time
+import uuid
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Mapping, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from app.service.lca_engine import LCADatabase, LCASolver, get_database, get_solver, reload_database
+
+logger = logging.getLogger("report_service")
+
+UNCERTAINTY_WORKERS = int(os.getenv("LCA_UNCERTAINTY_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# 작업 단위 = 난수 스트림 단위 (같은 seed면 워커 수와 무관하게 같은 결과)
+CHUNK_SAMPLES = int(os.getenv("LCA_UNCERTAINTY_CHUNK_SAMPLES", "256"))
+# 불확실한 technosphere 교환이 이 수 이하이면 Woodbury 저랭크 갱신, 초과하면 반복 정련
+LOWRANK_MAX_RANK = int(os.getenv("LCA_LOWRANK_MAX_RANK", "64"))
+REFINE_MAX_ITER = int(os.getenv("LCA_REFINE_MAX_ITER", "25"))
+REFINE_TOL = float(os.getenv("LCA_REFINE_TOL", "1e-10"))
+DEFAULT_PERCENTILES = (2.5, 5, 25, 50, 75, 95, 97.5)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+# 워커별 저랭크 기저 캐시 (db 버전 → A⁻¹U)
+_lowrank_cache: Dict[str, np.ndarray] = {}
+
+
+def _init_worker():
+    """워커 프로세스 시작 시 데이터베이스 로드 + 기준 분해 (이후 작업은 분해를 재사용)"""
+    get_solver()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """프로세스 풀 싱글톤 - 스레드가 있는 API 프로세스를 fork하지 않도록 spawn 사용"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=UNCERTAINTY_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            logger.info(f"🧵 LCA 불확실성 분석 프로세스 풀 시작: 워커 {UNCERTAINTY_WORKERS}개")
+        return _executor
+
+
+def reset_executor(broken: ProcessPoolExecutor):
+    """워커 프로세스가 비정상 종료해 깨진 풀 폐기 - 다음 get_executor()가 새 풀을 만든다"""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _worker_database(version: str) -> LCADatabase:
+    db = get_database()
+    if db.version != version:
+        db = reload_database()
+    if db.version != version:
+        raise RuntimeError(f"워커 데이터베이스 버전 불일치: {db.version} != {version}")
+    return db
+
+
+def _lowrank_basis(solver: LCASolver) -> np.ndarray:
+    """Y = A⁻¹ U (n × r) - U는 불확실한 교환의 행 위치 단위벡터, 버전마다 한 번만 풀이"""
+    basis = _lowrank_cache.get(solver.version)
+    if basis is None:
+        tech = solver.db.uncertainty["technosphere"]
+        r = len(tech["row"])
+        u = sparse.csc_matrix((np.ones(r), (tech["row"], np.arange(r))), shape=(solver.db.n_activities, r))
+        basis = _lowrank_cache[solver.version] = solver.supply(u)
+    return basis
+
+
+def _solve_lowrank(solver: LCASolver, s0: np.ndarray, delta: np.ndarray) -> np.ndarray:
+    """Woodbury: (A + U D Vᵀ)⁻¹ f = s0 - Y (I + D Vᵀ Y)⁻¹ D Vᵀ s0, 샘플별 r × r 계를 한 번에 풀이"""
+    tech = solver.db.uncertainty["technosphere"]
+    y = _lowrank_basis(solver)                              # (n, r)
+    w = y[tech["col"]]                                      # Vᵀ Y (r, r)
+    d = delta.T                                             # (K, r)
+    system = np.eye(len(w))[None, :, :] + d[:, :, None] * w[None, :, :]
+    rhs = d * s0[tech["col"]][None, :]
+    t = np.linalg.solve(system, rhs[:, :, None])[:, :, 0]  # (K, r)
+    return s0[:, None] - y @ t.T
+
+
+def _solve_refined(solver: LCASolver, f: np.ndarray, s0: np.ndarray,
+                   delta: np.ndarray) -> Tuple[np.ndarray, int, int]:
+    """기준 분해를 전처리기로 쓰는 반복 정련 - S ← S + A⁻¹(f - (A + ΔA_k) S), 열(샘플)별 수렴 판정
+
+    수렴하지 않거나 발산하는 샘플만 해당 샘플 행렬을 직접 분해해 푼다.
+    반환: (해 n × K, 최대 반복 수, 직접 분해 샘플 수)
+    """
+    db = solver.db
+    tech = db.uncertainty["technosphere"]
+    n, k = db.n_activities, delta.shape[1]
+    # 불확실한 교환 → 행 합산용 결합 행렬 (n × r)
+    incidence = sparse.csr_matrix((np.ones(len(tech["row"])), (tech["row"], np.arange(len(tech["row"])))),
+                                  shape=(n, len(tech["row"])))
+    s = np.repeat(s0[:, None], k, axis=1)
+    active = np.arange(k)
+    previous = np.full(k, np.inf)
+    iterations = 0
+    failed = np.zeros(k, dtype=bool)
+    for iterations in range(1, REFINE_MAX_ITER + 1):
+        sa = s[:, active]
+        residual = f[:, None] - db.technosphere @ sa - incidence @ (delta[:, active] * sa[tech["col"]])
+        correction = solver.supply(residual)
+        s[:, active] += correction
+        step = np.abs(correction).max(axis=0)
+        scale = np.maximum(np.abs(s[:, active]).max(axis=0), np.finfo(np.float64).tiny)
+        diverging = ~np.isfinite(step) | ((iterations > 2) & (step > previous[active]))
+        failed[active[diverging]] = True
+        previous[active] = step
+        active = active[(step > REFINE_TOL * scale) & ~diverging]
+        if not len(active):
+            break
+    failed[active] = True
+    for j in np.flatnonzero(failed):
+        sample = db.technosphere + sparse.csc_matrix((delta[:, j], (tech["row"], tech["col"])), shape=(n, n))
+        s[:, j] = splu(sample.tocsc()).solve(f)
+    return s, iterations, int(failed.sum())
+
+
+def simulate_chunk(version: str, demand: Mapping[str, float], methods: Optional[Sequence[str]],
+                   seed: np.random.SeedSequence, n_samples: int) -> Dict[str, Any]:
+    """워커 프로세스: 샘플 n개를 한 배치로 생성/풀이해 결과 샘플과 기여도/상관 누적값 반환
+
+    technosphere/biosphere 불확실 교환은 로그정규(중앙값 = 기준값, σ = ln gsd)로 한 번에 샘플링하고,
+    풀이는 기준 LU 분해를 재사용(저랭크 갱신 또는 반복 정련)한다.
+    """
+    started = time.perf_counter()
+    db = _worker_database(version)
+    solver = get_solver(db)
+    tech, bio = db.uncertainty["technosphere"], db.uncertainty["biosphere"]
+    method_pos = db.method_positions(methods)
+    f = db.demand_matrix([demand]).toarray()[:, 0]
+    s0 = solver.supply(f)
+
+    rng = np.random.Generator(np.random.PCG64(seed))
+    z_tech = rng.standard_normal((len(tech["row"]), n_samples))
+    z_bio = rng.standard_normal((len(bio["row"]), n_samples))
+    delta_tech = tech["value"][:, None] * np.expm1(tech["sigma"][:, None] * z_tech)
+    delta_bio = bio["value"][:, None] * np.expm1(bio["sigma"][:, None] * z_bio)
+
+    iterations, direct = 0, 0
+    if not len(tech["row"]):
+        mode, s = "fixed", np.repeat(s0[:, None], n_samples, axis=1)
+    elif len(tech["row"]) <= LOWRANK_MAX_RANK:
+        mode = "lowrank"
+        try:
+            s = _solve_lowrank(solver, s0, delta_tech)
+        except np.linalg.LinAlgError:
+            mode = "refinement"
+            s, iterations, direct = _solve_refined(solver, f, s0, delta_tech)
+    else:
+        mode = "refinement"
+        s, iterations, direct = _solve_refined(solver, f, s0, delta_tech)
+
+    # 영향 h = C (B S + ΔB S) - ΔB S 는 불확실 교환별 값 × 해당 활동 공급량을 흐름으로 합산
+    c = db.characterization[method_pos]                                   # (m, flows)
+    c_bio = c[:, bio["row"]].toarray()                                    # (m, r_b)
+    bio_terms = delta_bio * s[bio["col"]]                                 # (r_b, K)
+    base_per_activity = solver.impact_per_activity[method_pos]            # (m, n)
+    impacts = base_per_activity @ s + c_bio @ bio_terms                   # (m, K)
+
+    # 활동별 직접 기여도 합계 (평균은 병합 후 계산)
+    col_incidence = sparse.csr_matrix((np.ones(len(bio["col"])), (np.arange(len(bio["col"])), bio["col"])),
+                                      shape=(len(bio["col"]), db.n_activities))
+    contribution_sum = base_per_activity.multiply(s.sum(axis=1)[None, :]).toarray() \
+        + (c_bio * bio_terms.sum(axis=1)[None, :]) @ col_incidence
+
+    # 교환별 표준정규 점수 × 결과 상관 누적 (합, 제곱합, 곱의 합)
+    z = np.vstack([z_tech, z_bio])                                        # (p, K)
+    return {
+        "impacts": impacts,
+        "contribution_sum": np.asarray(contribution_sum),
+        "z_sum": z.sum(axis=1),
+        "z_sq_sum": np.einsum("ij,ij->i", z, z),
+        "zy_sum": z @ impacts.T,                                          # (p, m)
+        "mode": mode,
+        "iterations": iterations,
+        "direct_solves": direct,
+        "elapsed_s": time.perf_counter() - started,
+        "pid": os.getpid(),
+    }
+
+
+def linear_sensitivity(db: LCADatabase, solver: LCASolver, demand: Mapping[str, float],
+                       method_pos: np.ndarray) -> Dict[str, np.ndarray]:
+    """기준점 1차 민감도 - 방법마다 adjoint 풀이 1회로 모든 불확실 교환의 탄력성을 한 번에 계산
+
+    technosphere a_ij: ∂h/∂a = -λ_i s_j (Aᵀλ = CB 행), biosphere b_fj: ∂h/∂b = C_mf s_j
+    분산 기여(로그 척도 1차 근사) ∝ (탄력성 × σ)²
+    """
+    tech, bio = db.uncertainty["technosphere"], db.uncertainty["biosphere"]
+    s = solver.supply(db.demand_matrix([demand]).toarray()[:, 0])
+    per_activity = solver.impact_per_activity[method_pos].toarray()       # (m, n)
+    base = per_activity @ s                                               # (m,)
+    elasticity = []
+    for m, weights in enumerate(per_activity):
+        lam = solver.adjoint(weights)
+        d_tech = -lam[tech["row"]] * s[tech["col"]] * tech["value"]
+        d_bio = db.characterization[method_pos[m]].toarray()[0][bio["row"]] * s[bio["col"]] * bio["value"]
+        h = base[m] if base[m] else np.inf
+        elasticity.append(np.concatenate([d_tech, d_bio]) / h)
+    elasticity = np.array(elasticity)                                     # (m, p)
+    sigma = np.concatenate([tech["sigma"], bio["sigma"]])
+    variance = (elasticity * sigma[None, :]) ** 2
+    total = variance.sum(axis=1, keepdims=True)
+    return {
+        "base": base,
+        "elasticity": elasticity,
+        "variance_share": np.divide(variance, total, out=np.zeros_like(variance), where=total > 0),
+    }
+
+
+class UncertaintyAnalysis:
+    """기능단위 하나의 몬테카를로 분석 - 샘플을 고정 크기 청크(난수 스트림)로 나눠 프로세스 풀에 제출"""
+
+    def __init__(self, demand: Mapping[str, float], methods: Optional[Sequence[str]] = None,
+                 samples: int = 10_000, seed: int = 0, top: int = 10,
+                 percentiles: Sequence[float] = DEFAULT_PERCENTILES, label: str = ""):
+        if samples < 2:
+            raise ValueError("samples는 2 이상이어야 합니다")
+        self.db = get_database()
+        # 잘못된 활동/방법은 제출 전에 KeyError
+        self.db.demand_matrix([demand])
+        self.method_pos = self.db.method_positions(methods)
+        self.analysis_id = uuid.uuid4().hex
+        self.label = label
+        self.demand = dict(demand)
+        self.methods = [self.db.methods["method"][i] for i in self.method_pos]
+        self.samples = samples
+        self.seed = seed
+        self.top = top
+        self.percentiles = list(percentiles)
+        self.status = "queued"
+        n_chunks = -(-samples // CHUNK_SAMPLES)
+        self.chunks: List[Dict[str, Any]] = [
+            {"chunk": i, "samples": min(CHUNK_SAMPLES, samples - i * CHUNK_SAMPLES), "status": "queued"}
+            for i in range(n_chunks)
+        ]
+        self.results: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancelled = threading.Event()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def samples_done(self) -> int:
+        return sum(c["samples"] for c in self.chunks if c["status"] == "completed")
+
+    def run(self):
+        """청크 제출 후 완료 순서대로 누적 병합 (블로킹 - 워커 스레드에서 실행)"""
+        self.status = "running"
+        self.started_at = time.perf_counter()
+        pending: Dict[Any, int] = {}
+        try:
+            n_chunks = len(self.chunks)
+            seeds = np.random.SeedSequence(self.seed).spawn(n_chunks)
+            executor = get_executor()
+            pending = self._submit(executor, seeds, range(n_chunks))
+            retried = False
+            impacts: List[Optional[np.ndarray]] = [None] * n_chunks
+            acc: Dict[str, Any] = {}
+            modes = set()
+            while pending:
+                if self.cancelled.is_set():
+                    for future in pending:
+                        future.cancel()
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                broken = []
+                for future in done:
+                    i = pending.pop(future)
+                    if future.cancelled():
+                        self.chunks[i]["status"] = "cancelled"
+                        continue
+                    if isinstance(future.exception(), BrokenProcessPool):
+                        broken.append(i)
+                        continue
+                    part = future.result()
+                    impacts[i] = part["impacts"]
+                    for key in ("contribution_sum", "z_sum", "z_sq_sum", "zy_sum"):
+                        acc[key] = acc[key] + part[key] if key in acc else part[key]
+                    acc["direct_solves"] = acc.get("direct_solves", 0) + part["direct_solves"]
+                    acc["max_iterations"] = max(acc.get("max_iterations", 0), part["iterations"])
+                    modes.add(part["mode"])
+                    self.chunks[i].update(status="completed", elapsed_s=round(part["elapsed_s"], 3),
+                                          pid=part["pid"])
+                if broken:
+                    # 워커 하나가 죽으면 풀 전체가 깨짐 - 새 풀에 끝나지 않은 청크를 한 번만 다시 제출
+                    if retried:
+                        raise BrokenProcessPool("LCA 불확실성 워커 프로세스가 재시도 후에도 비정상 종료했습니다")
+                    retried = True
+                    retry = sorted(broken + list(pending.values()))
+                    logger.warning(f"⚠️ LCA 불확실성 프로세스 풀 손상 {self.analysis_id}: 청크 {len(retry)}개 새 풀에서 재시도")
+                    reset_executor(executor)
+                    executor = get_executor()
+                    pending = self._submit(executor, seeds, retry)
+            if self.cancelled.is_set():
+                self.status = "cancelled"
+            else:
+                # 청크 순서대로 이어 붙여 seed가 같으면 결과 배열도 같도록 함
+                self.results = self._summarize(np.hstack(impacts), acc, modes)
+                self.status = "completed"
+        except Exception as e:
+            # 실패한 분석의 남은 청크가 풀을 계속 점유하지 않도록 취소
+            for future in pending:
+                future.cancel()
+            self.status = "failed"
+            self.error = str(e)
+            logger.error(f"❌ LCA 불확실성 분석 실패 {self.analysis_id}: {str(e)}")
+        finally:
+            self.finished_at = time.perf_counter()
+        logger.info(
+            f"🎲 LCA 불확실성 분석 {self.status} {self.analysis_id}: 샘플 {self.samples_done:,}/{self.samples:,}, "
+            f"청크 {len(self.chunks)}개, {self.elapsed:.2f}s"
+        )
+
+    def _submit(self, executor: ProcessPoolExecutor, seeds: List[np.random.SeedSequence],
+                chunks: Sequence[int]) -> Dict[Any, int]:
+        return {
+            executor.submit(simulate_chunk, self.db.version, self.demand, self.methods, seeds[i],
+                            self.chunks[i]["samples"]): i
+            for i in chunks
+        }
+
+    def _exchange_labels(self) -> List[Dict[str, Any]]:
+        db = self.db
+        ids, flows = db.activities["id"].to_numpy(), db.flows["id"].to_numpy()
+        tech, bio = db.uncertainty["technosphere"], db.uncertainty["biosphere"]
+        labels = [
+            {"matrix": "technosphere", "consumer": ids[c], "producer": ids[r], "amount": float(-v),
+             "gsd": float(np.exp(sg))}
+            for r, c, v, sg in zip(tech["row"], tech["col"], tech["value"], tech["sigma"])
+        ]
+        labels += [
+            {"matrix": "biosphere", "activity": ids[c], "flow": flows[r], "amount": float(v),
+             "gsd": float(np.exp(sg))}
+            for r, c, v, sg in zip(bio["row"], bio["col"], bio["value"], bio["sigma"])
+        ]
+        return labels
+
+    def _summarize(self, impacts: np.ndarray, acc: Dict[str, Any], modes: set) -> Dict[str, Any]:
+        n = impacts.shape[1]
+        q = np.asarray(self.percentiles, dtype=np.float64)
+        linear = linear_sensitivity(self.db, get_solver(self.db), self.demand, self.method_pos)
+        # 상관계수: 표준정규 입력 점수 z와 결과 y (누적 합으로 계산)
+        y_mean = impacts.mean(axis=1)
+        y_std = impacts.std(axis=1)
+        z_mean = acc["z_sum"] / n
+        z_std = np.sqrt(np.maximum(acc["z_sq_sum"] / n - z_mean ** 2, 0.0))
+        cov = acc["zy_sum"] / n - z_mean[:, None] * y_mean[None, :]
+        denom = z_std[:, None] * y_std[None, :]
+        correlation = np.divide(cov, denom, out=np.zeros_like(cov), where=denom > 0)   # (p, m)
+        labels = self._exchange_labels()
+        activity_ids = self.db.activities["id"].to_numpy()
+        contribution_mean = acc["contribution_sum"] / n
+
+        by_method = {}
+        for m, method in enumerate(self.methods):
+            values = impacts[m]
+            ranking = np.argsort(-linear["variance_share"][m])[:self.top]
+            contrib = contribution_mean[m]
+            order = np.argsort(-np.abs(contrib))[:self.top]
+            by_method[method] = {
+                "unit": self.db.methods["unit"][self.method_pos[m]],
+                "deterministic": float(linear["base"][m]),
+                "mean": float(y_mean[m]),
+                "std": float(y_std[m]),
+                "cv": float(y_std[m] / y_mean[m]) if y_mean[m] else None,
+                "percentiles": {f"p{p:g}": float(v) for p, v in zip(q, np.percentile(values, q))},
+                "contributions": [
+                    {"activity_id": activity_ids[j], "mean": float(contrib[j]),
+                     "share": float(contrib[j] / y_mean[m]) if y_mean[m] else 0.0}
+                    for j in order
+                ],
+                "sensitivity": [
+                    {**labels[e], "elasticity": float(linear["elasticity"][m, e]),
+                     "variance_share": float(linear["variance_share"][m, e]),
+                     "correlation": float(correlation[e, m])}
+                    for e in ranking
+                ],
+            }
+        return {
+            "database_version": self.db.version,
+            "uncertain_exchanges": len(labels),
+            "solver": {"modes": sorted(modes), "max_refinement_iterations": acc["max_iterations"],
+                       "direct_solves": acc["direct_solves"]},
+            "methods": by_method,
+        }
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def to_dict(self, include_results: bool = True) -> Dict[str, Any]:
+        done = self.samples_done
+        out = {
+            "analysis_id": self.analysis_id,
+            "label": self.label,
+            "status": self.status,
+            "created_at": self.created_at,
+            "demand": self.demand,
+            "methods": self.methods,
+            "samples": self.samples,
+            "seed": self.seed,
+            "samples_done": done,
+            "chunks_total": len(self.chunks),
+            "chunks_completed": sum(c["status"] == "completed" for c in self.chunks),
+            "progress": round(done / self.samples, 4),
+            "elapsed_s": round(self.elapsed, 3),
+            "error": self.error,
+        }
+        if include_results:
+            out["results"] = self.results
+        return out
+
+
+_analyses: Dict[str, UncertaintyAnalysis] = {}
+MAX_ANALYSES = 100
+
+
+def register_analysis(analysis: UncertaintyAnalysis) -> UncertaintyAnalysis:
+    _analyses[analysis.analysis_id] = analysis
+    while len(_analyses) > MAX_ANALYSES:
+        oldest = next((aid for aid, a in _analyses.items() if a.status not in ("queued", "running")), None)
+        if oldest is None:
+            break
+        _analyses.pop(oldest)
+    return analysis
+
+
+def get_analysis(analysis_id: str) -> Optional[UncertaintyAnalysis]:
+    return _analyses.get(analysis_id)
@@ -0,0 +1,853 @@
+# 보고서 백그라운드 작업 - Redis(없으면 프로세스 내부) 큐, 우선순위별 동시 실행 제한, 프로세스 풀 실행, 진행 이벤트
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import asyncio
+import logging
+import threading
+import multiprocessing
+from collections import deque, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable, AsyncIterator, Tuple
+
+import pandas as pd
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.service.artifact_store import get_store
+
+logger = logging.getLogger("report_service")
+
+PRIORITIES = ("high", "normal", "low")
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+ARTIFACT_DIR = os.getenv("REPORT_ARTIFACT_DIR", os.path.join(os.getcwd(), "data", "artifacts"))
+REDIS_URL = os.getenv("REDIS_URL", "")
+JOB_TTL_SECONDS = int(os.getenv("REPORT_JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+# 작업별로 보관하는 진행 이벤트 수 (SSE 재연결 시 Last-Event-ID 이후 재전송)
+EVENT_HISTORY = 200
+# SSE keepalive 간격 (프록시 유휴 타임아웃 방지)
+KEEPALIVE_SECONDS = 15.0
+# 워커가 진행률을 보내는 최소 간격
+PROGRESS_INTERVAL_SECONDS = 0.2
+# 차트를 미룬 작업이 워커에서 끝났을 때의 진행률 (나머지는 API 프로세스의 차트 렌더링)
+CHART_PROGRESS = 0.8
+# Redis 큐: 꺼낸 작업은 인스턴스별 처리 목록에 두고 하트비트를 갱신 - 하트비트가 이 시간 동안 끊긴
+# 인스턴스의 처리 목록은 다른 인스턴스가 대기열로 되돌림 (프로세스가 죽어도 작업이 사라지지 않음)
+JOB_VISIBILITY_SECONDS = int(os.getenv("REPORT_JOB_VISIBILITY_SECONDS", "60"))
+HEARTBEAT_SECONDS = max(JOB_VISIBILITY_SECONDS / 3, 1.0)
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    """"high=4,normal=2,low=1" → 우선순위별 동시 실행 상한 (지정하지 않은 우선순위는 기본값)"""
+    limits = {"high": JOB_WORKERS, "normal": max(1, JOB_WORKERS // 2), "low": 1}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        if name not in limits or not value.isdigit():
+            raise ValueError(f"REPORT_JOB_LIMITS 형식 오류: {item}")
+        limits[name] = min(int(value), JOB_WORKERS)
+    return limits
+
+
+PRIORITY_LIMITS = _parse_limits(os.getenv("REPORT_JOB_LIMITS", ""))
+
+JOBS_TOTAL = Counter("report_jobs_total", "Report jobs finished by type and status", ["type", "status"])
+JOBS_RUNNING = Gauge("report_jobs_running", "Report jobs currently running in this instance", ["priority"])
+JOB_DURATION = Histogram(
+    "report_job_duration_seconds", "Report job execution time", ["type"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+JOB_QUEUE_WAIT = Histogram(
+    "report_job_queue_wait_seconds", "Time from submit to start", ["priority"],
+    buckets=(0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# 워커 프로세스 쪽
+# ---------------------------------------------------------------------------
+
+_progress_queue = None
+_cancel_flags = None
+
+
+def _init_worker(progress_queue, cancel_flags):
+    """워커 프로세스 시작 시 진행 큐/취소 플래그 연결 (풀 생성 시 상속으로만 전달 가능)"""
+    global _progress_queue, _cancel_flags
+    _progress_queue, _cancel_flags = progress_queue, cancel_flags
+
+
+# 작업이 API 프로세스에 넘기는 차트 렌더링 (차트 명세, 요약 파일 이름, 요약)
+DeferredCharts = Tuple[List[Any], str, Dict[str, Any]]
+
+
+class JobContext:
+    """작업 핸들러에 넘기는 실행 컨텍스트 - 진행률 보고, 취소 확인, 산출물 경로"""
+
+    def __init__(self, job_id: str, slot: int, artifact_dir: str):
+        self.job_id = job_id
+        self.slot = slot
+        self.artifact_dir = artifact_dir
+        self._last_sent = 0.0
+        self.deferred_charts: Optional[DeferredCharts] = None
+        os.makedirs(artifact_dir, exist_ok=True)
+
+    def check_cancelled(self):
+        if _cancel_flags is not None and _cancel_flags[self.slot]:
+            raise JobCancelled()
+
+    def progress(self, fraction: float, message: str = ""):
+        """진행률 보고 (PROGRESS_INTERVAL_SECONDS 간격으로 묶어 보냄) + 취소 확인"""
+        self.check_cancelled()
+        now = time.monotonic()
+        if _progress_queue is not None and (now - self._last_sent >= PROGRESS_INTERVAL_SECONDS or fraction >= 1.0):
+            self._last_sent = now
+            _progress_queue.put((self.job_id, min(max(float(fraction), 0.0), 1.0), message))
+
+    def artifact_path(self, name: str) -> str:
+        if os.path.basename(name) != name or name.startswith("."):
+            raise ValueError(f"잘못된 산출물 이름: {name}")
+        return os.path.join(self.artifact_dir, name)
+
+    def write_json(self, name: str, payload: Any):
+        with open(self.artifact_path(name), "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, default=str)
+
+    def write_csv(self, name: str, frame: pd.DataFrame):
+        frame.to_csv(self.artifact_path(name), index=False, encoding="utf-8-sig")
+
+    def defer_charts(self, specs: List[Any], summary_name: str, summary: Dict[str, Any]):
+        """차트 렌더링을 실행기에 넘김 - 렌더링 결과를 summary["charts"]에 넣어 summary_name으로 기록"""
+        # 이름 검증만 (파일은 실행기가 기록)
+        self.artifact_path(summary_name)
+        self.deferred_charts = (list(specs), summary_name, summary)
+
+
+def _cbam_quarter_report(params: Dict[str, Any], ctx: JobContext):
+    from app.service.cbam_report import build_quarter_report, quarter_chart_specs
+
+    report = build_quarter_report(params["company_id"], params["quarter"],
+                                  progress=lambda f, m: ctx.progress(0.5 * f, m))
+    tables = report.pop("tables")
+    for name, table in tables.items():
+        ctx.write_csv(f"{name}.csv", table)
+    if params.get("charts", True):
+        ctx.defer_charts(quarter_chart_specs(report, tables, fmt=params.get("chart_format", "png")),
+                         "summary.json", report)
+    else:
+        ctx.write_json("summary.json", report)
+
+
+def _lca_footprint_report(params: Dict[str, Any], ctx: JobContext):
+    from app.service.lca_report import steel_footprint_report
+
+    ctx.progress(0.1, "LCA 분해/풀이")
+    report = steel_footprint_report(params.get("activity_ids"), params.get("methods"), params.get("top", 5))
+    ctx.progress(0.6, "산출물 기록")
+    products = pd.DataFrame(report["products"])
+    ctx.write_csv("products.csv", products)
+    method = report["contributions"]["method"]
+    if params.get("charts", True) and method in products:
+        from app.service.charts import ChartSpec
+
+        ranked = products.sort_values(method, ascending=False)
+        ctx.defer_charts([ChartSpec("footprint_by_product", "barh", {
+            "labels": ranked["activity_id"].tolist(), method: ranked[method].tolist(),
+        }, title=f"Unit footprint by product ({method})", format=params.get("chart_format", "png"),
+            style={"height": 6.0})], "report.json", report)
+    else:
+        ctx.write_json("report.json", report)
+
+
+@dataclass
+class JobType:
+    run: Callable[[Dict[str, Any], JobContext], None]
+    required: tuple = ()
+
+
+JOB_TYPES: Dict[str, JobType] = {
+    "cbam_quarter_report": JobType(_cbam_quarter_report, required=("company_id", "quarter")),
+    "lca_footprint_report": JobType(_lca_footprint_report),
+}
+
+
+def run_job(job_id: str, job_type: str, params: Dict[str, Any], slot: int,
+            artifact_dir: str) -> Tuple[List[Dict[str, Any]], Optional[DeferredCharts]]:
+    """워커 프로세스: 핸들러 실행 후 (산출물 목록, 미뤄 둔 차트) 반환 (취소 시 JobCancelled, 부분 산출물은 삭제)"""
+    ctx = JobContext(job_id, slot, artifact_dir)
+    try:
+        ctx.check_cancelled()
+        JOB_TYPES[job_type].run(params, ctx)
+        if ctx.deferred_charts is None:
+            ctx.progress(1.0, "완료")
+    except BaseException:
+        shutil.rmtree(artifact_dir, ignore_errors=True)
+        raise
+    # 내용 주소 저장소로 이동 (해시 계산도 워커에서) - 같은 내용의 산출물은 작업 간에 공유
+    return get_store().ingest_dir(artifact_dir), ctx.deferred_charts
+
+
+def render_job_charts(job_id: str, specs: List[Any], summary_name: str,
+                      summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """API 프로세스: 작업이 넘긴 차트를 공유 차트 풀에서 렌더링하고 차트 + 요약 산출물을 저장소로 (블로킹)"""
+    from app.service.charts import render_charts
+
+    directory = os.path.join(ARTIFACT_DIR, job_id)
+    try:
+        summary["charts"] = render_charts(specs, output_dir=directory)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, summary_name), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, default=str)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return get_store().ingest_dir(directory)
+
+
+# ---------------------------------------------------------------------------
+# 큐/상태 저장소 (API 프로세스 쪽)
+# ---------------------------------------------------------------------------
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+class LocalJobBackend:
+    """프로세스 내부 큐 - REDIS_URL이 없거나 연결되지 않을 때 (로컬 개발, 단일 인스턴스)"""
+    name = "local"
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.queues = {p: deque() for p in PRIORITIES}
+        self.events: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.seq: Dict[str, int] = defaultdict(int)
+        self.cancel_requested = set()
+        self.markers: Dict[str, Dict[str, Any]] = {}
+        self._changed: Optional[asyncio.Condition] = None
+
+    @property
+    def changed(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    async def close(self):
+        pass
+
+    async def save(self, job: Dict[str, Any]):
+        self.jobs[job["job_id"]] = job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def enqueue(self, job: Dict[str, Any]):
+        self.queues[job["priority"]].appendleft(job["job_id"])
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def remove_queued(self, job: Dict[str, Any]) -> bool:
+        try:
+            self.queues[job["priority"]].remove(job["job_id"])
+            return True
+        except ValueError:
+            return False
+
+    async def pop(self, priorities: List[str], timeout: float) -> Optional[str]:
+        """우선순위 순서대로 꺼냄 - 비어 있으면 timeout까지 대기"""
+        deadline = time.monotonic() + timeout
+        async with self.changed:
+            while True:
+                for priority in priorities:
+                    if self.queues[priority]:
+                        return self.queues[priority].pop()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(self.changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return None
+
+    async def ack(self, job_id: str):
+        """프로세스 내부 큐는 꺼낸 작업을 따로 보관하지 않음 (프로세스가 죽으면 큐도 함께 사라짐)"""
+
+    async def heartbeat(self):
+        pass
+
+    async def reap(self) -> int:
+        return 0
+
+    async def release(self) -> int:
+        return 0
+
+    async def request_cancel(self, job_id: str):
+        self.cancel_requested.add(job_id)
+
+    async def cancel_requested_for(self, job_id: str) -> bool:
+        return job_id in self.cancel_requested
+
+    async def get_marker(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.markers.get(key)
+
+    async def set_marker(self, key: str, value: Dict[str, Any]):
+        self.markers[key] = value
+
+    async def publish(self, job_id: str, event: Dict[str, Any]):
+        self.seq[job_id] += 1
+        event = {"seq": self.seq[job_id], **event}
+        history = self.events[job_id]
+        history.append(event)
+        del history[:-EVENT_HISTORY]
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def stream(self, job_id: str, after: int) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """after 이후 이벤트 → 새 이벤트 대기, 종료 상태 이벤트를 보내면 끝 (None = keepalive)"""
+        while True:
+            timed_out = False
+            # 확인과 대기를 같은 잠금 안에서 해야 그 사이 발행된 이벤트 알림을 놓치지 않음
+            async with self.changed:
+                pending = [e for e in self.events.get(job_id, []) if e["seq"] > after]
+                if not pending:
+                    job = self.jobs.get(job_id)
+                    if job is None or job["status"] in TERMINAL_STATUSES:
+                        return
+                    try:
+                        await asyncio.wait_for(self.changed.wait(), KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        timed_out = True
+            if timed_out:
+                yield None
+            for event in pending:
+                after = event["seq"]
+                yield event
+                if event["type"] == "status" and event.get("status") in TERMINAL_STATUSES:
+                    return
+
+
+class RedisJobBackend:
+    """Redis 큐 - 여러 report-service 인스턴스가 같은 큐/상태를 공유
+
+    report:job:{id}                  작업 레코드 (JSON, TTL)
+    report:jobs:queue:{prio}         대기열 (LPUSH / LMOVE·BLMOVE - 우선순위 순서로 확인)
+    report:jobs:processing:{worker}  인스턴스가 꺼내 실행 중인 작업 (끝나면 ack로 제거)
+    report:jobs:worker:{worker}      인스턴스 하트비트 (TTL = JOB_VISIBILITY_SECONDS)
+    report:jobs:workers              처리 목록을 가진 인스턴스 집합 (리퍼가 순회)
+    report:job:{id}:events           최근 진행 이벤트 (재연결 재전송용), 같은 이름의 pub/sub 채널로 실시간 전달
+    report:marker:{key}              자동 작업 표시 (이벤트로 등록한 작업 ID/버전 - 중복 등록 방지)
+
+    전달 보장은 최소 1회: 하트비트가 끊긴 인스턴스가 실제로는 살아 있었다면 같은 작업이 한 번 더 실행될 수 있다.
+    """
+    name = "redis"
+    WORKERS_KEY = "report:jobs:workers"
+
+    def __init__(self, client, worker_id: Optional[str] = None):
+        self.redis = client
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    @staticmethod
+    def _queue(priority: str) -> str:
+        return f"report:jobs:queue:{priority}"
+
+    @staticmethod
+    def _processing(worker_id: str) -> str:
+        return f"report:jobs:processing:{worker_id}"
+
+    @staticmethod
+    def _alive(worker_id: str) -> str:
+        return f"report:jobs:worker:{worker_id}"
+
+    @staticmethod
+    def _key(job_id: str, suffix: str = "") -> str:
+        return f"report:job:{job_id}{suffix}"
+
+    async def close(self):
+        await self.redis.aclose()
+
+    async def save(self, job: Dict[str, Any]):
+        await self.redis.set(self._key(job["job_id"]), json.dumps(job, ensure_ascii=False), ex=JOB_TTL_SECONDS)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.redis.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    async def enqueue(self, job: Dict[str, Any]):
+        await self.redis.lpush(self._queue(job["priority"]), job["job_id"])
+
+    async def remove_queued(self, job: Dict[str, Any]) -> bool:
+        return bool(await self.redis.lrem(self._queue(job["priority"]), 0, job["job_id"]))
+
+    async def pop(self, priorities: List[str], timeout: float) -> Optional[str]:
+        """우선순위 순서대로 꺼내 이 인스턴스의 처리 목록으로 원자적으로 이동 (BLMOVE)
+
+        모두 비어 있으면 가장 높은 우선순위 큐에서만 블로킹 대기 - 낮은 우선순위 작업은 최대 timeout만큼 늦게 시작.
+        """
+        processing = self._processing(self.worker_id)
+        value = None
+        for priority in priorities:
+            value = await self.redis.lmove(self._queue(priority), processing, "RIGHT", "LEFT")
+            if value is not None:
+                break
+        else:
+            value = await self.redis.blmove(self._queue(priorities[0]), processing, max(timeout, 0.1), "RIGHT", "LEFT")
+        if value is None:
+            return None
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def ack(self, job_id: str):
+        """작업이 끝났거나(종료 상태) 실행하지 않기로 한 작업을 처리 목록에서 제거"""
+        await self.redis.lrem(self._processing(self.worker_id), 0, job_id)
+
+    async def heartbeat(self):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(self._alive(self.worker_id), "1", ex=JOB_VISIBILITY_SECONDS)
+            pipe.sadd(self.WORKERS_KEY, self.worker_id)
+            await pipe.execute()
+
+    async def _requeue(self, worker_id: str) -> int:
+        """인스턴스의 처리 목록 작업을 대기열 맨 앞(다음에 꺼낼 위치)으로 되돌림"""
+        processing = self._processing(worker_id)
+        requeued = 0
+        for raw in await self.redis.lrange(processing, 0, -1):
+            job_id = raw.decode() if isinstance(raw, bytes) else raw
+            # LREM 결과로 다른 리퍼와 중복 처리를 막음
+            if not await self.redis.lrem(processing, 1, job_id):
+                continue
+            job = await self.get(job_id)
+            if job is None or job["status"] in TERMINAL_STATUSES:
+                continue
+            job.update(status="queued", message="인스턴스 중단으로 다시 대기", requeued=job.get("requeued", 0) + 1)
+            await self.save(job)
+            await self.publish(job_id, {"type": "status", "status": "queued", "progress": job["progress"],
+                                        "message": job["message"], "artifacts": [], "error": None, "at": _now()})
+            await self.redis.rpush(self._queue(job["priority"]), job_id)
+            requeued += 1
+        if not await self.redis.llen(processing):
+            await self.redis.srem(self.WORKERS_KEY, worker_id)
+        return requeued
+
+    async def reap(self) -> int:
+        """하트비트가 만료된 인스턴스의 실행 중 작업을 대기열로 되돌림 → 되돌린 작업 수"""
+        requeued = 0
+        for raw in await self.redis.smembers(self.WORKERS_KEY):
+            worker_id = raw.decode() if isinstance(raw, bytes) else raw
+            if worker_id == self.worker_id or await self.redis.exists(self._alive(worker_id)):
+                continue
+            count = await self._requeue(worker_id)
+            if count:
+                logger.warning(f"♻️ 하트비트가 끊긴 인스턴스 {worker_id}의 보고서 작업 {count}개를 대기열로 되돌림")
+            requeued += count
+        return requeued
+
+    async def release(self) -> int:
+        """정상 종료 - 이 인스턴스가 끝내지 못한 작업을 바로 되돌리고 하트비트 삭제"""
+        requeued = await self._requeue(self.worker_id)
+        await self.redis.delete(self._alive(self.worker_id))
+        return requeued
+
+    async def request_cancel(self, job_id: str):
+        await self.redis.set(self._key(job_id, ":cancel"), "1", ex=JOB_TTL_SECONDS)
+
+    async def cancel_requested_for(self, job_id: str) -> bool:
+        return bool(await self.redis.exists(self._key(job_id, ":cancel")))
+
+    async def get_marker(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self.redis.get(f"report:marker:{key}")
+        return json.loads(raw) if raw else None
+
+    async def set_marker(self, key: str, value: Dict[str, Any]):
+        await self.redis.set(f"report:marker:{key}", json.dumps(value), ex=JOB_TTL_SECONDS)
+
+    async def publish(self, job_id: str, event: Dict[str, Any]):
+        seq = await self.redis.incr(self._key(job_id, ":seq"))
+        payload = json.dumps({"seq": seq, **event}, ensure_ascii=False)
+        key = self._key(job_id, ":events")
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, payload)
+            pipe.ltrim(key, -EVENT_HISTORY, -1)
+            pipe.expire(key, JOB_TTL_SECONDS)
+            pipe.expire(self._key(job_id, ":seq"), JOB_TTL_SECONDS)
+            pipe.publish(key, payload)
+            await pipe.execute()
+
+    async def stream(self, job_id: str, after: int) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        key = self._key(job_id, ":events")
+        pubsub = self.redis.pubsub()
+        # 구독을 먼저 하고 기록을 읽어야 그 사이 이벤트를 놓치지 않음 (중복은 seq로 제거)
+        await pubsub.subscribe(key)
+        try:
+            for raw in await self.redis.lrange(key, 0, -1):
+                event = json.loads(raw)
+                if event["seq"] <= after:
+                    continue
+                after = event["seq"]
+                yield event
+                if event["type"] == "status" and event.get("status") in TERMINAL_STATUSES:
+                    return
+            job = await self.get(job_id)
+            if job is None or job["status"] in TERMINAL_STATUSES:
+                return
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=KEEPALIVE_SECONDS)
+                if message is None:
+                    yield None
+                    continue
+                event = json.loads(message["data"])
+                if event["seq"] <= after:
+                    continue
+                after = event["seq"]
+                yield event
+                if event["type"] == "status" and event.get("status") in TERMINAL_STATUSES:
+                    return
+        finally:
+            await pubsub.unsubscribe(key)
+            await pubsub.aclose()
+
+
+async def _create_backend():
+    if REDIS_URL:
+        try:
+            import redis.asyncio as aioredis
+
+            client = aioredis.from_url(REDIS_URL)
+            await client.ping()
+            logger.info(f"📮 보고서 작업 큐: Redis ({REDIS_URL})")
+            return RedisJobBackend(client)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis 연결 실패 - 프로세스 내부 작업 큐 사용: {str(e)}")
+    else:
+        logger.info("📮 보고서 작업 큐: 프로세스 내부 (REDIS_URL 미설정)")
+    return LocalJobBackend()
+
+
+# ---------------------------------------------------------------------------
+# 실행기: 큐에서 꺼내 우선순위별 상한 안에서 프로세스 풀에 제출
+# ---------------------------------------------------------------------------
+
+class JobRunner:
+    """인스턴스당 하나 - 디스패처 태스크가 빈 슬롯이 있는 우선순위 큐에서만 작업을 꺼냄"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.running: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._slots = list(range(JOB_WORKERS))
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._progress_queue = self._mp_context.Queue()
+        # 실행 중 작업의 취소 플래그 (슬롯 = 동시 실행 자리)
+        self._cancel_flags = self._mp_context.Array("b", JOB_WORKERS, lock=False)
+        self._executor = self._new_executor()
+        self._slot_freed = asyncio.Event()
+        self._tasks = set()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._maintainer: Optional[asyncio.Task] = None
+        self._reader: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._reader = threading.Thread(target=self._read_progress, name="report-job-progress", daemon=True)
+        self._reader.start()
+        await self.backend.heartbeat()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._maintainer = asyncio.create_task(self._maintain())
+        logger.info(f"🧵 보고서 작업 실행기 시작: 워커 {JOB_WORKERS}개, 우선순위별 상한 {PRIORITY_LIMITS}")
+
+    async def stop(self):
+        self._stopping = True
+        for task in (self._dispatcher, self._maintainer):
+            if task is not None:
+                task.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._progress_queue.put(None)
+        try:
+            # 끝내지 못한 작업은 다른 인스턴스가 바로 이어받도록 대기열로
+            await self.backend.release()
+        except Exception as e:
+            logger.error(f"❌ 실행 중 보고서 작업 반환 실패: {str(e)}")
+        await self.backend.close()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=JOB_WORKERS, mp_context=self._mp_context,
+            initializer=_init_worker, initargs=(self._progress_queue, self._cancel_flags),
+        )
+
+    def _replace_executor(self, broken: ProcessPoolExecutor):
+        """워커 프로세스가 비정상 종료해 깨진 풀을 새 풀로 교체 (동시에 감지한 작업 중 처음 한 번만)"""
+        if self._executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._new_executor()
+        logger.warning("⚠️ 보고서 작업 프로세스 풀 손상 - 새 풀로 교체")
+
+    async def _maintain(self):
+        """하트비트 갱신 + 하트비트가 끊긴 다른 인스턴스의 작업 회수"""
+        while not self._stopping:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await self.backend.heartbeat()
+                await self.backend.reap()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 보고서 작업 하트비트/회수 실패: {str(e)}")
+
+    def _eligible(self) -> List[str]:
+        if sum(self.running.values()) >= JOB_WORKERS:
+            return []
+        return [p for p in PRIORITIES if self.running[p] < PRIORITY_LIMITS[p]]
+
+    async def _dispatch(self):
+        while not self._stopping:
+            eligible = self._eligible()
+            if not eligible:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+                continue
+            try:
+                job_id = await self.backend.pop(eligible, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 보고서 작업 큐 읽기 실패: {str(e)}")
+                await asyncio.sleep(1.0)
+                continue
+            if job_id is None:
+                continue
+            job = await self.backend.get(job_id)
+            if job is None or job["status"] != "queued":
+                await self.backend.ack(job_id)
+                continue
+            self.running[job["priority"]] += 1
+            JOBS_RUNNING.labels(job["priority"]).inc()
+            task = asyncio.create_task(self._execute(job, self._slots.pop()))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _read_progress(self):
+        """워커 진행 큐 → 이벤트 루프에서 상태 저장소로 발행 (별도 스레드에서 블로킹 읽기)"""
+        while True:
+            item = self._progress_queue.get()
+            if item is None:
+                return
+            job_id, fraction, message = item
+            asyncio.run_coroutine_threadsafe(self._on_progress(job_id, fraction, message), self._loop)
+
+    async def _on_progress(self, job_id: str, fraction: float, message: str):
+        job = await self.backend.get(job_id)
+        if job is None or job["status"] != "running":
+            return
+        job.update(progress=round(fraction, 4), message=message)
+        await self.backend.save(job)
+        await self.backend.publish(job_id, {"type": "progress", "progress": job["progress"], "message": message,
+                                            "at": _now()})
+
+    async def _set_status(self, job: Dict[str, Any], status: str, **fields):
+        job.update(status=status, **fields)
+        await self.backend.save(job)
+        await self.backend.publish(job["job_id"], {
+            "type": "status", "status": status, "progress": job["progress"], "message": job.get("message", ""),
+            "artifacts": job.get("artifacts", []), "error": job.get("error"), "at": _now(),
+        })
+
+    async def _run_in_pool(self, job: Dict[str, Any],
+                           slot: int) -> Tuple[List[Dict[str, Any]], Optional[DeferredCharts]]:
+        """프로세스 풀에서 실행 - 완료까지 기다리며 다른 인스턴스에서 들어온 취소 요청을 주기적으로 확인
+
+        풀이 깨지면(워커 비정상 종료) 새 풀로 교체하고 한 번만 다시 실행.
+        """
+        job_id = job["job_id"]
+        for attempt in (1, 2):
+            executor = self._executor
+            try:
+                future = asyncio.wrap_future(executor.submit(
+                    run_job, job_id, job["type"], job["params"], slot, os.path.join(ARTIFACT_DIR, job_id),
+                ))
+                while True:
+                    done, _ = await asyncio.wait({future}, timeout=0.5)
+                    if done:
+                        break
+                    if await self.backend.cancel_requested_for(job_id):
+                        self._cancel_flags[slot] = 1
+                return future.result()
+            except BrokenProcessPool:
+                self._replace_executor(executor)
+                if attempt == 2:
+                    raise
+                logger.warning(f"⚠️ 보고서 작업 {job_id} 실행 중 프로세스 풀 손상 - 새 풀에서 다시 실행")
+
+    async def _execute(self, job: Dict[str, Any], slot: int):
+        started = time.perf_counter()
+        job_id = job["job_id"]
+        self._cancel_flags[slot] = 0
+        JOB_QUEUE_WAIT.labels(job["priority"]).observe(
+            max(time.time() - job.get("submitted_ts", time.time()), 0.0))
+        try:
+            await self._set_status(job, "running", started_at=_now(), worker=os.getpid())
+            artifacts, charts = await self._run_in_pool(job, slot)
+            if charts is not None:
+                await self._on_progress(job_id, CHART_PROGRESS, "차트 렌더링")
+                rendered = await asyncio.to_thread(render_job_charts, job_id, *charts)
+                artifacts = sorted(artifacts + rendered, key=lambda a: a["name"])
+            new_bytes = sum(a["bytes"] for a in artifacts if a.pop("stored"))
+            await asyncio.to_thread(get_store().added, new_bytes)
+            await self._set_status(job, "completed", progress=1.0, message="완료", artifacts=artifacts,
+                                   finished_at=_now())
+        except JobCancelled:
+            await self._set_status(job, "cancelled", finished_at=_now())
+        except asyncio.CancelledError:
+            self._cancel_flags[slot] = 1
+            raise
+        except Exception as e:
+            logger.error(f"❌ 보고서 작업 실패 {job_id} ({job['type']}): {str(e)}")
+            await self._set_status(job, "failed", error=str(e), finished_at=_now())
+        finally:
+            if job["status"] in TERMINAL_STATUSES:
+                try:
+                    await self.backend.ack(job_id)
+                except Exception as e:
+                    logger.error(f"❌ 보고서 작업 처리 목록 정리 실패 {job_id}: {str(e)}")
+            elapsed = time.perf_counter() - started
+            JOBS_TOTAL.labels(job["type"], job["status"]).inc()
+            JOB_DURATION.labels(job["type"]).observe(elapsed)
+            JOBS_RUNNING.labels(job["priority"]).dec()
+            self.running[job["priority"]] -= 1
+            self._slots.append(slot)
+            self._slot_freed.set()
+            logger.info(f"📄 보고서 작업 {job['status']} {job_id} ({job['type']}, {job['priority']}): {elapsed:.2f}s")
+
+
+_runner: Optional[JobRunner] = None
+
+
+async def start_job_runner():
+    global _runner
+    if _runner is None:
+        _runner = JobRunner(await _create_backend())
+        await _runner.start()
+
+
+async def stop_job_runner():
+    global _runner
+    if _runner is not None:
+        await _runner.stop()
+        _runner = None
+
+
+def get_runner() -> JobRunner:
+    if _runner is None:
+        raise RuntimeError("보고서 작업 실행기가 시작되지 않았습니다")
+    return _runner
+
+
+async def submit_job(job_type: str, params: Dict[str, Any], priority: str = "normal", label: str = "") -> Dict[str, Any]:
+    """작업 등록 → 대기열에 넣고 레코드 반환"""
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"알 수 없는 작업 유형: {job_type} (가능: {sorted(JOB_TYPES)})")
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority는 {PRIORITIES} 중 하나여야 합니다")
+    missing = [k for k in JOB_TYPES[job_type].required if not params.get(k)]
+    if missing:
+        raise ValueError(f"필수 파라미터 누락: {missing}")
+    backend = get_runner().backend
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "type": job_type,
+        "params": params,
+        "priority": priority,
+        "label": label,
+        "status": "queued",
+        "progress": 0.0,
+        "message": "",
+        "artifacts": [],
+        "error": None,
+        "created_at": _now(),
+        "submitted_ts": time.time(),
+        "queue": backend.name,
+    }
+    await backend.save(job)
+    await backend.publish(job["job_id"], {"type": "status", "status": "queued", "progress": 0.0, "message": "",
+                                          "artifacts": [], "error": None, "at": job["created_at"]})
+    await backend.enqueue(job)
+    return job
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return await get_runner().backend.get(job_id)
+
+
+async def submit_job_once(key: str, version: int, job_type: str, params: Dict[str, Any], priority: str = "normal",
+                          label: str = "") -> Tuple[Dict[str, Any], bool]:
+    """같은 대상(key)의 자동 작업 등록 - (작업, 새로 등록했는지)
+
+    이미 같은/이후 버전으로 등록된 작업이 있거나(이벤트 재전달), 대기 중인 작업이 있으면(실행 시점에 최신 결과를 읽음)
+    그 작업을 반환하고 새로 등록하지 않음. 실패/취소된 작업은 다시 등록.
+    """
+    backend = get_runner().backend
+    marker = await backend.get_marker(key)
+    if marker:
+        job = await backend.get(marker["job_id"])
+        if job is not None and job["status"] not in ("failed", "cancelled") and (
+                marker["version"] >= version or job["status"] == "queued"):
+            if version > marker["version"]:
+                await backend.set_marker(key, {"job_id": job["job_id"], "version": version})
+            return job, False
+    job = await submit_job(job_type, params, priority, label)
+    await backend.set_marker(key, {"job_id": job["job_id"], "version": version})
+    return job, True
+
+
+async def cancel_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """대기 중이면 큐에서 빼고 바로 취소, 실행 중이면 취소 요청 (워커가 다음 진행 보고 시점에 중단)"""
+    runner = get_runner()
+    backend = runner.backend
+    job = await backend.get(job_id)
+    if job is None or job["status"] in TERMINAL_STATUSES:
+        return job
+    if job["status"] == "queued" and await backend.remove_queued(job):
+        await runner._set_status(job, "cancelled", finished_at=_now())
+        JOBS_TOTAL.labels(job["type"], "cancelled").inc()
+        return job
+    await backend.request_cancel(job_id)
+    return job
+
+
+def stream_events(job_id: str, after: int = 0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    return get_runner().backend.stream(job_id, after)
+
+
+def artifact_file(job: Dict[str, Any], name: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """작업 산출물 → (파일 경로, 강한 ETag, 목록 항목). 저장소에서 제거됐으면 None"""
+    entry = next((a for a in job.get("artifacts", []) if a["name"] == name), None)
+    if entry is None:
+        return None
+    if entry.get("sha256"):
+        store = get_store()
+        path = store.path(entry["sha256"])
+        if not os.path.isfile(path):
+            return None
+        store.touch(entry["sha256"])
+        return path, f'"{entry["sha256"]}"', entry
+    # 저장소 도입 전 작업 - 작업 디렉터리 파일 (크기+수정 시각 ETag)
+    if os.path.basename(name) != name:
+        return None
+    path = os.path.join(ARTIFACT_DIR, job["job_id"], name)
+    if not os.path.isfile(path):
+        return None
+    st = os.stat(path)
+    return path, f'"{st.st_size:x}-{st.st_mtime_ns:x}"', entry
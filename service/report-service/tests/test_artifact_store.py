@@ -0,0 +1,92 @@
+# 산출물 저장소 - 같은 내용은 한 번만 저장, 다운로드는 강한 ETag와 단일 Range를 따름
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.router.job_router import artifact_router
+from app.service import artifact_store
+from app.service.artifact_store import ArtifactStore, parse_range
+
+BODY = bytes(range(256)) * 40
+
+
+def write(directory, name, content) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def test_ingest_dedupes_and_evicts_least_recent(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"), max_bytes=2 * len(BODY))
+    first = store.ingest_dir(os.path.dirname(write(tmp_path / "job1", "a.csv", BODY)))
+    second = store.ingest_dir(os.path.dirname(write(tmp_path / "job2", "b.csv", BODY)))
+    assert first[0]["sha256"] == second[0]["sha256"]
+    assert (first[0]["stored"], second[0]["stored"]) == (True, False)
+
+    old = first[0]["sha256"]
+    os.utime(store.path(old), (1, 1))
+    middle, size, _ = store.ingest(write(tmp_path, "c.bin", b"x" * len(BODY)))
+    assert store.added(size) == 0
+    os.utime(store.path(middle), (2, 2))
+    newest, size, _ = store.ingest(write(tmp_path, "d.bin", b"y" * len(BODY)))
+    # 상한(2개)을 넘으면 LOW_WATERMARK(1.8개) 아래까지 오래된 순으로 제거
+    assert store.added(size) == 2
+    assert not store.exists(old) and not store.exists(middle) and store.exists(newest)
+
+
+def test_parse_range_forms():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_download_etag_range_and_if_range(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "store"))
+    monkeypatch.setattr(artifact_store, "_store", store)
+    sha, _, _ = store.ingest(write(tmp_path, "table.csv", BODY))
+    app = FastAPI()
+    app.include_router(artifact_router)
+    client = TestClient(app)
+    url = f"/api/v1/report/artifacts/{sha}"
+    etag = f'"{sha}"'
+
+    full = client.get(url, params={"name": "table.csv"})
+    assert full.status_code == 200 and full.content == BODY
+    assert full.headers["etag"] == etag and full.headers["accept-ranges"] == "bytes"
+    assert full.headers["content-type"].startswith("text/csv")
+
+    assert client.get(url, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+    part = client.get(url, headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206 and part.content == BODY[100:200]
+    assert part.headers["content-range"] == f"bytes 100-199/{len(BODY)}"
+
+    # 다른 ETag로 재개하면 부분 응답 대신 전체를 다시 받음
+    stale = client.get(url, headers={"Range": "bytes=100-199", "If-Range": '"other"'})
+    assert stale.status_code == 200 and stale.content == BODY
+
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={len(BODY)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(BODY)}"
+
+    head = client.head(url, headers={"Range": "bytes=-16"})
+    assert head.status_code == 206 and head.headers["content-length"] == "16" and head.content == b""
+
+    # 한글/따옴표 이름 - latin-1 헤더로 못 쓰는 문자는 ASCII 대체 + filename*
+    named = client.get(url, params={"name": '분기 "보고서".csv'})
+    assert named.status_code == 200
+    assert named.headers["content-disposition"] == (
+        "attachment; filename=\"__ _____.csv\"; "
+        "filename*=UTF-8''%EB%B6%84%EA%B8%B0%20%22%EB%B3%B4%EA%B3%A0%EC%84%9C%22.csv"
+    )
+
+    assert client.get("/api/v1/report/artifacts/" + "0" * 64).status_code == 404
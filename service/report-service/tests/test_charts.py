@@ -0,0 +1,36 @@
+# 차트 렌더링 - 같은 데이터는 캐시 재사용, 캐시 정리는 산출물 연결 뒤에, 이번 묶음이 쓰는 캐시 파일은 남김
+import os
+
+from app.service import charts
+from app.service.charts import ChartSpec, render_charts
+
+
+def spec(name: str, values) -> ChartSpec:
+    return ChartSpec(name, "bar", {"labels": ["a", "b"], "t": values}, format="svg")
+
+
+def test_charts_in_use_survive_a_full_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(charts, "CHART_CACHE_MAX_BYTES", 0)
+    first = render_charts([spec("first", [1, 2])], output_dir=str(tmp_path / "job1"))
+    result = render_charts([spec("one", [3, 4]), spec("two", [5, 6])], output_dir=str(tmp_path / "job2"))
+
+    assert result["rendered"] == 2
+    for chart in result["charts"]:
+        assert os.path.exists(charts.cache_path(chart["key"], "svg"))
+        assert os.path.getsize(tmp_path / "job2" / f"{chart['name']}.svg") == chart["bytes"]
+    # 이전 묶음의 캐시 파일은 상한을 넘으면 정리 대상 (산출물 링크는 그대로)
+    assert not os.path.exists(charts.cache_path(first["charts"][0]["key"], "svg"))
+    assert os.path.exists(tmp_path / "job1" / "first.svg")
+
+
+def test_unchanged_charts_are_served_from_the_cache(tmp_path):
+    specs = [spec("cached_a", [7, 8]), spec("cached_b", [9, 10]), spec("cached_c", [7, 8])]
+    first = render_charts(specs, output_dir=str(tmp_path / "first"))
+    again = render_charts([spec(s.name, s.data["t"]) for s in specs], output_dir=str(tmp_path / "again"))
+
+    # 같은 내용의 차트(a, c)는 첫 렌더링에서도 한 번만 그림
+    assert first["rendered"] == 2
+    assert again["rendered"] == 0 and again["cache_hits"] == len(specs)
+    assert [c["key"] for c in again["charts"]] == [c["key"] for c in first["charts"]]
+    assert all(c["cached"] for c in again["charts"])
+    assert os.path.exists(tmp_path / "again" / "cached_c.svg")
@@ -0,0 +1,91 @@
+# 형식 변환 - 레코드마다 키가 달라도 열을 조용히 버리지 않아야 함
+import io
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.router import convert_router as convert_module
+from app.router.convert_router import convert_router
+from app.service.format_transfort import ConversionError, open_records, read_csv, read_ndjson, read_xlsx, scan_fields, convert
+
+RECORDS = [
+    {"line_id": "l1", "quantity_t": 10.5},
+    {"line_id": "l2", "quantity_t": 3.0, "country_of_origin": "CN"},
+    {"line_id": "l3", "installation_id": "INST-7"},
+]
+
+
+def ndjson(records) -> bytes:
+    return "".join(json.dumps(r) + "\n" for r in records).encode("utf-8")
+
+
+def test_heterogeneous_keys_round_trip_through_csv():
+    fields = scan_fields(read_ndjson(io.BytesIO(ndjson(RECORDS))))
+    assert fields == ["line_id", "quantity_t", "country_of_origin", "installation_id"]
+
+    columns, records = open_records(read_ndjson(io.BytesIO(ndjson(RECORDS))), fields)
+    body = b"".join(convert(records, columns, "csv"))
+    back = list(read_csv(io.BytesIO(body)))
+    assert [{k: v for k, v in r.items() if v is not None} for r in back] == RECORDS
+
+
+def test_inferred_fields_refuse_unknown_keys():
+    columns, records = open_records(read_ndjson(io.BytesIO(ndjson(RECORDS))))
+    assert columns == ["line_id", "quantity_t"]
+    with pytest.raises(ConversionError, match="country_of_origin"):
+        list(records)
+
+
+def test_upload_keeps_every_key_or_uses_explicit_fields():
+    app = FastAPI()
+    app.include_router(convert_router)
+    client = TestClient(app)
+    url = "/api/v1/report/convert"
+
+    response = client.post(url, params={"target": "ndjson", "source": "ndjson"}, content=ndjson(RECORDS))
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [{k: v for k, v in r.items() if v is not None} for r in lines] == RECORDS
+
+    response = client.post(url, params={"target": "csv", "source": "ndjson", "fields": "line_id,installation_id"},
+                           content=ndjson(RECORDS))
+    assert response.status_code == 200
+    assert response.text.splitlines() == ["line_id,installation_id", "l1,", "l2,", "l3,INST-7"]
+
+    response = client.post(url, params={"target": "csv", "source": "ndjson"}, content=b"{\"a\": 1}\nnot json\n")
+    assert response.status_code == 422
+
+
+def test_open_key_targets_stream_without_a_pre_scan(monkeypatch):
+    def no_scan(*args):
+        raise AssertionError("JSON/NDJSON/XML 출력은 전체 키를 미리 모으지 않아야 함")
+
+    monkeypatch.setattr(convert_module, "_scan_upload", no_scan)
+    app = FastAPI()
+    app.include_router(convert_router)
+    client = TestClient(app)
+    url = "/api/v1/report/convert"
+
+    response = client.post(url, params={"target": "ndjson", "source": "ndjson"}, content=ndjson(RECORDS))
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == RECORDS
+
+    response = client.post(url, params={"target": "json", "source": "ndjson"}, content=ndjson(RECORDS))
+    assert response.json() == RECORDS
+
+    response = client.post(url, params={"target": "xml", "source": "ndjson"}, content=ndjson(RECORDS))
+    assert response.status_code == 200
+    extras = [(e.get("name"), e.text) for e in ET.fromstring(response.content).iter("AdditionalInformation")]
+    assert ("country_of_origin", "CN") in extras
+
+
+def test_xml_illegal_characters_are_replaced():
+    records = [{"line_id": "x\x01y", "product_name": "a\x0bb"}]
+    xlsx = b"".join(convert(iter(records), ["line_id", "product_name"], "xlsx"))
+    assert list(read_xlsx(io.BytesIO(xlsx))) == [{"line_id": "x\ufffdy", "product_name": "a\ufffdb"}]
+
+    registry = b"".join(convert(iter(records), ["line_id", "product_name"], "xml", company_id="c\x02"))
+    ET.fromstring(registry)
@@ -0,0 +1,63 @@
+# LCA 엔진 - 캐시된 분해로 푼 다중 수요 결과가 밀집 풀이와 같고, 잘못된 수요는 거부
+import json
+
+import numpy as np
+import pytest
+
+from app.service.lca_engine import footprints, get_database
+from app.service.lca_report import product_footprint_table
+
+
+def dense_impacts(db, demand: dict) -> np.ndarray:
+    f = np.zeros(db.n_activities)
+    f[db.activity_positions(list(demand))] = list(demand.values())
+    s = np.linalg.solve(db.technosphere.toarray(), f)
+    return (db.characterization @ db.biosphere).toarray() @ s
+
+
+def test_batched_footprints_match_dense_solve():
+    db = get_database()
+    ids = db.activities["id"].tolist()
+    demands = [{ids[-1]: 1.0}, {ids[0]: 2.0, ids[-1]: 0.5}]
+    result = footprints(demands)
+    for row, demand in zip(result["impacts"], demands):
+        np.testing.assert_allclose(row, dense_impacts(db, demand), rtol=1e-9, atol=1e-12)
+
+
+def test_empty_demand_is_rejected():
+    with pytest.raises(ValueError):
+        footprints([{}])
+
+
+def test_product_table_keeps_activity_id_key():
+    db = get_database()
+    ids = db.activities["id"].tolist()[:2]
+    table = product_footprint_table(ids)
+    assert table.index.name == "activity_id"
+    assert table.reset_index()["activity_id"].tolist() == ids
+
+
+def test_footprints_endpoint_negotiates_packed_rows():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.common.wire import PACKED_MEDIA_TYPE, packed_to_json, unpackb
+    from app.router.lca_router import lca_router
+
+    app = FastAPI()
+    app.include_router(lca_router)
+    client = TestClient(app)
+    ids = get_database().activities["id"].tolist()
+    body = {"demands": [{ids[-1]: 1.0}, {ids[0]: 2.0}]}
+
+    plain = client.post("/api/v1/report/lca/footprints", json=body)
+    packed = client.post("/api/v1/report/lca/footprints", json=body, headers={"Accept": PACKED_MEDIA_TYPE})
+    assert plain.headers["content-type"].startswith("application/json")
+    assert packed.headers["content-type"] == PACKED_MEDIA_TYPE
+    rows = unpackb(packed.content)["impacts"]
+    assert all(isinstance(row, np.ndarray) and row.dtype == np.float64 for row in rows)
+    assert json.loads(packed_to_json(packed.content)) == plain.json()
+
+    rejected = client.post("/api/v1/report/lca/footprints", json={"demands": [{}]},
+                           headers={"Accept": PACKED_MEDIA_TYPE})
+    assert rejected.status_code == 422
@@ -0,0 +1,60 @@
+# LCA 불확실성 분석 - 깨진 프로세스 풀은 한 번 새로 만들어 재시도, 청크 실패 시 남은 청크 취소
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from app.service import lca_uncertainty
+from app.service.lca_engine import get_database
+from app.service.lca_uncertainty import UncertaintyAnalysis
+
+
+class FailingPool:
+    """제출한 작업을 주어진 예외로 끝내는 풀 (fail_all이 아니면 첫 작업만 실패, 나머지는 대기 상태로 남김)"""
+
+    def __init__(self, error: Exception, fail_all: bool):
+        self.error = error
+        self.fail_all = fail_all
+        self.futures = []
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        if self.fail_all or not self.futures:
+            future.set_exception(self.error)
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def analysis(monkeypatch):
+    monkeypatch.setattr(lca_uncertainty, "CHUNK_SAMPLES", 16)
+    db = get_database()
+    return UncertaintyAnalysis({db.activities["id"].iloc[-1]: 1.0}, samples=64, seed=1)
+
+
+def test_broken_pool_is_replaced_and_chunks_retried_once(analysis, monkeypatch):
+    broken = FailingPool(BrokenProcessPool("worker died"), fail_all=True)
+    replacement = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(lca_uncertainty, "_executor", broken)
+    monkeypatch.setattr(lca_uncertainty, "ProcessPoolExecutor", lambda **kwargs: replacement)
+
+    analysis.run()
+    replacement.shutdown()
+    assert analysis.status == "completed", analysis.error
+    assert broken.shut_down and lca_uncertainty._executor is replacement
+    assert analysis.samples_done == 64
+    assert all(np.isfinite(m["mean"]) for m in analysis.results["methods"].values())
+
+
+def test_failed_chunk_cancels_the_remaining_chunks(analysis, monkeypatch):
+    pool = FailingPool(RuntimeError("solver failed"), fail_all=False)
+    monkeypatch.setattr(lca_uncertainty, "_executor", pool)
+
+    analysis.run()
+    assert (analysis.status, analysis.error) == ("failed", "solver failed")
+    assert all(f.cancelled() for f in pool.futures[1:])
@@ -0,0 +1,120 @@
+# 보고서 작업 큐 - Redis 처리 목록/하트비트로 죽은 인스턴스의 작업 회수, 깨진 프로세스 풀은 교체 후 한 번 재실행,
+# 차트는 작업 워커가 아니라 API 프로세스의 차트 풀에서 렌더링
+import asyncio
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fakeredis.aioredis
+
+from app.service import charts, report_jobs
+from app.service.artifact_store import get_store
+from app.service.charts import ChartSpec
+from app.service.report_jobs import JobRunner, JobType, LocalJobBackend, RedisJobBackend
+
+
+def job(job_id: str, priority: str = "normal") -> dict:
+    return {"job_id": job_id, "type": "lca_footprint_report", "params": {}, "priority": priority,
+            "status": "queued", "progress": 0.0, "message": ""}
+
+
+def test_jobs_of_a_dead_instance_are_requeued():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        dead = RedisJobBackend(fakeredis.aioredis.FakeRedis(server=server), worker_id="dead")
+        alive = RedisJobBackend(fakeredis.aioredis.FakeRedis(server=server), worker_id="alive")
+        for backend in (dead, alive):
+            await backend.heartbeat()
+        for item in (job("j1", "low"), job("j2", "high")):
+            await dead.save(item)
+            await dead.enqueue(item)
+
+        # 높은 우선순위부터, 꺼낸 작업은 처리 목록으로
+        assert await dead.pop(["high", "normal", "low"], timeout=0.1) == "j2"
+        running = await dead.get("j2")
+        running["status"] = "running"
+        await dead.save(running)
+        assert await dead.redis.lrange("report:jobs:processing:dead", 0, -1) == [b"j2"]
+
+        # 하트비트가 살아 있으면 회수하지 않음, 만료되면 대기열 맨 앞으로
+        assert await alive.reap() == 0
+        await dead.redis.delete("report:jobs:worker:dead")
+        assert await alive.reap() == 1
+        assert (await alive.get("j2"))["status"] == "queued"
+        assert await alive.pop(["high", "normal", "low"], timeout=0.1) == "j2"
+        assert not await alive.redis.sismember("report:jobs:workers", "dead")
+
+        await alive.ack("j2")
+        assert await alive.redis.llen("report:jobs:processing:alive") == 0
+        assert await alive.pop(["high"], timeout=0.1) is None
+
+    asyncio.run(scenario())
+
+
+class BrokenPool:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pool_is_replaced_and_job_retried_once(monkeypatch):
+    async def scenario():
+        runner = JobRunner(LocalJobBackend())
+        runner._executor.shutdown()
+        broken = runner._executor = BrokenPool()
+        replacement = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(runner, "_new_executor", lambda: replacement)
+        monkeypatch.setattr(report_jobs, "run_job", lambda *args: ([{"name": "report.json"}], None))
+
+        assert await runner._run_in_pool(job("j1"), slot=0) == ([{"name": "report.json"}], None)
+        assert broken.shut_down and runner._executor is replacement
+        replacement.shutdown()
+
+    asyncio.run(scenario())
+
+
+def _chart_job(params, ctx):
+    ctx.write_json("data.json", {"rows": 3})
+    specs = [ChartSpec(f"chart{i}", "bar", {"labels": ["a", "b"], "t": [i, i + 1]}, format="svg") for i in range(3)]
+    ctx.defer_charts(specs, "summary.json", {"title": "quarter"})
+
+
+def test_job_charts_are_rendered_through_the_shared_chart_pool(monkeypatch):
+    monkeypatch.setitem(report_jobs.JOB_TYPES, "chart_job", JobType(_chart_job))
+    monkeypatch.setattr(charts, "CHART_INLINE_MAX", 1)
+    # Figure 템플릿은 프로세스별 상태라 스레드 하나로 풀을 대신함
+    chart_pool = ThreadPoolExecutor(max_workers=1)
+    submitted = []
+
+    def get_executor():
+        submitted.append(True)
+        return chart_pool
+
+    monkeypatch.setattr(charts, "get_executor", get_executor)
+
+    async def scenario():
+        runner = JobRunner(LocalJobBackend())
+        runner._executor.shutdown()
+        runner._executor = ThreadPoolExecutor(max_workers=1)
+        record = dict(job("c1"), type="chart_job")
+        await runner._execute(record, runner._slots.pop())
+        runner._executor.shutdown()
+        return record
+
+    record = asyncio.run(scenario())
+    chart_pool.shutdown()
+    assert record["status"] == "completed", record.get("error")
+    assert submitted
+    names = [a["name"] for a in record["artifacts"]]
+    assert names == ["chart0.svg", "chart1.svg", "chart2.svg", "data.json", "summary.json"]
+    summary = next(a for a in record["artifacts"] if a["name"] == "summary.json")
+    with open(get_store().path(summary["sha256"]), encoding="utf-8") as f:
+        rendered = json.load(f)
+    assert rendered["title"] == "quarter" and len(rendered["charts"]["charts"]) == 3